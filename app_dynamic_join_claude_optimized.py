@@ -6,10 +6,27 @@ import logging
 import sqlite3
 import math
 import re
+import threading
+import time
 from pathlib import Path
-from flask import Flask, render_template, request, flash, send_from_directory, url_for
+from flask import Flask, render_template, request, flash, send_from_directory, url_for, jsonify
 from typing import List, Dict, Any, Optional, Tuple
 
+from bitmap_index import (BitmapIndex, can_use_index, candidate_condition, class_condition, default_index_path,
+                          fetch_bitmap_page)
+from goods_code_dictionary import GoodsCodeDictionary, default_dictionary_path
+from goods_fts import ORDERS as GOODS_ORDERS, goods_condition, index_exists as goods_index_exists, rank_subquery
+from db_pool import SQLiteConnectionPool
+from image_manifest import DEFAULT_TTL as IMAGE_MANIFEST_DEFAULT_TTL, ImageManifest
+from image_store import relative_thumbnail_path
+from search_cache import DEFAULT_MAX_ENTRIES as SEARCH_CACHE_DEFAULT_SIZE, SearchCache, get_data_version
+from search_paging import DEFAULT_COUNT_CAP, InvalidCursorError, fetch_keyset_page, fetch_ranked_page, query_key
+from similar_group_search import (OPERATORS as SIMILAR_GROUP_OPERATORS, InvalidCodeError, parse_codes,
+                                  similar_group_condition, table_exists as similar_group_table_exists)
+from mark_text_fts import index_exists, mark_text_condition
+from trademark_summary import (WEB_SUMMARY_COLUMNS, is_standard_character, summary_exists, summary_lookup_sql,
+                               web_detail_sql)
+
 # --- 設定クラス ---
 class Config:
     DB_PATH = Path(os.environ.get('DB_PATH', Path(__file__).parent.resolve() / "output.db"))
@@ -21,6 +38,31 @@ class Config:
     # 画像関連設定
     IMAGES_DIR = Path(os.environ.get('IMAGES_DIR', Path(__file__).parent.resolve() / "images" / "final_complete"))
     SERVE_IMAGES = True
+    # 画像目録の更新確認間隔（秒）
+    IMAGE_MANIFEST_TTL = float(os.environ.get('IMAGE_MANIFEST_TTL', IMAGE_MANIFEST_DEFAULT_TTL))
+    # 画像配信のキャッシュ期間（?v= 付きURLは内容が変わらないため immutable で長期キャッシュ）
+    IMAGE_CACHE_MAX_AGE = int(os.environ.get('IMAGE_CACHE_MAX_AGE', 365 * 24 * 3600))
+    IMAGE_REVALIDATE_MAX_AGE = int(os.environ.get('IMAGE_REVALIDATE_MAX_AGE', 3600))
+    # X-Sendfile（前段のWebサーバーにファイル送信を任せる場合のみ有効化）
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+    # コネクションプール設定
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    # 総件数の取得モード（single: 1パスで正確な件数, estimate: 上限付き概算）
+    SEARCH_COUNT_MODE = os.environ.get('SEARCH_COUNT_MODE', 'single')
+    SEARCH_COUNT_CAP = int(os.environ.get('SEARCH_COUNT_CAP', DEFAULT_COUNT_CAP))
+    # 検索結果キャッシュ（総件数・出願番号ページ、データ更新で自動的に無効化）
+    SEARCH_CACHE_ENABLED = os.environ.get('SEARCH_CACHE_ENABLED', 'true').lower() == 'true'
+    SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', SEARCH_CACHE_DEFAULT_SIZE))
+    # SQLite上の2段目キャッシュ（プロセス再起動後・複数ワーカー間で共有）
+    SEARCH_CACHE_PERSISTENT = os.environ.get('SEARCH_CACHE_PERSISTENT', 'true').lower() == 'true'
+    # 区分・類似群コードのビットマップ索引（インポート・週次更新・起動時に作成したファイルを読み込む）
+    BITMAP_INDEX_ENABLED = os.environ.get('BITMAP_INDEX_ENABLED', 'true').lower() == 'true'
+    BITMAP_INDEX_PATH = Path(os.environ.get('BITMAP_INDEX_PATH', default_index_path(DB_PATH)))
+    # データバージョンの確認間隔（秒）
+    BITMAP_INDEX_TTL = float(os.environ.get('BITMAP_INDEX_TTL', 30))
+    # 商品・役務名 → 類似群コードの展開辞書（インポート・週次更新・起動時に作成したファイルを読み込む）
+    GOODS_DICTIONARY_PATH = Path(os.environ.get('GOODS_DICTIONARY_PATH', default_dictionary_path(DB_PATH)))
 
 # --- アプリケーション初期化 ---
 app = Flask(__name__)
@@ -38,51 +80,34 @@ else:
 logger = logging.getLogger(__name__)
 
 # --- 画像関連ユーティリティ ---
-def find_image_file(app_num: str) -> Optional[str]:
-    """出願番号に対応する画像ファイルを検索"""
-    if not app_num:
-        return None
-    
-    # 出願番号を正規化（ハイフンを除去）
-    normalized_num = app_num.replace("-", "").strip()
-    
-    # 画像ディレクトリが存在するかチェック
+_image_manifest: Optional[ImageManifest] = None
+
+def get_image_manifest() -> ImageManifest:
+    """画像ディレクトリの目録を取得（初回のみディレクトリを走査）"""
+    global _image_manifest
     images_dir = Path(app.config['IMAGES_DIR'])
-    if not images_dir.exists():
-        logger.warning(f"Images directory not found: {images_dir}")
-        return None
-    
-    # 対応する画像ファイルを検索
-    possible_extensions = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff']
-    
-    for ext in possible_extensions:
-        image_path = images_dir / f"{normalized_num}.{ext}"
-        if image_path.exists():
-            return f"{normalized_num}.{ext}"
-    
-    return None
+    if _image_manifest is None or _image_manifest.images_dir != images_dir:
+        _image_manifest = ImageManifest(images_dir, ttl=app.config['IMAGE_MANIFEST_TTL'])
+    return _image_manifest
 
-def get_image_url(app_num: str) -> Optional[str]:
-    """画像URLを取得"""
-    image_filename = find_image_file(app_num)
+def find_image_file(app_num: str) -> Optional[str]:
+    """出願番号に対応する画像ファイルを検索（目録を参照し、ファイルシステムには触れない）"""
+    return get_image_manifest().lookup(app_num)
+
+def get_image_url(app_num: str, image_filename: Optional[str] = None, thumbnail: bool = False) -> Optional[str]:
+    """画像URLを取得（thumbnail=True の場合はサムネイルがあればサムネイルを配信するURL）"""
+    image_filename = image_filename or find_image_file(app_num)
     if image_filename:
-        return url_for('serve_image', filename=image_filename)
+        params = {}
+        # 画像の更新時刻をURLに含め、ブラウザに再検証なしでキャッシュさせる
+        version = get_image_manifest().version(image_filename)
+        if version:
+            params['v'] = version
+        if thumbnail:
+            params['size'] = 'thumb'
+        return url_for('serve_image', filename=image_filename, **params)
     return None
 
-def is_standard_character(image_data: str) -> bool:
-    """標準文字かどうかを判定"""
-    if not image_data:
-        return True
-    
-    # 標準文字の特徴的なパターン
-    if (image_data.startswith("//") or 
-        set(image_data.strip()) == {"/"} or 
-        len(image_data.strip()) < 20 or
-        image_data.count("/") / len(image_data) > 0.8):
-        return True
-    
-    return False
-
 # --- テンプレートフィルター ---
 @app.template_filter('format_similar_code')
 def format_similar_group_code(codes_str: Optional[str]) -> str:
@@ -132,146 +157,230 @@ def init_database():
             logger.error(f"Schema file not found at {schema_path}")
             raise FileNotFoundError(f"Schema file not found at {schema_path}")
 
-def get_db_connection():
-    """データベース接続を取得"""
-    db_path = app.config['DB_PATH']
-    if not db_path.exists() or db_path.stat().st_size == 0:
-        init_database()
-    
-    con = sqlite3.connect(db_path)
-    con.row_factory = sqlite3.Row
-    return con
+_db_pool: Optional[SQLiteConnectionPool] = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> SQLiteConnectionPool:
+    """読み取り専用コネクションプールを取得（初回のみDBファイルを確認）"""
+    global _db_pool
+    if _db_pool is not None:
+        return _db_pool
+    # 同時に届いた最初のリクエストがプールを重複して作らないようにする
+    with _db_pool_lock:
+        if _db_pool is None:
+            db_path = app.config['DB_PATH']
+            if not db_path.exists() or db_path.stat().st_size == 0:
+                init_database()
+            _db_pool = SQLiteConnectionPool(
+                db_path,
+                max_size=app.config['DB_POOL_SIZE'],
+                timeout=app.config['DB_POOL_TIMEOUT']
+            )
+            logger.info(f"Connection pool created: {db_path} (max_size={_db_pool.max_size})")
+        return _db_pool
+
+def reset_db_pool():
+    """コネクションプールを破棄（DB再初期化時など）"""
+    global _db_pool, _search_cache, _bitmap_index, _bitmap_index_checked_at, _goods_dictionary
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.close_all()
+            _db_pool = None
+        if _search_cache is not None:
+            _search_cache.close()
+            _search_cache = None
+    _bitmap_index = None
+    _bitmap_index_checked_at = float('-inf')
+    _goods_dictionary = None
+
+_search_cache: Optional[SearchCache] = None
+_bitmap_index: Optional[BitmapIndex] = None
+_bitmap_index_checked_at = float('-inf')
+_bitmap_index_lock = threading.Lock()
+
+def get_bitmap_index() -> Optional[BitmapIndex]:
+    """
+    区分・類似群コードのビットマップ索引を取得（データバージョンが変わっていれば読み込み直す）
+    索引ファイルが無い・古い場合は None（検索中には作成せず、SQL条件で検索する）
+    """
+    global _bitmap_index, _bitmap_index_checked_at
+    if not app.config['BITMAP_INDEX_ENABLED']:
+        return None
+    # 作成に失敗した場合も TTL の間は再試行しない（None を返してSQL条件で検索する）
+    if time.monotonic() - _bitmap_index_checked_at < app.config['BITMAP_INDEX_TTL']:
+        return _bitmap_index
+    with _bitmap_index_lock:
+        if time.monotonic() - _bitmap_index_checked_at < app.config['BITMAP_INDEX_TTL']:
+            return _bitmap_index
+        try:
+            with get_db_pool().connection() as con:
+                if _bitmap_index is None or _bitmap_index.data_version != get_data_version(con):
+                    _bitmap_index = BitmapIndex.load_current(con, app.config['BITMAP_INDEX_PATH'])
+                    if _bitmap_index is None:
+                        logger.warning(f"Bitmap index missing or stale, using SQL filters: "
+                                       f"{app.config['BITMAP_INDEX_PATH']}")
+                    else:
+                        logger.info(f"Bitmap index ready: {_bitmap_index.size} applications "
+                                    f"(data version {_bitmap_index.data_version})")
+        except sqlite3.Error as e:
+            logger.warning(f"Bitmap index unavailable, using SQL filters: {e}")
+            _bitmap_index = None
+        _bitmap_index_checked_at = time.monotonic()
+    return _bitmap_index
+
+_goods_dictionary: Optional[GoodsCodeDictionary] = None
+_goods_dictionary_checked_at = float('-inf')
+_goods_dictionary_lock = threading.Lock()
+
+def prepare_bitmap_index():
+    """起動時に索引ファイルを確認し、無い・古い場合は作成して保存"""
+    if not app.config['BITMAP_INDEX_ENABLED']:
+        return
+    with get_db_pool().connection() as con:
+        index = BitmapIndex.load_or_build(con, app.config['BITMAP_INDEX_PATH'])
+    logger.info(f"Bitmap index prepared: {index.size} applications (data version {index.data_version})")
+
+def get_goods_dictionary() -> GoodsCodeDictionary:
+    """
+    商品・役務名の展開辞書を取得（データバージョンが変わっていれば読み込み直す）
+    検索中には作成しない。辞書ファイルが古い場合はそのまま使い、無い場合は空の辞書（展開なし）
+    """
+    global _goods_dictionary, _goods_dictionary_checked_at
+    if _goods_dictionary is not None and \
+            time.monotonic() - _goods_dictionary_checked_at < app.config['BITMAP_INDEX_TTL']:
+        return _goods_dictionary
+    with _goods_dictionary_lock:
+        if _goods_dictionary is not None and \
+                time.monotonic() - _goods_dictionary_checked_at < app.config['BITMAP_INDEX_TTL']:
+            return _goods_dictionary
+        with get_db_pool().connection() as con:
+            version = get_data_version(con)
+        if _goods_dictionary is None or _goods_dictionary.data_version != version:
+            path = app.config['GOODS_DICTIONARY_PATH']
+            dictionary = GoodsCodeDictionary.load_saved(path)
+            if dictionary is None:
+                logger.warning(f"Goods dictionary not found, goods terms are not expanded: {path}")
+                dictionary = _goods_dictionary or GoodsCodeDictionary.from_mapping({})
+            elif dictionary.data_version != version:
+                logger.warning(f"Goods dictionary is stale (data version {dictionary.data_version}, "
+                               f"current {version}): {path}")
+            else:
+                logger.info(f"Goods dictionary ready: {dictionary.term_count} terms "
+                            f"(data version {dictionary.data_version})")
+            _goods_dictionary = dictionary
+        _goods_dictionary_checked_at = time.monotonic()
+    return _goods_dictionary
+
+def prepare_goods_dictionary():
+    """起動時に辞書ファイルを確認し、無い・古い場合は作成して保存"""
+    with get_db_pool().connection() as con:
+        dictionary = GoodsCodeDictionary.load_or_build(con, app.config['GOODS_DICTIONARY_PATH'])
+    logger.info(f"Goods dictionary prepared: {dictionary.term_count} terms "
+                f"(data version {dictionary.data_version})")
+
+def get_search_cache() -> Optional[SearchCache]:
+    """検索結果キャッシュを取得（SEARCH_CACHE_ENABLED が false の場合は None）"""
+    global _search_cache
+    if not app.config['SEARCH_CACHE_ENABLED']:
+        return None
+    if _search_cache is None:
+        get_db_pool()
+        with _db_pool_lock:
+            if _search_cache is None:
+                _search_cache = SearchCache(
+                    app.config['DB_PATH'],
+                    max_entries=app.config['SEARCH_CACHE_SIZE'],
+                    persistent=app.config['SEARCH_CACHE_PERSISTENT']
+                )
+    return _search_cache
 
 def query_db(sql, params=()):
     """データベースクエリ実行"""
     logger.debug(f"Executing SQL: {sql}")
     logger.debug(f"With params: {params}")
     
-    con = get_db_connection()
     try:
-        cur = con.execute(sql, params)
-        rows = [dict(row) for row in cur.fetchall()]
+        with get_db_pool().connection() as con:
+            cur = con.execute(sql, params)
+            rows = [dict(row) for row in cur.fetchall()]
         return rows
     except Exception as e:
         logger.error(f"Database query error: {e}")
         raise
-    finally:
-        con.close()
 
 def query_db_one(sql, params=()):
     """データベースクエリ実行（1行のみ）"""
     logger.debug(f"Executing SQL (one): {sql}")
     logger.debug(f"With params (one): {params}")
     
-    con = get_db_connection()
     try:
-        cur = con.execute(sql, params)
-        row = cur.fetchone()
+        with get_db_pool().connection() as con:
+            cur = con.execute(sql, params)
+            row = cur.fetchone()
         return dict(row) if row else None
     except Exception as e:
         logger.error(f"Database query error: {e}")
         raise
-    finally:
-        con.close()
 
 def get_optimized_results(app_nums):
     """最適化された単一クエリで全データを取得"""
     if not app_nums:
         return []
     
-    placeholders = ",".join("?" for _ in app_nums)
-    
-    # 単一の最適化されたクエリで全データを取得（商標表示優先順位対応 + 申請人実名表示）
-    optimized_sql = f"""
-        SELECT
-            j.normalized_app_num AS app_num,
-            -- 商標表示の優先順位: 標準文字 > 表示用商標 > 検索用商標
-            COALESCE(
-                NULLIF(s.standard_char_t, ''),
-                NULLIF(iu.indct_use_t, ''),
-                NULLIF(su.search_use_t, '')
-            ) AS mark_text,
-            j.shutugan_bi AS app_date,
-            j.reg_reg_ymd AS reg_date,
-            h.reg_num AS reg_no,
-            h.right_person_name AS owner_name,
-            h.right_person_addr AS owner_addr,
-            
-            -- 申請人情報（マスターファイル優先、フォールバック付き）
-            CASE 
-                WHEN am.appl_name IS NOT NULL AND am.appl_name != '' AND am.appl_name NOT LIKE '%省略%'
-                THEN am.appl_name
-                WHEN apm.applicant_name IS NOT NULL
-                THEN apm.applicant_name || ' (推定)'
-                ELSE 'コード:' || ap.shutugannindairinin_code
-            END as applicant_name,
-            COALESCE(am.appl_addr, apm.applicant_addr) as applicant_addr,
-            
-            -- 商品・役務区分（GROUP_CONCAT）
-            GROUP_CONCAT(DISTINCT gca.goods_classes) AS goods_classes,
-            
-            -- 類似群コード（GROUP_CONCAT）
-            GROUP_CONCAT(DISTINCT tknd.smlr_dsgn_group_cd) AS similar_group_codes,
-            
-            -- 指定商品・役務（GROUP_CONCAT）
-            GROUP_CONCAT(DISTINCT jcs.designated_goods) AS designated_goods,
-            
-            -- 称呼（GROUP_CONCAT）
-            GROUP_CONCAT(DISTINCT td.dsgnt) AS call_name,
-            
-            -- 画像データ（最初のレコードのみ）
-            MIN(ts.image_data) AS image_data_sample
-            
-        FROM jiken_c_t AS j
-        LEFT JOIN standard_char_t_art AS s ON j.normalized_app_num = s.normalized_app_num
-        LEFT JOIN indct_use_t_art AS iu ON j.normalized_app_num = iu.normalized_app_num
-        LEFT JOIN search_use_t_art_table AS su ON j.normalized_app_num = su.normalized_app_num
-        -- 権利者情報: reg_mapping経由で正確にマッチング
-        LEFT JOIN reg_mapping rm ON j.normalized_app_num = rm.app_num
-        LEFT JOIN right_person_art_t AS h ON rm.reg_num = h.reg_num
-        -- 申請人情報
-        LEFT JOIN jiken_c_t_shutugannindairinin ap ON j.normalized_app_num = ap.shutugan_no 
-                                                   AND ap.shutugannindairinin_sikbt = '1'
-        -- 申請人マスターファイル（優先）
-        LEFT JOIN applicant_master am ON ap.shutugannindairinin_code = am.appl_cd
-        -- 部分的申請人マッピング（フォールバック）
-        LEFT JOIN (
-            SELECT applicant_code, applicant_name, applicant_addr,
-                   ROW_NUMBER() OVER (PARTITION BY applicant_code ORDER BY trademark_count DESC) as rn
-            FROM applicant_mapping
-        ) apm ON ap.shutugannindairinin_code = apm.applicant_code AND apm.rn = 1
-        -- 商品区分: 出願番号または登録番号でマッチング  
-        LEFT JOIN goods_class_art AS gca ON (j.normalized_app_num = gca.normalized_app_num OR
-                                           (j.reg_reg_ymd IS NOT NULL AND gca.reg_num IS NOT NULL))
-        LEFT JOIN t_knd_info_art_table AS tknd ON j.normalized_app_num = tknd.normalized_app_num
-        LEFT JOIN jiken_c_t_shohin_joho AS jcs ON j.normalized_app_num = jcs.normalized_app_num
-        LEFT JOIN t_dsgnt_art AS td ON j.normalized_app_num = td.normalized_app_num
-        LEFT JOIN t_sample AS ts ON j.normalized_app_num = ts.normalized_app_num
-        
-        WHERE j.normalized_app_num IN ({placeholders})
-        GROUP BY j.normalized_app_num
-        ORDER BY j.normalized_app_num
-    """
+    # サマリーテーブルがあれば主キー検索のみで表示データを取得
+    if summary_exists(query_db_one):
+        results = query_db(summary_lookup_sql(len(app_nums), WEB_SUMMARY_COLUMNS), tuple(app_nums))
+        for result in results:
+            result['is_standard_char'] = bool(result['is_standard_char'])
+        return add_image_info(results)
     
-    results = query_db(optimized_sql, tuple(app_nums))
+    # 単一の最適化されたクエリで全データを取得（サマリーのWeb画面用の列と同じ結果）
+    results = query_db(web_detail_sql(len(app_nums)), tuple(app_nums))
+    for result in results:
+        result['is_standard_char'] = is_standard_character(result.get('image_data_sample', ''))
     
-    # 各結果に画像情報を追加
+    return add_image_info(results)
+
+def add_image_info(results):
+    """各結果に画像情報を追加"""
     for result in results:
         app_num = result.get('app_num', '')
         if app_num:
-            result['image_url'] = get_image_url(app_num)
-            result['has_image'] = find_image_file(app_num) is not None
-            result['is_standard_char'] = is_standard_character(result.get('image_data_sample', ''))
+            image_filename = find_image_file(app_num)
+            # 一覧表示はサムネイル、原寸画像は image_full_url
+            result['image_url'] = get_image_url(app_num, image_filename, thumbnail=True)
+            result['image_full_url'] = get_image_url(app_num, image_filename)
+            result['has_image'] = image_filename is not None
     
     return results
 
 # --- 画像配信ルート ---
-@app.route('/images/<filename>')
+@app.route('/images/<path:filename>')
 def serve_image(filename):
-    """画像ファイルを配信"""
+    """
+    画像ファイルを配信（?size=thumb の場合はサムネイルがあればサムネイルを配信）
+    ETag（更新時刻・サイズから生成）と Last-Modified を付け、条件付きリクエストには 304 を返す。
+    ?v= 付きのURLは内容が変わらないため immutable として長期間キャッシュさせる。
+    サムネイルが未作成で元画像を代わりに配信した場合は、作成後に差し替わるよう長期キャッシュしない。
+    """
     try:
         images_dir = app.config['IMAGES_DIR']
-        return send_from_directory(images_dir, filename)
+        path = filename
+        substituted = False
+        if request.args.get('size') == 'thumb':
+            thumbnail = relative_thumbnail_path(Path(filename).stem)
+            if (Path(images_dir) / thumbnail).is_file():
+                path = thumbnail
+            else:
+                substituted = True
+        
+        versioned = bool(request.args.get('v')) and not substituted
+        max_age = app.config['IMAGE_CACHE_MAX_AGE'] if versioned else app.config['IMAGE_REVALIDATE_MAX_AGE']
+        response = send_from_directory(images_dir, path, max_age=max_age, conditional=True, etag=True)
+        response.cache_control.public = True
+        if versioned:
+            response.cache_control.immutable = True
+        return response
     except Exception as e:
         logger.error(f"Error serving image {filename}: {e}")
         return "Image not found", 404
@@ -286,13 +395,20 @@ def index():
     kw_goods_classes = ""
     kw_designated_goods = ""
     kw_similar_group_codes = ""
+    kw_similar_group_op = "and"
+    kw_goods_order = "app_num"
+    kw_goods_term = ""
+    expanded_codes = []
     
     results = []
     error = None
     total_results = 0
+    total_is_estimate = False
     current_page = 1
     per_page = app.config['DEFAULT_PER_PAGE']
     total_pages = 0
+    after = ""
+    next_cursor = None
     
     # リクエストデータの取得
     if request.method == "POST":
@@ -301,6 +417,10 @@ def index():
         kw_goods_classes = request.form.get("goods_classes", "").strip()
         kw_designated_goods = request.form.get("designated_goods", "").strip()
         kw_similar_group_codes = request.form.get("similar_group_codes", "").strip()
+        kw_similar_group_op = request.form.get("similar_group_op", "and").strip()
+        kw_goods_order = request.form.get("goods_order", "app_num").strip()
+        kw_goods_term = request.form.get("goods_term", "").strip()
+        after = request.form.get("after", "").strip()
         try:
             current_page = int(request.form.get("page", 1))
             per_page = int(request.form.get("per_page", app.config['DEFAULT_PER_PAGE']))
@@ -313,6 +433,10 @@ def index():
         kw_goods_classes = request.args.get("goods_classes", "").strip()
         kw_designated_goods = request.args.get("designated_goods", "").strip()
         kw_similar_group_codes = request.args.get("similar_group_codes", "").strip()
+        kw_similar_group_op = request.args.get("similar_group_op", "and").strip()
+        kw_goods_order = request.args.get("goods_order", "app_num").strip()
+        kw_goods_term = request.args.get("goods_term", "").strip()
+        after = request.args.get("after", "").strip()
         try:
             current_page = int(request.args.get("page", 1))
             per_page = int(request.args.get("per_page", app.config['DEFAULT_PER_PAGE']))
@@ -325,9 +449,14 @@ def index():
         current_page = 1
     if per_page not in app.config['PER_PAGE_OPTIONS']:
         per_page = app.config['DEFAULT_PER_PAGE']
+    if kw_similar_group_op not in SIMILAR_GROUP_OPERATORS:
+        kw_similar_group_op = "and"
+    if kw_goods_order not in GOODS_ORDERS:
+        kw_goods_order = "app_num"
     
     # 検索条件があるかチェック
-    has_search_conditions = any([kw_app, kw_mark, kw_goods_classes, kw_designated_goods, kw_similar_group_codes])
+    has_search_conditions = any([kw_app, kw_mark, kw_goods_classes, kw_designated_goods, kw_similar_group_codes,
+                                 kw_goods_term])
     
     if has_search_conditions:
         try:
@@ -343,52 +472,109 @@ def index():
             
             # 商標文字（全商標タイプを検索）
             if kw_mark:
-                from_parts.append("LEFT JOIN standard_char_t_art s ON j.normalized_app_num = s.normalized_app_num")
-                from_parts.append("LEFT JOIN indct_use_t_art iu ON j.normalized_app_num = iu.normalized_app_num")
-                from_parts.append("LEFT JOIN search_use_t_art_table su ON j.normalized_app_num = su.normalized_app_num")
-                where_parts.append("(s.standard_char_t LIKE ? OR iu.indct_use_t LIKE ? OR su.search_use_t LIKE ?)")
-                params.extend([f"%{kw_mark}%", f"%{kw_mark}%", f"%{kw_mark}%"])
+                # 3文字以上はtrigram索引で候補を絞り込み、LIKEで従来と同じ条件を確認
+                mark_from, mark_where, mark_params = mark_text_condition(kw_mark, index_exists(query_db_one))
+                from_parts.extend(mark_from)
+                where_parts.extend(mark_where)
+                params.extend(mark_params)
+            
+            # 区分（部分一致のAND）・類似群コード（前方一致のAND/OR）をビットマップ索引で絞り込み
+            class_terms = kw_goods_classes.split()
+            code_terms = parse_codes(kw_similar_group_codes)
+            # 商品・役務名を類似群コードへ展開（いずれかのコードを持つ出願、展開できなければ該当なし）
+            if kw_goods_term:
+                expanded_codes = get_goods_dictionary().expand(kw_goods_term)
+                if not expanded_codes:
+                    where_parts.append("0 = 1")
+            fields = (['goods_classes'] if class_terms else []) + \
+                (['similar_group_codes'] if code_terms or expanded_codes else [])
+            bitmap_index = get_bitmap_index() if fields else None
+            bitmap = bitmap_key = None
+            if bitmap_index is not None and bitmap_index.has_fields(fields) and can_use_index(class_terms):
+                postings = []
+                if class_terms:
+                    postings.append(bitmap_index.select('goods_classes', class_terms, match='partial'))
+                if code_terms:
+                    postings.append(bitmap_index.select('similar_group_codes', code_terms,
+                                                        match='prefix', op=kw_similar_group_op))
+                if expanded_codes:
+                    postings.append(bitmap_index.select('similar_group_codes', expanded_codes, op='or'))
+                bitmap = bitmap_index.intersect(postings)
+                if len(where_parts) == 1 and not kw_designated_goods:
+                    # 区分・類似群コードのみの検索は索引だけでページと総件数を取得
+                    bitmap_key = query_key("bitmap", f"goods_classes|similar_group_codes:{kw_similar_group_op}",
+                                           class_terms + ['|'] + code_terms + ['|'] + expanded_codes)
+                else:
+                    condition = candidate_condition(bitmap_index, bitmap)
+                    if condition is None:
+                        bitmap = None
+                    else:
+                        where_parts.append(condition[0])
+                        params.extend(condition[1])
             
             # 商品・役務区分
-            if kw_goods_classes:
-                from_parts.append("LEFT JOIN goods_class_art AS gca ON j.normalized_app_num = gca.normalized_app_num")
-                terms = kw_goods_classes.split()
-                for term in terms:
-                    where_parts.append("gca.goods_classes LIKE ?")
-                    params.append(f"%{term}%")
+            if class_terms and bitmap is None:
+                # 索引と同じく出願単位で判定（各区分を別の行に持つ出願も該当）
+                class_where, class_params = class_condition(class_terms, match='partial', op='and')
+                where_parts.extend(class_where)
+                params.extend(class_params)
             
-            # 指定商品・役務名
+            # 指定商品・役務名（AND / OR / "フレーズ"。3文字以上の語はtrigram索引で候補の行を絞り込む）
+            rank = None
             if kw_designated_goods:
-                from_parts.append("LEFT JOIN jiken_c_t_shohin_joho AS jcs ON j.normalized_app_num = jcs.normalized_app_num")
-                terms = kw_designated_goods.split()
-                for term in terms:
-                    where_parts.append("jcs.designated_goods LIKE ?")
-                    params.append(f"%{term}%")
+                has_goods_index = goods_index_exists(query_db_one)
+                if kw_goods_order == "relevance" and has_goods_index:
+                    rank = rank_subquery(kw_designated_goods)
+                # 関連度順は rank のサブクエリとの結合が同じ絞り込みになるため、条件を重ねない
+                if rank is None:
+                    goods_from, goods_where, goods_params = goods_condition(kw_designated_goods, has_goods_index)
+                    from_parts.extend(goods_from)
+                    where_parts.extend(goods_where)
+                    params.extend(goods_params)
             
-            # 類似群コード
-            if kw_similar_group_codes:
-                from_parts.append("LEFT JOIN t_knd_info_art_table AS tknd ON j.normalized_app_num = tknd.normalized_app_num")
-                terms = kw_similar_group_codes.split()
-                for term in terms:
-                    where_parts.append("tknd.smlr_dsgn_group_cd LIKE ?")
-                    params.append(f"%{term}%")
+            # 類似群コード（5桁は完全一致、5桁未満は前方一致。索引テーブルが無ければ元の列を語単位で判定）
+            if code_terms and bitmap is None:
+                code_where, code_params = similar_group_condition(
+                    code_terms, kw_similar_group_op, similar_group_table_exists(query_db_one))
+                where_parts.extend(code_where)
+                params.extend(code_params)
+            if expanded_codes and bitmap is None:
+                code_where, code_params = similar_group_condition(
+                    expanded_codes, 'or', similar_group_table_exists(query_db_one))
+                where_parts.extend(code_where)
+                params.extend(code_params)
             
             sub_query_from = " ".join(from_parts)
             sub_query_where = " AND ".join(where_parts)
             
-            # 総件数取得
-            count_sql = f"SELECT COUNT(DISTINCT j.normalized_app_num) AS total {sub_query_from} WHERE {sub_query_where}"
-            count_result = query_db_one(count_sql, tuple(params))
-            total_results = count_result['total'] if count_result else 0
+            # 対象の出願番号ページと総件数を1パスで取得
+            # 「次へ」リンクの継続トークン（after）がある場合は前ページの続きからシークする
+            offset = (current_page - 1) * per_page
+            paging_args = (query_db, sub_query_from, sub_query_where, params, per_page, offset)
+            paging_kwargs = dict(count_mode=app.config['SEARCH_COUNT_MODE'],
+                                 count_cap=app.config['SEARCH_COUNT_CAP'],
+                                 cache=get_search_cache())
+            
+            def fetch(cursor):
+                if bitmap_key is not None:
+                    return fetch_bitmap_page(bitmap_index, bitmap, bitmap_key, per_page, offset, cursor=cursor)
+                if rank is not None:
+                    # 関連度順（bm25）
+                    return fetch_ranked_page(query_db, sub_query_from, sub_query_where, params, rank[0], rank[1],
+                                             per_page, offset, cursor=cursor, cache=get_search_cache())
+                return fetch_keyset_page(*paging_args, cursor=cursor, **paging_kwargs)
+            
+            try:
+                page = fetch(after or None)
+            except InvalidCursorError as e:
+                logger.warning(f"Invalid cursor ignored: {e}")
+                page = fetch(None)
+            app_nums, total_results, total_is_estimate = page.app_nums, page.total_count, page.is_estimate
+            next_cursor = page.next_cursor
+            current_page = page.position // per_page + 1
             
             if total_results > 0:
                 total_pages = math.ceil(total_results / per_page)
-                offset = (current_page - 1) * per_page
-                
-                # 対象の出願番号を取得
-                app_num_sql = f"SELECT DISTINCT j.normalized_app_num {sub_query_from} WHERE {sub_query_where} ORDER BY j.normalized_app_num LIMIT ? OFFSET ?"
-                app_num_rows = query_db(app_num_sql, tuple(params + [per_page, offset]))
-                app_nums = [row['normalized_app_num'] for row in app_num_rows]
                 
                 if app_nums:
                     # 最適化された単一クエリで全データを取得
@@ -399,6 +585,9 @@ def index():
                     
                     # Noneや不正な結果をフィルタリング
                     results = [r for r in results if r and r.get('app_num')]
+                    # 関連度順のページはその順に並べ直す
+                    order = {num: i for i, num in enumerate(app_nums)}
+                    results.sort(key=lambda r: order.get(r['app_num'], len(order)))
                     logger.debug(f"Final results count: {len(results)}")
             
             # 検索結果メッセージ
@@ -409,8 +598,12 @@ def index():
                 logger.error("Results is empty despite total_results > 0")
             else:
                 image_count = sum(1 for result in results if result.get('has_image', False))
-                flash(f"{total_results}件の商標が見つかりました。（画像付き: {image_count}件）", 'success')
+                total_label = f"{total_results}+" if total_is_estimate else f"{total_results}"
+                flash(f"{total_label}件の商標が見つかりました。（画像付き: {image_count}件）", 'success')
                 
+        except InvalidCodeError as e:
+            logger.info(f"Invalid similar-group code: {e}")
+            flash("類似群コードの形式が正しくありません（例: 09G01、前方一致は 09G）。", 'error')
         except Exception as e:
             logger.error(f"Search error: {e}")
             if "no such table" in str(e).lower():
@@ -428,11 +621,17 @@ def index():
         kw_goods_classes=kw_goods_classes,
         kw_designated_goods=kw_designated_goods,
         kw_similar_group_codes=kw_similar_group_codes,
+        kw_similar_group_op=kw_similar_group_op,
+        kw_goods_order=kw_goods_order,
+        kw_goods_term=kw_goods_term,
+        expanded_codes=expanded_codes,
         error=error,
         total_results=total_results,
+        total_is_estimate=total_is_estimate,
         current_page=current_page,
         per_page=per_page,
         total_pages=total_pages,
+        next_cursor=next_cursor,
         per_page_options=app.config['PER_PAGE_OPTIONS']
     )
 
@@ -444,22 +643,20 @@ def test_images():
         if not images_dir.exists():
             return f"Images directory not found: {images_dir}"
         
-        # 画像ファイル一覧を取得
-        image_files = []
-        for ext in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff']:
-            image_files.extend(images_dir.glob(f"*.{ext}"))
+        # 画像ファイル一覧を目録から取得
+        manifest = get_image_manifest()
         
         # 最初の10個の画像をテスト表示
-        test_images = image_files[:10]
+        test_images = manifest.filenames(limit=10)
         
         html = "<h2>画像配信テスト</h2>"
         html += f"<p>画像ディレクトリ: {images_dir}</p>"
-        html += f"<p>総画像数: {len(image_files)}</p>"
+        html += f"<p>総画像数: {len(manifest)}</p>"
         html += "<h3>サンプル画像:</h3>"
         
         for img_file in test_images:
-            img_url = url_for('serve_image', filename=img_file.name)
-            app_num = img_file.stem
+            img_url = url_for('serve_image', filename=img_file)
+            app_num = Path(img_file).stem
             html += f'<div style="margin: 10px; padding: 10px; border: 1px solid #ccc;">'
             html += f'<p>出願番号: {app_num}</p>'
             html += f'<img src="{img_url}" alt="{app_num}" style="max-width: 200px; max-height: 200px;">'
@@ -470,11 +667,23 @@ def test_images():
     except Exception as e:
         return f"Error: {str(e)}"
 
+@app.route("/admin/pool-stats")
+def pool_stats_route():
+    """コネクションプール統計（checkouts / waits / max_in_use など）"""
+    return jsonify(get_db_pool().get_stats())
+
+@app.route("/admin/cache-stats")
+def cache_stats_route():
+    """検索結果キャッシュ統計（hits / misses / evictions / data_version など）"""
+    cache = get_search_cache()
+    return jsonify(cache.get_stats() if cache else {'enabled': False})
+
 @app.route("/admin/init-db")
 def init_db_route():
     """データベース初期化エンドポイント"""
     try:
         init_database()
+        reset_db_pool()
         return "Database initialized successfully"
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
@@ -489,9 +698,14 @@ if __name__ == "__main__":
         test_result = query_db_one("SELECT COUNT(*) as count FROM jiken_c_t LIMIT 1")
         logger.info(f"Database test - jiken_c_t records: {test_result['count'] if test_result else 'None'}")
         
+        # 検索中に索引・辞書を作成しないよう、起動時に作成しておく
+        prepare_bitmap_index()
+        prepare_goods_dictionary()
+        
         images_dir = Path(app.config['IMAGES_DIR'])
         if images_dir.exists():
-            image_count = len(list(images_dir.glob("*.jpg"))) + len(list(images_dir.glob("*.jpeg"))) + len(list(images_dir.glob("*.png")))
+            # 起動時に目録を作成（以降の検索では画像ファイルの存在確認を行わない）
+            image_count = len(get_image_manifest())
             logger.info(f"Images directory found: {images_dir} ({image_count} images)")
         else:
             logger.warning(f"Images directory not found: {images_dir}")
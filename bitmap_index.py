@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+類・類似群コードの転置ビットマップ索引
+出願番号を jiken_c_t の出願番号順の連番（ID）に置き換え、類・類似群コードごとに
+該当するIDの集合をメモリ上に保持する。複数コードの AND/OR はビット演算で求め、
+結果のページと件数は SQL を使わずに取得する（search_paging と同じ継続トークン）。
+
+    件数の多いキー: Python の整数をビットマップとして使用（ビット i = ID i）
+    件数の少ないキー: IDの配列（array('I')、昇順）
+
+索引はファイル（zlib圧縮）に保存して起動時に読み込み、データバージョン
+（search_cache.get_data_version）が変わっていれば作り直す。
+前方一致・部分一致（LIKE '%語%' 相当）は語で始まる・語を含むキーすべての OR として扱い、
+LIKEのワイルドカード（% _）を含む語は索引を使わずに従来のSQLで検索する。
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import os
+import re
+import sqlite3
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from search_cache import get_data_version
+from search_paging import KeysetPage, decode_cursor, keyset_page
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TMBITMP1"
+
+# 索引ファイル名（データベースと同じディレクトリに置く）
+INDEX_FILENAME = "bitmap_index.bin"
+
+# 索引化する項目: 項目名 → (テーブル, 値の列)
+FIELDS = {
+    'goods_classes': ("goods_class_art", "goods_classes"),
+    'similar_group_codes': ("t_knd_info_art_table", "smlr_dsgn_group_cd"),
+}
+
+MATCH_MODES = ('exact', 'prefix', 'partial')
+OPERATORS = ('and', 'or')
+
+# 件数 × SPARSE_FACTOR が全出願件数未満のキーは配列で保持する（IDは4バイト、ビットマップは1件1ビット）
+SPARSE_FACTOR = 32
+
+# 他の条件と組み合わせる場合に、候補の出願番号をSQLへ渡す上限件数
+CANDIDATE_LIMIT = 5000
+
+_VALUE_SEPARATOR = re.compile(r'[\s,]+')
+_NONZERO_BYTE = re.compile(rb'[^\x00]')
+_ASCII_UPPER = str.maketrans('abcdefghijklmnopqrstuvwxyz', 'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+Posting = Union[int, array]
+
+
+def can_use_index(terms: Sequence[str]) -> bool:
+    """索引で検索できる語か（LIKEのワイルドカードを含む語は不可）"""
+    return all('%' not in term and '_' not in term for term in terms)
+
+
+def _like_key(value: str) -> str:
+    """LIKE と同じくASCII英字の大文字・小文字を区別しない比較用の値"""
+    return value.translate(_ASCII_UPPER)
+
+
+# --- ポスティング（IDの集合）の演算 ---
+def _to_bitmap(posting: Posting, size: int) -> int:
+    if isinstance(posting, int):
+        return posting
+    buf = bytearray((size + 7) // 8)
+    for i in posting:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _compact(ids: Sequence[int], size: int) -> Posting:
+    """昇順のIDを件数に応じた表現へ変換"""
+    if len(ids) * SPARSE_FACTOR < size:
+        return array('I', ids)
+    return _to_bitmap(ids, size)
+
+
+def intersect(postings: Sequence[Posting], size: int) -> Posting:
+    """AND（配列が含まれる場合は結果も配列）"""
+    if not postings:
+        raise ValueError("intersect() requires at least one posting")
+    sparse = sorted((p for p in postings if not isinstance(p, int)), key=len)
+    dense = [p for p in postings if isinstance(p, int)]
+
+    mask = None
+    for p in dense:
+        mask = p if mask is None else mask & p
+    if not sparse:
+        return mask
+
+    ids = list(sparse[0])
+    for p in sparse[1:]:
+        members = set(p)
+        ids = [i for i in ids if i in members]
+    if mask is not None:
+        bits = mask.to_bytes((size + 7) // 8, 'little')
+        ids = [i for i in ids if bits[i >> 3] >> (i & 7) & 1]
+    return array('I', ids)
+
+
+def union(postings: Sequence[Posting], size: int) -> Posting:
+    """OR（件数が少なければ配列、多ければビットマップ）"""
+    if all(not isinstance(p, int) for p in postings):
+        total = sum(len(p) for p in postings)
+        if total * SPARSE_FACTOR < size:
+            return array('I', sorted(set().union(*postings)))
+    result = 0
+    for p in postings:
+        result |= _to_bitmap(p, size)
+    return result
+
+
+def count(posting: Posting) -> int:
+    return posting.bit_count() if isinstance(posting, int) else len(posting)
+
+
+def _select_bit(bitmap: int, k: int) -> int:
+    """k 番目（0始まり）に立っているビットの位置（二分探索、各段はC実装の popcount）"""
+    lo, hi = 0, bitmap.bit_length()
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if (bitmap & ((1 << (mid + 1)) - 1)).bit_count() > k:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def _lowest_bits(bitmap: int, start: int, limit: int) -> List[int]:
+    """位置 start 以降に立っているビットを小さい順に最大 limit 個"""
+    rest = bitmap >> start
+    data = rest.to_bytes((rest.bit_length() + 7) // 8, 'little')
+    ids = []
+    for match in _NONZERO_BYTE.finditer(data):
+        base = start + match.start() * 8
+        byte = data[match.start()]
+        while byte:
+            low = byte & -byte
+            ids.append(base + low.bit_length() - 1)
+            if len(ids) == limit:
+                return ids
+            byte ^= low
+    return ids
+
+
+def page_ids(posting: Posting, limit: int, offset: int = 0, after: Optional[int] = None) -> List[int]:
+    """ID順のページ（after を指定した場合はそのIDより後ろから）"""
+    if limit <= 0:
+        return []
+    if not isinstance(posting, int):
+        start = bisect.bisect_right(posting, after) if after is not None else offset
+        return list(posting[start:start + limit])
+    if after is not None:
+        return _lowest_bits(posting, after + 1, limit)
+    if offset >= posting.bit_count():
+        return []
+    return _lowest_bits(posting, _select_bit(posting, offset), limit)
+
+
+class BitmapIndex:
+    """類・類似群コードの転置ビットマップ索引"""
+
+    def __init__(self, app_nums: List[str], postings: Dict[str, Dict[str, Posting]], data_version: int = 0):
+        # ID → 出願番号（出願番号順）
+        self.app_nums = app_nums
+        self.postings = postings
+        self.data_version = data_version
+        self._like_keys: Dict[str, List[Tuple[str, str]]] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.app_nums)
+
+    @classmethod
+    def build(cls, conn: sqlite3.Connection) -> "BitmapIndex":
+        """データベースから索引を作成"""
+        app_nums = [row[0] for row in conn.execute(
+            "SELECT normalized_app_num FROM jiken_c_t WHERE normalized_app_num IS NOT NULL "
+            "ORDER BY normalized_app_num")]
+        ids = {app_num: i for i, app_num in enumerate(app_nums)}
+        size = len(app_nums)
+
+        postings = {}
+        for field, (table, column) in FIELDS.items():
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if not {'normalized_app_num', column} <= columns:
+                # 元の列が無い項目は索引化しない（その項目の検索はSQL条件で行う）
+                logger.warning(f"  {field}: {table}.{column} が無いため索引化しません")
+                continue
+            collected: Dict[str, array] = {}
+            for app_num, value in conn.execute(f"SELECT normalized_app_num, {column} FROM {table} "
+                                               f"ORDER BY normalized_app_num"):
+                app_id = ids.get(app_num)
+                if app_id is None or value is None:
+                    continue
+                for key in _VALUE_SEPARATOR.split(str(value).strip()):
+                    if not key:
+                        continue
+                    members = collected.setdefault(key, array('I'))
+                    # 出願番号順に読むためIDは昇順（同じ出願の重複のみ除く）
+                    if not members or members[-1] != app_id:
+                        members.append(app_id)
+            postings[field] = {key: _compact(members, size) for key, members in collected.items()}
+            logger.info(f"  {field}: {len(collected):,}キー")
+
+        return cls(app_nums, postings, get_data_version(conn))
+
+    # --- 検索 ---
+    def has_fields(self, fields: Sequence[str]) -> bool:
+        """指定した項目がすべて索引化されているか"""
+        return all(field in self.postings for field in fields)
+
+    def keys(self, field: str) -> List[str]:
+        return sorted(self.postings[field])
+
+    def _matching_keys(self, field: str, term: str, match: str) -> List[str]:
+        if match == 'exact':
+            return [term] if term in self.postings[field] else []
+        like_keys = self._like_keys.get(field)
+        if like_keys is None:
+            like_keys = self._like_keys[field] = [(_like_key(key), key) for key in self.postings[field]]
+        term = _like_key(term)
+        if match == 'prefix':
+            return [key for folded, key in like_keys if folded.startswith(term)]
+        return [key for folded, key in like_keys if term in folded]
+
+    def lookup(self, field: str, term: str, match: str = 'exact') -> Posting:
+        """1語に該当するID（前方一致・部分一致は該当するキーすべての OR）"""
+        if field not in self.postings:
+            raise ValueError(f"Unknown field: {field} (expected one of {tuple(self.postings)})")
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode: {match} (expected one of {MATCH_MODES})")
+        postings = [self.postings[field][key] for key in self._matching_keys(field, term, match)]
+        return union(postings, self.size) if postings else array('I')
+
+    def select(self, field: str, terms: Sequence[str], match: str = 'exact', op: str = 'and') -> Posting:
+        """複数語の AND / OR"""
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator: {op} (expected one of {OPERATORS})")
+        postings = [self.lookup(field, term, match) for term in terms]
+        if not postings:
+            raise ValueError("select() requires at least one term")
+        combine = intersect if op == 'and' else union
+        return combine(postings, self.size)
+
+    def intersect(self, postings: Sequence[Posting]) -> Posting:
+        return intersect(postings, self.size)
+
+    def count(self, posting: Posting) -> int:
+        return count(posting)
+
+    def page(self, posting: Posting, limit: int, offset: int = 0, after: Optional[str] = None) -> List[str]:
+        """出願番号順のページ（after を指定した場合はその出願番号より後ろから）"""
+        after_id = None
+        if after is not None:
+            after_id = bisect.bisect_right(self.app_nums, after) - 1
+        return [self.app_nums[i] for i in page_ids(posting, limit, offset, after_id)]
+
+    def app_nums_of(self, posting: Posting) -> List[str]:
+        return self.page(posting, count(posting))
+
+    # --- 保存・読み込み ---
+    def save(self, path):
+        """索引をファイルへ保存（一時ファイルに書いてから置き換え）"""
+        blobs = []
+        header = {'data_version': self.data_version, 'size': self.size, 'fields': {}}
+        for field, postings in self.postings.items():
+            entries = header['fields'][field] = []
+            for key, posting in postings.items():
+                if isinstance(posting, int):
+                    blob = posting.to_bytes((self.size + 7) // 8, 'little')
+                    entries.append([key, 'b', len(blob)])
+                else:
+                    ids = array('I', posting)
+                    if sys.byteorder == 'big':
+                        ids.byteswap()
+                    blob = ids.tobytes()
+                    entries.append([key, 'a', len(blob)])
+                blobs.append(blob)
+
+        header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        app_bytes = "\n".join(self.app_nums).encode('utf-8')
+        payload = b"".join([struct.pack('<II', len(header_bytes), len(app_bytes)), header_bytes, app_bytes] + blobs)
+
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC)
+            f.write(zlib.compress(payload, 6))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path) -> "BitmapIndex":
+        """ファイルから索引を読み込み"""
+        data = Path(path).read_bytes()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"Not a bitmap index file: {path}")
+        payload = zlib.decompress(data[len(MAGIC):])
+        header_len, app_len = struct.unpack_from('<II', payload)
+        pos = struct.calcsize('<II')
+        header = json.loads(payload[pos:pos + header_len])
+        pos += header_len
+        app_text = payload[pos:pos + app_len].decode('utf-8')
+        pos += app_len
+        app_nums = app_text.split("\n") if app_text else []
+
+        postings = {}
+        for field, entries in header['fields'].items():
+            postings[field] = {}
+            for key, kind, length in entries:
+                blob = payload[pos:pos + length]
+                pos += length
+                if kind == 'b':
+                    postings[field][key] = int.from_bytes(blob, 'little')
+                else:
+                    ids = array('I')
+                    ids.frombytes(blob)
+                    if sys.byteorder == 'big':
+                        ids.byteswap()
+                    postings[field][key] = ids
+        return cls(app_nums, postings, header['data_version'])
+
+    @classmethod
+    def load_current(cls, conn: sqlite3.Connection, path) -> Optional["BitmapIndex"]:
+        """保存済みの索引がデータバージョンと一致すれば読み込む（無い・古い・読めない場合は None）"""
+        if path is None or not Path(path).exists():
+            return None
+        version = get_data_version(conn)
+        try:
+            index = cls.load(path)
+        except (OSError, ValueError, KeyError, zlib.error, struct.error) as e:
+            logger.warning(f"ビットマップ索引を読み込めませんでした: {path}: {e}")
+            return None
+        if index.data_version != version:
+            logger.info(f"ビットマップ索引が古くなっています: {index.data_version} → {version}")
+            return None
+        return index
+
+    @classmethod
+    def load_or_build(cls, conn: sqlite3.Connection, path=None) -> "BitmapIndex":
+        """
+        保存済みの索引がデータバージョンと一致すれば読み込み、そうでなければ作り直して保存
+        （保存に失敗しても作成した索引は返す）
+        """
+        index = cls.load_current(conn, path)
+        if index is not None:
+            return index
+
+        index = cls.build(conn)
+        if path is not None:
+            try:
+                index.save(path)
+            except OSError as e:
+                logger.warning(f"ビットマップ索引を保存できませんでした: {path}: {e}")
+        return index
+
+
+def default_index_path(db_path) -> Path:
+    """データベースに対応する索引ファイルのパス"""
+    return Path(db_path).with_name(INDEX_FILENAME)
+
+
+def write_index(conn: sqlite3.Connection, path) -> BitmapIndex:
+    """
+    索引を作成してファイルへ保存（インポート・週次更新でデータバージョンを進めた後に実行）
+    Webアプリは保存された索引を読み込むだけで、検索中に作成しない
+    """
+    index = BitmapIndex.build(conn)
+    index.save(path)
+    logger.info(f"ビットマップ索引を保存しました: {path} ({index.size:,}件, データバージョン {index.data_version})")
+    return index
+
+
+def candidate_condition(index: BitmapIndex, posting: Posting,
+                        limit: Optional[int] = None) -> Optional[Tuple[str, List[str]]]:
+    """
+    他の条件と組み合わせる場合のWHERE句の条件（候補の出願番号をJSON配列で渡す）
+    候補が limit 件（既定は CANDIDATE_LIMIT）を超える場合は None（class_condition などのSQL条件で検索する）
+    """
+    if count(posting) > (CANDIDATE_LIMIT if limit is None else limit):
+        return None
+    return ("j.normalized_app_num IN (SELECT value FROM json_each(?))",
+            [json.dumps(index.app_nums_of(posting), separators=(',', ':'))])
+
+
+def class_condition(terms: Sequence[str], match: str = 'exact', op: str = 'or') -> Tuple[List[str], List[str]]:
+    """
+    区分の WHERE条件とパラメータ（索引を使わない場合、select と同じく出願単位で判定）
+
+    Args:
+        terms: 区分
+        match: 'exact'（完全一致） / 'partial'（LIKE '%語%'）
+        op: 'and'（全区分を持つ） / 'or'（いずれかを持つ）
+    """
+    if match not in ('exact', 'partial'):
+        raise ValueError(f"Unknown match mode: {match} (expected 'exact' or 'partial')")
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator: {op} (expected one of {OPERATORS})")
+    subquery = "j.normalized_app_num IN (SELECT normalized_app_num FROM goods_class_art WHERE goods_classes {})"
+    if match == 'exact' and op == 'or':
+        return [subquery.format(f"IN ({','.join(['?' for _ in terms])})")], list(terms)
+
+    comparison = "= ?" if match == 'exact' else "LIKE ?"
+    params = list(terms) if match == 'exact' else [f"%{term}%" for term in terms]
+    where = [subquery.format(comparison) for _ in terms]
+    if op == 'or':
+        return [f"({' OR '.join(where)})"], params
+    return where, params
+
+
+def fetch_bitmap_page(index: BitmapIndex, posting: Posting, key: str, limit: int,
+                      offset: int = 0, cursor: Optional[str] = None) -> KeysetPage:
+    """
+    索引の結果から fetch_keyset_page と同じ形式のページを作成（総件数は常に正確）
+
+    Raises:
+        InvalidCursorError: トークンが不正、または別の検索条件のものである場合
+    """
+    total_count = count(posting)
+    if cursor is None:
+        return keyset_page(index.page(posting, limit, offset=offset), total_count, False, offset, limit, key)
+    state = decode_cursor(cursor, key)
+    app_nums = index.page(posting, limit, after=state['after'])
+    return keyset_page(app_nums, total_count, False, state['position'], limit, key)
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="類・類似群コードのビットマップ索引を作成")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    parser.add_argument("--output", help=f"索引ファイルのパス（省略時はデータベースと同じディレクトリの {INDEX_FILENAME}）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    output = args.output or default_index_path(args.db)
+    conn = sqlite3.connect(args.db)
+    try:
+        index = write_index(conn, output)
+    finally:
+        conn.close()
+    keys = ", ".join(f"{field}: {len(postings):,}" for field, postings in index.postings.items())
+    print(f"{output}: {index.size:,}件（{keys}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,15 +15,57 @@ import math
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 
+from search_paging import (COUNT_MODES, DEFAULT_COUNT_MODE, DEFAULT_COUNT_CAP,
+                           InvalidCursorError, KeysetPage, fetch_keyset_page, fetch_ranked_page, query_key)
+from bitmap_index import BitmapIndex, candidate_condition, class_condition, fetch_bitmap_page
+from search_cache import SearchCache
+from goods_code_dictionary import GoodsCodeDictionary
+from goods_fts import ORDERS as GOODS_ORDERS, goods_condition, index_exists as goods_index_exists, rank_subquery
+from similar_group_search import (OPERATORS as SIMILAR_GROUP_OPERATORS, InvalidCodeError, parse_codes,
+                                  similar_group_condition, table_exists as similar_group_table_exists)
+from mark_text_fts import index_exists, mark_text_condition
+from normalized_marks import MATCH_MODES, NORMALIZED_COLUMNS, columns_indexed, normalized_mark_condition, register_functions
+from trademark_summary import live_detail_sql, summary_exists, summary_lookup_sql
+
 # データベース設定
 DB_PATH = Path("output.db")
 
 class TrademarkSearchCLI:
     """商標検索CLI"""
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None,
+                 count_mode: str = DEFAULT_COUNT_MODE,
+                 count_cap: int = DEFAULT_COUNT_CAP,
+                 cache: Optional[SearchCache] = None,
+                 bitmap_index: Optional[BitmapIndex] = None,
+                 goods_dictionary: Optional[GoodsCodeDictionary] = None):
         self.db_path = Path(db_path) if db_path else DB_PATH
         self.conn = None
+        # 総件数・出願番号ページのキャッシュ（search_cache.SearchCache、None でキャッシュなし）
+        self.cache = cache
+        # 類・類似群コードの転置ビットマップ索引（bitmap_index.BitmapIndex、None でSQLのみ）
+        self.bitmap_index = bitmap_index
+        # 指定商品・役務名 → 類似群コードの展開辞書（goods_code_dictionary、None なら初回の展開時に作成）
+        self.goods_dictionary = goods_dictionary
+        # 総件数の取得モード（search_paging.COUNT_MODES）
+        self.count_mode = count_mode
+        self.count_cap = count_cap
+        # 直近の検索の総件数が概算（count_capで打ち切り）かどうか
+        self.last_total_is_estimate = False
+        # 直近の検索の次ページ継続トークン（--after に指定する）
+        self.last_next_cursor = None
+        # 直近の検索で商品・役務名から展開した類似群コード
+        self.last_expanded_codes = []
+        # trademark_summary テーブルの有無（初回の詳細取得時に確認）
+        self._has_summary = None
+        # 商標文字のFTS5索引の有無（初回の商標文字検索時に確認）
+        self._has_mark_text_index = None
+        # 正規化済み商標文字の列・索引の有無（初回の完全一致・前方一致検索時に確認）
+        self._has_normalized_columns = None
+        # 類似群コード索引テーブルの有無（初回の類似群コード検索時に確認）
+        self._has_similar_group_table = None
+        # 指定商品・役務名のFTS5索引の有無（初回の指定商品検索時に確認）
+        self._has_goods_index = None
         
     def get_db_connection(self):
         """データベース接続を取得"""
@@ -46,6 +88,45 @@ class TrademarkSearchCLI:
         results = self.query_db(query, args)
         return results[0] if results else None
     
+    def has_summary_table(self) -> bool:
+        """trademark_summary テーブルが存在するか（接続ごとに一度だけ確認）"""
+        if self._has_summary is None:
+            self._has_summary = summary_exists(self.query_db_one)
+        return self._has_summary
+    
+    def has_mark_text_index(self) -> bool:
+        """商標文字のFTS5索引が存在するか（接続ごとに一度だけ確認）"""
+        if self._has_mark_text_index is None:
+            self._has_mark_text_index = index_exists(self.query_db_one)
+        return self._has_mark_text_index
+    
+    def has_normalized_columns(self) -> bool:
+        """正規化済み商標文字の列・索引が存在するか（接続ごとに一度だけ確認）"""
+        if self._has_normalized_columns is None:
+            self._has_normalized_columns = columns_indexed(self.query_db_one)
+            if not self._has_normalized_columns:
+                # 列が無い場合は正規化関数をSQL関数として評価する（全件走査）
+                register_functions(self.get_db_connection())
+        return self._has_normalized_columns
+    
+    def has_similar_group_table(self) -> bool:
+        """類似群コード索引テーブルが存在するか（接続ごとに一度だけ確認）"""
+        if self._has_similar_group_table is None:
+            self._has_similar_group_table = similar_group_table_exists(self.query_db_one)
+        return self._has_similar_group_table
+    
+    def has_goods_index(self) -> bool:
+        """指定商品・役務名のFTS5索引が存在するか（接続ごとに一度だけ確認）"""
+        if self._has_goods_index is None:
+            self._has_goods_index = goods_index_exists(self.query_db_one)
+        return self._has_goods_index
+    
+    def get_goods_dictionary(self) -> GoodsCodeDictionary:
+        """商品・役務名の展開辞書（未指定ならデータベースから作成）"""
+        if self.goods_dictionary is None:
+            self.goods_dictionary = GoodsCodeDictionary.build(self.get_db_connection())
+        return self.goods_dictionary
+    
     def get_optimized_results(self, app_nums: List[str]) -> List[Dict]:
         """
         最適化された単一クエリで全情報を取得
@@ -54,101 +135,10 @@ class TrademarkSearchCLI:
         if not app_nums:
             return []
         
-        placeholders = ','.join(['?' for _ in app_nums])
-        
-        optimized_sql = f"""
-            SELECT DISTINCT
-                j.normalized_app_num AS app_num,
-                COALESCE(je.shutugan_bi, j.shutugan_bi) AS app_date,
-                COALESCE(je.toroku_bi, j.reg_reg_ymd) AS reg_date,
-                
-                -- 登録番号（拡張データから取得）
-                COALESCE(je.raz_toroku_no, tbi.reg_num, rm.reg_num, h.reg_num) AS registration_number,
-                
-                -- 基本項目（新規対応）
-                je.raz_kohohakko_bi AS reg_gazette_date,
-                je.pcz_kokaikohohakko_bi AS publication_date,
-                tbi.prior_app_right_occr_dt AS prior_right_date,
-                tbi.conti_prd_expire_dt AS expiry_date,
-                tbi.rjct_finl_dcsn_dsptch_dt AS rejection_dispatch_date,
-                tbi.rec_latest_updt_dt AS renewal_application_date,
-                tbi.set_reg_dt AS renewal_registration_date,
-                
-                -- 管理情報項目（新規対応）
-                mgi.trial_dcsn_year_month_day AS trial_request_date,
-                mgi.processing_type AS trial_type,
-                
-                -- 付加情報項目（新規対応）  
-                ai.right_request AS additional_info,
-                
-                -- 商標文字（優先順位: 標準文字 → 表示用 → 検索用）
-                COALESCE(s.standard_char_t, iu.indct_use_t, su.search_use_t) AS mark_text,
-                
-                -- 権利者情報
-                h.right_person_name AS right_person_name,
-                h.right_person_addr AS right_person_addr,
-                
-                -- 申請人情報（マスターファイル優先、フォールバック付き）
-                CASE 
-                    WHEN am.appl_name IS NOT NULL AND am.appl_name != '' AND am.appl_name NOT LIKE '%省略%'
-                    THEN am.appl_name
-                    WHEN apm.applicant_name IS NOT NULL
-                    THEN apm.applicant_name || ' (推定)'
-                    ELSE 'コード:' || ap.shutugannindairinin_code
-                END as applicant_name,
-                COALESCE(am.appl_addr, apm.applicant_addr) as applicant_addr,
-                
-                -- 商品・役務区分（GROUP_CONCAT）
-                GROUP_CONCAT(DISTINCT gca.goods_classes) AS goods_classes,
-                
-                -- 類似群コード（GROUP_CONCAT）
-                GROUP_CONCAT(DISTINCT tknd.smlr_dsgn_group_cd) AS similar_group_codes,
-                
-                -- 指定商品・役務（GROUP_CONCAT）
-                GROUP_CONCAT(DISTINCT jcs.designated_goods) AS designated_goods,
-                
-                -- 称呼（GROUP_CONCAT）
-                GROUP_CONCAT(DISTINCT td.dsgnt) AS call_name,
-                
-                -- 画像データの有無
-                CASE WHEN ts.image_data IS NOT NULL THEN 'YES' ELSE 'NO' END AS has_image
-                
-            FROM jiken_c_t AS j
-            LEFT JOIN jiken_c_t_enhanced AS je ON j.normalized_app_num = je.normalized_app_num
-            LEFT JOIN t_basic_item_enhanced AS tbi ON j.normalized_app_num = tbi.normalized_app_num
-            LEFT JOIN mgt_info_enhanced AS mgi ON j.normalized_app_num = mgi.normalized_app_num
-            LEFT JOIN add_info_enhanced AS ai ON j.normalized_app_num = ai.normalized_app_num
-            LEFT JOIN standard_char_t_art AS s ON j.normalized_app_num = s.normalized_app_num
-            LEFT JOIN indct_use_t_art AS iu ON j.normalized_app_num = iu.normalized_app_num
-            LEFT JOIN search_use_t_art_table AS su ON j.normalized_app_num = su.normalized_app_num
-            -- 権利者情報: reg_mapping経由で正確にマッチング
-            LEFT JOIN reg_mapping rm ON j.normalized_app_num = rm.app_num
-            LEFT JOIN right_person_art_t AS h ON rm.reg_num = h.reg_num
-            -- 申請人情報
-            LEFT JOIN jiken_c_t_shutugannindairinin ap ON j.normalized_app_num = ap.normalized_app_num 
-                                                       AND ap.shutugannindairinin_sikbt = '1'
-            -- 申請人マスターファイル（優先）
-            LEFT JOIN applicant_master am ON ap.shutugannindairinin_code = am.appl_cd
-            -- 部分的申請人マッピング（フォールバック）
-            LEFT JOIN (
-                SELECT applicant_code, applicant_name, applicant_addr,
-                       ROW_NUMBER() OVER (PARTITION BY applicant_code ORDER BY created_at DESC) as rn
-                FROM applicant_mapping
-            ) apm ON ap.shutugannindairinin_code = apm.applicant_code AND apm.rn = 1
-            -- 商品区分: 出願番号でマッチング、または登録番号経由でマッチング
-            LEFT JOIN goods_class_art AS gca ON (j.normalized_app_num = gca.normalized_app_num OR
-                                               (rm.reg_num IS NOT NULL AND gca.reg_num = rm.reg_num))
-            LEFT JOIN t_knd_info_art_table AS tknd ON j.normalized_app_num = tknd.normalized_app_num
-            LEFT JOIN jiken_c_t_shohin_joho AS jcs ON j.normalized_app_num = jcs.normalized_app_num
-            LEFT JOIN t_dsgnt_art AS td ON j.normalized_app_num = td.normalized_app_num
-            LEFT JOIN t_sample AS ts ON j.normalized_app_num = ts.normalized_app_num
-            
-            WHERE j.normalized_app_num IN ({placeholders})
-            GROUP BY j.normalized_app_num
-            ORDER BY j.normalized_app_num
-        """
-        
-        return self.query_db(optimized_sql, tuple(app_nums))
+        # サマリーテーブルがあれば主キー検索、無ければライブJOINで集約
+        if self.has_summary_table():
+            return self.query_db(summary_lookup_sql(len(app_nums)), tuple(app_nums))
+        return self.query_db(live_detail_sql(len(app_nums)), tuple(app_nums))
     
     def search_international_trademarks(self,
                                        intl_reg_num: str = None,
@@ -397,13 +387,31 @@ class TrademarkSearchCLI:
                                         applicant_name: str = None,
                                         rights_holder: str = None,
                                         limit: int = 200,
-                                        offset: int = 0) -> Tuple[List[Dict], int]:
+                                        offset: int = 0,
+                                        after: str = None,
+                                        mark_match: str = 'partial',
+                                        mark_normalization: str = 'trademark',
+                                        similar_group_op: str = 'and',
+                                        goods_order: str = 'app_num',
+                                        goods_term: str = None) -> Tuple[List[Dict], int]:
         """
         国内商標の高速直接検索（統合ビューを使わない）
         重複表示問題を解決し、パフォーマンスを向上
+        after に継続トークンを指定した場合は offset ではなく前ページの続きから取得する
+        mark_match が 'exact'/'prefix' の場合は商標文字を mark_normalization の規則で正規化し、
+        正規化列の完全一致・前方一致で検索する
+        類似群コードは5桁なら完全一致、5桁未満なら前方一致（09G → 09G01, 09G02, ...）で、
+        similar_group_op が 'and' なら全コード、'or' ならいずれかのコードを持つ出願を検索する
+        指定商品・役務名は AND / OR / "フレーズ" の検索式で、goods_order が 'relevance' の場合は
+        FTS5索引の bm25 による関連度順に並べる（索引が無い場合は出願番号順）
+        goods_term は商品・役務名の展開辞書で類似群コードに展開し、いずれかのコードを持つ出願を検索する
+        （展開したコードは last_expanded_codes に保持）
         
         Returns:
             (results, total_count): 検索結果と総件数のタプル
+        
+        Raises:
+            InvalidCodeError: 類似群コードの形式が不正な場合
         """
         
         # 動的WHERE句の構築
@@ -416,60 +424,121 @@ class TrademarkSearchCLI:
             where_parts.append("j.normalized_app_num = ?")
             params.append(app_num.replace("-", ""))
         
-        # 商標文字（全商標タイプを検索）
-        if mark_text:
-            from_parts.append("LEFT JOIN standard_char_t_art s ON j.normalized_app_num = s.normalized_app_num")
-            from_parts.append("LEFT JOIN indct_use_t_art iu ON j.normalized_app_num = iu.normalized_app_num")
-            from_parts.append("LEFT JOIN search_use_t_art_table su ON j.normalized_app_num = su.normalized_app_num")
-            where_parts.append("(s.standard_char_t LIKE ? OR iu.indct_use_t LIKE ? OR su.search_use_t LIKE ?)")
-            params.extend([f"%{mark_text}%", f"%{mark_text}%", f"%{mark_text}%"])
+        # 商標文字（正規化済み列の完全一致・前方一致）
+        if mark_text and mark_match in MATCH_MODES:
+            mark_where, mark_params = normalized_mark_condition(
+                mark_text, mark_match, mark_normalization, self.has_normalized_columns()
+            )
+            where_parts.extend(mark_where)
+            params.extend(mark_params)
+        
+        # 商標文字（全商標タイプを部分一致で検索）
+        elif mark_text:
+            # 3文字以上はtrigram索引で候補を絞り込み、LIKEで従来と同じ条件を確認
+            mark_from, mark_where, mark_params = mark_text_condition(mark_text, self.has_mark_text_index())
+            from_parts.extend(mark_from)
+            where_parts.extend(mark_where)
+            params.extend(mark_params)
+        
+        class_terms = [term.strip() for term in goods_classes.split() if term.strip()] if goods_classes else []
+        code_terms = parse_codes(similar_group_codes) if similar_group_codes else []
+        
+        # 商品・役務名を類似群コードへ展開（展開できない場合は該当なし）
+        expanded_codes = []
+        if goods_term:
+            expanded_codes = self.last_expanded_codes = self.get_goods_dictionary().expand(goods_term)
+            if not expanded_codes:
+                return self._finish_direct_search(KeysetPage([], 0, False, offset, None))
+        
+        # 区分（完全一致のOR）・類似群コード（前方一致のAND/OR）をビットマップ索引で絞り込み
+        bitmap = None
+        fields = (['goods_classes'] if class_terms else []) + \
+            (['similar_group_codes'] if code_terms or expanded_codes else [])
+        if self.bitmap_index is not None and fields and self.bitmap_index.has_fields(fields):
+            postings = []
+            if class_terms:
+                postings.append(self.bitmap_index.select('goods_classes', class_terms, match='exact', op='or'))
+            if code_terms:
+                postings.append(self.bitmap_index.select('similar_group_codes', code_terms,
+                                                         match='prefix', op=similar_group_op))
+            if expanded_codes:
+                postings.append(self.bitmap_index.select('similar_group_codes', expanded_codes, op='or'))
+            bitmap = self.bitmap_index.intersect(postings)
+            
+            # 区分・類似群コードのみの検索は索引だけでページと総件数を取得
+            if len(where_parts) == 1 and not designated_goods:
+                key = query_key("bitmap", f"goods_classes|similar_group_codes:{similar_group_op}",
+                                class_terms + ['|'] + code_terms + ['|'] + expanded_codes)
+                page = fetch_bitmap_page(self.bitmap_index, bitmap, key, limit, offset, cursor=after)
+                return self._finish_direct_search(page)
+            
+            condition = candidate_condition(self.bitmap_index, bitmap)
+            if condition is None:
+                bitmap = None
+            else:
+                where_parts.append(condition[0])
+                params.extend(condition[1])
         
         # 商品・役務区分（最適化版）
-        if goods_classes:
-            from_parts.append("LEFT JOIN goods_class_art AS gca ON j.normalized_app_num = gca.normalized_app_num")
-            terms = [term.strip() for term in goods_classes.split() if term.strip()]
-            if terms:
-                placeholders = ','.join(['?' for _ in terms])
-                where_parts.append(f"gca.goods_classes IN ({placeholders})")  # OR条件に修正
-                params.extend(terms)
+        if class_terms and bitmap is None:
+            class_where, class_params = class_condition(class_terms, match='exact', op='or')  # OR条件
+            where_parts.extend(class_where)
+            params.extend(class_params)
         
-        # 指定商品・役務名
+        # 指定商品・役務名（3文字以上の語はtrigram索引で候補の行を絞り込み、LIKEで従来と同じ条件を確認）
+        rank = None
         if designated_goods:
-            from_parts.append("LEFT JOIN jiken_c_t_shohin_joho AS jcs ON j.normalized_app_num = jcs.normalized_app_num")
-            terms = designated_goods.split()
-            for term in terms:
-                where_parts.append("jcs.designated_goods LIKE ?")
-                params.append(f"%{term}%")
-        
-        # 類似群コード
-        if similar_group_codes:
-            from_parts.append("LEFT JOIN t_knd_info_art_table AS tknd ON j.normalized_app_num = tknd.normalized_app_num")
-            terms = similar_group_codes.split()
-            for term in terms:
-                where_parts.append("tknd.smlr_dsgn_group_cd LIKE ?")
-                params.append(f"%{term}%")
+            if goods_order == 'relevance' and self.has_goods_index():
+                rank = rank_subquery(designated_goods)
+            # 関連度順は rank のサブクエリとの結合が同じ絞り込みになるため、条件を重ねない
+            if rank is None:
+                goods_from, goods_where, goods_params = goods_condition(designated_goods, self.has_goods_index())
+                from_parts.extend(goods_from)
+                where_parts.extend(goods_where)
+                params.extend(goods_params)
+        
+        # 類似群コード（索引テーブルのシーク、未作成なら元の列を語単位で判定）
+        if code_terms and bitmap is None:
+            code_where, code_params = similar_group_condition(code_terms, similar_group_op,
+                                                              self.has_similar_group_table())
+            where_parts.extend(code_where)
+            params.extend(code_params)
+        if expanded_codes and bitmap is None:
+            code_where, code_params = similar_group_condition(expanded_codes, 'or', self.has_similar_group_table())
+            where_parts.extend(code_where)
+            params.extend(code_params)
         
         sub_query_from = " ".join(from_parts)
         sub_query_where = " AND ".join(where_parts)
         
-        # 総件数取得
-        count_sql = f"SELECT COUNT(DISTINCT j.normalized_app_num) AS total {sub_query_from} WHERE {sub_query_where}"
-        count_result = self.query_db_one(count_sql, tuple(params))
-        total_count = count_result['total'] if count_result else 0
-        
-        if total_count == 0:
-            return [], 0
-        
-        # 対象の出願番号を取得
-        app_num_sql = f"SELECT DISTINCT j.normalized_app_num {sub_query_from} WHERE {sub_query_where} ORDER BY j.normalized_app_num LIMIT ? OFFSET ?"
-        app_num_rows = self.query_db(app_num_sql, tuple(params + [limit, offset]))
-        app_nums = [row['normalized_app_num'] for row in app_num_rows]
+        # 関連度順は bm25 の昇順でページと総件数を取得（継続トークンは次ページの位置）
+        if rank is not None:
+            page = fetch_ranked_page(self.query_db, sub_query_from, sub_query_where, params, rank[0], rank[1],
+                                     limit, offset, cursor=after, cache=self.cache)
+            return self._finish_direct_search(page)
+        
+        # 対象の出願番号ページと総件数を取得（count_modeに応じて1パス/2クエリ/概算、
+        # 継続トークン指定時は前ページの最終出願番号からシーク）
+        page = fetch_keyset_page(
+            self.query_db, sub_query_from, sub_query_where, params,
+            limit, offset, cursor=after, count_mode=self.count_mode, count_cap=self.count_cap,
+            cache=self.cache
+        )
+        return self._finish_direct_search(page)
+    
+    def _finish_direct_search(self, page) -> Tuple[List[Dict], int]:
+        """取得したページの詳細データを取得"""
+        app_nums, total_count = page.app_nums, page.total_count
+        self.last_total_is_estimate = page.is_estimate
+        self.last_next_cursor = page.next_cursor
         
         if not app_nums:
             return [], total_count
         
-        # 最適化された単一クエリで全データを取得
+        # 最適化された単一クエリで全データを取得（関連度順のページはその順に並べ直す）
         results = self.get_optimized_results(app_nums)
+        order = {num: i for i, num in enumerate(app_nums)}
+        results.sort(key=lambda r: order.get(r.get('app_num'), len(order)))
         
         return results, total_count
     
@@ -486,15 +555,26 @@ class TrademarkSearchCLI:
                          applicant_name: str = None,
                          rights_holder: str = None,
                          limit: int = 200,
-                         offset: int = 0) -> Tuple[List[Dict], int]:
+                         offset: int = 0,
+                         after: str = None,
+                         mark_match: str = 'partial',
+                         mark_normalization: str = 'trademark',
+                         similar_group_op: str = 'and',
+                         goods_order: str = 'app_num',
+                         goods_term: str = None) -> Tuple[List[Dict], int]:
         """
         商標検索実行
         パフォーマンス問題を修正し、直接検索を優先使用
+        after（継続トークン）・mark_match（完全一致/前方一致）は国内商標検索でのみ有効
         
         Returns:
             (results, total_count): 検索結果と総件数のタプル
         """
         
+        self.last_total_is_estimate = False
+        self.last_next_cursor = None
+        self.last_expanded_codes = []
+        
         # 国際商標検索の場合は専用メソッドを使用
         if search_international or intl_reg_num:
             return self.search_international_trademarks(
@@ -517,7 +597,13 @@ class TrademarkSearchCLI:
             applicant_name=applicant_name,
             rights_holder=rights_holder,
             limit=limit,
-            offset=offset
+            offset=offset,
+            after=after,
+            mark_match=mark_match,
+            mark_normalization=mark_normalization,
+            similar_group_op=similar_group_op,
+            goods_order=goods_order,
+            goods_term=goods_term
         )
 
         # 従来の商標検索（Phase 1）は廃止
@@ -694,6 +780,8 @@ class TrademarkSearchCLI:
         """リソースのクリーンアップ"""
         if self.conn:
             self.conn.close()
+        if self.cache:
+            self.cache.close()
 
 
 def main():
@@ -701,25 +789,48 @@ def main():
     parser = argparse.ArgumentParser(description="商標検索CLI")
     parser.add_argument("--app-num", help="出願番号")
     parser.add_argument("--mark-text", help="商標文字")
+    parser.add_argument("--mark-match", choices=("partial",) + MATCH_MODES, default="partial",
+                        help="商標文字の一致方法（partial: 部分一致, exact: 完全一致, prefix: 前方一致）")
+    parser.add_argument("--mark-normalization", choices=tuple(NORMALIZED_COLUMNS), default="trademark",
+                        help="完全一致・前方一致で使用する正規化（trademark: 商標文字, pronunciation: 称呼）")
     parser.add_argument("--intl-reg-num", help="国際登録番号")
     parser.add_argument("--international", action="store_true", help="国際商標検索モード")
     parser.add_argument("--goods-classes", help="商品・役務区分")
-    parser.add_argument("--designated-goods", help="指定商品・役務名")
-    parser.add_argument("--similar-group-codes", help="類似群コード")
+    parser.add_argument("--designated-goods",
+                        help='指定商品・役務名（空白区切りはAND、"語1 OR 語2" はOR、引用符で囲むとフレーズ）')
+    parser.add_argument("--goods-order", choices=GOODS_ORDERS, default="app_num",
+                        help="指定商品・役務名検索の並び順（app_num: 出願番号順, relevance: 関連度順）")
+    parser.add_argument("--goods-term",
+                        help="商品・役務名を類似群コードに展開して検索（例: コーヒー、一致する語が無ければ前方一致）")
+    parser.add_argument("--goods-dictionary", metavar="PATH",
+                        help="商品・役務名の展開辞書ファイル（無い・古い場合は作成して保存）")
+    parser.add_argument("--similar-group-codes", help="類似群コード（空白区切り、5桁未満は前方一致: 09G）")
+    parser.add_argument("--similar-group-op", choices=SIMILAR_GROUP_OPERATORS, default="and",
+                        help="類似群コードの組み合わせ（and: 全コード, or: いずれか）")
     parser.add_argument("--application-date-start", help="出願日開始（YYYY-MM-DD）")
     parser.add_argument("--application-date-end", help="出願日終了（YYYY-MM-DD）")
     parser.add_argument("--applicant-name", help="出願人名")
     parser.add_argument("--rights-holder", help="権利者名")
     parser.add_argument("--limit", type=int, default=10, help="取得件数上限（デフォルト: 10）")
     parser.add_argument("--offset", type=int, default=0, help="オフセット（デフォルト: 0）")
+    parser.add_argument("--after", help="継続トークン（前回出力された次ページ用トークン、国内検索のみ）")
     parser.add_argument("--format", choices=["text", "json"], default="text", help="出力形式")
+    parser.add_argument("--count-mode", choices=COUNT_MODES, default=DEFAULT_COUNT_MODE,
+                        help="総件数の取得モード（exact: 2クエリ, single: 1パス, estimate: 上限付き概算）")
+    parser.add_argument("--count-cap", type=int, default=DEFAULT_COUNT_CAP,
+                        help=f"estimateモードの件数上限（デフォルト: {DEFAULT_COUNT_CAP}）")
+    parser.add_argument("--cache", action="store_true",
+                        help="総件数・出願番号ページをキャッシュ（データ更新で自動的に無効化）")
+    parser.add_argument("--cache-stats", action="store_true", help="キャッシュの統計を表示（--cache と併用）")
+    parser.add_argument("--bitmap-index", metavar="PATH",
+                        help="区分・類似群コードのビットマップ索引ファイル（無い・古い場合は作成して保存）")
     parser.add_argument("--db", help="データベースファイルパス")
     
     args = parser.parse_args()
     
     # 検索条件のチェック
     search_conditions = [args.app_num, args.mark_text, args.goods_classes, 
-                        args.designated_goods, args.similar_group_codes, 
+                        args.designated_goods, args.similar_group_codes, args.goods_term,
                         args.intl_reg_num, args.international, args.application_date_start,
                         args.application_date_end, args.applicant_name, args.rights_holder]
     if not any(search_conditions):
@@ -727,7 +838,28 @@ def main():
     
     try:
         # 検索実行
-        searcher = TrademarkSearchCLI(args.db)
+        db_path = Path(args.db) if args.db else DB_PATH
+        cache = SearchCache(db_path) if args.cache else None
+        bitmap_index = None
+        if args.bitmap_index:
+            if not db_path.exists():
+                raise FileNotFoundError(f"Database not found: {db_path}")
+            conn = sqlite3.connect(db_path)
+            try:
+                bitmap_index = BitmapIndex.load_or_build(conn, args.bitmap_index)
+            finally:
+                conn.close()
+        goods_dictionary = None
+        if args.goods_term and args.goods_dictionary:
+            if not db_path.exists():
+                raise FileNotFoundError(f"Database not found: {db_path}")
+            conn = sqlite3.connect(db_path)
+            try:
+                goods_dictionary = GoodsCodeDictionary.load_or_build(conn, args.goods_dictionary)
+            finally:
+                conn.close()
+        searcher = TrademarkSearchCLI(args.db, count_mode=args.count_mode, count_cap=args.count_cap,
+                                      cache=cache, bitmap_index=bitmap_index, goods_dictionary=goods_dictionary)
         results, total_count = searcher.search_trademarks(
             app_num=args.app_num,
             mark_text=args.mark_text,
@@ -741,17 +873,32 @@ def main():
             applicant_name=args.applicant_name,
             rights_holder=args.rights_holder,
             limit=args.limit,
-            offset=args.offset
+            offset=args.offset,
+            after=args.after,
+            mark_match=args.mark_match,
+            mark_normalization=args.mark_normalization,
+            similar_group_op=args.similar_group_op,
+            goods_order=args.goods_order,
+            goods_term=args.goods_term
         )
         
         # 結果表示
-        print(f"検索結果: {len(results)}件 / 総件数: {total_count}件")
+        if args.goods_term:
+            print(f"展開した類似群コード: {' '.join(searcher.last_expanded_codes) or '（該当なし）'}")
+        total_label = f"{total_count}+" if searcher.last_total_is_estimate else f"{total_count}"
+        print(f"検索結果: {len(results)}件 / 総件数: {total_label}件")
         print("=" * 80)
         
         for i, result in enumerate(results, 1):
             print(f"\n--- 結果 {i} ---")
             print(searcher.format_result(result, args.format))
         
+        if searcher.last_next_cursor:
+            print(f"\n次ページ: --after {searcher.last_next_cursor}")
+        
+        if cache and args.cache_stats:
+            print(f"\nキャッシュ: {json.dumps(cache.get_stats(), ensure_ascii=False)}")
+        
         searcher.close()
         
     except sqlite3.Error as e:
@@ -760,6 +907,12 @@ def main():
     except FileNotFoundError as e:
         print(f"ファイルが見つかりません: {e}", file=sys.stderr)
         sys.exit(1)
+    except InvalidCursorError as e:
+        print(f"継続トークンが不正です: {e}", file=sys.stderr)
+        sys.exit(1)
+    except InvalidCodeError as e:
+        print(f"類似群コードが不正です: {e}", file=sys.stderr)
+        sys.exit(1)
     except KeyboardInterrupt:
         print("\n検索が中断されました。", file=sys.stderr)
         sys.exit(0)
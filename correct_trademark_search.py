@@ -7,7 +7,10 @@
 """
 
 import sqlite3
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Iterable, Sequence, Tuple
+
+# IN (...) 1回あたりの出願番号数（SQLiteのバインド変数上限未満）
+CHUNK_SIZE = 500
 
 class CorrectTrademarkSearch:
     """正しい商標検索クラス"""
@@ -51,14 +54,10 @@ class CorrectTrademarkSearch:
                 print("   該当する出願番号がありません")
                 return []
             
-            # ステップ2: 出願番号を主キーとして各テーブルから情報取得
+            # ステップ2: 出願番号をまとめて各テーブルから情報取得（テーブルごとに1クエリ）
             print("2. 出願番号を主キーとして各テーブルから情報取得...")
-            results = []
-            
-            for app_num in app_nums:
-                result = self._get_trademark_info_by_app_num(cursor, app_num)
-                if result:
-                    results.append(result)
+            details = self._get_trademark_info_batch(cursor, app_nums)
+            results = [details[app_num] for app_num in app_nums]
             
             conn.close()
             
@@ -105,14 +104,10 @@ class CorrectTrademarkSearch:
                 print("   該当する出願番号がありません")
                 return []
             
-            # ステップ2: 出願番号を主キーとして各テーブルから情報取得
+            # ステップ2: 出願番号をまとめて各テーブルから情報取得（テーブルごとに1クエリ）
             print("2. 出願番号を主キーとして各テーブルから情報取得...")
-            results = []
-            
-            for app_num in app_nums:
-                result = self._get_trademark_info_by_app_num(cursor, app_num)
-                if result:
-                    results.append(result)
+            details = self._get_trademark_info_batch(cursor, app_nums)
+            results = [details[app_num] for app_num in app_nums]
             
             conn.close()
             
@@ -125,160 +120,190 @@ class CorrectTrademarkSearch:
     
     def _get_trademark_info_by_app_num(self, cursor, app_num: str) -> Dict[str, Any]:
         """出願番号を主キーとして商標情報を取得"""
-        
-        result = {
-            'normalized_app_num': app_num,
-            'app_num': None,
-            'mark_text': None,
-            'search_use_t': None,
-            'standard_char_t': None,
-            'indct_use_t': None,
-            'goods_classes': None,
-            'designated_goods': None,
-            'similar_group_codes': None,
-            'shutugan_bi': None,
-            'reg_num': None,
-            'applicant_name': None,
-            'rights_holder': None,
-            'has_image': 'NO'
-        }
+        return self._get_trademark_info_batch(cursor, [app_num])[app_num]
+    
+    def _fetch_rows(self, cursor, sql: str, keys: Sequence[str]) -> Iterable[tuple]:
+        """IN (...) のクエリを CHUNK_SIZE 件ずつ実行して行を返す（sql の {placeholders} を置換）"""
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = list(keys[start:start + CHUNK_SIZE])
+            placeholders = ','.join(['?' for _ in chunk])
+            cursor.execute(sql.format(placeholders=placeholders), chunk)
+            yield from cursor.fetchall()
+    
+    def _first_by_key(self, cursor, sql: str, keys: Sequence[str]) -> Dict[str, tuple]:
+        """キーごとの最初の行（1件ずつの LIMIT 1 / fetchone と同じ rowid 順）"""
+        first = {}
+        for row in self._fetch_rows(cursor, sql, keys):
+            first.setdefault(row[0], row[1:])
+        return first
+    
+    def _get_trademark_info_batch(self, cursor, app_nums: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        複数の出願番号の商標情報をまとめて取得
+        テーブルごとに1クエリ（IN）で取得し、出願番号ごとの結果はPython側で組み立てる
+        """
+        app_nums = list(dict.fromkeys(app_nums))
         
         # 基本情報（jiken_c_t）
-        cursor.execute("""
-            SELECT shutugan_bi 
-            FROM jiken_c_t 
-            WHERE normalized_app_num = ?
-        """, (app_num,))
-        basic_info = cursor.fetchone()
-        if basic_info:
-            result['shutugan_bi'] = basic_info[0]
-            result['app_num'] = self._format_app_num(app_num)
+        basic = self._first_by_key(cursor, """
+            SELECT normalized_app_num, shutugan_bi
+            FROM jiken_c_t
+            WHERE normalized_app_num IN ({placeholders})
+            ORDER BY rowid
+        """, app_nums)
         
         # 登録番号（reg_mappingから取得）
-        cursor.execute("""
-            SELECT reg_num 
-            FROM reg_mapping 
-            WHERE app_num = ?
-        """, (app_num,))
-        reg_info = cursor.fetchone()
-        if reg_info:
-            result['reg_num'] = reg_info[0]
+        registrations = self._first_by_key(cursor, """
+            SELECT app_num, reg_num
+            FROM reg_mapping
+            WHERE app_num IN ({placeholders})
+            ORDER BY rowid
+        """, app_nums)
         
-        # 画像データの確認（最優先）- データベースから画像ファイルの存在を確認
-        cursor.execute("""
-            SELECT has_image_file
+        # 画像データの確認（最優先）
+        images = self._first_by_key(cursor, """
+            SELECT normalized_app_num, has_image_file
             FROM t_sample
-            WHERE normalized_app_num = ?
-            LIMIT 1
-        """, (app_num,))
-        image_info = cursor.fetchone()
-        if image_info and image_info[0] == 'YES':
-            result['has_image'] = 'YES'
-            result['mark_text'] = '[画像商標]'  # 画像がある場合は最優先
-        
-        # 標準文字商標（standard_char_t_art）- 第2優先
-        cursor.execute("""
-            SELECT standard_char_t 
-            FROM standard_char_t_art 
-            WHERE normalized_app_num = ?
-        """, (app_num,))
-        standard = cursor.fetchone()
-        if standard:
-            result['standard_char_t'] = standard[0]
-            # 画像がない場合は標準文字を使用
-            if not result['mark_text']:
-                result['mark_text'] = standard[0]
-        
-        # 検索用商標（search_use_t_art_table）- 第3優先
-        cursor.execute("""
-            SELECT search_use_t 
-            FROM search_use_t_art_table 
-            WHERE normalized_app_num = ?
-            LIMIT 1
-        """, (app_num,))
-        search = cursor.fetchone()
-        if search:
-            result['search_use_t'] = search[0]
-            # 画像も標準文字もない場合は検索用商標を使用
-            if not result['mark_text']:
-                result['mark_text'] = search[0]
-        
-        # 指定商標（indct_use_t_art）- 削除（使用しない）
-        
-        # 商品区分・指定商品（jiken_c_t_shohin_joho）
-        cursor.execute("""
-            SELECT 
-                GROUP_CONCAT(DISTINCT rui ORDER BY rui) as goods_classes,
-                MAX(designated_goods) as designated_goods
-            FROM jiken_c_t_shohin_joho 
-            WHERE normalized_app_num = ?
-        """, (app_num,))
-        goods_info = cursor.fetchone()
-        if goods_info:
-            result['goods_classes'] = goods_info[0]
-            result['designated_goods'] = goods_info[1]
+            WHERE normalized_app_num IN ({placeholders})
+            ORDER BY rowid
+        """, app_nums)
         
-        # 類似群コード（t_knd_info_art_table）- 半角スペース区切りで整形
-        cursor.execute("""
-            SELECT GROUP_CONCAT(DISTINCT smlr_dsgn_group_cd) as similar_codes
-            FROM t_knd_info_art_table 
-            WHERE normalized_app_num = ?
-        """, (app_num,))
-        similar = cursor.fetchone()
-        if similar and similar[0]:
-            # 類似群コードを半角スペース区切りで整形
-            codes = similar[0].split(',')
-            formatted_codes = []
-            for code in codes:
-                code = code.strip()
-                if len(code) >= 5:  # 2桁数字+1文字アルファベット+2桁数字
-                    formatted_codes.append(code)
-            result['similar_group_codes'] = ' '.join(formatted_codes)
+        # 標準文字商標（第2優先）・検索用商標（第3優先）
+        standards = self._first_by_key(cursor, """
+            SELECT normalized_app_num, standard_char_t
+            FROM standard_char_t_art
+            WHERE normalized_app_num IN ({placeholders})
+            ORDER BY rowid
+        """, app_nums)
+        searches = self._first_by_key(cursor, """
+            SELECT normalized_app_num, search_use_t
+            FROM search_use_t_art_table
+            WHERE normalized_app_num IN ({placeholders})
+            ORDER BY rowid
+        """, app_nums)
         
-        # 申請人情報（複数のソースから取得）
-        # 1. 申請人マスターから取得
-        cursor.execute("""
-            SELECT am.appl_name
-            FROM jiken_c_t_shutugannindairinin ap
-            LEFT JOIN applicant_master am ON ap.shutugannindairinin_code = am.appl_cd
-            WHERE ap.normalized_app_num = ? AND ap.shutugannindairinin_sikbt = '1'
-            LIMIT 1
-        """, (app_num,))
-        applicant = cursor.fetchone()
-        if applicant and applicant[0]:
-            result['applicant_name'] = applicant[0]
-        else:
-            # 2. TSVファイルから直接取得を試行
-            cursor.execute("""
-                SELECT DISTINCT shutugannindairinin_code
-                FROM jiken_c_t_shutugannindairinin
-                WHERE normalized_app_num = ? AND shutugannindairinin_sikbt = '1'
-                LIMIT 1
-            """, (app_num,))
-            code_result = cursor.fetchone()
-            if code_result:
-                # 申請人コードが存在する場合は「申請人情報あり」として表示
-                result['applicant_name'] = f'申請人コード: {code_result[0]}'
+        # 商品区分・指定商品（GROUP_CONCAT(DISTINCT rui ORDER BY rui) と MAX(designated_goods) 相当）
+        goods_classes: Dict[str, set] = {}
+        designated_goods: Dict[str, str] = {}
+        for app_num, rui, goods in self._fetch_rows(cursor, """
+            SELECT normalized_app_num, rui, designated_goods
+            FROM jiken_c_t_shohin_joho
+            WHERE normalized_app_num IN ({placeholders})
+        """, app_nums):
+            if rui is not None:
+                goods_classes.setdefault(app_num, set()).add(rui)
+            if goods is not None and (app_num not in designated_goods or goods > designated_goods[app_num]):
+                designated_goods[app_num] = goods
         
-        # 権利者情報（reg_mapping + right_person_art_t）
-        cursor.execute("""
-            SELECT rp.right_person_name
-            FROM reg_mapping rm
-            LEFT JOIN right_person_art_t rp ON rm.reg_num = rp.reg_num
-            WHERE rm.app_num = ?
-            LIMIT 1
-        """, (app_num,))
-        rights = cursor.fetchone()
-        if rights:
-            result['rights_holder'] = rights[0]
+        # 類似群コード（GROUP_CONCAT(DISTINCT smlr_dsgn_group_cd) 相当、rowid順）
+        similar_codes: Dict[str, Dict[str, None]] = {}
+        for app_num, code in self._fetch_rows(cursor, """
+            SELECT normalized_app_num, smlr_dsgn_group_cd
+            FROM t_knd_info_art_table
+            WHERE normalized_app_num IN ({placeholders})
+            ORDER BY rowid
+        """, app_nums):
+            if code is not None:
+                similar_codes.setdefault(app_num, {})[code] = None
         
-        # 画像データの確認は既に商標表示で処理済み
+        # 申請人情報（最初の申請人の申請人マスター名、無ければ申請人コード）
+        applicants = self._first_by_key(cursor, """
+            SELECT normalized_app_num, shutugannindairinin_code
+            FROM jiken_c_t_shutugannindairinin
+            WHERE normalized_app_num IN ({placeholders}) AND shutugannindairinin_sikbt = '1'
+            ORDER BY rowid
+        """, app_nums)
+        applicant_codes = list({row[0] for row in applicants.values() if row[0] is not None})
+        applicant_names = self._first_by_key(cursor, """
+            SELECT appl_cd, appl_name
+            FROM applicant_master
+            WHERE appl_cd IN ({placeholders})
+            ORDER BY rowid
+        """, applicant_codes)
         
-        # 表示用商標名が設定されていない場合は空欄にする
-        if not result['mark_text']:
-            result['mark_text'] = ""
+        # 権利者情報（最初の登録番号の権利者）
+        reg_nums = list({row[0] for row in registrations.values() if row[0] is not None})
+        right_holders = self._first_by_key(cursor, """
+            SELECT reg_num, right_person_name
+            FROM right_person_art_t
+            WHERE reg_num IN ({placeholders})
+            ORDER BY rowid
+        """, reg_nums)
         
-        return result
+        results = {}
+        for app_num in app_nums:
+            result = {
+                'normalized_app_num': app_num,
+                'app_num': None,
+                'mark_text': None,
+                'search_use_t': None,
+                'standard_char_t': None,
+                'indct_use_t': None,
+                'goods_classes': None,
+                'designated_goods': None,
+                'similar_group_codes': None,
+                'shutugan_bi': None,
+                'reg_num': None,
+                'applicant_name': None,
+                'rights_holder': None,
+                'has_image': 'NO'
+            }
+            
+            if app_num in basic:
+                result['shutugan_bi'] = basic[app_num][0]
+                result['app_num'] = self._format_app_num(app_num)
+            
+            registration = registrations.get(app_num)
+            if registration:
+                result['reg_num'] = registration[0]
+            
+            image = images.get(app_num)
+            if image and image[0] == 'YES':
+                result['has_image'] = 'YES'
+                result['mark_text'] = '[画像商標]'  # 画像がある場合は最優先
+            
+            standard = standards.get(app_num)
+            if standard:
+                result['standard_char_t'] = standard[0]
+                if not result['mark_text']:
+                    result['mark_text'] = standard[0]
+            
+            search = searches.get(app_num)
+            if search:
+                result['search_use_t'] = search[0]
+                if not result['mark_text']:
+                    result['mark_text'] = search[0]
+            
+            if app_num in goods_classes:
+                result['goods_classes'] = ','.join(sorted(goods_classes[app_num]))
+            result['designated_goods'] = designated_goods.get(app_num)
+            
+            # 類似群コードを半角スペース区切りで整形
+            similar = ','.join(similar_codes.get(app_num, ()))
+            if similar:
+                codes = [code.strip() for code in similar.split(',')]
+                # 2桁数字+1文字アルファベット+2桁数字
+                result['similar_group_codes'] = ' '.join(code for code in codes if len(code) >= 5)
+            
+            applicant = applicants.get(app_num)
+            if applicant:
+                name = applicant_names.get(applicant[0])
+                if name and name[0]:
+                    result['applicant_name'] = name[0]
+                else:
+                    # 申請人コードが存在する場合は「申請人情報あり」として表示
+                    result['applicant_name'] = f'申請人コード: {applicant[0]}'
+            
+            if registration:
+                holder = right_holders.get(registration[0])
+                result['rights_holder'] = holder[0] if holder else None
+            
+            # 表示用商標名が設定されていない場合は空欄にする
+            if not result['mark_text']:
+                result['mark_text'] = ""
+            
+            results[app_num] = result
+        return results
     
     def _format_app_num(self, normalized_app_num: str) -> str:
         """出願番号の表示形式変換"""
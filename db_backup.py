@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLiteオンラインバックアップ
+shutil.copy2 によるファイルコピーの代わりに SQLite のオンラインバックアップAPIで
+ページ単位に少しずつ複製する（Webアプリが書き込み中でも整合したスナップショットを取得できる）。
+
+バックアップごとにページのハッシュ値をマニフェスト（JSON）に記録し、
+差分モードでは前回のバックアップから変化したページのみを圧縮して保存する。
+復元時はフルバックアップから差分を順に適用する。
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import shutil
+import sqlite3
+import struct
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# オンラインバックアップで1ステップあたりに複製するページ数
+PAGES_PER_STEP = 1024
+
+# フルバックアップ1件に続けて作成する差分の上限（超えたらフルバックアップを作成）
+MAX_DELTAS = 6
+
+BACKUP_PREFIX = "output_backup_"
+DELTA_MAGIC = b"TMDELTA1"
+HASH_SIZE = 16
+PAGE_NUMBER = struct.Struct(">I")
+
+# (残りページ数, 総ページ数) を受け取る進捗コールバック
+ProgressCallback = Callable[[int, int], None]
+
+
+def _log_progress(remaining: int, total: int):
+    if total:
+        logger.info(f"  バックアップ中: {total - remaining}/{total}ページ ({(total - remaining) / total * 100:.0f}%)")
+
+
+def online_backup(db_path, dest_path, pages: int = PAGES_PER_STEP,
+                  progress: Optional[ProgressCallback] = _log_progress, sleep: float = 0.0) -> Path:
+    """
+    オンラインバックアップAPIで dest_path へ複製
+    pages ページごとにロックを解放するため、バックアップ中も他の接続が読み書きできる
+    （複製中に元が更新された場合は SQLite が自動的にやり直す）
+    """
+    dest_path = Path(dest_path)
+    src = sqlite3.connect(f"file:{Path(db_path)}?mode=ro", uri=True)
+    dst = sqlite3.connect(dest_path)
+    try:
+        callback = None
+        if progress is not None:
+            callback = lambda status, remaining, total: progress(remaining, total)
+        src.backup(dst, pages=pages, progress=callback, sleep=sleep)
+        # WALモードの元データでも単一ファイルで完結させる
+        dst.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        dst.close()
+        src.close()
+    return dest_path
+
+
+def compress_file(path, dest_path) -> Path:
+    """gzip圧縮して dest_path へ書き出す"""
+    with open(path, 'rb') as src, gzip.open(dest_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    return Path(dest_path)
+
+
+def _open_data(path):
+    path = Path(path)
+    return gzip.open(path, 'rb') if path.suffix == '.gz' else open(path, 'rb')
+
+
+def page_size_of(path) -> int:
+    conn = sqlite3.connect(f"file:{Path(path)}?mode=ro", uri=True)
+    try:
+        return conn.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def iter_pages(path, page_size: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return
+            yield page
+
+
+def _page_hash(page: bytes) -> bytes:
+    return hashlib.blake2b(page, digest_size=HASH_SIZE).digest()
+
+
+def page_hashes(path, page_size: int) -> List[bytes]:
+    return [_page_hash(page) for page in iter_pages(path, page_size)]
+
+
+def _write_manifest(path: Path, manifest: Dict, hashes: List[bytes]):
+    manifest = dict(manifest, hashes=base64.b64encode(b''.join(hashes)).decode('ascii'))
+    path.write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+
+
+def load_manifest(path) -> Dict:
+    manifest = json.loads(Path(path).read_text(encoding='utf-8'))
+    raw = base64.b64decode(manifest['hashes'])
+    manifest['hashes'] = [raw[i:i + HASH_SIZE] for i in range(0, len(raw), HASH_SIZE)]
+    return manifest
+
+
+def list_manifests(backup_dir) -> List[Path]:
+    """マニフェストを作成順（ファイル名順）に返す"""
+    return sorted(Path(backup_dir).glob(f"{BACKUP_PREFIX}*.json"))
+
+
+def write_delta(snapshot_path, delta_path, page_size: int, hashes: List[bytes],
+                previous_hashes: List[bytes]) -> int:
+    """
+    前回のハッシュ値と異なるページのみを gzip の差分ファイルへ書き出す
+    形式: DELTA_MAGIC + (ページ番号4バイト + ページ内容) の繰り返し
+
+    Returns:
+        書き出したページ数
+    """
+    changed = 0
+    with gzip.open(delta_path, 'wb', compresslevel=6) as out:
+        out.write(DELTA_MAGIC)
+        for pgno, page in enumerate(iter_pages(snapshot_path, page_size)):
+            if pgno < len(previous_hashes) and previous_hashes[pgno] == hashes[pgno]:
+                continue
+            out.write(PAGE_NUMBER.pack(pgno))
+            out.write(page)
+            changed += 1
+    return changed
+
+
+def _apply_delta(target, delta_path, page_size: int):
+    with gzip.open(delta_path, 'rb') as delta:
+        if delta.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+            raise ValueError(f"差分ファイルの形式が不正です: {delta_path}")
+        while True:
+            header = delta.read(PAGE_NUMBER.size)
+            if not header:
+                return
+            pgno, = PAGE_NUMBER.unpack(header)
+            page = delta.read(page_size)
+            if len(page) != page_size:
+                raise ValueError(f"差分ファイルが途中で終わっています: {delta_path}")
+            target.seek(pgno * page_size)
+            target.write(page)
+
+
+def _needs_full_backup(manifest_path: Path, max_deltas: int) -> bool:
+    """
+    前回のバックアップに差分を続けず、フルバックアップを作成すべきか
+    差分が max_deltas 件に達した場合、または差分の合計サイズがフルバックアップを超えた場合
+    （古い世代を削除できるように、また復元時に適用する差分が増え続けないようにする）
+    """
+    chain = backup_chain(manifest_path)
+    if len(chain) - 1 >= max_deltas:
+        return True
+    sizes = [path.with_name(json.loads(path.read_text(encoding='utf-8'))['data']).stat().st_size
+             for path in chain]
+    return sum(sizes[1:]) > sizes[0]
+
+
+def create_backup(db_path, backup_dir, compress: bool = False, incremental: bool = False,
+                  keep: int = 5, pages: int = PAGES_PER_STEP,
+                  progress: Optional[ProgressCallback] = _log_progress,
+                  max_deltas: int = MAX_DELTAS) -> Path:
+    """
+    バックアップを作成し、マニフェストのパスを返す
+
+    Args:
+        compress: フルバックアップを gzip 圧縮（.db.gz）で保存
+        incremental: 前回のバックアップから変化したページのみを保存
+            （前回が無い場合、差分が max_deltas 件に達した場合、差分の合計がフルより大きい場合はフル）
+        keep: 保持するフルバックアップの世代数（その差分も含めて保持）
+        max_deltas: フルバックアップ1件に続けて作成する差分の上限
+    """
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    name = BACKUP_PREFIX + datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    snapshot = backup_dir / f"{name}.db"
+
+    start = time.perf_counter()
+    logger.info(f"データベースをバックアップ中: {db_path}")
+    online_backup(db_path, snapshot, pages=pages, progress=progress)
+    page_size = page_size_of(snapshot)
+    hashes = page_hashes(snapshot, page_size)
+    manifest = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'source': str(db_path),
+        'page_size': page_size,
+        'page_count': len(hashes),
+    }
+
+    manifests = list_manifests(backup_dir)
+    previous = None
+    if incremental and manifests and not _needs_full_backup(manifests[-1], max_deltas):
+        previous = load_manifest(manifests[-1])
+    if previous is not None and previous['page_size'] == page_size:
+        delta_path = backup_dir / f"{name}.delta.gz"
+        changed = write_delta(snapshot, delta_path, page_size, hashes, previous['hashes'])
+        snapshot.unlink()
+        manifest.update(kind='delta', data=delta_path.name, parent=manifests[-1].name, changed_pages=changed)
+        logger.info(f"  差分バックアップ: {changed}/{len(hashes)}ページ")
+    else:
+        data_path = snapshot
+        if compress:
+            data_path = compress_file(snapshot, backup_dir / f"{name}.db.gz")
+            snapshot.unlink()
+        manifest.update(kind='full', data=data_path.name, parent=None, changed_pages=len(hashes))
+
+    manifest_path = backup_dir / f"{name}.json"
+    _write_manifest(manifest_path, manifest, hashes)
+    logger.info(f"バックアップ完了: {manifest['data']} ({time.perf_counter() - start:.1f}秒)")
+
+    prune_backups(backup_dir, keep)
+    return manifest_path
+
+
+def backup_chain(manifest_path) -> List[Path]:
+    """フルバックアップから指定したバックアップまでのマニフェストを順に返す"""
+    chain = []
+    path = Path(manifest_path)
+    while True:
+        chain.append(path)
+        parent = json.loads(path.read_text(encoding='utf-8')).get('parent')
+        if not parent:
+            return chain[::-1]
+        path = path.with_name(parent)
+        if not path.exists():
+            raise FileNotFoundError(f"差分の元になるバックアップが見つかりません: {path}")
+
+
+def prune_backups(backup_dir, keep: int = 5) -> List[Path]:
+    """
+    古いバックアップを削除（最新 keep 世代のフルバックアップとその差分を保持）
+
+    Returns:
+        削除したファイル
+    """
+    manifests = list_manifests(backup_dir)
+    roots = {}
+    for path in manifests:
+        parent = json.loads(path.read_text(encoding='utf-8')).get('parent')
+        roots[path.name] = roots.get(parent, path.name) if parent else path.name
+    kept_roots = sorted(set(roots.values()))[-keep:] if keep > 0 else []
+
+    removed = []
+    for path in manifests:
+        if roots[path.name] in kept_roots:
+            continue
+        data = json.loads(path.read_text(encoding='utf-8'))['data']
+        for target in (path.with_name(data), path):
+            if target.exists():
+                target.unlink()
+                removed.append(target)
+                logger.info(f"古いバックアップを削除: {target}")
+    return removed
+
+
+def restore_backup(manifest_path, dest_path) -> Path:
+    """バックアップ（差分の場合は元のフルバックアップから順に適用）を dest_path へ復元"""
+    chain = backup_chain(manifest_path)
+    manifests = [json.loads(path.read_text(encoding='utf-8')) for path in chain]
+    dest_path = Path(dest_path)
+    base = chain[0].with_name(manifests[0]['data'])
+    with _open_data(base) as src, open(dest_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    with open(dest_path, 'r+b') as target:
+        for path, manifest in zip(chain[1:], manifests[1:]):
+            _apply_delta(target, path.with_name(manifest['data']), manifest['page_size'])
+        target.truncate(manifests[-1]['page_count'] * manifests[-1]['page_size'])
+    return dest_path
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="SQLiteオンラインバックアップ")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    parser.add_argument("--backup-dir", default="backups", help="バックアップの保存先")
+    parser.add_argument("--compress", action="store_true", help="フルバックアップを gzip 圧縮")
+    parser.add_argument("--incremental", action="store_true", help="前回から変化したページのみ保存")
+    parser.add_argument("--keep", type=int, default=5, help="保持するフルバックアップの世代数")
+    parser.add_argument("--max-deltas", type=int, default=MAX_DELTAS,
+                        help="フルバックアップ1件に続けて作成する差分の上限")
+    parser.add_argument("--pages", type=int, default=PAGES_PER_STEP, help="1ステップで複製するページ数")
+    parser.add_argument("--restore", metavar="MANIFEST", help="指定したバックアップを復元")
+    parser.add_argument("--output", help="復元先のファイルパス（--restore と併用）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.restore:
+        if not args.output:
+            parser.error("--restore には --output が必要です")
+        restore_backup(args.restore, args.output)
+        print(f"復元しました: {args.output}")
+        return
+
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    manifest_path = create_backup(args.db, args.backup_dir, compress=args.compress,
+                                  incremental=args.incremental, keep=args.keep, pages=args.pages,
+                                  max_deltas=args.max_deltas)
+    print(f"バックアップ: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
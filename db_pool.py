@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite読み取り専用コネクションプール
+Flask検索アプリで検索ごとに sqlite3.connect していたコストを削減するため、
+読み取り向けにチューニングした接続を使い回す
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# transaction で書き込み中の接続（id）
+_transactions = set()
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """
+    with conn: の代わりに使う書き込みトランザクション
+    入れ子にした場合は最も外側で確定・取り消しを行う
+    （週次更新でテーブル更新と派生テーブルの再集計を1トランザクションにまとめるため）
+    """
+    key = id(conn)
+    if key in _transactions:
+        yield conn
+        return
+    _transactions.add(key)
+    try:
+        with conn:
+            if not conn.in_transaction:
+                # DDL（一時テーブル作成など）もトランザクションに含める
+                conn.execute("BEGIN")
+            yield conn
+    finally:
+        _transactions.discard(key)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """プールから接続を取得できなかった場合のエラー"""
+
+
+class SQLiteConnectionPool:
+    """スレッドセーフな上限付き読み取り専用コネクションプール"""
+
+    def __init__(self, db_path, max_size: int = 8, timeout: float = 30.0,
+                 mmap_size: int = 256 * 1024 * 1024, cache_size_kib: int = 64 * 1024,
+                 busy_timeout_ms: int = 5000):
+        self.db_path = Path(db_path)
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._idle: List[sqlite3.Connection] = []
+        self._in_use = 0
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        # プール統計
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'max_in_use': 0,
+            'connections_created': 0,
+            'health_check_failures': 0,
+        }
+
+        self._enable_wal()
+
+    def _enable_wal(self):
+        """WALモードを有効化（読み取り中も書き込みをブロックしないため）"""
+        # journal_modeは書き込み可能な接続でしか変更できないため、初期化時に一度だけ設定する
+        try:
+            con = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000)
+            try:
+                mode = con.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+                logger.debug(f"journal_mode: {mode}")
+            finally:
+                con.close()
+        except sqlite3.Error as e:
+            logger.warning(f"WALモードを有効化できませんでした: {e}")
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """読み取り用にチューニングした接続を作成"""
+        uri = f"file:{self.db_path.resolve().as_posix()}?mode=ro"
+        con = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                              timeout=self.busy_timeout_ms / 1000)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA query_only = ON")
+        con.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        con.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        con.execute("PRAGMA temp_store = MEMORY")
+        con.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        with self._cond:
+            self.stats['connections_created'] += 1
+        return con
+
+    def _is_healthy(self, con: sqlite3.Connection) -> bool:
+        """接続のヘルスチェック"""
+        try:
+            con.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        """接続を取得（上限に達している場合は返却を待機）"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+
+            waited = False
+            wait_start = time.monotonic()
+            while not self._idle and self._created >= self.max_size:
+                waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"No connection available within {timeout}s (max_size={self.max_size})"
+                    )
+                self._cond.wait(remaining)
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+
+            if waited:
+                self.stats['waits'] += 1
+                self.stats['wait_time_total'] += time.monotonic() - wait_start
+
+            con = self._idle.pop() if self._idle else None
+            if con is None:
+                # 枠を先に確保してからロック外で接続を作成する
+                self._created += 1
+            self._in_use += 1
+            self.stats['checkouts'] += 1
+            self.stats['max_in_use'] = max(self.stats['max_in_use'], self._in_use)
+
+        try:
+            if con is not None and not self._is_healthy(con):
+                with self._cond:
+                    self.stats['health_check_failures'] += 1
+                logger.warning("プール接続のヘルスチェックに失敗したため再接続します")
+                self._close_quietly(con)
+                con = None
+            if con is None:
+                con = self._create_connection()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return con
+
+    def release(self, con: sqlite3.Connection):
+        """接続をプールへ返却"""
+        discard = False
+        try:
+            # 未完了の読み取りトランザクションを残さない
+            if con.in_transaction:
+                con.rollback()
+        except sqlite3.Error:
+            discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._created -= 1
+            else:
+                self._idle.append(con)
+            self._cond.notify()
+
+        if discard or self._closed:
+            self._close_quietly(con)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """with文で使用する接続コンテキスト"""
+        con = self.acquire(timeout)
+        try:
+            yield con
+        finally:
+            self.release(con)
+
+    def get_stats(self) -> Dict[str, float]:
+        """プール統計を取得"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['in_use'] = self._in_use
+            stats['idle'] = len(self._idle)
+            stats['size'] = self._created
+            stats['max_size'] = self.max_size
+        return stats
+
+    def close_all(self):
+        """全ての接続をクローズ"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for con in idle:
+            self._close_quietly(con)
+
+    @staticmethod
+    def _close_quietly(con: sqlite3.Connection):
+        try:
+            con.close()
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+指定商品・役務名 → 類似群コードの展開辞書
+jiken_c_t_shohin_joho の指定商品・役務名を語（"，" などの区切り）に分け、同じ出願の
+t_knd_info_art_table の類似群コードとの共起件数から語ごとの候補コードを求める。
+
+    採用条件: 共起件数 >= min_count かつ 共起件数 / 語の出願件数 >= min_ratio（多い順に最大 MAX_CODES 件）
+
+語は正規化（NFKC）して UTF-8 のバイト順に並べ、BLOCK_SIZE 語ごとのブロックに前方圧縮
+（直前の語と共通する先頭バイト数 + 残り）で格納する。検索はブロック先頭語の二分探索と
+ブロック内の最大 BLOCK_SIZE 語の復号のみで、前方一致（"コーヒー" → "コーヒー豆" ...）も同じ順序で走査できる。
+辞書はインポート・週次更新の後にファイル（zlib圧縮）へ保存し、Webアプリは読み込むだけで検索中に作成しない。
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import struct
+import sys
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from search_cache import get_data_version
+from similar_group_search import normalize_code
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TMGDICT1"
+
+# 辞書ファイル名（データベースと同じディレクトリに置く）
+DICTIONARY_FILENAME = "goods_dictionary.bin"
+
+BLOCK_SIZE = 16
+
+# 採用条件の既定値
+MIN_COUNT = 2
+MIN_RATIO = 0.5
+MAX_CODES = 8
+
+# 完全一致が無い場合に前方一致で展開する語数の上限
+PREFIX_LIMIT = 50
+
+# 語の区切り（全角・半角のカンマ、読点、セミコロン、空白）
+_TERM_SEPARATOR = re.compile(r'[，,、;；\s]+')
+# 区分見出し（"第9類" など）は語として扱わない
+_CLASS_HEADING = re.compile(r'第\d+類')
+_CODE_SEPARATOR = re.compile(r'[\s,]+')
+MAX_TERM_LENGTH = 64
+
+
+def normalize_term(term: str) -> str:
+    """語の正規化（NFKC、前後の空白除去、英字は小文字）"""
+    return unicodedata.normalize('NFKC', term).strip().lower()
+
+
+def split_terms(designated_goods: str) -> List[str]:
+    """指定商品・役務名を正規化した語に分割（重複・区分見出し・長すぎる語を除く）"""
+    terms = []
+    for token in _TERM_SEPARATOR.split(designated_goods or ""):
+        term = normalize_term(token)
+        if term and len(term) <= MAX_TERM_LENGTH and not _CLASS_HEADING.fullmatch(term) and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _grouped(rows: Iterator[Tuple[str, str]]) -> Iterator[Tuple[str, List[str]]]:
+    """出願番号順の (出願番号, 値) を出願ごとの (出願番号, 値のリスト) にまとめる"""
+    for app_num, group in itertools.groupby(rows, key=lambda row: row[0]):
+        yield app_num, [value for _, value in group]
+
+
+def _encode_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class GoodsCodeDictionary:
+    """前方圧縮した語 → 類似群コードの辞書"""
+
+    def __init__(self, codes: List[str], blocks: bytes, block_offsets: array, block_heads: List[bytes],
+                 term_count: int, data_version: int, params: Optional[Dict] = None):
+        self.codes = codes                  # コードID → 類似群コード
+        self.blocks = blocks                # 前方圧縮した全ブロック
+        self.block_offsets = block_offsets  # ブロックの開始位置
+        self.block_heads = block_heads      # ブロック先頭語（UTF-8、二分探索用）
+        self.term_count = term_count
+        self.data_version = data_version
+        self.params = params or {}
+
+    # --- 作成 ---
+    @classmethod
+    def from_mapping(cls, mapping: Dict[str, Sequence[str]], data_version: int = 0,
+                     params: Optional[Dict] = None) -> "GoodsCodeDictionary":
+        """語 → コード（優先順）の辞書から作成"""
+        codes = sorted({code for values in mapping.values() for code in values})
+        code_ids = {code: i for i, code in enumerate(codes)}
+        entries = sorted((term.encode('utf-8'), values) for term, values in mapping.items() if term and values)
+
+        blocks = bytearray()
+        block_offsets = array('I')
+        block_heads = []
+        previous = b""
+        for i, (key, values) in enumerate(entries):
+            if i % BLOCK_SIZE == 0:
+                block_offsets.append(len(blocks))
+                block_heads.append(key)
+                previous = b""
+            shared = 0
+            limit = min(len(previous), len(key))
+            while shared < limit and previous[shared] == key[shared]:
+                shared += 1
+            _encode_varint(shared, blocks)
+            _encode_varint(len(key) - shared, blocks)
+            blocks += key[shared:]
+            _encode_varint(len(values), blocks)
+            for code in values:
+                _encode_varint(code_ids[code], blocks)
+            previous = key
+        return cls(codes, bytes(blocks), block_offsets, block_heads, len(entries), data_version, params)
+
+    @classmethod
+    def build(cls, conn: sqlite3.Connection, min_count: int = MIN_COUNT, min_ratio: float = MIN_RATIO,
+              max_codes: int = MAX_CODES) -> "GoodsCodeDictionary":
+        """
+        データベースの共起件数から辞書を作成
+        類似群コードと指定商品・役務名を出願番号順に並行して読み、1出願ずつ件数へ加算する
+        （出願ごとの語・コードの集合を全件保持しない）
+        """
+        code_groups = _grouped(conn.execute(
+            "SELECT normalized_app_num, smlr_dsgn_group_cd FROM t_knd_info_art_table "
+            "WHERE normalized_app_num IS NOT NULL AND normalized_app_num != '' "
+            "AND smlr_dsgn_group_cd IS NOT NULL AND smlr_dsgn_group_cd != '' ORDER BY normalized_app_num"))
+        goods_groups = _grouped(conn.execute(
+            "SELECT normalized_app_num, designated_goods FROM jiken_c_t_shohin_joho "
+            "WHERE normalized_app_num IS NOT NULL AND normalized_app_num != '' "
+            "AND designated_goods IS NOT NULL AND designated_goods != '' ORDER BY normalized_app_num"))
+
+        term_counts: Counter = Counter()
+        pair_counts: Dict[str, Counter] = defaultdict(Counter)
+        code_app, code_values = next(code_groups, (None, None))
+        for app_num, goods_values in goods_groups:
+            while code_app is not None and code_app < app_num:
+                code_app, code_values = next(code_groups, (None, None))
+            if code_app != app_num:
+                continue
+            codes = {normalize_code(code) for value in code_values
+                     for code in _CODE_SEPARATOR.split(value.strip()) if code}
+            terms = {term for goods in goods_values for term in split_terms(goods)}
+            for term in terms:
+                term_counts[term] += 1
+                pair_counts[term].update(codes)
+
+        mapping = {}
+        for term, counts in pair_counts.items():
+            threshold = max(min_count, min_ratio * term_counts[term])
+            selected = [code for code, n in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+                        if n >= threshold]
+            if selected:
+                mapping[term] = selected[:max_codes]
+
+        params = {'min_count': min_count, 'min_ratio': min_ratio, 'max_codes': max_codes}
+        dictionary = cls.from_mapping(mapping, get_data_version(conn), params)
+        logger.info(f"商品・役務名辞書: {dictionary.term_count:,}語 / {len(dictionary.codes):,}コード "
+                    f"（{len(dictionary.blocks):,}バイト）")
+        return dictionary
+
+    # --- 検索 ---
+    def _block_entries(self, block: int) -> Iterator[Tuple[bytes, int]]:
+        """ブロック内の (語, コード列の位置) を順に復号（コード列は必要な語のみ _codes_at で復号）"""
+        data = self.blocks
+        pos = self.block_offsets[block]
+        end = self.block_offsets[block + 1] if block + 1 < len(self.block_offsets) else len(data)
+        key = b""
+        while pos < end:
+            shared, pos = _decode_varint(data, pos)
+            length, pos = _decode_varint(data, pos)
+            key = key[:shared] + data[pos:pos + length]
+            pos += length
+            codes_pos = pos
+            n, pos = _decode_varint(data, pos)
+            for _ in range(n):
+                while data[pos] & 0x80:
+                    pos += 1
+                pos += 1
+            yield key, codes_pos
+
+    def _codes_at(self, pos: int) -> List[str]:
+        n, pos = _decode_varint(self.blocks, pos)
+        codes = []
+        for _ in range(n):
+            code_id, pos = _decode_varint(self.blocks, pos)
+            codes.append(self.codes[code_id])
+        return codes
+
+    def _entries_from(self, key: bytes) -> Iterator[Tuple[bytes, int]]:
+        """key 以上の語を辞書順に列挙"""
+        block = max(bisect.bisect_right(self.block_heads, key) - 1, 0)
+        for i in range(block, len(self.block_offsets)):
+            for entry_key, codes_pos in self._block_entries(i):
+                if entry_key >= key:
+                    yield entry_key, codes_pos
+
+    def lookup(self, term: str) -> List[str]:
+        """語（完全一致）の候補コード（該当なしは空リスト）"""
+        key = normalize_term(term).encode('utf-8')
+        for entry_key, codes_pos in self._entries_from(key):
+            return self._codes_at(codes_pos) if entry_key == key else []
+        return []
+
+    def prefix(self, term: str, limit: int = PREFIX_LIMIT) -> List[Tuple[str, List[str]]]:
+        """語で始まる見出し語と候補コード（辞書順に最大 limit 件）"""
+        key = normalize_term(term).encode('utf-8')
+        results = []
+        if not key:
+            return results
+        for entry_key, codes_pos in self._entries_from(key):
+            if not entry_key.startswith(key) or len(results) >= limit:
+                break
+            results.append((entry_key.decode('utf-8'), self._codes_at(codes_pos)))
+        return results
+
+    def expand(self, text: str) -> List[str]:
+        """
+        検索語を類似群コードへ展開（語ごとに完全一致、無ければ前方一致する語のコードを使用）
+        複数語のコードは重複を除いて出現順に連結する
+        """
+        codes = []
+        for term in split_terms(text):
+            found = self.lookup(term)
+            if not found:
+                found = [code for _, values in self.prefix(term) for code in values]
+            for code in found:
+                if code not in codes:
+                    codes.append(code)
+        return codes
+
+    # --- 保存・読み込み ---
+    def save(self, path):
+        """辞書をファイルへ保存（一時ファイルに書いてから置き換え）"""
+        offsets = array('I', self.block_offsets)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        header = {'data_version': self.data_version, 'term_count': self.term_count,
+                  'codes': self.codes, 'params': self.params}
+        header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        heads_bytes = b"\n".join(self.block_heads)
+        offsets_bytes = offsets.tobytes()
+        payload = b"".join([struct.pack('<III', len(header_bytes), len(heads_bytes), len(offsets_bytes)),
+                            header_bytes, heads_bytes, offsets_bytes, self.blocks])
+
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC)
+            f.write(zlib.compress(payload, 6))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path) -> "GoodsCodeDictionary":
+        """ファイルから辞書を読み込み"""
+        data = Path(path).read_bytes()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"Not a goods dictionary file: {path}")
+        payload = zlib.decompress(data[len(MAGIC):])
+        header_len, heads_len, offsets_len = struct.unpack_from('<III', payload)
+        pos = struct.calcsize('<III')
+        header = json.loads(payload[pos:pos + header_len])
+        pos += header_len
+        heads_bytes = payload[pos:pos + heads_len]
+        pos += heads_len
+        offsets = array('I')
+        offsets.frombytes(payload[pos:pos + offsets_len])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        pos += offsets_len
+        heads = heads_bytes.split(b"\n") if heads_bytes else []
+        return cls(header['codes'], payload[pos:], offsets, heads, header['term_count'],
+                   header['data_version'], header.get('params'))
+
+    @classmethod
+    def load_saved(cls, path) -> Optional["GoodsCodeDictionary"]:
+        """保存済みの辞書を読み込む（無い・読めない場合は None）"""
+        if path is None or not Path(path).exists():
+            return None
+        try:
+            return cls.load(path)
+        except (OSError, ValueError, KeyError, zlib.error, struct.error) as e:
+            logger.warning(f"商品・役務名辞書を読み込めませんでした: {path}: {e}")
+            return None
+
+    @classmethod
+    def load_or_build(cls, conn: sqlite3.Connection, path=None) -> "GoodsCodeDictionary":
+        """
+        保存済みの辞書がデータバージョンと一致すれば読み込み、そうでなければ作り直して保存
+        （保存に失敗しても作成した辞書は返す）
+        """
+        version = get_data_version(conn)
+        dictionary = cls.load_saved(path)
+        if dictionary is not None:
+            if dictionary.data_version == version:
+                return dictionary
+            logger.info(f"商品・役務名辞書が古いため作り直します: {dictionary.data_version} → {version}")
+
+        dictionary = cls.build(conn)
+        if path is not None:
+            try:
+                dictionary.save(path)
+            except OSError as e:
+                logger.warning(f"商品・役務名辞書を保存できませんでした: {path}: {e}")
+        return dictionary
+
+
+def default_dictionary_path(db_path) -> Path:
+    """データベースに対応する辞書ファイルのパス"""
+    return Path(db_path).with_name(DICTIONARY_FILENAME)
+
+
+def write_dictionary(conn: sqlite3.Connection, path) -> GoodsCodeDictionary:
+    """辞書を作成してファイルへ保存（インポート・週次更新でデータバージョンを進めた後に実行）"""
+    dictionary = GoodsCodeDictionary.build(conn)
+    dictionary.save(path)
+    logger.info(f"商品・役務名辞書を保存しました: {path} (データバージョン {dictionary.data_version})")
+    return dictionary
+
+
+def benchmark(dictionary: GoodsCodeDictionary, terms: Sequence[str], repeats: int = 1000) -> float:
+    """1語あたりの展開時間（マイクロ秒）"""
+    if not terms:
+        return 0.0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for term in terms:
+            dictionary.expand(term)
+    return (time.perf_counter() - start) / (repeats * len(terms)) * 1e6
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="指定商品・役務名 → 類似群コードの展開辞書を作成")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    parser.add_argument("--output", help=f"辞書ファイルのパス（省略時はデータベースと同じディレクトリの {DICTIONARY_FILENAME}）")
+    parser.add_argument("--min-count", type=int, default=MIN_COUNT, help="採用する最小共起件数")
+    parser.add_argument("--min-ratio", type=float, default=MIN_RATIO, help="採用する最小共起率（0〜1）")
+    parser.add_argument("--max-codes", type=int, default=MAX_CODES, help="1語あたりの最大コード数")
+    parser.add_argument("--lookup", nargs="*", metavar="TERM", help="作成後に展開結果と所要時間を表示する語")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        dictionary = GoodsCodeDictionary.build(conn, args.min_count, args.min_ratio, args.max_codes)
+    finally:
+        conn.close()
+    output = args.output or default_dictionary_path(args.db)
+    dictionary.save(output)
+    print(f"{output}: {dictionary.term_count:,}語 / {len(dictionary.codes):,}コード "
+          f"（{Path(output).stat().st_size:,}バイト）")
+
+    for term in args.lookup or []:
+        print(f"{term}: {' '.join(dictionary.expand(term)) or '（該当なし）'}")
+    if args.lookup:
+        print(f"展開時間: {benchmark(dictionary, args.lookup):.1f} µs/語")
+
+
+if __name__ == "__main__":
+    main()
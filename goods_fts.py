@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+指定商品・役務名の FTS5 trigram 索引
+jiken_c_t_shohin_joho の1行を1文書として索引化する（区分ごとの行単位で条件を満たすかは従来と同じ）。
+
+検索式:
+    語1 語2         : AND（同じ行に両方を含む）
+    語1 OR 語2      : OR
+    "語1 語2"       : フレーズ（空白を含めた部分文字列として検索）
+
+各語は部分文字列として検索する。索引で候補の行を絞り込んだうえで従来のLIKE条件も適用するため、
+結果はLIKEのみの検索と同一になる。trigramで検索できない2文字以下の語や、
+LIKEのワイルドカード（% _）を含む語はLIKEのみで判定する。
+関連度順（bm25）は索引で検索できる語を含む場合のみ利用できる。
+"""
+
+import argparse
+import logging
+import re
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from db_pool import transaction
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "goods_fts"
+DOCS_TABLE = "goods_fts_docs"
+
+# trigram索引で検索できる最小文字数
+MIN_FTS_LENGTH = 3
+
+# 検索結果の並び順（出願番号順 / 関連度順）
+ORDERS = ('app_num', 'relevance')
+
+CHUNK_SIZE = 500
+
+# 引用符で囲んだフレーズ（閉じ忘れは末尾まで）または空白区切りの語
+_TOKEN_PATTERN = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+def _chunks(items: List[str], size: int = CHUNK_SIZE) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def index_exists(query_one: Callable) -> bool:
+    """索引が存在するか（query_one: (sql, params) -> 1行 or None）"""
+    row = query_one("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,))
+    return row is not None
+
+
+def parse_query(text: str) -> List[List[str]]:
+    """
+    検索式を「ORグループのAND」に分解
+
+    例: 'コーヒー 菓子 OR "広告 業"' → [['コーヒー'], ['菓子', '広告 業']]
+    """
+    groups = []
+    join_next = False
+    for match in _TOKEN_PATTERN.finditer(text or ""):
+        phrase, word = match.groups()
+        if word == 'OR':
+            join_next = bool(groups)
+            continue
+        term = phrase if phrase is not None else word
+        if not term.strip():
+            continue
+        if join_next:
+            groups[-1].append(term)
+        else:
+            groups.append([term])
+        join_next = False
+    return groups
+
+
+def can_use_fts(term: str) -> bool:
+    """trigram索引で検索できる語か"""
+    return len(term) >= MIN_FTS_LENGTH and '%' not in term and '_' not in term
+
+
+def fts_phrase(term: str) -> str:
+    """語全体を1つのフレーズとして検索するMATCH式"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_expression(groups: List[List[str]]) -> Optional[str]:
+    """索引で検索できるグループのみのMATCH式（該当なしは None）"""
+    parts = []
+    for group in groups:
+        if all(can_use_fts(term) for term in group):
+            parts.append("(" + " OR ".join(fts_phrase(term) for term in group) + ")")
+    return " AND ".join(parts) if parts else None
+
+
+def _like_conditions(groups: List[List[str]], column: str) -> Tuple[List[str], List[str]]:
+    where = []
+    params = []
+    for group in groups:
+        likes = [f"{column} LIKE ?" for _ in group]
+        where.append(likes[0] if len(likes) == 1 else f"({' OR '.join(likes)})")
+        params.extend(f"%{term}%" for term in group)
+    return where, params
+
+
+def _match_rows(groups: List[List[str]], match: str, select: str) -> Tuple[str, List[str]]:
+    """MATCHとLIKEの両方を満たす索引行のSELECT文"""
+    # 列を式（+列）にして索引を使わずに評価する（trigram索引のLIKEは2文字以下の語で一致しないため）
+    like_where, like_params = _like_conditions(groups, "+f.designated_goods")
+    sql = (f"SELECT {select} FROM {FTS_TABLE} f JOIN {DOCS_TABLE} d ON d.doc_id = f.rowid "
+           f"WHERE {FTS_TABLE} MATCH ? AND {' AND '.join(like_where)}")
+    return sql, [match] + like_params
+
+
+def goods_condition(text: str, use_fts: bool) -> Tuple[List[str], List[str], List[str]]:
+    """
+    指定商品・役務名検索の FROM句追加分・WHERE条件・パラメータを生成
+
+    Args:
+        text: 検索式
+        use_fts: 索引が利用可能か（索引で検索できる語が無い場合はLIKEのみになる）
+
+    Returns:
+        (from_parts, where_parts, params)
+    """
+    groups = parse_query(text)
+    if not groups:
+        # 語の無い検索式（"OR" や引用符のみ）は該当なし
+        return [], ["0 = 1"], []
+    match = match_expression(groups) if use_fts else None
+    if match is None:
+        where, params = _like_conditions(groups, "jcs.designated_goods")
+        return (["LEFT JOIN jiken_c_t_shohin_joho AS jcs ON j.normalized_app_num = jcs.normalized_app_num"],
+                where, params)
+    rows_sql, params = _match_rows(groups, match, "d.normalized_app_num")
+    return [], [f"j.normalized_app_num IN ({rows_sql})"], params
+
+
+def rank_subquery(text: str) -> Optional[Tuple[str, List[str]]]:
+    """
+    関連度順の並べ替え用サブクエリ（出願番号, score）を生成
+    score は bm25（小さいほど関連度が高い）。索引で検索できる語が無い場合は None
+    """
+    groups = parse_query(text)
+    match = match_expression(groups)
+    if match is None:
+        return None
+    return _match_rows(groups, match, f"d.normalized_app_num, bm25({FTS_TABLE}) AS score")
+
+
+def create_index(conn: sqlite3.Connection):
+    """索引テーブルを作成"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DOCS_TABLE} (
+            doc_id INTEGER PRIMARY KEY,  -- jiken_c_t_shohin_joho の rowid
+            normalized_app_num TEXT NOT NULL
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{DOCS_TABLE}_app_num ON {DOCS_TABLE}(normalized_app_num)")
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            designated_goods,
+            tokenize = 'trigram'
+        )
+    """)
+
+
+def _index_rows(conn: sqlite3.Connection, row_filter: str = "", params: Iterable = ()):
+    """商品情報の行を文書テーブルと索引へ挿入（文書IDは商品情報の rowid、再利用された rowid は置き換える）"""
+    params = tuple(params)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {DOCS_TABLE} (doc_id, normalized_app_num)
+        SELECT rowid, normalized_app_num FROM jiken_c_t_shohin_joho
+        WHERE normalized_app_num IS NOT NULL AND designated_goods IS NOT NULL {row_filter}
+    """, params)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {FTS_TABLE} (rowid, designated_goods)
+        SELECT rowid, designated_goods FROM jiken_c_t_shohin_joho
+        WHERE normalized_app_num IS NOT NULL AND designated_goods IS NOT NULL {row_filter}
+    """, params)
+
+
+def rebuild_index(conn: sqlite3.Connection) -> int:
+    """
+    索引を全件再構築（インポート後に実行）
+
+    Returns:
+        索引化した行数
+    """
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        conn.execute(f"DROP TABLE IF EXISTS {DOCS_TABLE}")
+        create_index(conn)
+        _index_rows(conn)
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    count = conn.execute(f"SELECT COUNT(*) FROM {DOCS_TABLE}").fetchone()[0]
+    logger.info(f"{FTS_TABLE} を再構築しました: {count}行")
+    return count
+
+
+def refresh_index(conn: sqlite3.Connection, app_nums: Iterable[str]) -> int:
+    """
+    指定した出願番号の索引行のみ作り直す（週次更新後に実行）
+    索引が未作成の場合は何もしない
+
+    Returns:
+        対象とした出願番号の件数
+    """
+    app_nums = sorted({num for num in app_nums if num})
+    if not app_nums or not index_exists(lambda sql, params: conn.execute(sql, params).fetchone()):
+        return 0
+
+    with transaction(conn):
+        for chunk in _chunks(app_nums):
+            placeholders = ','.join(['?' for _ in chunk])
+            conn.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                         f"(SELECT doc_id FROM {DOCS_TABLE} WHERE normalized_app_num IN ({placeholders}))", chunk)
+            conn.execute(f"DELETE FROM {DOCS_TABLE} WHERE normalized_app_num IN ({placeholders})", chunk)
+            _index_rows(conn, f"AND normalized_app_num IN ({placeholders})", chunk)
+    logger.info(f"{FTS_TABLE} を更新しました: {len(app_nums)}件")
+    return len(app_nums)
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="指定商品・役務名のFTS5 trigram索引を構築")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        count = rebuild_index(conn)
+        print(f"{FTS_TABLE}: {count}行を索引化しました")
+    except sqlite3.OperationalError as e:
+        print(f"エラー: 索引を作成できませんでした（FTS5 trigram が必要です）: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+画像ファイルのメモリ上の目録
+検索結果1件ごとに最大7拡張子分のファイル存在確認（stat）を行う代わりに、
+起動時に画像ディレクトリを1回走査して 出願番号 → ファイル名 の対応を保持する。
+
+ディレクトリ（と画像ストアの目印ファイル）の更新時刻を ttl 秒ごとに確認し、
+変化していれば一覧を取り直して追加・削除されたファイルの分だけ目録を更新する
+（ttl 秒以内の参照はファイルシステムに触れない）。
+分割ディレクトリ構成（image_store）とフラットな構成のどちらの画像も対象とし、
+ファイル名は画像ディレクトリからの相対パスで返す。
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from image_store import IMAGE_EXTENSIONS, MARKER_FILE, iter_images
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 5.0
+
+
+class ImageManifest:
+    """画像ディレクトリの目録（スレッドセーフ）"""
+
+    def __init__(self, images_dir, ttl: float = DEFAULT_TTL):
+        self.images_dir = Path(images_dir)
+        self.ttl = ttl
+        # 相対パス → (出願番号, 拡張子)
+        self._names: Dict[str, Tuple[str, str]] = {}
+        # 出願番号 → {相対パス: 拡張子}
+        self._candidates: Dict[str, Dict[str, str]] = {}
+        self._files: Dict[str, str] = {}
+        # 相対パス → 更新時刻（ナノ秒、画像URLのバージョンに使用）
+        self._mtimes: Dict[str, int] = {}
+        self._dir_mtime_ns: Optional[Tuple[int, int]] = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+        self.stats = {'scans': 0, 'added': 0, 'removed': 0}
+
+    def _select(self, app_num: str):
+        candidates = self._candidates.get(app_num)
+        if not candidates:
+            self._candidates.pop(app_num, None)
+            self._files.pop(app_num, None)
+            return
+        self._files[app_num] = min(candidates, key=lambda path: (IMAGE_EXTENSIONS.index(candidates[path]), path))
+
+    def _scan(self):
+        """ディレクトリの一覧を取り直し、前回との差分を目録へ反映"""
+        try:
+            names = {path: (app_num, ext) for app_num, ext, path in iter_images(self.images_dir)}
+        except FileNotFoundError:
+            names = {}
+        if not self.images_dir.is_dir() and (not self.stats['scans'] or self._names):
+            logger.warning(f"Images directory not found: {self.images_dir}")
+
+        added = names.keys() - self._names.keys()
+        removed = self._names.keys() - names.keys()
+        changed = set()
+        for path in removed:
+            app_num, _ = self._names[path]
+            self._candidates.get(app_num, {}).pop(path, None)
+            self._mtimes.pop(path, None)
+            changed.add(app_num)
+        for path in added:
+            app_num, ext = names[path]
+            self._candidates.setdefault(app_num, {})[path] = ext
+            # 追加されたファイルのみ stat する（同名での上書きは画像ストアでは行わない）
+            try:
+                self._mtimes[path] = os.stat(self.images_dir / path).st_mtime_ns
+            except FileNotFoundError:
+                pass
+            changed.add(app_num)
+        for app_num in changed:
+            self._select(app_num)
+
+        self._names = names
+        self.stats['scans'] += 1
+        self.stats['added'] += len(added)
+        self.stats['removed'] += len(removed)
+        if added or removed:
+            logger.info(f"Image manifest updated: +{len(added)} -{len(removed)} ({len(self._files)} images)")
+
+    def _mtime_ns(self) -> Optional[Tuple[int, int]]:
+        """ディレクトリと目印ファイルの更新時刻（分割ディレクトリ内の追加はルートの時刻を変えないため）"""
+        try:
+            dir_mtime = self.images_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        try:
+            marker_mtime = (self.images_dir / MARKER_FILE).stat().st_mtime_ns
+        except FileNotFoundError:
+            marker_mtime = 0
+        return dir_mtime, marker_mtime
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        ディレクトリが変化していれば目録を更新
+        force=False の場合、前回の確認から ttl 秒以内は何もしない
+
+        Returns:
+            一覧を取り直したか
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.ttl:
+            return False
+        with self._lock:
+            if not force and now - self._checked_at < self.ttl:
+                return False
+            mtime_ns = self._mtime_ns()
+            self._checked_at = now
+            if not force and self.stats['scans'] and mtime_ns == self._dir_mtime_ns:
+                return False
+            self._dir_mtime_ns = mtime_ns
+            self._scan()
+            return True
+
+    def lookup(self, app_num: str) -> Optional[str]:
+        """出願番号に対応する画像ファイルの相対パス（無ければ None）"""
+        if not app_num:
+            return None
+        self.refresh()
+        return self._files.get(app_num.replace("-", "").strip())
+
+    def version(self, filename: str) -> Optional[str]:
+        """画像ファイルのバージョン（更新時刻の16進表記、URLの ?v= に付けてキャッシュを固定する）"""
+        mtime_ns = self._mtimes.get(filename)
+        return None if mtime_ns is None else format(mtime_ns, 'x')
+
+    def filenames(self, limit: Optional[int] = None) -> List[str]:
+        """目録の画像ファイルの相対パス（出願番号順）"""
+        self.refresh()
+        names = [self._files[app_num] for app_num in sorted(self._files)]
+        return names if limit is None else names[:limit]
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._files)
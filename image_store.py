@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分割ディレクトリ構成の画像ストア
+数十万件の {出願番号}.jpg を1つのディレクトリに置く代わりに、
+出願番号の年4桁と続く3桁で2階層に分割して保存する（1ディレクトリ最大1,000件程度）。
+
+    images/final_complete/2024/000/2024000001.jpg
+    images/final_complete/thumbs/2024/000/2024000001.jpg   （一覧表示用サムネイル）
+
+10桁の数字でない出願番号はハッシュ値の先頭2桁で分割する。
+サムネイルの生成には Pillow が必要（未インストールの場合は生成しない）。
+既存のフラットな構成からは migrate_flat で移行する。
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow は任意（サムネイル生成のみに使用）
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# 同じ出願番号に複数の画像がある場合の優先順
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff')
+
+THUMBNAIL_DIR = "thumbs"
+THUMBNAIL_SIZE = (160, 160)
+THUMBNAIL_QUALITY = 80
+
+# 画像の追加・移動後に更新する目印ファイル（分割ディレクトリ内の変更を目録へ知らせる）
+MARKER_FILE = ".updated"
+
+
+def split_image_name(name: str) -> Optional[Tuple[str, str]]:
+    """'2024000001.jpg' → ('2024000001', 'jpg')（画像の拡張子でなければ None）"""
+    stem, dot, ext = name.rpartition('.')
+    if not dot or not stem or ext not in IMAGE_EXTENSIONS:
+        return None
+    return stem, ext
+
+
+def shard_parts(app_num: str) -> Tuple[str, str]:
+    """出願番号の保存先ディレクトリ（2階層）"""
+    if len(app_num) == 10 and app_num.isdigit():
+        return app_num[:4], app_num[4:7]
+    digest = hashlib.blake2b(app_num.encode('utf-8'), digest_size=2).hexdigest()
+    return "_hash", digest[:2]
+
+
+def relative_image_path(app_num: str, ext: str = 'jpg') -> str:
+    """ストアのルートからの相対パス（URLにもそのまま使用する）"""
+    return "/".join(shard_parts(app_num) + (f"{app_num}.{ext}",))
+
+
+def relative_thumbnail_path(app_num: str) -> str:
+    return f"{THUMBNAIL_DIR}/{relative_image_path(app_num, 'jpg')}"
+
+
+def iter_images(root) -> Iterator[Tuple[str, str, str]]:
+    """
+    ストア内の画像を (出願番号, 拡張子, 相対パス) で返す
+    フラットな構成のファイル（移行前）も含む。サムネイルと隠しディレクトリは除外する。
+    """
+    def walk(directory: str, prefix: str, top: bool):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name.startswith('.') or (top and entry.name == THUMBNAIL_DIR):
+                        continue
+                    yield from walk(entry.path, f"{prefix}{entry.name}/", False)
+                    continue
+                parts = split_image_name(entry.name)
+                if parts:
+                    yield parts[0], parts[1], prefix + entry.name
+
+    root = Path(root)
+    if root.is_dir():
+        yield from walk(str(root), "", True)
+
+
+def thumbnails_available() -> bool:
+    return Image is not None
+
+
+def make_thumbnail(source: Path, dest: Path, size: Tuple[int, int] = THUMBNAIL_SIZE) -> bool:
+    """サムネイル（JPEG）を作成（Pillow が無い場合や画像を読めない場合は False）"""
+    if Image is None:
+        return False
+    try:
+        with Image.open(source) as image:
+            image.thumbnail(size)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(dest.name + '.tmp')
+            image.save(tmp, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+            os.replace(tmp, dest)
+        return True
+    except (OSError, ValueError) as e:
+        logger.warning(f"サムネイルを作成できませんでした: {source}: {e}")
+        return False
+
+
+class ImageStore:
+    """分割ディレクトリ構成の画像ストア"""
+
+    def __init__(self, root, thumbnails: bool = True, thumbnail_size: Tuple[int, int] = THUMBNAIL_SIZE):
+        self.root = Path(root)
+        self.thumbnails = thumbnails and thumbnails_available()
+        self.thumbnail_size = thumbnail_size
+        self._made_dirs = set()
+
+    def path(self, app_num: str, ext: str = 'jpg') -> Path:
+        return self.root / relative_image_path(app_num, ext)
+
+    def thumbnail_path(self, app_num: str) -> Path:
+        return self.root / relative_thumbnail_path(app_num)
+
+    def _ensure_dir(self, directory: Path):
+        if directory not in self._made_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._made_dirs.add(directory)
+
+    def write(self, app_num: str, data: bytes, ext: str = 'jpg') -> Path:
+        """画像を書き出し、サムネイルを作成（サムネイルの失敗は画像の書き出しに影響しない）"""
+        path = self.path(app_num, ext)
+        self._ensure_dir(path.parent)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if self.thumbnails:
+            make_thumbnail(path, self.thumbnail_path(app_num), self.thumbnail_size)
+        return path
+
+    def existing_app_nums(self, ext: Optional[str] = None) -> set:
+        return {app_num for app_num, image_ext, _ in iter_images(self.root) if ext is None or image_ext == ext}
+
+    def mark_updated(self):
+        """目印ファイルを更新して、画像目録に再走査を促す"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / MARKER_FILE).touch()
+
+    def migrate_flat(self, dry_run: bool = False) -> Dict[str, int]:
+        """
+        ルート直下のフラットな画像を分割ディレクトリへ移動（同じファイルシステム内の rename）
+        移動先に同名のファイルがある場合は移動しない
+        """
+        stats = {'moved': 0, 'skipped': 0, 'thumbnails': 0}
+        with os.scandir(self.root) as entries:
+            flat = [(entry.name, split_image_name(entry.name)) for entry in entries if entry.is_file()]
+
+        for name, parts in flat:
+            if not parts:
+                continue
+            app_num, ext = parts
+            dest = self.path(app_num, ext)
+            if dest.exists():
+                stats['skipped'] += 1
+                continue
+            stats['moved'] += 1
+            if dry_run:
+                continue
+            self._ensure_dir(dest.parent)
+            os.replace(self.root / name, dest)
+            if self.thumbnails and make_thumbnail(dest, self.thumbnail_path(app_num), self.thumbnail_size):
+                stats['thumbnails'] += 1
+            if stats['moved'] % 10000 == 0:
+                logger.info(f"  移行済み: {stats['moved']:,}件")
+
+        if not dry_run:
+            self.mark_updated()
+        return stats
+
+    def generate_missing_thumbnails(self) -> int:
+        """サムネイルが無い画像のサムネイルを作成"""
+        if not self.thumbnails:
+            return 0
+        created = 0
+        for app_num, _, relative in iter_images(self.root):
+            thumbnail = self.thumbnail_path(app_num)
+            if not thumbnail.exists() and make_thumbnail(self.root / relative, thumbnail, self.thumbnail_size):
+                created += 1
+        return created
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="画像ストアの移行とサムネイル作成")
+    parser.add_argument("--root", default="images/final_complete", help="画像ディレクトリ")
+    parser.add_argument("--migrate", action="store_true", help="フラットな構成から分割ディレクトリへ移行")
+    parser.add_argument("--thumbnails", action="store_true", help="不足しているサムネイルを作成")
+    parser.add_argument("--dry-run", action="store_true", help="移行対象の件数のみ表示")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not Path(args.root).is_dir():
+        print(f"エラー: 画像ディレクトリが見つかりません: {args.root}", file=sys.stderr)
+        sys.exit(1)
+    if args.thumbnails and not thumbnails_available():
+        print("警告: Pillow が無いためサムネイルは作成しません（pip install Pillow）", file=sys.stderr)
+
+    store = ImageStore(args.root, thumbnails=not args.dry_run)
+    if args.migrate:
+        stats = store.migrate_flat(dry_run=args.dry_run)
+        label = "移行対象" if args.dry_run else "移行"
+        print(f"{label}: {stats['moved']:,}件、スキップ: {stats['skipped']:,}件、"
+              f"サムネイル: {stats['thumbnails']:,}件")
+    if args.thumbnails and not args.dry_run:
+        print(f"サムネイルを作成しました: {store.generate_missing_thumbnails():,}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,26 @@ TSVデータインポートスクリプト（修正版）
 
 import sqlite3
 import csv
+import itertools
 import os
+import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import argparse
 
+from bitmap_index import default_index_path, write_index as write_bitmap_index
+from goods_code_dictionary import default_dictionary_path, write_dictionary as write_goods_dictionary
+from goods_fts import FTS_TABLE as GOODS_FTS_TABLE, rebuild_index as rebuild_goods_index
+from mark_text_fts import FTS_TABLE, rebuild_index as rebuild_mark_text_index
+from normalized_marks import rebuild_normalized_columns
+from pronunciation_search import DOCS_TABLE as PRONUNCIATION_TABLE, rebuild_index as rebuild_pronunciation_index
+from search_cache import bump_data_version
+from similar_group_search import CODE_TABLE, rebuild_table as rebuild_similar_group_table
+from trademark_summary import SUMMARY_TABLE, rebuild_summary
+
 def get_db_connection(db_path):
     """データベース接続を取得"""
     if not Path(db_path).exists():
@@ -23,375 +38,403 @@ def get_db_connection(db_path):
     conn = sqlite3.connect(db_path)
     return conn
 
-def import_jiken_c_t(conn, tsv_path):
-    """jiken_c_t テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> jiken_c_t")
+# 一括読み込みの既定バッチ件数（executemany 1回あたりの行数）
+DEFAULT_BATCH_SIZE = 10000
+
+# 欠損値として扱う分割番号
+EMPTY_SPLIT_NUM = '0000000000000000000000000000000'
+
+def _normalize_app_num(app_num, missing=None):
+    """ハイフンを除去して正規化（missing と一致する値は欠損値として扱う）"""
+    return app_num.replace('-', '') if app_num and app_num != missing else None
+
+def _split_num(row):
+    return row.get('split_num') if row.get('split_num') != EMPTY_SPLIT_NUM else None
+
+def _jiken_c_t_params(row):
+    return (
+        _normalize_app_num(row.get('shutugan_no', '')),
+        row.get('shutugan_bi'),
+        row.get('toroku_bi')  # 登録日の正しいカラム名
+    )
+
+def _standard_char_t_art_params(row):
+    return (_normalize_app_num(row.get('app_num', '')), row.get('standard_char_t'))
+
+def _goods_class_art_params(row):
+    return (
+        row.get('processing_type'),
+        row.get('law_cd'),
+        row.get('reg_num'),
+        _split_num(row),
+        # 0000000000は欠損値として扱う
+        _normalize_app_num(row.get('app_num', ''), missing='0000000000'),
+        row.get('goods_cls_art_upd_ymd'),
+        row.get('mu_num'),
+        row.get('desig_goods_or_desig_wrk_class')
+    )
+
+def _jiken_c_t_shohin_joho_params(row):
+    return (
+        _normalize_app_num(row.get('shutugan_no', '')),
+        row.get('shohinekimumeisho')  # 実際のカラム名
+    )
+
+def _t_knd_info_art_table_params(row):
+    return (_normalize_app_num(row.get('app_num', '')), row.get('smlr_dsgn_group_cd'))
+
+def _reg_mapping_params(row):
+    return (row.get('app_num'), row.get('reg_num'))
+
+def _right_person_art_t_params(row):
+    return (
+        row.get('processing_type'),
+        row.get('law_cd'),
+        row.get('reg_num'),
+        _split_num(row),
+        # app_numを正規化して保存（0000000000は欠損値として扱う）
+        _normalize_app_num(row.get('app_num', ''), missing='0000000000'),
+        row.get('rec_num'),
+        row.get('pe_num'),
+        row.get('right_psn_art_upd_ymd'),
+        row.get('right_person_appl_id'),
+        row.get('right_person_addr_len'),
+        row.get('right_person_addr'),
+        row.get('right_person_name_len'),
+        row.get('right_person_name')
+    )
+
+def _t_dsgnt_art_params(row):
+    return (_normalize_app_num(row.get('app_num', '')), row.get('dsgnt'))
+
+def _t_sample_params(row):
+    return (_normalize_app_num(row.get('app_num', '')), row.get('image_data'), row.get('rec_seq_num', 1))
+
+def _indct_use_t_art_params(row):
+    return (_normalize_app_num(row.get('app_num', '')), row.get('indct_use_t'))
+
+def _search_use_t_art_table_params(row):
+    return (
+        _normalize_app_num(row.get('app_num', '')),
+        row.get('search_use_t_seq', 1),
+        row.get('search_use_t')
+    )
+
+def _jiken_c_t_shutugannindairinin_params(row):
+    return (
+        row.get('shutugan_no'),
+        row.get('shutugannindairinin_code'),
+        row.get('shutugannindairinin_sikbt')
+    )
+
+# テーブル名 → (INSERT文, TSV行をパラメータに変換する関数)
+IMPORT_SPECS = {
+    'jiken_c_t': (
+        "INSERT OR REPLACE INTO jiken_c_t (normalized_app_num, shutugan_bi, reg_reg_ymd) VALUES (?, ?, ?)",
+        _jiken_c_t_params
+    ),
+    'standard_char_t_art': (
+        "INSERT OR REPLACE INTO standard_char_t_art (normalized_app_num, standard_char_t) VALUES (?, ?)",
+        _standard_char_t_art_params
+    ),
+    'goods_class_art': (
+        """INSERT OR REPLACE INTO goods_class_art (
+            processing_type, law_cd, reg_num, split_num, normalized_app_num,
+            goods_cls_art_upd_ymd, mu_num, goods_classes
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        _goods_class_art_params
+    ),
+    'jiken_c_t_shohin_joho': (
+        "INSERT OR REPLACE INTO jiken_c_t_shohin_joho (normalized_app_num, designated_goods) VALUES (?, ?)",
+        _jiken_c_t_shohin_joho_params
+    ),
+    't_knd_info_art_table': (
+        "INSERT OR REPLACE INTO t_knd_info_art_table (normalized_app_num, smlr_dsgn_group_cd) VALUES (?, ?)",
+        _t_knd_info_art_table_params
+    ),
+    'reg_mapping': (
+        "INSERT OR REPLACE INTO reg_mapping (app_num, reg_num) VALUES (?, ?)",
+        _reg_mapping_params
+    ),
+    'right_person_art_t': (
+        """INSERT OR REPLACE INTO right_person_art_t (
+            processing_type, law_cd, reg_num, split_num, normalized_app_num,
+            rec_num, pe_num, right_psn_art_upd_ymd, right_person_appl_id,
+            right_person_addr_len, right_person_addr, right_person_name_len, right_person_name
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        _right_person_art_t_params
+    ),
+    't_dsgnt_art': (
+        "INSERT OR REPLACE INTO t_dsgnt_art (normalized_app_num, dsgnt) VALUES (?, ?)",
+        _t_dsgnt_art_params
+    ),
+    't_sample': (
+        "INSERT OR REPLACE INTO t_sample (normalized_app_num, image_data, rec_seq_num) VALUES (?, ?, ?)",
+        _t_sample_params
+    ),
+    'indct_use_t_art': (
+        "INSERT OR REPLACE INTO indct_use_t_art (normalized_app_num, indct_use_t) VALUES (?, ?)",
+        _indct_use_t_art_params
+    ),
+    'search_use_t_art_table': (
+        """INSERT OR REPLACE INTO search_use_t_art_table (normalized_app_num, search_use_t_seq, search_use_t)
+        VALUES (?, ?, ?)""",
+        _search_use_t_art_table_params
+    ),
+    'jiken_c_t_shutugannindairinin': (
+        """INSERT OR REPLACE INTO jiken_c_t_shutugannindairinin
+        (shutugan_no, shutugannindairinin_code, shutugannindairinin_sikbt) VALUES (?, ?, ?)""",
+        _jiken_c_t_shutugannindairinin_params
+    ),
+}
+
+def import_table(conn, table_name, tsv_path, batch_size=DEFAULT_BATCH_SIZE, commit=True):
+    """
+    TSVファイルを batch_size 行ずつ executemany でインポート
+    
+    Args:
+        commit: 完了時にコミットするか（一括モードでは全テーブルを1トランザクションで読み込むため False）
     
+    Returns:
+        (インポートした行数, 所要秒数)
+    """
+    print(f"インポート中: {tsv_path} -> {table_name}")
+    
+    insert_sql, to_params = IMPORT_SPECS[table_name]
     cursor = conn.cursor()
     imported = 0
+    start = time.perf_counter()
     
     with open(tsv_path, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # 正しいカラム名を使用
-            app_num = row.get('shutugan_no', '')
-            # ハイフンを除去して正規化
-            normalized_app_num = app_num.replace('-', '') if app_num else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO jiken_c_t (normalized_app_num, shutugan_bi, reg_reg_ymd)
-                VALUES (?, ?, ?)
-            """, (
-                normalized_app_num,
-                row.get('shutugan_bi'),
-                row.get('toroku_bi')  # 登録日の正しいカラム名
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
+        for batch_num in itertools.count(1):
+            batch = [to_params(row) for row in itertools.islice(reader, batch_size)]
+            if not batch:
+                break
+            cursor.executemany(insert_sql, batch)
+            imported += len(batch)
+            if batch_num % 10 == 0:
                 print(f"  {imported} レコード処理済み...")
     
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    if commit:
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    rate = imported / elapsed if elapsed > 0 else 0
+    print(f"  完了: {imported} レコードをインポート（{elapsed:.1f}秒, {rate:,.0f} 行/秒）")
+    return imported, elapsed
+
+def import_jiken_c_t(conn, tsv_path):
+    """jiken_c_t テーブルにデータをインポート"""
+    return import_table(conn, 'jiken_c_t', tsv_path)
 
 def import_standard_char_t_art(conn, tsv_path):
     """standard_char_t_art テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> standard_char_t_art")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # 正しいカラム名を使用
-            app_num = row.get('app_num', '')
-            normalized_app_num = app_num.replace('-', '') if app_num else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO standard_char_t_art (normalized_app_num, standard_char_t)
-                VALUES (?, ?)
-            """, (
-                normalized_app_num,
-                row.get('standard_char_t')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 'standard_char_t_art', tsv_path)
 
 def import_goods_class_art(conn, tsv_path):
     """goods_class_art テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> goods_class_art")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # TSVファイルの実際のカラム名を使用
-            app_num = row.get('app_num', '')
-            # 0000000000は欠損値として扱う
-            normalized_app_num = app_num.replace('-', '') if app_num and app_num != '0000000000' else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO goods_class_art (
-                    processing_type, law_cd, reg_num, split_num, normalized_app_num,
-                    goods_cls_art_upd_ymd, mu_num, goods_classes
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                row.get('processing_type'),
-                row.get('law_cd'),
-                row.get('reg_num'),
-                row.get('split_num') if row.get('split_num') != '0000000000000000000000000000000' else None,
-                normalized_app_num,
-                row.get('goods_cls_art_upd_ymd'),
-                row.get('mu_num'),
-                row.get('desig_goods_or_desig_wrk_class')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 'goods_class_art', tsv_path)
 
 def import_jiken_c_t_shohin_joho(conn, tsv_path):
     """jiken_c_t_shohin_joho テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> jiken_c_t_shohin_joho")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # TSVファイルの実際のカラム名を使用
-            app_num = row.get('shutugan_no', '')
-            normalized_app_num = app_num.replace('-', '') if app_num else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO jiken_c_t_shohin_joho (normalized_app_num, designated_goods)
-                VALUES (?, ?)
-            """, (
-                normalized_app_num,
-                row.get('shohinekimumeisho')  # 実際のカラム名
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 'jiken_c_t_shohin_joho', tsv_path)
 
 def import_t_knd_info_art_table(conn, tsv_path):
     """t_knd_info_art_table テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> t_knd_info_art_table")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # 正しいカラム名を使用
-            app_num = row.get('app_num', '')
-            normalized_app_num = app_num.replace('-', '') if app_num else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO t_knd_info_art_table (normalized_app_num, smlr_dsgn_group_cd)
-                VALUES (?, ?)
-            """, (
-                normalized_app_num,
-                row.get('smlr_dsgn_group_cd')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 't_knd_info_art_table', tsv_path)
 
 def import_reg_mapping(conn, tsv_path):
     """reg_mapping テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> reg_mapping")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            cursor.execute("""
-                INSERT OR REPLACE INTO reg_mapping (app_num, reg_num)
-                VALUES (?, ?)
-            """, (
-                row.get('app_num'),
-                row.get('reg_num')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 'reg_mapping', tsv_path)
 
 def import_right_person_art_t(conn, tsv_path):
     """right_person_art_t テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> right_person_art_t")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # app_numを正規化して保存（0000000000は欠損値として扱う）
-            app_num = row.get('app_num', '')
-            normalized_app_num = app_num.replace('-', '') if app_num and app_num != '0000000000' else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO right_person_art_t (
-                    processing_type, law_cd, reg_num, split_num, normalized_app_num,
-                    rec_num, pe_num, right_psn_art_upd_ymd, right_person_appl_id,
-                    right_person_addr_len, right_person_addr, right_person_name_len, right_person_name
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                row.get('processing_type'),
-                row.get('law_cd'),
-                row.get('reg_num'),
-                row.get('split_num') if row.get('split_num') != '0000000000000000000000000000000' else None,
-                normalized_app_num,
-                row.get('rec_num'),
-                row.get('pe_num'),
-                row.get('right_psn_art_upd_ymd'),
-                row.get('right_person_appl_id'),
-                row.get('right_person_addr_len'),
-                row.get('right_person_addr'),
-                row.get('right_person_name_len'),
-                row.get('right_person_name')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 'right_person_art_t', tsv_path)
 
 def import_t_dsgnt_art(conn, tsv_path):
     """t_dsgnt_art テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> t_dsgnt_art")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # 正しいカラム名を使用
-            app_num = row.get('app_num', '')
-            normalized_app_num = app_num.replace('-', '') if app_num else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO t_dsgnt_art (normalized_app_num, dsgnt)
-                VALUES (?, ?)
-            """, (
-                normalized_app_num,
-                row.get('dsgnt')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 't_dsgnt_art', tsv_path)
 
 def import_t_sample(conn, tsv_path):
     """t_sample テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> t_sample")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # 正しいカラム名を使用
-            app_num = row.get('app_num', '')
-            normalized_app_num = app_num.replace('-', '') if app_num else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO t_sample (normalized_app_num, image_data, rec_seq_num)
-                VALUES (?, ?, ?)
-            """, (
-                normalized_app_num,
-                row.get('image_data'),
-                row.get('rec_seq_num', 1)
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 't_sample', tsv_path)
 
 def import_indct_use_t_art(conn, tsv_path):
     """indct_use_t_art テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> indct_use_t_art")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # 正しいカラム名を使用
-            app_num = row.get('app_num', '')
-            normalized_app_num = app_num.replace('-', '') if app_num else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO indct_use_t_art (normalized_app_num, indct_use_t)
-                VALUES (?, ?)
-            """, (
-                normalized_app_num,
-                row.get('indct_use_t')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 'indct_use_t_art', tsv_path)
 
 def import_search_use_t_art_table(conn, tsv_path):
     """search_use_t_art_table テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> search_use_t_art_table")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # 正しいカラム名を使用
-            app_num = row.get('app_num', '')
-            normalized_app_num = app_num.replace('-', '') if app_num else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO search_use_t_art_table (normalized_app_num, search_use_t_seq, search_use_t)
-                VALUES (?, ?, ?)
-            """, (
-                normalized_app_num,
-                row.get('search_use_t_seq', 1),
-                row.get('search_use_t')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 'search_use_t_art_table', tsv_path)
 
 def import_jiken_c_t_shutugannindairinin(conn, tsv_path):
     """jiken_c_t_shutugannindairinin テーブルにデータをインポート"""
-    print(f"インポート中: {tsv_path} -> jiken_c_t_shutugannindairinin")
-    
-    cursor = conn.cursor()
-    imported = 0
-    
-    with open(tsv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        for row in reader:
-            # TSVファイルの実際のカラム名を使用
-            cursor.execute("""
-                INSERT OR REPLACE INTO jiken_c_t_shutugannindairinin 
-                (shutugan_no, shutugannindairinin_code, shutugannindairinin_sikbt)
-                VALUES (?, ?, ?)
-            """, (
-                row.get('shutugan_no'),
-                row.get('shutugannindairinin_code'),
-                row.get('shutugannindairinin_sikbt')
-            ))
-            imported += 1
-            
-            if imported % 1000 == 0:
-                print(f"  {imported} レコード処理済み...")
-    
-    conn.commit()
-    print(f"  完了: {imported} レコードをインポート")
+    return import_table(conn, 'jiken_c_t_shutugannindairinin', tsv_path)
+
+def drop_secondary_indexes(conn, table_names):
+    """
+    対象テーブルの二次索引を削除し、再作成用のCREATE文を返す
+    （主キー・UNIQUE制約の自動索引は INSERT OR REPLACE の判定に必要なため残す）
+    """
+    placeholders = ','.join(['?' for _ in table_names])
+    rows = conn.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+        ORDER BY name
+    """, list(table_names)).fetchall()
+    for name, _ in rows:
+        conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+    return [sql for _, sql in rows]
+
+def stage_table(table_name, tsv_path, schema_sql, staging_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    TSVファイルを作業用データベースへ読み込む（並列インポートのワーカープロセスで実行）
+    作業用データベースには本体と同じ定義のテーブルを1つだけ作成する
+    
+    Returns:
+        (行数, 所要秒数, 作業用データベースのパス)
+    """
+    conn = sqlite3.connect(staging_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(schema_sql)
+        conn.execute("BEGIN")
+        rows, elapsed = import_table(conn, table_name, tsv_path, batch_size, commit=False)
+        conn.commit()
+    finally:
+        conn.close()
+    return rows, elapsed, staging_path
+
+def merge_staging_table(conn, table_name, staging_path):
+    """作業用データベースのテーブルを ATTACH して本体へ INSERT ... SELECT で統合"""
+    conn.execute("ATTACH DATABASE ? AS staging", (str(staging_path),))
+    try:
+        columns = ", ".join(row[1] for row in conn.execute(f"PRAGMA staging.table_info({table_name})"))
+        with conn:
+            # 読み込み順（rowid順）に挿入し、INSERT OR REPLACE の結果を行単位の読み込みと一致させる
+            cursor = conn.execute(f"""
+                INSERT OR REPLACE INTO main.{table_name} ({columns})
+                SELECT {columns} FROM staging.{table_name} ORDER BY rowid
+            """)
+        return cursor.rowcount
+    finally:
+        conn.execute("DETACH DATABASE staging")
+
+def _database_dir(conn):
+    """接続中のデータベースファイルのディレクトリ（メモリDBなら None）"""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return str(Path(path).parent) if path else None
+
+def parallel_import(conn, files, batch_size=DEFAULT_BATCH_SIZE, workers=2, stop_on_error=False):
+    """
+    並列インポート
+    ワーカープロセスが各TSVをテーブルごとの作業用データベースへ解析・変換し、
+    このプロセス（単一の書き込み側）が完了した順に ATTACH して統合する。
+    所要時間は各ファイルの合計ではなく、最も大きいファイルの解析時間＋統合時間に近づく。
+    
+    Args:
+        files: {テーブル名: TSVファイルパス}
+        stop_on_error: True なら最初の失敗で例外を送出（False なら失敗したテーブルを飛ばして続行）
+    
+    Returns:
+        {テーブル名: (行数, 解析の所要秒数)}
+    """
+    stats = {}
+    start = time.perf_counter()
+    staging_dir = tempfile.mkdtemp(prefix='import_staging_', dir=_database_dir(conn))
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {}
+        for table_name, tsv_path in files.items():
+            if table_name not in IMPORT_SPECS:
+                continue
+            schema_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                      (table_name,)).fetchone()[0]
+            staging_path = os.path.join(staging_dir, f"{table_name}.db")
+            future = executor.submit(stage_table, table_name, str(tsv_path), schema_sql, staging_path, batch_size)
+            futures[future] = table_name
+        
+        for future in as_completed(futures):
+            table_name = futures[future]
+            try:
+                rows, elapsed, staging_path = future.result()
+                merge_start = time.perf_counter()
+                merge_staging_table(conn, table_name, staging_path)
+                os.remove(staging_path)
+            except Exception as e:
+                if stop_on_error:
+                    raise
+                print(f"エラー: {table_name} のインポートに失敗: {e}")
+                continue
+            stats[table_name] = (rows, elapsed)
+            print(f"  統合完了: {table_name} {rows} レコード"
+                  f"（解析 {elapsed:.1f}秒, 統合 {time.perf_counter() - merge_start:.1f}秒）")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    
+    wall = time.perf_counter() - start
+    parse_total = sum(elapsed for _, elapsed in stats.values())
+    total = sum(rows for rows, _ in stats.values())
+    rate = total / wall if wall > 0 else 0
+    print(f"並列インポート完了: {total} レコード（経過 {wall:.1f}秒 / 解析合計 {parse_total:.1f}秒, "
+          f"{rate:,.0f} 行/秒, {workers}プロセス）")
+    return stats
+
+def bulk_import(conn, files, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    """
+    一括読み込みモード（初回の全件インポート用）
+    journal_mode=OFF / synchronous=OFF で全テーブルを1トランザクションで読み込み、
+    二次索引は読み込み前に削除して最後に作り直し、ANALYZE で統計を更新する。
+    workers > 1 の場合は parallel_import で並列に読み込む（統合はテーブルごとのトランザクション）。
+    ジャーナルを使用しないため、途中で失敗した場合はロールバックできない（--reinit からやり直す）。
+    
+    Args:
+        files: {テーブル名: TSVファイルパス}
+    
+    Returns:
+        {テーブル名: (行数, 所要秒数)}（失敗したテーブル以降は含まない）
+    """
+    table_names = [name for name in files if name in IMPORT_SPECS]
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")  # 256MB（索引の再作成時のソートに使用）
+    
+    stats = {}
+    start = time.perf_counter()
+    try:
+        index_sqls = drop_secondary_indexes(conn, table_names)
+        print(f"二次索引 {len(index_sqls)} 件を削除しました（読み込み後に再作成）")
+        try:
+            if workers > 1:
+                stats.update(parallel_import(conn, {name: files[name] for name in table_names},
+                                             batch_size, workers, stop_on_error=True))
+            else:
+                conn.execute("BEGIN")
+                for table_name in table_names:
+                    stats[table_name] = import_table(conn, table_name, files[table_name], batch_size, commit=False)
+        finally:
+            # 失敗した場合も索引は元に戻す
+            index_start = time.perf_counter()
+            for sql in index_sqls:
+                conn.execute(sql)
+            print(f"二次索引 {len(index_sqls)} 件を再作成しました（{time.perf_counter() - index_start:.1f}秒）")
+            conn.commit()
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+    
+    elapsed = time.perf_counter() - start
+    total = sum(rows for rows, _ in stats.values())
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"一括読み込み完了: {total} レコード（{elapsed:.1f}秒, {rate:,.0f} 行/秒）")
+    return stats
 
 def search_tsv_files(base_dir):
     """TSVファイルを検索"""
@@ -437,6 +480,16 @@ def main():
     parser.add_argument('--table', help='特定のテーブルのみインポート')
     parser.add_argument('--list', action='store_true', help='利用可能なTSVファイルを一覧表示')
     parser.add_argument('--reinit', action='store_true', help='データベースを再初期化')
+    parser.add_argument('--skip-derived', action='store_true',
+                        help='正規化列・商標サマリーテーブル・商標文字索引・称呼索引の再構築を行わない')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='正規化列の計算に使用するワーカープロセス数')
+    parser.add_argument('--bulk', action='store_true',
+                        help='一括読み込みモード（ジャーナル無効・1トランザクション・索引は最後に再作成、初回インポート用）')
+    parser.add_argument('--parallel', type=int, default=1, metavar='N',
+                        help='N個のワーカープロセスでTSVファイルを並列に解析・変換する（統合は1プロセス）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'executemany 1回あたりの行数（デフォルト: {DEFAULT_BATCH_SIZE}）')
     
     args = parser.parse_args()
     
@@ -484,7 +537,22 @@ def main():
     }
     
     try:
-        if args.table:
+        if args.bulk:
+            # 一括読み込みモード
+            if args.table:
+                if args.table not in found_files or args.table not in import_functions:
+                    print(f"テーブル '{args.table}' のTSVファイルが見つかりません。")
+                    return
+                bulk_files = {args.table: found_files[args.table]}
+            else:
+                bulk_files = found_files
+            print(f"\n{len(bulk_files)} 個のTSVファイルを一括読み込みします...")
+            bulk_import(conn, bulk_files, args.batch_size, workers=args.parallel)
+        elif args.parallel > 1 and not args.table:
+            # 並列インポート（作業用データベース経由で統合）
+            print(f"\n{len(found_files)} 個のTSVファイルを {args.parallel} プロセスで並列インポートします...")
+            parallel_import(conn, found_files, args.batch_size, args.parallel)
+        elif args.table:
             # 特定のテーブルのみインポート
             if args.table in found_files and args.table in import_functions:
                 import_functions[args.table](conn, found_files[args.table])
@@ -510,6 +578,51 @@ def main():
         
         print("\n=== インポート完了 ===")
         
+        # 正規化列、検索結果表示用のサマリーテーブルと商標文字索引を再構築
+        if not args.skip_derived:
+            print("\n正規化列を再計算中...")
+            normalized_count = rebuild_normalized_columns(conn, workers=args.workers)
+            print(f"正規化列: {normalized_count} 件")
+            
+            print(f"{SUMMARY_TABLE} を再構築中...")
+            summary_count = rebuild_summary(conn)
+            print(f"{SUMMARY_TABLE}: {summary_count} レコード")
+            
+            print(f"{FTS_TABLE} を再構築中...")
+            try:
+                fts_count = rebuild_mark_text_index(conn)
+                print(f"{FTS_TABLE}: {fts_count} 件")
+            except sqlite3.OperationalError as e:
+                # FTS5 trigram 非対応のSQLiteではLIKE検索のまま
+                print(f"商標文字索引を作成できませんでした（LIKE検索を使用します）: {e}")
+            
+            print(f"{GOODS_FTS_TABLE} を再構築中...")
+            try:
+                goods_fts_count = rebuild_goods_index(conn)
+                print(f"{GOODS_FTS_TABLE}: {goods_fts_count} 行")
+            except sqlite3.OperationalError as e:
+                print(f"指定商品・役務名索引を作成できませんでした（LIKE検索を使用します）: {e}")
+            
+            print(f"{PRONUNCIATION_TABLE} を再構築中...")
+            pronunciation_count = rebuild_pronunciation_index(conn)
+            print(f"{PRONUNCIATION_TABLE}: {pronunciation_count} 件")
+            
+            print(f"{CODE_TABLE} を再構築中...")
+            code_count = rebuild_similar_group_table(conn)
+            print(f"{CODE_TABLE}: {code_count} 件")
+        
+        # 取り込み前の検索結果キャッシュを無効化
+        print(f"データバージョン: {bump_data_version(conn)}")
+        
+        if not args.skip_derived:
+            # 新しいデータバージョンの索引・辞書ファイル（Webアプリは読み込むだけ）
+            bitmap_path = default_index_path(args.db)
+            index = write_bitmap_index(conn, bitmap_path)
+            print(f"ビットマップ索引: {bitmap_path}（{index.size} 件）")
+            dictionary_path = default_dictionary_path(args.db)
+            dictionary = write_goods_dictionary(conn, dictionary_path)
+            print(f"商品・役務名辞書: {dictionary_path}（{dictionary.term_count} 語）")
+        
         # 各テーブルのレコード数を確認
         cursor = conn.cursor()
         for table_name in import_functions.keys():
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+カナ（モーラ列）の編集距離
+normalize_pronunciation 後の称呼を split_morae したモーラ列を対象とする。
+
+    levenshtein_naive          単位コストの全DP（検証用）
+    bounded_levenshtein        Ukkonen の帯状DP（距離が k を超えた時点で打ち切り）
+    myers_distance             Myers のビット並列法（モーラ→ビットマスク、1列あたり定数回のビット演算）
+    weighted_distance_naive    カナの音の近さによる重み付きの全DP（検証用）
+    weighted_distance          重み付きの帯状DP（上限指定時は打ち切り）
+    QueryScorer / batch_distances
+                               1つの検索語と多数の候補の距離を一括計算
+                               （Myers の単位距離 × 最小コストで下限を求めて候補を除外し、
+                                 残った候補のみ重み付き帯状DPで計算）
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 五十音表（行 → 各段のカナ、空欄は \0）
+_KANA_ROWS = {
+    '': 'アイウエオ',
+    'K': 'カキクケコ', 'G': 'ガギグゲゴ',
+    'S': 'サシスセソ', 'Z': 'ザジズゼゾ',
+    'T': 'タチツテト', 'D': 'ダヂヅデド',
+    'N': 'ナニヌネノ',
+    'H': 'ハヒフヘホ', 'B': 'バビブベボ', 'P': 'パピプペポ',
+    'M': 'マミムメモ',
+    'Y': 'ヤ\0ユ\0ヨ',
+    'R': 'ラリルレロ',
+    'W': 'ワヰ\0ヱヲ',
+}
+_VOWELS = 'AIUEO'
+
+# 清音・濁音・半濁音の対応（子音の組）
+_VOICING_PAIRS = {frozenset(pair) for pair in (('K', 'G'), ('S', 'Z'), ('T', 'D'), ('H', 'B'), ('H', 'P'), ('B', 'P'))}
+
+# 長音・促音・撥音（聞き落としやすい音）
+_WEAK_MORAE = frozenset('-ッン')
+
+# 置換・挿入削除のコスト
+COST_VOICING = 0.3       # カ/ガ、ハ/パ など清濁・半濁の違い
+COST_SAME_VOWEL = 0.6    # カ/サ など同じ段
+COST_SAME_CONSONANT = 0.7  # カ/キ など同じ行
+COST_WEAK = 0.5          # 長音・促音・撥音どうしの置換、およびその挿入削除
+COST_DEFAULT = 1.0
+MIN_EDIT_COST = min(COST_VOICING, COST_SAME_VOWEL, COST_SAME_CONSONANT, COST_WEAK, COST_DEFAULT)
+MIN_INDEL_COST = min(COST_WEAK, COST_DEFAULT)
+
+# 浮動小数点の加算誤差を吸収する許容差
+EPSILON = 1e-9
+
+_KANA_SOUNDS: Dict[str, Tuple[str, str]] = {}
+for _consonant, _chars in _KANA_ROWS.items():
+    for _vowel, _char in zip(_VOWELS, _chars):
+        if _char != '\0':
+            _KANA_SOUNDS[_char] = (_consonant, _vowel)
+
+
+def substitution_cost(a: str, b: str) -> float:
+    """モーラ a を b に置き換えるコスト"""
+    if a == b:
+        return 0.0
+    if a in _WEAK_MORAE and b in _WEAK_MORAE:
+        return COST_WEAK
+    sound_a = _KANA_SOUNDS.get(a)
+    sound_b = _KANA_SOUNDS.get(b)
+    if sound_a is None or sound_b is None:
+        return COST_DEFAULT
+    if sound_a[1] == sound_b[1]:
+        if frozenset((sound_a[0], sound_b[0])) in _VOICING_PAIRS:
+            return COST_VOICING
+        return COST_SAME_VOWEL
+    if sound_a[0] == sound_b[0]:
+        return COST_SAME_CONSONANT
+    return COST_DEFAULT
+
+
+def indel_cost(mora: str) -> float:
+    """モーラの挿入・削除のコスト"""
+    return COST_WEAK if mora in _WEAK_MORAE else COST_DEFAULT
+
+
+class _CostRow(dict):
+    """1つのモーラから各モーラへの置換コスト（初回参照時に計算して保持）"""
+
+    def __init__(self, mora: str):
+        super().__init__()
+        self.mora = mora
+
+    def __missing__(self, other: str) -> float:
+        cost = self[other] = substitution_cost(self.mora, other)
+        return cost
+
+
+_COST_ROWS: Dict[str, _CostRow] = {}
+
+
+def _cost_row(mora: str) -> _CostRow:
+    row = _COST_ROWS.get(mora)
+    if row is None:
+        row = _COST_ROWS[mora] = _CostRow(mora)
+    return row
+
+
+def levenshtein_naive(a: Sequence[str], b: Sequence[str]) -> int:
+    """単位コストの編集距離（全DP、検証・ベンチマーク用）"""
+    previous = list(range(len(b) + 1))
+    for i, mora_a in enumerate(a, 1):
+        current = [i]
+        for j, mora_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (mora_a != mora_b)))
+        previous = current
+    return previous[-1]
+
+
+def bounded_levenshtein(a: Sequence[str], b: Sequence[str], k: int) -> Optional[int]:
+    """
+    単位コストの編集距離（Ukkonen の帯状DP）
+    対角線から k を超えて離れたセルは計算せず、距離が k を超えた時点で None を返す
+    """
+    n, m = len(a), len(b)
+    if abs(n - m) > k:
+        return None
+    outside = k + 1
+    previous = [j if j <= k else outside for j in range(m + 1)]
+    for i in range(1, n + 1):
+        mora_a = a[i - 1]
+        lo = max(1, i - k)
+        hi = min(m, i + k)
+        current = [outside] * (m + 1)
+        if i <= k:
+            current[0] = i
+        row_min = current[0]
+        for j in range(lo, hi + 1):
+            value = previous[j - 1] + (mora_a != b[j - 1])
+            other = previous[j] + 1
+            if other < value:
+                value = other
+            other = current[j - 1] + 1
+            if other < value:
+                value = other
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > k:
+            return None
+        previous = current
+    distance = previous[m]
+    return distance if distance <= k else None
+
+
+def _pattern_masks(pattern: Sequence[str]) -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    for i, mora in enumerate(pattern):
+        masks[mora] = masks.get(mora, 0) | (1 << i)
+    return masks
+
+
+def _myers(masks: Dict[str, int], m: int, text: Sequence[str]) -> int:
+    """Myers/Hyyrö のビット並列法による全体一致の編集距離（pattern 長 m）"""
+    if m == 0:
+        return len(text)
+    full = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv = full
+    mv = 0
+    score = m
+    for mora in text:
+        eq = masks.get(mora, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
+
+def myers_distance(a: Sequence[str], b: Sequence[str], k: Optional[int] = None) -> Optional[int]:
+    """
+    単位コストの編集距離（Myers のビット並列法）
+    k を指定した場合、距離が k を超えれば None を返す
+    """
+    distance = _myers(_pattern_masks(a), len(a), b)
+    if k is not None and distance > k:
+        return None
+    return distance
+
+
+def weighted_distance_naive(a: Sequence[str], b: Sequence[str]) -> float:
+    """重み付き編集距離（全DP、検証・ベンチマーク用）"""
+    previous = [0.0]
+    for mora in b:
+        previous.append(previous[-1] + indel_cost(mora))
+    for mora_a in a:
+        delete = indel_cost(mora_a)
+        current = [previous[0] + delete]
+        for j, mora_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + delete,
+                current[j - 1] + indel_cost(mora_b),
+                previous[j - 1] + substitution_cost(mora_a, mora_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def weighted_distance(a: Sequence[str], b: Sequence[str], max_distance: float = None) -> Optional[float]:
+    """
+    重み付き編集距離
+    max_distance を指定した場合は挿入削除の最小コストから決まる幅の帯だけを計算し、
+    max_distance を超えることが確定した時点で None を返す
+    """
+    if max_distance is None:
+        return weighted_distance_naive(a, b)
+    n, m = len(a), len(b)
+    width = int(max_distance / MIN_INDEL_COST + EPSILON)
+    if abs(n - m) > width:
+        return None
+    limit = max_distance + EPSILON
+    inf = float('inf')
+    insert_costs = [indel_cost(mora) for mora in b]
+    previous = [inf] * (m + 1)
+    previous[0] = 0.0
+    for j in range(1, min(m, width) + 1):
+        previous[j] = previous[j - 1] + insert_costs[j - 1]
+    for i in range(1, n + 1):
+        mora_a = a[i - 1]
+        delete = indel_cost(mora_a)
+        costs = _cost_row(mora_a)
+        lo = max(1, i - width)
+        hi = min(m, i + width)
+        current = [inf] * (m + 1)
+        if i <= width:
+            current[0] = previous[0] + delete
+        row_min = current[0]
+        for j in range(lo, hi + 1):
+            value = previous[j - 1] + costs[b[j - 1]]
+            other = previous[j] + delete
+            if other < value:
+                value = other
+            other = current[j - 1] + insert_costs[j - 1]
+            if other < value:
+                value = other
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return None
+        previous = current
+    distance = previous[m]
+    return distance if distance <= limit else None
+
+
+class QueryScorer:
+    """
+    1つの検索語に対する距離計算
+    検索語のビットマスクを一度だけ作成し、候補ごとに Myers の単位距離で下限を確認してから
+    重み付き距離を計算する
+    """
+
+    def __init__(self, query: Sequence[str], max_distance: float = None, weighted: bool = True):
+        self.query = list(query)
+        self.max_distance = max_distance
+        self.weighted = weighted
+        self._masks = _pattern_masks(self.query)
+        # 重み付き距離 >= 単位距離 × 最小コスト のため、これを超える単位距離の候補は除外できる
+        if max_distance is None:
+            self._max_edits = None
+        elif weighted:
+            self._max_edits = int(max_distance / MIN_EDIT_COST + EPSILON)
+        else:
+            self._max_edits = int(max_distance + EPSILON)
+
+    def distance(self, candidate: Sequence[str]):
+        """候補との距離（上限を超える場合は None）"""
+        if self._max_edits is not None and abs(len(candidate) - len(self.query)) > self._max_edits:
+            return None
+        edits = _myers(self._masks, len(self.query), candidate)
+        if self._max_edits is not None and edits > self._max_edits:
+            return None
+        if not self.weighted:
+            return edits
+        if edits == 0:
+            return 0.0
+        return weighted_distance(self.query, candidate, self.max_distance)
+
+    def distances(self, candidates: Sequence[Sequence[str]]) -> List:
+        """候補の配列との距離（入力順、上限を超える候補は None）"""
+        distance = self.distance
+        return [distance(candidate) for candidate in candidates]
+
+
+def batch_distances(query: Sequence[str], candidates: Sequence[Sequence[str]],
+                    max_distance: float = None, weighted: bool = True) -> List:
+    """1つの検索語と候補の配列との距離を一括計算"""
+    return QueryScorer(query, max_distance, weighted).distances(candidates)
+
+
+def _timed(func, *args) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def benchmark(queries: Sequence[Sequence[str]], candidates: Sequence[Sequence[str]],
+              max_distance: float = 1.0) -> Dict[str, Dict[str, float]]:
+    """
+    素朴な全DPとの比較（秒）
+    各方式の結果が素朴な方式と一致することも確認する
+
+    Returns:
+        {'unit': {...}, 'weighted': {...}}（各方式の所要秒数と speedup）
+    """
+    k = int(max_distance)
+
+    def unit_naive():
+        return [[d if d <= k else None for d in (levenshtein_naive(q, c) for c in candidates)] for q in queries]
+
+    def unit_ukkonen():
+        return [[bounded_levenshtein(q, c, k) for c in candidates] for q in queries]
+
+    def unit_myers():
+        return [[myers_distance(q, c, k) for c in candidates] for q in queries]
+
+    def unit_batch():
+        return [batch_distances(q, candidates, k, weighted=False) for q in queries]
+
+    def weighted_naive():
+        return [[d if d <= max_distance + EPSILON else None
+                 for d in (weighted_distance_naive(q, c) for c in candidates)] for q in queries]
+
+    def weighted_bounded():
+        return [[weighted_distance(q, c, max_distance) for c in candidates] for q in queries]
+
+    def weighted_batch():
+        return [batch_distances(q, candidates, max_distance) for q in queries]
+
+    results = {}
+    for group, variants in (('unit', [('naive', unit_naive), ('ukkonen', unit_ukkonen),
+                                      ('myers', unit_myers), ('batch', unit_batch)]),
+                            ('weighted', [('naive', weighted_naive), ('banded', weighted_bounded),
+                                          ('batch', weighted_batch)])):
+        timings = {}
+        expected = None
+        for label, func in variants:
+            elapsed, result = _timed(func)
+            if expected is None:
+                expected = result
+            elif group == 'unit' and result != expected:
+                raise AssertionError(f"{group}/{label} の結果が素朴な方式と一致しません")
+            elif group == 'weighted' and [[d is None for d in row] for row in result] != \
+                    [[d is None for d in row] for row in expected]:
+                raise AssertionError(f"{group}/{label} の結果が素朴な方式と一致しません")
+            timings[label] = elapsed
+        for label in list(timings):
+            if label != 'naive':
+                timings[f"{label}_speedup"] = timings['naive'] / timings[label] if timings[label] else float('inf')
+        results[group] = timings
+    return results
+
+
+_SYNTHETIC_MORAE = list('アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン'
+                        'ガギグゲゴザジズゼゾダヂヅデドバビブベボパピプペポ-ッ')
+
+
+def synthetic_morae(count: int, seed: int = 0, min_length: int = 2, max_length: int = 10) -> List[List[str]]:
+    """ベンチマーク用のランダムなモーラ列"""
+    rng = random.Random(seed)
+    return [[rng.choice(_SYNTHETIC_MORAE) for _ in range(rng.randint(min_length, max_length))]
+            for _ in range(count)]
+
+
+def main():
+    """CLI エントリーポイント（マイクロベンチマーク）"""
+    parser = argparse.ArgumentParser(description="カナ編集距離のマイクロベンチマーク")
+    parser.add_argument("--db", help="称呼索引（pronunciation_docs）のあるデータベース。省略時はランダムなモーラ列")
+    parser.add_argument("--candidates", type=int, default=20000, help="候補数（デフォルト: 20000）")
+    parser.add_argument("--queries", type=int, default=5, help="検索語数（デフォルト: 5）")
+    parser.add_argument("--max-distance", type=float, default=1.0, help="距離の上限（デフォルト: 1.0）")
+    args = parser.parse_args()
+
+    if args.db:
+        if not Path(args.db).exists():
+            print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+            sys.exit(1)
+        from pronunciation_search import DOCS_TABLE, split_morae
+        conn = sqlite3.connect(args.db)
+        try:
+            rows = conn.execute(f"SELECT pronunciation FROM {DOCS_TABLE} ORDER BY RANDOM() LIMIT ?",
+                                (args.candidates + args.queries,)).fetchall()
+        finally:
+            conn.close()
+        sequences = [split_morae(row[0]) for row in rows]
+        queries, candidates = sequences[:args.queries], sequences[args.queries:]
+    else:
+        queries = synthetic_morae(args.queries, seed=1)
+        candidates = synthetic_morae(args.candidates, seed=2)
+
+    print(f"検索語 {len(queries)}件 × 候補 {len(candidates)}件 / 上限 {args.max_distance}")
+    for group, timings in benchmark(queries, candidates, args.max_distance).items():
+        parts = [f"{label} {timings[label]:.3f}秒" for label in timings if not label.endswith('_speedup')]
+        speedups = [f"{label[:-8]} {timings[label]:.1f}x" for label in timings if label.endswith('_speedup')]
+        print(f"{group:>8}: {' / '.join(parts)}  ({', '.join(speedups)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+商標文字の部分一致検索用 FTS5 trigram 索引
+標準文字・表示用商標・検索用商標の3テーブルを出願番号ごとに1文書へまとめ、
+trigramトークナイザで索引化する（既定トークナイザは日本語を分割できないため）。
+
+検索時は索引で候補の出願番号を絞り込んだうえで従来のLIKE条件も適用するため、
+結果はLIKEのみの検索と同一になる。trigramで検索できない2文字以下の語や、
+LIKEのワイルドカード（% _）を含む語はLIKEのみで検索する。
+"""
+
+import argparse
+import logging
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Callable, Iterable, List, Tuple
+
+from db_pool import transaction
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "mark_text_fts"
+DOCS_TABLE = "mark_text_fts_docs"
+
+# trigram索引で検索できる最小文字数
+MIN_FTS_LENGTH = 3
+
+CHUNK_SIZE = 500
+
+# (テーブル名, 商標文字の列名)
+MARK_TEXT_SOURCES = [
+    ('standard_char_t_art', 'standard_char_t'),
+    ('indct_use_t_art', 'indct_use_t'),
+    ('search_use_t_art_table', 'search_use_t'),
+]
+
+# 商標文字の従来の検索条件（3テーブルのLEFT JOIN + LIKE）
+MARK_TEXT_JOINS = [
+    "LEFT JOIN standard_char_t_art s ON j.normalized_app_num = s.normalized_app_num",
+    "LEFT JOIN indct_use_t_art iu ON j.normalized_app_num = iu.normalized_app_num",
+    "LEFT JOIN search_use_t_art_table su ON j.normalized_app_num = su.normalized_app_num",
+]
+MARK_TEXT_LIKE = "(s.standard_char_t LIKE ? OR iu.indct_use_t LIKE ? OR su.search_use_t LIKE ?)"
+
+
+def _chunks(items: List[str], size: int = CHUNK_SIZE) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def index_exists(query_one: Callable) -> bool:
+    """索引が存在するか（query_one: (sql, params) -> 1行 or None）"""
+    row = query_one("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,))
+    return row is not None
+
+
+def can_use_fts(mark_text: str) -> bool:
+    """trigram索引で検索できる語か"""
+    return len(mark_text) >= MIN_FTS_LENGTH and '%' not in mark_text and '_' not in mark_text
+
+
+def fts_phrase(mark_text: str) -> str:
+    """語全体を1つのフレーズとして検索するMATCH式"""
+    return '"' + mark_text.replace('"', '""') + '"'
+
+
+def mark_text_condition(mark_text: str, use_fts: bool) -> Tuple[List[str], List[str], List[str]]:
+    """
+    商標文字検索の FROM句追加分・WHERE条件・パラメータを生成
+
+    Args:
+        mark_text: 検索語
+        use_fts: 索引が利用可能か（語が索引で検索できない場合はLIKEのみになる）
+
+    Returns:
+        (from_parts, where_parts, params)
+    """
+    where_parts = []
+    params = []
+    if use_fts and can_use_fts(mark_text):
+        # 索引で候補を絞り込み、LIKEで従来と同じ条件を確認する
+        where_parts.append(
+            f"j.normalized_app_num IN (SELECT d.normalized_app_num FROM {FTS_TABLE} f "
+            f"JOIN {DOCS_TABLE} d ON d.doc_id = f.rowid WHERE {FTS_TABLE} MATCH ?)"
+        )
+        params.append(fts_phrase(mark_text))
+    where_parts.append(MARK_TEXT_LIKE)
+    params.extend([f"%{mark_text}%"] * 3)
+    return list(MARK_TEXT_JOINS), where_parts, params
+
+
+def create_index(conn: sqlite3.Connection):
+    """索引テーブルを作成"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DOCS_TABLE} (
+            doc_id INTEGER PRIMARY KEY,
+            normalized_app_num TEXT NOT NULL UNIQUE
+        )
+    """)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            standard_char_t,
+            indct_use_t,
+            search_use_t,
+            tokenize = 'trigram'
+        )
+    """)
+
+
+def _index_documents(conn: sqlite3.Connection, doc_filter: str = "", params: Iterable = ()):
+    """文書テーブルの出願番号について3テーブルの商標文字を索引へ挿入"""
+    # 同じ出願番号の複数レコードは改行で連結する（どのレコードの部分文字列も文書に含まれる）
+    columns = ",\n".join(
+        f"(SELECT GROUP_CONCAT({col}, char(10)) FROM {table} t "
+        f"WHERE t.normalized_app_num = d.normalized_app_num)"
+        for table, col in MARK_TEXT_SOURCES
+    )
+    conn.execute(f"""
+        INSERT INTO {FTS_TABLE} (rowid, standard_char_t, indct_use_t, search_use_t)
+        SELECT d.doc_id, {columns}
+        FROM {DOCS_TABLE} d {doc_filter}
+    """, tuple(params))
+
+
+def _source_app_nums_sql(where: str = "") -> str:
+    return " UNION ".join(
+        f"SELECT normalized_app_num FROM {table} WHERE normalized_app_num IS NOT NULL "
+        f"AND {col} IS NOT NULL {where}"
+        for table, col in MARK_TEXT_SOURCES
+    )
+
+
+def rebuild_index(conn: sqlite3.Connection) -> int:
+    """
+    索引を全件再構築（インポート後に実行）
+
+    Returns:
+        索引化した出願番号の件数
+    """
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        conn.execute(f"DROP TABLE IF EXISTS {DOCS_TABLE}")
+        create_index(conn)
+        conn.execute(f"INSERT INTO {DOCS_TABLE} (normalized_app_num) "
+                     f"SELECT normalized_app_num FROM ({_source_app_nums_sql()}) ORDER BY normalized_app_num")
+        _index_documents(conn)
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    count = conn.execute(f"SELECT COUNT(*) FROM {DOCS_TABLE}").fetchone()[0]
+    logger.info(f"{FTS_TABLE} を再構築しました: {count}件")
+    return count
+
+
+def refresh_index(conn: sqlite3.Connection, app_nums: Iterable[str]) -> int:
+    """
+    指定した出願番号の索引文書のみ作り直す（週次更新後に実行）
+    索引が未作成の場合は何もしない
+
+    Returns:
+        対象とした出願番号の件数
+    """
+    app_nums = sorted({num for num in app_nums if num})
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (FTS_TABLE,)).fetchone()
+    if not app_nums or not exists:
+        return 0
+
+    with transaction(conn):
+        for chunk in _chunks(app_nums):
+            placeholders = ','.join(['?' for _ in chunk])
+            conn.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                         f"(SELECT doc_id FROM {DOCS_TABLE} WHERE normalized_app_num IN ({placeholders}))", chunk)
+            conn.execute(f"DELETE FROM {DOCS_TABLE} WHERE normalized_app_num IN ({placeholders})", chunk)
+            source_sql = _source_app_nums_sql(f"AND normalized_app_num IN ({placeholders})")
+            conn.execute(f"INSERT INTO {DOCS_TABLE} (normalized_app_num) SELECT normalized_app_num "
+                         f"FROM ({source_sql})", chunk * len(MARK_TEXT_SOURCES))
+            _index_documents(conn, f"WHERE d.normalized_app_num IN ({placeholders})", chunk)
+    logger.info(f"{FTS_TABLE} を更新しました: {len(app_nums)}件")
+    return len(app_nums)
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="商標文字のFTS5 trigram索引を構築")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        count = rebuild_index(conn)
+        print(f"{FTS_TABLE}: {count}件を索引化しました")
+    except sqlite3.OperationalError as e:
+        print(f"エラー: 索引を作成できませんでした（FTS5 trigram が必要です）: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+コンパイル済みテキスト正規化エンジン
+TextNormalizer の各正規化をまとめた変換テーブル（str.translate）と
+1回の正規表現パスに置き換えた高速版。出力は TextNormalizer と完全に一致する。
+
+    TextNormalizer               CompiledNormalizer
+    ---------------------------  -------------------------------------------
+    ひらがな→カタカナ（1文字ずつ連結）  upper() 後に1回の translate
+    数十回の str.replace          （1文字単位の置換・削除をすべて合成したテーブル）
+    微差音の str.replace x24       最長一致の正規表現1パス（連鎖置換も事前展開）
+    長音化の re.sub x3            後読み付き正規表現1パス
+
+変換テーブルは TextNormalizer の各ステップを1文字ずつ実行して生成するため、
+TextNormalizer の辞書（旧字体・ローマ数字・ギリシャ文字）を変更しても自動的に追従する。
+"""
+
+import argparse
+import itertools
+import re
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from text_normalizer import TextNormalizer
+
+NORMALIZATION_MODES = ('basic', 'trademark', 'pronunciation')
+
+# normalize_many の既定チャンクサイズ（プロセス間の受け渡し単位）
+DEFAULT_CHUNK_SIZE = 10000
+
+# 1文字単位の置換対象になり得る文字の範囲（各ステップの記号リストを網羅する）
+_CANDIDATE_RANGES = [
+    (0x0000, 0x0100),   # ASCII・Latin-1（記号・句読点・空白）
+    (0x0370, 0x0400),   # ギリシャ文字
+    (0x2000, 0x2C00),   # 一般句読点・ダッシュ・数字の形（ローマ数字）・記号・罫線
+    (0x3000, 0x3100),   # CJK記号・ひらがな・カタカナ
+    (0xFF00, 0xFFF0),   # 全角形
+]
+
+# TM-SONAR記号除去の2文字パターン（_remove_tm_sonar_punctuation の末尾要素 ', '）
+# 1文字の記号を除去した後、空白除去の前に適用される
+_TRADEMARK_PAIR_REMOVAL = ', '
+
+# 微差音統一（_normalize_subtle_sounds）の規則（適用順）
+_SUBTLE_SOUND_RULES = [
+    ('ヴェ', 'ベ'), ('ヴァ', 'バ'), ('ヴィ', 'ビ'), ('ヴォ', 'ボ'), ('ヴュ', 'ビュ'), ('ヴ', 'ブ'),
+    ('ツィ', 'チ'), ('ティ', 'チ'), ('トゥ', 'ツ'), ('ディ', 'ジ'), ('デュ', 'ジュ'), ('ドゥ', 'ズ'),
+    ('ファ', 'ハ'), ('フィ', 'ヒ'), ('フェ', 'ヘ'), ('フォ', 'ホ'), ('フュ', 'ヒュ'),
+    ('ウィ', 'イ'), ('ウェ', 'エ'), ('ウォ', 'オ'), ('シェ', 'セ'), ('ジェ', 'ゼ'), ('チェ', 'テ'), ('ツェ', 'テ'),
+]
+
+# 逐次置換で前の規則の出力が後の規則に一致する連鎖（例: ツィェ→チェ→テ）
+_SUBTLE_SOUND_CASCADES = [
+    ('ツィェ', 'テ'), ('ティェ', 'テ'), ('ディェ', 'ゼ'), ('トゥェ', 'テ'),
+]
+
+# 長音化（_normalize_long_sounds）: エイ→エ-, オウ→オ-, コウ→コ-
+_LONG_SOUND_RE = re.compile(r'(?<=エ)イ|(?<=[オコ])ウ')
+
+# 微差音・長音化・拗音のいずれかが適用され得る文字列の判定
+# （微差音の規則はすべて「ヴ」か小書き文字を含み、拗音大文字化は小書き文字のみが対象）
+_PRONUNCIATION_GUARD_RE = re.compile(r'[ヴァィゥェォャュョ]|(?<=エ)イ|(?<=[オコ])ウ')
+
+
+def _strip_whitespace(text: str) -> str:
+    return re.sub(r'\s+', '', text)
+
+
+def _candidate_chars(reference: TextNormalizer) -> List[str]:
+    """変換テーブルの生成対象文字"""
+    chars = set()
+    for start, end in _CANDIDATE_RANGES:
+        chars.update(chr(code) for code in range(start, end))
+    # 空白文字（\s）はすべてU+3000以下にある
+    chars.update(chr(code) for code in range(0x3001) if chr(code).isspace())
+    for table in (reference.old_to_new_kanji, reference.roman_to_arabic, reference.greek_latin_to_ascii):
+        chars.update(key for key in table if len(key) == 1)
+    return sorted(chars)
+
+
+def _compile_table(chars: Iterable[str], steps: Sequence[Callable[[str], str]]) -> Dict[int, Optional[str]]:
+    """1文字単位のステップ列を合成した str.translate 用テーブル"""
+    table = {}
+    for ch in chars:
+        out = ch
+        for step in steps:
+            out = step(out)
+        if out != ch:
+            table[ord(ch)] = out or None
+    return table
+
+
+def _compose_tables(first: Dict[int, Optional[str]], second: Dict[int, Optional[str]]) -> Dict[int, Optional[str]]:
+    """first → second の順に適用するテーブルを合成"""
+    table = {}
+    for code in set(first) | set(second):
+        out = chr(code).translate(first).translate(second)
+        if out != chr(code):
+            table[code] = out or None
+    return table
+
+
+_BMP_SIZE = 0x10000
+
+
+def _as_lookup(table: Dict[int, Optional[str]], identity: List[int]):
+    """
+    translate用の参照テーブル
+    BMP内のみの置換ならリスト（辞書より高速に引ける）、それ以外は辞書のまま
+    """
+    if any(code >= _BMP_SIZE for code in table):
+        return table
+    lookup = list(identity)
+    for code, out in table.items():
+        lookup[code] = out
+    return lookup
+
+
+class CompiledNormalizer:
+    """TextNormalizer と同一結果を返す高速正規化エンジン"""
+
+    def __init__(self, reference: TextNormalizer = None):
+        self.reference = reference or TextNormalizer()
+        ref = self.reference
+        chars = _candidate_chars(ref)
+
+        # upper() はひらがなに影響しないため、ひらがな変換は upper() 後のテーブルへ合成できる
+        basic_steps = [
+            ref._hiragana_to_katakana, ref._normalize_hyphens, _strip_whitespace,
+            ref._remove_special_symbols, ref._remove_punctuation, ref._convert_greek_latin,
+            ref._convert_old_kanji, ref._convert_roman_numerals,
+        ]
+        self._basic_table = _compile_table(chars, basic_steps)
+        self._pronunciation_table = _compile_table(chars, basic_steps + [ref._normalize_pronunciation_same])
+        self._contracted_table = _compile_table(chars, [ref._normalize_contracted_sounds])
+
+        # 商標正規化は2文字パターン（', '）の除去を挟んで前後2つのテーブルに分ける
+        self._trademark_table_pre = _compile_table(chars, [
+            ref._hiragana_to_katakana, ref._normalize_hyphens, ref._convert_greek_latin,
+            ref._remove_tm_sonar_special_symbols, ref._remove_tm_sonar_punctuation,
+        ])
+        self._trademark_table_post = _compile_table(chars, [
+            _strip_whitespace, ref._convert_old_kanji, ref._convert_roman_numerals,
+        ])
+
+        trademark_table = _compose_tables(self._trademark_table_pre, self._trademark_table_post)
+
+        # 変換ステップが文字単位ではない箇所のみ別処理とし、それ以外はリスト参照のtranslateで処理する
+        identity = list(range(_BMP_SIZE))
+        self._basic_lookup = _as_lookup(self._basic_table, identity)
+        self._pronunciation_lookup = _as_lookup(self._pronunciation_table, identity)
+        self._contracted_lookup = _as_lookup(self._contracted_table, identity)
+        self._trademark_lookup = _as_lookup(trademark_table, identity)
+        self._trademark_pre_lookup = _as_lookup(self._trademark_table_pre, identity)
+        self._trademark_post_lookup = _as_lookup(self._trademark_table_post, identity)
+
+        subtle_map = dict(_SUBTLE_SOUND_RULES)
+        subtle_map.update(_SUBTLE_SOUND_CASCADES)
+        self._subtle_map = subtle_map
+        self._subtle_re = re.compile('|'.join(
+            re.escape(pattern) for pattern in sorted(subtle_map, key=len, reverse=True)
+        ))
+
+    def normalize_basic(self, text: str) -> str:
+        """TextNormalizer.normalize_basic と同一"""
+        if not text:
+            return ""
+        return text.upper().translate(self._basic_lookup)
+
+    def normalize_trademark(self, text: str) -> str:
+        """TextNormalizer.normalize_trademark と同一"""
+        if not text:
+            return ""
+        text = text.upper()
+        if _TRADEMARK_PAIR_REMOVAL[0] not in text:
+            # 2文字パターンの先頭文字（テーブルでは生成されない）が無ければ1回の変換で済む
+            return text.translate(self._trademark_lookup)
+        text = text.translate(self._trademark_pre_lookup).replace(_TRADEMARK_PAIR_REMOVAL, '')
+        return text.translate(self._trademark_post_lookup)
+
+    def normalize_pronunciation(self, text: str) -> str:
+        """TextNormalizer.normalize_pronunciation と同一"""
+        if not text:
+            return ""
+        text = text.upper().translate(self._pronunciation_lookup)
+        # 該当しない文字列が大半のため、まとめて判定してから各置換を行う
+        if _PRONUNCIATION_GUARD_RE.search(text) is None:
+            return text
+        text = self._subtle_re.sub(self._replace_subtle, text)
+        text = _LONG_SOUND_RE.sub('-', text)
+        return text.translate(self._contracted_lookup)
+
+    def normalize_applicant_name(self, text: str) -> str:
+        """TextNormalizer.normalize_applicant_name と同一"""
+        if not text:
+            return ""
+        text = self.reference._remove_corporate_suffixes(text)
+        return self.normalize_basic(text).strip()
+
+    def normalize(self, text: str, mode: str = 'trademark') -> str:
+        """モード指定で正規化（'basic' / 'trademark' / 'pronunciation'）"""
+        return self.get_function(mode)(text)
+
+    def get_function(self, mode: str) -> Callable[[str], str]:
+        """モードに対応する正規化関数"""
+        if mode == 'trademark':
+            return self.normalize_trademark
+        if mode == 'pronunciation':
+            return self.normalize_pronunciation
+        if mode == 'basic':
+            return self.normalize_basic
+        raise ValueError(f"Unknown normalization mode: {mode} (expected one of {NORMALIZATION_MODES})")
+
+    def _replace_subtle(self, match) -> str:
+        return self._subtle_map[match.group()]
+
+
+@lru_cache(maxsize=1)
+def get_compiled_normalizer() -> CompiledNormalizer:
+    """プロセス内で共有するエンジン（テーブル生成は初回のみ）"""
+    return CompiledNormalizer()
+
+
+def _normalize_chunk(mode: str, chunk: List[Optional[str]]) -> List[Optional[str]]:
+    """1チャンク分を正規化（ワーカープロセスで実行。None はそのまま返す）"""
+    func = get_compiled_normalizer().get_function(mode)
+    return [None if text is None else func(text) for text in chunk]
+
+
+def _iter_chunks(texts: Iterable[Optional[str]], chunk_size: int) -> Iterator[List[Optional[str]]]:
+    iterator = iter(texts)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _normalize_serial(texts, mode, chunk_size):
+    for chunk in _iter_chunks(texts, chunk_size):
+        yield from _normalize_chunk(mode, chunk)
+
+
+def _normalize_parallel(texts, mode, workers, chunk_size, max_pending):
+    pending = deque()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for chunk in _iter_chunks(texts, chunk_size):
+            pending.append(executor.submit(_normalize_chunk, mode, chunk))
+            # 未処理チャンク数を上限以下に保つ（入力を先読みしすぎない）
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # 途中で打ち切られた場合は未着手のチャンクを取り消す
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def normalize_many(texts: Iterable[Optional[str]], mode: str = 'trademark', workers: int = 1,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE, max_pending: Optional[int] = None) -> Iterator[Optional[str]]:
+    """
+    文字列を一括で正規化（入力順を保持するイテレータを返す）
+
+    入力はチャンク単位で読み進め、workers > 1 の場合はプロセスプールへ分散する。
+    先読みは max_pending チャンク（既定 workers×2）までのため、
+    1,000万件規模の入力でもメモリ使用量は chunk_size × max_pending 件程度に収まる。
+
+    Args:
+        texts: 正規化する文字列（ジェネレータ可。None はそのまま None を返す）
+        mode: 'basic' / 'trademark' / 'pronunciation'
+        workers: ワーカープロセス数（1以下なら現在のプロセスで処理）
+        chunk_size: プロセス間で受け渡す件数
+        max_pending: 同時に処理中とするチャンク数の上限
+    """
+    if mode not in NORMALIZATION_MODES:
+        raise ValueError(f"Unknown normalization mode: {mode} (expected one of {NORMALIZATION_MODES})")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive: {chunk_size}")
+    if workers <= 1:
+        return _normalize_serial(texts, mode, chunk_size)
+    max_pending = max(1, max_pending or workers * 2)
+    return _normalize_parallel(texts, mode, workers, chunk_size, max_pending)
+
+
+def verify_against_reference(texts: Iterable[str], modes: Sequence[str] = NORMALIZATION_MODES,
+                             engine: CompiledNormalizer = None) -> Tuple[int, List[Tuple[str, str, str, str]]]:
+    """
+    TextNormalizer との差分検査
+
+    Returns:
+        (検査件数, [(モード, 入力, 期待値, 実際の値), ...])
+    """
+    engine = engine or get_compiled_normalizer()
+    reference = engine.reference
+    pairs = [(mode, getattr(reference, f"normalize_{mode}"), engine.get_function(mode)) for mode in modes]
+    checked = 0
+    mismatches = []
+    for text in texts:
+        checked += 1
+        for mode, expected_func, actual_func in pairs:
+            expected = expected_func(text)
+            actual = actual_func(text)
+            if expected != actual:
+                mismatches.append((mode, text, expected, actual))
+    return checked, mismatches
+
+
+def benchmark(texts: Sequence[str], modes: Sequence[str] = NORMALIZATION_MODES,
+              engine: CompiledNormalizer = None) -> Dict[str, Dict[str, float]]:
+    """TextNormalizer とのスループット比較（件/秒）"""
+    engine = engine or get_compiled_normalizer()
+    results = {}
+    for mode in modes:
+        timings = {}
+        for label, func in (('reference', getattr(engine.reference, f"normalize_{mode}")),
+                            ('compiled', engine.get_function(mode))):
+            start = time.perf_counter()
+            for text in texts:
+                func(text)
+            elapsed = time.perf_counter() - start
+            timings[label] = len(texts) / elapsed if elapsed > 0 else float('inf')
+        timings['speedup'] = timings['compiled'] / timings['reference'] if timings['reference'] else 0.0
+        results[mode] = timings
+    return results
+
+
+# 差分検査・ベンチマークに使用するコーパス（テーブル, 列）
+CORPUS_COLUMNS = [
+    ('standard_char_t_art', 'standard_char_t'),
+    ('indct_use_t_art', 'indct_use_t'),
+    ('search_use_t_art_table', 'search_use_t'),
+    ('t_dsgnt_art', 'dsgnt'),
+]
+
+
+def iter_corpus(conn: sqlite3.Connection, limit: Optional[int] = None) -> Iterable[str]:
+    """データベースの商標文字・称呼を順に返す"""
+    for table, column in CORPUS_COLUMNS:
+        sql = f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        for (value,) in conn.execute(sql):
+            yield value
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="コンパイル済み正規化エンジンの差分検査・ベンチマーク")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    parser.add_argument("--limit", type=int, help="テーブルごとの最大件数")
+    parser.add_argument("--benchmark", action="store_true", help="スループットを比較")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="--benchmark 時に normalize_many の並列スループットも計測するワーカー数")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        texts = list(iter_corpus(conn, args.limit))
+    finally:
+        conn.close()
+
+    checked, mismatches = verify_against_reference(texts)
+    print(f"差分検査: {checked}件 × {len(NORMALIZATION_MODES)}モード / 不一致 {len(mismatches)}件")
+    for mode, text, expected, actual in mismatches[:20]:
+        print(f"  [{mode}] {text!r}: expected={expected!r} actual={actual!r}")
+
+    if args.benchmark:
+        for mode, timings in benchmark(texts).items():
+            print(f"{mode:>14}: reference {timings['reference']:,.0f}件/秒  "
+                  f"compiled {timings['compiled']:,.0f}件/秒  ({timings['speedup']:.1f}x)")
+        if args.workers > 1:
+            for mode in NORMALIZATION_MODES:
+                start = time.perf_counter()
+                count = sum(1 for _ in normalize_many(texts, mode, workers=args.workers))
+                elapsed = time.perf_counter() - start
+                rate = count / elapsed if elapsed > 0 else float('inf')
+                print(f"{mode:>14}: normalize_many(workers={args.workers}) {rate:,.0f}件/秒")
+
+    if mismatches:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+正規化済み商標文字の列と索引
+標準文字・検索用商標・称呼の各テーブルに TextNormalizer の正規化結果を
+normalized_trademark / normalized_pronunciation 列として保持し、B-tree索引を作成する。
+
+TM-SONAR の完全一致・前方一致は検索語を同じ規則で正規化し、
+    完全一致: normalized_* = ?
+    前方一致: normalized_* >= ? AND normalized_* < ? || U+10FFFF
+の範囲条件で索引をシークする（LIKE '%...%' の全件走査を行わない）。
+列が未作成のデータベースでは、正規化関数をSQL関数として登録して同じ条件を評価する。
+"""
+
+import argparse
+import logging
+import sqlite3
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, List, Tuple
+
+from db_pool import transaction
+from normalization_engine import get_compiled_normalizer, normalize_many
+
+logger = logging.getLogger(__name__)
+
+# (テーブル名, 元の列名)
+NORMALIZED_SOURCES = [
+    ('standard_char_t_art', 'standard_char_t'),
+    ('search_use_t_art_table', 'search_use_t'),
+    ('t_dsgnt_art', 'dsgnt'),
+]
+
+# 正規化モード → 保存先の列名
+NORMALIZED_COLUMNS = {
+    'trademark': 'normalized_trademark',
+    'pronunciation': 'normalized_pronunciation',
+}
+
+# 列が無い場合に条件式で使用するSQL関数名
+SQL_FUNCTIONS = {
+    'trademark': 'tm_normalize_trademark',
+    'pronunciation': 'tm_normalize_pronunciation',
+}
+
+MATCH_MODES = ('exact', 'prefix')
+
+# 前方一致の上限（どの文字よりも大きいコードポイント）
+PREFIX_UPPER_BOUND = '\U0010FFFF'
+
+CHUNK_SIZE = 500
+READ_BATCH_SIZE = 10000
+
+
+def index_name(table: str, mode: str) -> str:
+    return f"idx_{table}_{NORMALIZED_COLUMNS[mode]}"
+
+
+def _chunks(items: List[str], size: int = CHUNK_SIZE) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def columns_indexed(query_one: Callable) -> bool:
+    """全テーブルの正規化列の索引が存在するか（query_one: (sql, params) -> 1行 or None）"""
+    for table, _ in NORMALIZED_SOURCES:
+        for mode in NORMALIZED_COLUMNS:
+            row = query_one("SELECT name FROM sqlite_master WHERE type = 'index' AND name = ?",
+                            (index_name(table, mode),))
+            if row is None:
+                return False
+    return True
+
+
+def register_functions(conn: sqlite3.Connection):
+    """正規化関数をSQL関数として登録（列が未作成のデータベース用）"""
+    engine = get_compiled_normalizer()
+    for mode, name in SQL_FUNCTIONS.items():
+        func = engine.get_function(mode)
+        conn.create_function(name, 1, lambda text, func=func: None if text is None else func(text),
+                             deterministic=True)
+
+
+def normalized_mark_condition(mark_text: str, match: str = 'exact', mode: str = 'trademark',
+                              indexed: bool = True) -> Tuple[List[str], List[str]]:
+    """
+    正規化済み商標文字による完全一致・前方一致の WHERE条件とパラメータを生成
+
+    Args:
+        mark_text: 検索語（mode と同じ規則で正規化して比較する）
+        match: 'exact'（完全一致） / 'prefix'（前方一致）
+        mode: 'trademark' / 'pronunciation'
+        indexed: 正規化列が利用可能か（False の場合は register_functions の登録が必要）
+
+    Returns:
+        (where_parts, params)
+    """
+    if match not in MATCH_MODES:
+        raise ValueError(f"Unknown match mode: {match} (expected one of {MATCH_MODES})")
+    if mode not in NORMALIZED_COLUMNS:
+        raise ValueError(f"Unknown normalization mode: {mode} (expected one of {tuple(NORMALIZED_COLUMNS)})")
+
+    key = get_compiled_normalizer().normalize(mark_text, mode)
+    if not key:
+        # 正規化で空になる検索語（空白のみ等）は該当なし（前方一致で全件に一致させない）
+        return ["0 = 1"], []
+    subqueries = []
+    params = []
+    for table, source_column in NORMALIZED_SOURCES:
+        expr = NORMALIZED_COLUMNS[mode] if indexed else f"{SQL_FUNCTIONS[mode]}({source_column})"
+        if match == 'exact':
+            subqueries.append(f"SELECT normalized_app_num FROM {table} WHERE {expr} = ?")
+            params.append(key)
+        else:
+            subqueries.append(f"SELECT normalized_app_num FROM {table} WHERE {expr} >= ? AND {expr} < ?")
+            params.extend([key, key + PREFIX_UPPER_BOUND])
+    where = f"j.normalized_app_num IN ({' UNION ALL '.join(subqueries)})"
+    return [where], params
+
+
+def _existing_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def ensure_columns(conn: sqlite3.Connection):
+    """正規化列を追加（既存のデータベース用、作成済みなら何もしない）"""
+    for table, _ in NORMALIZED_SOURCES:
+        existing = _existing_columns(conn, table)
+        for column in NORMALIZED_COLUMNS.values():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+
+def create_indexes(conn: sqlite3.Connection):
+    for table, _ in NORMALIZED_SOURCES:
+        for mode, column in NORMALIZED_COLUMNS.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name(table, mode)} ON {table}({column})")
+
+
+def _iter_rows(conn: sqlite3.Connection, table: str, column: str, batch_size: int = READ_BATCH_SIZE):
+    """rowid順に (rowid, 元の文字列) を返す（バッチごとに読み込み、更新中のカーソルを保持しない）"""
+    last_rowid = 0
+    while True:
+        rows = conn.execute(f"SELECT rowid, {column} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                            (last_rowid, batch_size)).fetchall()
+        if not rows:
+            return
+        yield from rows
+        last_rowid = rows[-1][0]
+
+
+def _rebuild_column(conn: sqlite3.Connection, table: str, source_column: str, mode: str,
+                    workers: int, batch_size: int = READ_BATCH_SIZE) -> int:
+    """1テーブル1モード分の正規化列を全件更新"""
+    rowids = deque()
+
+    def texts():
+        for rowid, text in _iter_rows(conn, table, source_column, batch_size):
+            rowids.append(rowid)
+            yield text
+
+    target = NORMALIZED_COLUMNS[mode]
+    update_sql = f"UPDATE {table} SET {target} = ? WHERE rowid = ?"
+    batch = []
+    updated = 0
+    # normalize_many は入力を先読みするため、出願番号ではなく rowid を入力順に対応付ける
+    for normalized in normalize_many(texts(), mode, workers=workers):
+        batch.append((normalized, rowids.popleft()))
+        if len(batch) >= batch_size:
+            conn.executemany(update_sql, batch)
+            updated += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(update_sql, batch)
+        updated += len(batch)
+    return updated
+
+
+def rebuild_normalized_columns(conn: sqlite3.Connection, workers: int = 1) -> int:
+    """
+    全テーブルの正規化列を全件再計算（インポート後に実行）
+    更新中は索引を削除し、更新後に作り直す
+
+    Returns:
+        更新した行数（モードごとに数える）
+    """
+    total = 0
+    with conn:
+        ensure_columns(conn)
+        for table, source_column in NORMALIZED_SOURCES:
+            for mode in NORMALIZED_COLUMNS:
+                conn.execute(f"DROP INDEX IF EXISTS {index_name(table, mode)}")
+            for mode in NORMALIZED_COLUMNS:
+                start = time.perf_counter()
+                count = _rebuild_column(conn, table, source_column, mode, workers)
+                total += count
+                logger.info(f"{table}.{NORMALIZED_COLUMNS[mode]}: {count}件 "
+                            f"({time.perf_counter() - start:.1f}秒)")
+        create_indexes(conn)
+    return total
+
+
+def refresh_normalized_columns(conn: sqlite3.Connection, app_nums: Iterable[str]) -> int:
+    """
+    指定した出願番号の行のみ正規化列を再計算（週次更新後に実行）
+    列が未作成の場合は何もしない
+
+    Returns:
+        更新した行数
+    """
+    app_nums = sorted({num for num in app_nums if num})
+    if not app_nums or NORMALIZED_COLUMNS['trademark'] not in _existing_columns(conn, NORMALIZED_SOURCES[0][0]):
+        return 0
+
+    engine = get_compiled_normalizer()
+    normalize_trademark = engine.normalize_trademark
+    normalize_pronunciation = engine.normalize_pronunciation
+    updated = 0
+    with transaction(conn):
+        for table, source_column in NORMALIZED_SOURCES:
+            update_sql = (f"UPDATE {table} SET {NORMALIZED_COLUMNS['trademark']} = ?, "
+                          f"{NORMALIZED_COLUMNS['pronunciation']} = ? WHERE rowid = ?")
+            for chunk in _chunks(app_nums):
+                placeholders = ','.join(['?' for _ in chunk])
+                rows = conn.execute(f"SELECT rowid, {source_column} FROM {table} "
+                                    f"WHERE normalized_app_num IN ({placeholders})", chunk).fetchall()
+                conn.executemany(update_sql, [
+                    (None, None, rowid) if text is None
+                    else (normalize_trademark(text), normalize_pronunciation(text), rowid)
+                    for rowid, text in rows
+                ])
+                updated += len(rows)
+    logger.info(f"正規化列を更新しました: {updated}行")
+    return updated
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="正規化済み商標文字の列と索引を構築")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    parser.add_argument("--workers", type=int, default=1, help="正規化のワーカープロセス数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        count = rebuild_normalized_columns(conn, workers=args.workers)
+        print(f"正規化列: {count}件を更新しました")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
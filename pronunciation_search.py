@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+称呼類似検索
+t_dsgnt_art.dsgnt（称呼）を normalize_pronunciation で正規化し、
+モーラ単位の2-gram転置索引で候補を絞り込んだうえで、
+カナの音の近さを考慮した重み付き編集距離（上限付き）で順位付けする。
+
+    候補生成: 検索語と共通するモーラ2-gramの数が
+              |検索語の2-gram| - 2 × 最大編集回数 以上（かつ1以上）、
+              モーラ数の差が最大編集回数以内の称呼
+    距離    : kana_distance の重み付き編集距離（清濁・半濁の違い < 同じ段 < 同じ行 < その他、
+              長音・促音・撥音の挿入削除は低コスト）
+    スコア  : 1 - 距離 / 長い方のモーラ数
+
+索引は正規化後の称呼ごとに1文書とし、出願番号との対応を別テーブルに保持する。
+"""
+
+import argparse
+import logging
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from db_pool import transaction
+from kana_distance import MIN_EDIT_COST, QueryScorer
+from normalization_engine import get_compiled_normalizer
+
+logger = logging.getLogger(__name__)
+
+DOCS_TABLE = "pronunciation_docs"
+GRAMS_TABLE = "pronunciation_grams"
+APPS_TABLE = "pronunciation_apps"
+
+CHUNK_SIZE = 500
+
+DEFAULT_MAX_DISTANCE = 1.0
+DEFAULT_LIMIT = 100
+# 距離計算の対象とする候補数の上限（共通2-gramの多い順）
+DEFAULT_MAX_CANDIDATES = 20000
+
+# 文字列の先頭・末尾を表す記号（2-gramに含めて語頭・語尾の一致を重視する）
+BOUNDARY_START = '^'
+BOUNDARY_END = '$'
+
+_SMALL_KANA = frozenset('ァィゥェォャュョヮ')
+
+
+class PronunciationMatch(NamedTuple):
+    """称呼類似検索の結果"""
+    pronunciation: str        # 正規化後の称呼
+    distance: float           # 重み付き編集距離
+    score: float              # 類似度（1.0 が完全一致）
+    app_nums: List[str]       # この称呼を持つ出願番号
+
+
+def split_morae(text: str) -> List[str]:
+    """
+    正規化後の称呼をモーラ単位に分割
+    normalize_pronunciation の拗音大文字化後は1文字が1モーラになる
+    （未正規化の小書き文字は直前の文字と同じモーラとして扱う）
+    """
+    morae = []
+    for char in text:
+        if char in _SMALL_KANA and morae:
+            morae[-1] += char
+        else:
+            morae.append(char)
+    return morae
+
+
+def mora_bigrams(morae: Sequence[str]) -> List[str]:
+    """語頭・語尾記号を付けたモーラ2-gram（重複なし）"""
+    padded = [BOUNDARY_START] + list(morae) + [BOUNDARY_END]
+    return sorted({padded[i] + padded[i + 1] for i in range(len(padded) - 1)})
+
+
+def similarity_score(distance: float, length_a: int, length_b: int) -> float:
+    return max(0.0, 1.0 - distance / max(length_a, length_b, 1))
+
+
+def index_exists(query_one: Callable) -> bool:
+    """索引が存在するか（query_one: (sql, params) -> 1行 or None）"""
+    row = query_one("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (DOCS_TABLE,))
+    return row is not None
+
+
+def _chunks(items: List, size: int = CHUNK_SIZE) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def create_index(conn: sqlite3.Connection):
+    """索引テーブルを作成"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DOCS_TABLE} (
+            doc_id INTEGER PRIMARY KEY,
+            pronunciation TEXT NOT NULL UNIQUE,
+            mora_count INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {GRAMS_TABLE} (
+            gram TEXT NOT NULL,
+            mora_count INTEGER NOT NULL,
+            doc_id INTEGER NOT NULL,
+            PRIMARY KEY (gram, mora_count, doc_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {APPS_TABLE} (
+            doc_id INTEGER NOT NULL,
+            normalized_app_num TEXT NOT NULL,
+            PRIMARY KEY (doc_id, normalized_app_num)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{APPS_TABLE}_app_num ON {APPS_TABLE}(normalized_app_num)")
+
+
+def _add_documents(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str]]) -> int:
+    """(出願番号, 称呼) を索引へ追加（未登録の称呼は文書と2-gramを作成）"""
+    normalize = get_compiled_normalizer().normalize_pronunciation
+    doc_ids = {}
+    added = 0
+    for app_num, dsgnt in rows:
+        pronunciation = normalize(dsgnt) if dsgnt else ''
+        if not app_num or not pronunciation:
+            continue
+        doc_id = doc_ids.get(pronunciation)
+        if doc_id is None:
+            row = conn.execute(f"SELECT doc_id FROM {DOCS_TABLE} WHERE pronunciation = ?",
+                               (pronunciation,)).fetchone()
+            if row:
+                doc_id = row[0]
+            else:
+                morae = split_morae(pronunciation)
+                doc_id = conn.execute(f"INSERT INTO {DOCS_TABLE} (pronunciation, mora_count) VALUES (?, ?)",
+                                      (pronunciation, len(morae))).lastrowid
+                conn.executemany(f"INSERT INTO {GRAMS_TABLE} (gram, mora_count, doc_id) VALUES (?, ?, ?)",
+                                 [(gram, len(morae), doc_id) for gram in mora_bigrams(morae)])
+            doc_ids[pronunciation] = doc_id
+        conn.execute(f"INSERT OR IGNORE INTO {APPS_TABLE} (doc_id, normalized_app_num) VALUES (?, ?)",
+                     (doc_id, app_num))
+        added += 1
+    return added
+
+
+def rebuild_index(conn: sqlite3.Connection) -> int:
+    """
+    索引を全件再構築（インポート後に実行）
+
+    Returns:
+        索引化した称呼（正規化後・重複なし）の件数
+    """
+    with conn:
+        for table in (APPS_TABLE, GRAMS_TABLE, DOCS_TABLE):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        create_index(conn)
+        rows = conn.execute("SELECT normalized_app_num, dsgnt FROM t_dsgnt_art "
+                            "WHERE normalized_app_num IS NOT NULL AND dsgnt IS NOT NULL "
+                            "ORDER BY normalized_app_num").fetchall()
+        _add_documents(conn, rows)
+    count = conn.execute(f"SELECT COUNT(*) FROM {DOCS_TABLE}").fetchone()[0]
+    logger.info(f"{DOCS_TABLE} を再構築しました: {count}件")
+    return count
+
+
+def refresh_index(conn: sqlite3.Connection, app_nums: Iterable[str]) -> int:
+    """
+    指定した出願番号の称呼のみ索引を作り直す（週次更新後に実行）
+    索引が未作成の場合は何もしない
+
+    Returns:
+        対象とした出願番号の件数
+    """
+    app_nums = sorted({num for num in app_nums if num})
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (DOCS_TABLE,)).fetchone()
+    if not app_nums or not exists:
+        return 0
+
+    with transaction(conn):
+        for chunk in _chunks(app_nums):
+            placeholders = ','.join(['?' for _ in chunk])
+            conn.execute(f"DELETE FROM {APPS_TABLE} WHERE normalized_app_num IN ({placeholders})", chunk)
+            rows = conn.execute(f"SELECT normalized_app_num, dsgnt FROM t_dsgnt_art "
+                                f"WHERE normalized_app_num IN ({placeholders}) AND dsgnt IS NOT NULL", chunk).fetchall()
+            _add_documents(conn, rows)
+        # どの出願にも使われなくなった称呼を削除
+        orphan_sql = f"SELECT doc_id FROM {DOCS_TABLE} WHERE doc_id NOT IN (SELECT doc_id FROM {APPS_TABLE})"
+        conn.execute(f"DELETE FROM {GRAMS_TABLE} WHERE doc_id IN ({orphan_sql})")
+        conn.execute(f"DELETE FROM {DOCS_TABLE} WHERE doc_id IN ({orphan_sql})")
+    logger.info(f"{DOCS_TABLE} を更新しました: {len(app_nums)}件")
+    return len(app_nums)
+
+
+def max_edits(max_distance: float) -> int:
+    """距離の上限内で可能な編集回数の上限"""
+    return int(max_distance / MIN_EDIT_COST + 1e-9)
+
+
+def find_candidates(conn: sqlite3.Connection, morae: Sequence[str], max_distance: float,
+                    max_candidates: int = DEFAULT_MAX_CANDIDATES) -> List[Tuple[int, str]]:
+    """2-gram索引から距離計算の対象とする (doc_id, 称呼) を取得"""
+    grams = mora_bigrams(morae)
+    edits = max_edits(max_distance)
+    # 1回の編集で失われる2-gramは最大2個
+    min_shared = max(1, len(grams) - 2 * edits)
+    min_count = max(1, len(morae) - edits)
+    max_count = len(morae) + edits
+    placeholders = ','.join(['?' for _ in grams])
+    rows = conn.execute(f"""
+        SELECT d.doc_id, d.pronunciation
+        FROM (
+            SELECT doc_id, COUNT(*) AS shared
+            FROM {GRAMS_TABLE}
+            WHERE gram IN ({placeholders}) AND mora_count BETWEEN ? AND ?
+            GROUP BY doc_id
+            HAVING shared >= ?
+            ORDER BY shared DESC
+            LIMIT ?
+        ) c
+        JOIN {DOCS_TABLE} d ON d.doc_id = c.doc_id
+    """, grams + [min_count, max_count, min_shared, max_candidates]).fetchall()
+    return rows
+
+
+def search(conn: sqlite3.Connection, query: str, max_distance: float = DEFAULT_MAX_DISTANCE,
+           limit: int = DEFAULT_LIMIT, max_candidates: int = DEFAULT_MAX_CANDIDATES) -> List[PronunciationMatch]:
+    """
+    称呼の類似検索
+
+    Args:
+        query: 検索する称呼（ひらがな・カタカナ・全角/半角いずれも可）
+        max_distance: 重み付き編集距離の上限
+        limit: 返す称呼の件数
+        max_candidates: 距離計算の対象とする候補数の上限
+
+    Returns:
+        距離の小さい順（同距離はスコア・称呼順）の PronunciationMatch のリスト
+    """
+    pronunciation = get_compiled_normalizer().normalize_pronunciation(query or '')
+    morae = split_morae(pronunciation)
+    if not morae:
+        return []
+
+    candidates = find_candidates(conn, morae, max_distance, max_candidates)
+    candidate_morae_list = [split_morae(candidate) for _, candidate in candidates]
+    distances = QueryScorer(morae, max_distance).distances(candidate_morae_list)
+    scored = []
+    for (doc_id, candidate), candidate_morae, distance in zip(candidates, candidate_morae_list, distances):
+        if distance is not None:
+            score = similarity_score(distance, len(morae), len(candidate_morae))
+            scored.append((distance, -score, candidate, doc_id))
+    scored.sort()
+    scored = scored[:limit]
+
+    app_nums: Dict[int, List[str]] = {}
+    doc_ids = [doc_id for _, _, _, doc_id in scored]
+    for chunk in _chunks(doc_ids):
+        placeholders = ','.join(['?' for _ in chunk])
+        for doc_id, app_num in conn.execute(f"SELECT doc_id, normalized_app_num FROM {APPS_TABLE} "
+                                            f"WHERE doc_id IN ({placeholders}) ORDER BY normalized_app_num", chunk):
+            app_nums.setdefault(doc_id, []).append(app_num)
+
+    return [PronunciationMatch(candidate, round(distance, 6), round(-neg_score, 6), app_nums.get(doc_id, []))
+            for distance, neg_score, candidate, doc_id in scored]
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="称呼類似検索")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    parser.add_argument("--rebuild", action="store_true", help="称呼の2-gram索引を再構築")
+    parser.add_argument("--query", help="検索する称呼")
+    parser.add_argument("--max-distance", type=float, default=DEFAULT_MAX_DISTANCE,
+                        help=f"重み付き編集距離の上限（デフォルト: {DEFAULT_MAX_DISTANCE}）")
+    parser.add_argument("--limit", type=int, default=20, help="表示件数（デフォルト: 20）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not args.rebuild and not args.query:
+        parser.error("--rebuild または --query を指定してください")
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.rebuild:
+            count = rebuild_index(conn)
+            print(f"{DOCS_TABLE}: {count}件の称呼を索引化しました")
+        if args.query:
+            if not index_exists(lambda sql, params: conn.execute(sql, params).fetchone()):
+                print("エラー: 称呼索引がありません（--rebuild で作成してください）", file=sys.stderr)
+                sys.exit(1)
+            start = time.perf_counter()
+            matches = search(conn, args.query, args.max_distance, args.limit)
+            elapsed = time.perf_counter() - start
+            print(f"称呼類似検索: {args.query} → {len(matches)}件 ({elapsed * 1000:.0f}ms)")
+            for rank, match in enumerate(matches, 1):
+                app_nums = ', '.join(match.app_nums[:5])
+                more = f" 他{len(match.app_nums) - 5}件" if len(match.app_nums) > 5 else ""
+                print(f"{rank:>3}. {match.pronunciation}  距離 {match.distance:.2f}  "
+                      f"スコア {match.score:.3f}  [{app_nums}{more}]")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+検索結果キャッシュ
+検索条件（FROM句・WHERE句・パラメータ）をキーに、総件数とページの出願番号リストを
+別々にキャッシュする（同じ条件の別ページは総件数を再計算しない）。
+
+    1段目: プロセス内のLRU（OrderedDict）
+    2段目: SQLiteの search_cache テーブル（プロセス再起動後・複数プロセス間で共有）
+
+キャッシュはデータバージョン（data_version テーブル）ごとに管理し、
+週次更新・インポートで bump_data_version を呼ぶと以前のエントリはすべて無効になる。
+詳細データ（表示項目）はキャッシュしない。
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional
+
+from db_pool import transaction
+
+logger = logging.getLogger(__name__)
+
+CACHE_TABLE = "search_cache"
+DATA_VERSION_TABLE = "data_version"
+
+CACHE_KINDS = ('count', 'page')
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_PERSISTENT_ENTRIES = 100000
+# データバージョンを確認する間隔（秒、この間のLRUヒットはデータベースに触れない）
+DEFAULT_VERSION_TTL = 2.0
+# 2段目のエントリ数上限の確認間隔（書き込み回数）
+PRUNE_INTERVAL = 500
+
+# optimize_search_performance.create_search_cache_table の列に追加する列
+_EXTRA_COLUMNS = {
+    'kind': "TEXT",
+    'data_version': "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def ensure_tables(conn: sqlite3.Connection):
+    """キャッシュテーブルとデータバージョンテーブルを作成（既存の search_cache には列を追加）"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute(f"INSERT OR IGNORE INTO {DATA_VERSION_TABLE} (id, version) VALUES (1, 1)")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            query_hash TEXT UNIQUE,
+            query_params TEXT,
+            result_count INTEGER,
+            result_data TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            access_count INTEGER DEFAULT 1,
+            kind TEXT,
+            data_version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({CACHE_TABLE})")}
+    for column, definition in _EXTRA_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {CACHE_TABLE} ADD COLUMN {column} {definition}")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON {CACHE_TABLE}(last_accessed)")
+
+
+def get_data_version(conn: sqlite3.Connection) -> int:
+    """現在のデータバージョン（テーブルが無ければ 0）"""
+    try:
+        row = conn.execute(f"SELECT version FROM {DATA_VERSION_TABLE} WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+def bump_data_version(conn: sqlite3.Connection) -> int:
+    """
+    データバージョンを1つ進め、古いキャッシュエントリを削除（データ更新後に実行）
+
+    Returns:
+        新しいデータバージョン
+    """
+    with transaction(conn):
+        ensure_tables(conn)
+        conn.execute(f"UPDATE {DATA_VERSION_TABLE} SET version = version + 1, "
+                     f"updated_at = CURRENT_TIMESTAMP WHERE id = 1")
+        version = get_data_version(conn)
+        conn.execute(f"DELETE FROM {CACHE_TABLE} WHERE data_version < ?", (version,))
+    logger.info(f"データバージョンを更新しました: {version}（検索キャッシュを無効化）")
+    return version
+
+
+def cache_key(kind: str, key: Any) -> str:
+    """エントリのハッシュ（検索条件のJSON表現の SHA-256）"""
+    raw = json.dumps([kind, key], ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class SearchCache:
+    """2段構成（LRU + SQLite）の検索結果キャッシュ（スレッドセーフ）"""
+
+    def __init__(self, db_path, max_entries: int = DEFAULT_MAX_ENTRIES, persistent: bool = True,
+                 max_persistent_entries: int = DEFAULT_MAX_PERSISTENT_ENTRIES,
+                 version_ttl: float = DEFAULT_VERSION_TTL):
+        self.db_path = Path(db_path)
+        self.max_entries = max(1, int(max_entries))
+        self.persistent = persistent
+        self.max_persistent_entries = max_persistent_entries
+        self.version_ttl = version_ttl
+
+        self._lru: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._tables_ready = False
+        self._version = None
+        self._version_checked_at = float('-inf')
+        self._writes = 0
+
+        self.stats = {
+            'hits': 0,
+            'memory_hits': 0,
+            'persistent_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'persistent_evictions': 0,
+            'invalidations': 0,
+            'errors': 0,
+        }
+
+    # --- 2段目（SQLite） ---
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # 検索用の読み取り専用プールとは別の書き込み可能な接続
+            self._conn = sqlite3.connect(self.db_path, timeout=1.0, check_same_thread=False)
+        return self._conn
+
+    def _persistent_call(self, func, default=None):
+        """2段目の操作（失敗してもキャッシュなしとして続行する）"""
+        if not self.persistent:
+            return default
+        try:
+            return func(self._connection())
+        except sqlite3.Error as e:
+            self.stats['errors'] += 1
+            log = logger.warning if self.stats['errors'] == 1 else logger.debug
+            log(f"検索キャッシュ（SQLite）の操作に失敗しました: {e}")
+            return default
+
+    def _ensure_tables(self, conn: sqlite3.Connection):
+        if not self._tables_ready:
+            with conn:
+                ensure_tables(conn)
+            self._tables_ready = True
+
+    def _read_version(self, conn: sqlite3.Connection) -> int:
+        self._ensure_tables(conn)
+        return get_data_version(conn)
+
+    def current_version(self) -> int:
+        """データバージョン（version_ttl 秒ごとに確認し、変わっていればLRUを破棄）"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_checked_at < self.version_ttl:
+                return self._version
+            version = self._persistent_call(self._read_version, default=self._version or 0)
+            if self._version is not None and version != self._version:
+                self._lru.clear()
+                self.stats['invalidations'] += 1
+            self._version = version
+            self._version_checked_at = now
+            return version
+
+    def _load(self, conn: sqlite3.Connection, digest: str, version: int):
+        self._ensure_tables(conn)
+        row = conn.execute(f"SELECT result_data FROM {CACHE_TABLE} WHERE query_hash = ? AND data_version = ?",
+                           (digest, version)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute(f"UPDATE {CACHE_TABLE} SET last_accessed = CURRENT_TIMESTAMP, "
+                         f"access_count = access_count + 1 WHERE query_hash = ?", (digest,))
+        return json.loads(row[0])
+
+    def _store(self, conn: sqlite3.Connection, kind: str, key: Any, digest: str, value: Any, version: int):
+        self._ensure_tables(conn)
+        count = value[0] if kind == 'count' else len(value)
+        with conn:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {CACHE_TABLE}
+                    (query_hash, query_params, result_count, result_data, kind, data_version)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (digest, json.dumps(key, ensure_ascii=False, default=str), count,
+                  json.dumps(value, ensure_ascii=False), kind, version))
+        self._writes += 1
+        if self._writes % PRUNE_INTERVAL == 0:
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        """2段目のエントリ数を上限以下に保つ（最終参照が古い順に削除）"""
+        total = conn.execute(f"SELECT COUNT(*) FROM {CACHE_TABLE}").fetchone()[0]
+        excess = total - self.max_persistent_entries
+        if excess > 0:
+            with conn:
+                conn.execute(f"DELETE FROM {CACHE_TABLE} WHERE id IN "
+                             f"(SELECT id FROM {CACHE_TABLE} ORDER BY last_accessed, id LIMIT ?)", (excess,))
+            self.stats['persistent_evictions'] += excess
+
+    # --- 公開インターフェース ---
+    def get(self, kind: str, key: Any) -> Optional[Any]:
+        """キャッシュされた値（無ければ None）"""
+        version = self.current_version()
+        digest = cache_key(kind, key)
+        with self._lock:
+            value = self._lru.get((version, digest))
+            if value is not None:
+                self._lru.move_to_end((version, digest))
+                self.stats['hits'] += 1
+                self.stats['memory_hits'] += 1
+                return value
+
+            value = self._persistent_call(lambda conn: self._load(conn, digest, version))
+            if value is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self.stats['persistent_hits'] += 1
+            self._remember((version, digest), value)
+            return value
+
+    def put(self, kind: str, key: Any, value: Any):
+        """値をキャッシュ（count: [総件数, 概算か], page: 出願番号リスト）"""
+        if kind not in CACHE_KINDS:
+            raise ValueError(f"Unknown cache kind: {kind} (expected one of {CACHE_KINDS})")
+        version = self.current_version()
+        digest = cache_key(kind, key)
+        with self._lock:
+            self._remember((version, digest), value)
+            self.stats['stores'] += 1
+            self._persistent_call(lambda conn: self._store(conn, kind, key, digest, value, version))
+
+    def _remember(self, lru_key, value):
+        self._lru[lru_key] = value
+        self._lru.move_to_end(lru_key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット・ミス・追い出しの統計"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._lru)
+            stats['max_entries'] = self.max_entries
+            stats['data_version'] = self._version
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """1段目のみ破棄（2段目はデータバージョンで無効化する）"""
+        with self._lock:
+            self._lru.clear()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+検索結果ページング
+CLI・Flaskアプリ共通の「対象出願番号ページ＋総件数」取得処理
+
+件数取得モード:
+    exact    : COUNT(DISTINCT) と LIMIT/OFFSET の2クエリ（従来方式）
+    single   : ウィンドウ関数 COUNT(*) OVER () でページと総件数を1パスで取得
+    estimate : 総件数を上限（count_cap）で打ち切る概算モード（UI向け、"10000+件"表示）
+
+キーセット（シーク）ページング:
+    fetch_keyset_page は最終出願番号を含む不透明な継続トークン（カーソル）を返す。
+    次ページは "j.normalized_app_num > 最終出願番号" で検索を再開するため、
+    OFFSETのように読み飛ばす行が発生せず、深いページでも1ページ目と同じコストで取得できる。
+    総件数は最初のページで取得した値をトークンに保持して引き継ぐ。
+
+関連度順:
+    fetch_ranked_page はスコアのサブクエリ（出願番号, score）の最小値の昇順でページを取得する。
+    並び順が出願番号ではないためシークはできず、継続トークンは次ページの位置（OFFSET）を保持する。
+
+キャッシュ:
+    fetch_keyset_page・fetch_ranked_page に cache（search_cache.SearchCache）を渡すと、総件数とページの出願番号リストを
+    検索条件ごとに別々にキャッシュする。総件数がキャッシュ済みなら別ページはページの取得のみ行う。
+"""
+
+import base64
+import hashlib
+import json
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+COUNT_MODES = ('exact', 'single', 'estimate')
+DEFAULT_COUNT_MODE = 'single'
+DEFAULT_COUNT_CAP = 10000
+
+QueryFunc = Callable[[str, tuple], List[Dict]]
+
+
+def _count_exact(query_db: QueryFunc, sub_query_from: str, sub_query_where: str,
+                 params: Sequence) -> int:
+    """COUNT(DISTINCT) による正確な総件数"""
+    count_sql = f"SELECT COUNT(DISTINCT j.normalized_app_num) AS total {sub_query_from} WHERE {sub_query_where}"
+    rows = query_db(count_sql, tuple(params))
+    return rows[0]['total'] if rows else 0
+
+
+def _count_capped(query_db: QueryFunc, sub_query_from: str, sub_query_where: str,
+                  params: Sequence, count_cap: int) -> Tuple[int, bool]:
+    """count_cap+1件で打ち切る概算件数"""
+    count_sql = f"""
+        SELECT COUNT(*) AS total FROM (
+            SELECT DISTINCT j.normalized_app_num {sub_query_from} WHERE {sub_query_where}
+            LIMIT ?
+        )
+    """
+    rows = query_db(count_sql, tuple(list(params) + [count_cap + 1]))
+    total = rows[0]['total'] if rows else 0
+    if total > count_cap:
+        return count_cap, True
+    return total, False
+
+
+def fetch_page(query_db: QueryFunc,
+               sub_query_from: str,
+               sub_query_where: str,
+               params: Sequence,
+               limit: int,
+               offset: int = 0,
+               count_mode: str = DEFAULT_COUNT_MODE,
+               count_cap: int = DEFAULT_COUNT_CAP) -> Tuple[List[str], int, bool]:
+    """
+    対象の出願番号ページと総件数を取得
+
+    Args:
+        query_db: (sql, params) を受け取り行の辞書リストを返す関数
+        sub_query_from: "FROM jiken_c_t j ..." 句
+        sub_query_where: WHERE句の条件部分
+        params: WHERE句のパラメータ
+        limit, offset: ページ指定
+        count_mode: 'exact' / 'single' / 'estimate'
+        count_cap: estimateモードの件数上限
+
+    Returns:
+        (app_nums, total_count, is_estimate)
+        is_estimate が True の場合、total_count は count_cap で打ち切られた値
+    """
+    if count_mode not in COUNT_MODES:
+        raise ValueError(f"Unknown count_mode: {count_mode} (expected one of {COUNT_MODES})")
+
+    params = list(params)
+
+    if count_mode == 'exact':
+        total_count = _count_exact(query_db, sub_query_from, sub_query_where, params)
+        if total_count == 0:
+            return [], 0, False
+        app_num_sql = (f"SELECT DISTINCT j.normalized_app_num {sub_query_from} WHERE {sub_query_where} "
+                       f"ORDER BY j.normalized_app_num LIMIT ? OFFSET ?")
+        rows = query_db(app_num_sql, tuple(params + [limit, offset]))
+        return [row['normalized_app_num'] for row in rows], total_count, False
+
+    if count_mode == 'estimate' and offset + limit <= count_cap:
+        # 先頭 count_cap+1 件だけを対象にウィンドウ関数で件数を数える（1クエリ）
+        page_sql = f"""
+            SELECT normalized_app_num, COUNT(*) OVER () AS total_count
+            FROM (
+                SELECT DISTINCT j.normalized_app_num {sub_query_from} WHERE {sub_query_where}
+                ORDER BY j.normalized_app_num
+                LIMIT ?
+            )
+            ORDER BY normalized_app_num
+            LIMIT ? OFFSET ?
+        """
+        rows = query_db(page_sql, tuple(params + [count_cap + 1, limit, offset]))
+        if rows:
+            total_count = rows[0]['total_count']
+            if total_count > count_cap:
+                return [row['normalized_app_num'] for row in rows], count_cap, True
+            return [row['normalized_app_num'] for row in rows], total_count, False
+        if offset == 0:
+            return [], 0, False
+        total_count, is_estimate = _count_capped(query_db, sub_query_from, sub_query_where, params, count_cap)
+        return [], total_count, is_estimate
+
+    # single（および上限を超えるページのestimate）: ページと総件数を1パスで取得
+    page_sql = f"""
+        SELECT normalized_app_num, COUNT(*) OVER () AS total_count
+        FROM (
+            SELECT DISTINCT j.normalized_app_num {sub_query_from} WHERE {sub_query_where}
+        )
+        ORDER BY normalized_app_num
+        LIMIT ? OFFSET ?
+    """
+    rows = query_db(page_sql, tuple(params + [limit, offset]))
+    if rows:
+        return [row['normalized_app_num'] for row in rows], rows[0]['total_count'], False
+    if offset == 0:
+        return [], 0, False
+    # 最終ページより後ろを指定された場合はウィンドウ結果が得られないため件数のみ別途取得
+    return [], _count_exact(query_db, sub_query_from, sub_query_where, params), False
+
+
+CURSOR_VERSION = 1
+
+
+class InvalidCursorError(ValueError):
+    """継続トークンが不正、または別の検索条件のものである場合のエラー"""
+
+
+class KeysetPage(NamedTuple):
+    """キーセットページングの結果"""
+    app_nums: List[str]
+    total_count: int
+    is_estimate: bool
+    position: int                 # このページ先頭の0始まりの位置
+    next_cursor: Optional[str]    # 次ページの継続トークン（最終ページならNone）
+
+
+def query_key(sub_query_from: str, sub_query_where: str, params: Sequence) -> str:
+    """検索条件を識別する短いハッシュ（トークンの使い回し防止用）"""
+    raw = json.dumps([sub_query_from, sub_query_where, [str(p) for p in params]], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(last_app_num: str, position: int, total_count: int,
+                  is_estimate: bool, key: str) -> str:
+    """継続トークンを生成（URLセーフなBase64）"""
+    payload = {
+        'v': CURSOR_VERSION,
+        'a': last_app_num,
+        'p': position,
+        't': total_count,
+        'e': 1 if is_estimate else 0,
+        'q': key,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, key: Optional[str] = None) -> Dict:
+    """継続トークンを復号して検証"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        state = {
+            'after': str(payload['a']),
+            'position': int(payload['p']),
+            'total_count': int(payload['t']),
+            'is_estimate': bool(payload['e']),
+            'key': str(payload['q']),
+        }
+        version = payload['v']
+    except (ValueError, KeyError, TypeError, UnicodeEncodeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}") from e
+
+    if version != CURSOR_VERSION:
+        raise InvalidCursorError(f"Unsupported cursor version: {version}")
+    if key is not None and state['key'] != key:
+        raise InvalidCursorError("Cursor does not belong to this search")
+    if state['position'] < 0 or not state['after']:
+        raise InvalidCursorError("Invalid cursor position")
+    return state
+
+
+def fetch_keyset_page(query_db: QueryFunc,
+                      sub_query_from: str,
+                      sub_query_where: str,
+                      params: Sequence,
+                      limit: int,
+                      offset: int = 0,
+                      cursor: Optional[str] = None,
+                      count_mode: str = DEFAULT_COUNT_MODE,
+                      count_cap: int = DEFAULT_COUNT_CAP,
+                      cache=None) -> KeysetPage:
+    """
+    継続トークン対応のページ取得
+
+    cursor が無い場合は fetch_page で offset のページと総件数を取得し、次ページのトークンを返す。
+    cursor がある場合は最終出願番号からシークして limit 件だけ取得する（総件数の再計算なし）。
+    cache を指定した場合は総件数・ページの出願番号リストをキャッシュから取得する。
+
+    Raises:
+        InvalidCursorError: トークンが不正、または別の検索条件のものである場合
+    """
+    params = list(params)
+    key = query_key(sub_query_from, sub_query_where, params)
+    # キャッシュのキー（正規化済みの検索条件そのもの）
+    search_key = [sub_query_from, sub_query_where, [str(p) for p in params], count_mode, count_cap]
+
+    if cursor is None:
+        position = offset
+        page_key = search_key + [limit, 'offset', offset]
+        # estimateモードでも上限を超えるページは正確な件数になるため別エントリとする
+        count_key = search_key + [count_mode == 'estimate' and offset + limit <= count_cap]
+        cached_count = cache.get('count', count_key) if cache is not None else None
+        cached_page = cache.get('page', page_key) if cached_count is not None else None
+        if cached_page is not None:
+            app_nums = cached_page
+            total_count, is_estimate = cached_count
+        elif cached_count is not None:
+            # 総件数はキャッシュ済みのためページのみ取得
+            total_count, is_estimate = cached_count
+            app_nums = []
+            if total_count > 0 or is_estimate:
+                page_sql = (f"SELECT DISTINCT j.normalized_app_num {sub_query_from} WHERE {sub_query_where} "
+                            f"ORDER BY j.normalized_app_num LIMIT ? OFFSET ?")
+                app_nums = [row['normalized_app_num'] for row in query_db(page_sql, tuple(params + [limit, offset]))]
+            cache.put('page', page_key, app_nums)
+        else:
+            app_nums, total_count, is_estimate = fetch_page(
+                query_db, sub_query_from, sub_query_where, params, limit, offset,
+                count_mode=count_mode, count_cap=count_cap
+            )
+            if cache is not None:
+                cache.put('count', count_key, [total_count, is_estimate])
+                cache.put('page', page_key, app_nums)
+    else:
+        state = decode_cursor(cursor, key)
+        page_key = search_key + [limit, 'after', state['after']]
+        app_nums = cache.get('page', page_key) if cache is not None else None
+        if app_nums is None:
+            seek_sql = (f"SELECT DISTINCT j.normalized_app_num {sub_query_from} "
+                        f"WHERE ({sub_query_where}) AND j.normalized_app_num > ? "
+                        f"ORDER BY j.normalized_app_num LIMIT ?")
+            rows = query_db(seek_sql, tuple(params + [state['after'], limit]))
+            app_nums = [row['normalized_app_num'] for row in rows]
+            if cache is not None:
+                cache.put('page', page_key, app_nums)
+        total_count = state['total_count']
+        is_estimate = state['is_estimate']
+        position = state['position']
+
+    return keyset_page(app_nums, total_count, is_estimate, position, limit, key)
+
+
+def keyset_page(app_nums: List[str], total_count: int, is_estimate: bool,
+                position: int, limit: int, key: str) -> KeysetPage:
+    """取得したページから KeysetPage を作成（続きがあれば次ページのトークンを付ける）"""
+    next_position = position + len(app_nums)
+    has_more = len(app_nums) == limit and (is_estimate or next_position < total_count)
+    next_cursor = None
+    if app_nums and has_more:
+        next_cursor = encode_cursor(app_nums[-1], next_position, total_count, is_estimate, key)
+
+    return KeysetPage(app_nums, total_count, is_estimate, position, next_cursor)
+
+
+def fetch_ranked_page(query_db: QueryFunc,
+                      sub_query_from: str,
+                      sub_query_where: str,
+                      params: Sequence,
+                      rank_sql: str,
+                      rank_params: Sequence,
+                      limit: int,
+                      offset: int = 0,
+                      cursor: Optional[str] = None,
+                      cache=None) -> KeysetPage:
+    """
+    関連度順のページ取得（スコアの小さい順、同点は出願番号順）
+
+    rank_sql は normalized_app_num と score を返すSELECT文（1出願に複数行ある場合は最小値を使用）。
+    ページと総件数はウィンドウ関数で1パスで取得する（総件数は常に正確な値）。
+
+    Raises:
+        InvalidCursorError: トークンが不正、または別の検索条件のものである場合
+    """
+    params = list(params)
+    rank_params = list(rank_params)
+    key = query_key(f"{sub_query_from} RANK {rank_sql}", sub_query_where, params + rank_params)
+    search_key = ['rank', sub_query_from, sub_query_where, rank_sql, [str(p) for p in params + rank_params]]
+
+    if cursor is None:
+        position = offset
+        cached_count = None
+    else:
+        state = decode_cursor(cursor, key)
+        position = state['position']
+        cached_count = [state['total_count'], False]
+
+    page_key = search_key + [limit, position]
+    if cached_count is None and cache is not None:
+        cached_count = cache.get('count', search_key)
+    app_nums = cache.get('page', page_key) if cache is not None and cached_count is not None else None
+
+    if app_nums is None:
+        # スコア関数（FTS5のbm25など）は元の問い合わせ内でしか評価できないため、先に実体化する
+        page_sql = f"""
+            WITH r AS MATERIALIZED ({rank_sql})
+            SELECT j.normalized_app_num, MIN(r.score) AS score, COUNT(*) OVER () AS total_count
+            {sub_query_from}
+            JOIN r ON r.normalized_app_num = j.normalized_app_num
+            WHERE {sub_query_where}
+            GROUP BY j.normalized_app_num
+            ORDER BY score, j.normalized_app_num
+            LIMIT ? OFFSET ?
+        """
+        rows = query_db(page_sql, tuple(rank_params + params + [limit, position]))
+        app_nums = [row['normalized_app_num'] for row in rows]
+        if cached_count is None:
+            if rows:
+                cached_count = [rows[0]['total_count'], False]
+            elif position == 0:
+                cached_count = [0, False]
+            else:
+                count_sql = (f"WITH r AS MATERIALIZED ({rank_sql}) "
+                             f"SELECT COUNT(DISTINCT j.normalized_app_num) AS total {sub_query_from} "
+                             f"JOIN r ON r.normalized_app_num = j.normalized_app_num "
+                             f"WHERE {sub_query_where}")
+                count_rows = query_db(count_sql, tuple(rank_params + params))
+                cached_count = [count_rows[0]['total'] if count_rows else 0, False]
+            if cache is not None:
+                cache.put('count', search_key, cached_count)
+        if cache is not None:
+            cache.put('page', page_key, app_nums)
+
+    return keyset_page(app_nums, cached_count[0], False, position, limit, key)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+類似群コードの検索条件と索引テーブル
+t_knd_info_art_table.smlr_dsgn_group_cd は類ごとに複数のコードを空白区切りで保持するため、
+コード1つにつき1行の t_knd_info_code テーブル（主キー: コード, 出願番号）を作成し、
+索引のシークで出願番号を取得する。
+
+    完全一致: 5桁のコード（09G01）は code = ? / code IN (...)
+    前方一致: 5桁未満（09G, 09）は code >= ? AND code < ? || U+10FFFF（09G01, 09G02, ...）
+    AND: 全コードを持つ出願（完全一致のコードは GROUP BY ... HAVING COUNT(*) = n の1回の走査）
+    OR : いずれかのコードを持つ出願
+
+コードは出願単位で判定する（同じ類の行に限定しない）。
+テーブルが未作成のデータベースでは、元の列を空白区切りの語として LIKE で同じ条件を評価する。
+"""
+
+import argparse
+import logging
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from db_pool import transaction
+from normalized_marks import PREFIX_UPPER_BOUND
+
+logger = logging.getLogger(__name__)
+
+CODE_TABLE = "t_knd_info_code"
+
+OPERATORS = ('and', 'or')
+
+# 完全なコード（2桁数字 + 英字1文字 + 2桁数字）と、前方一致で指定できる先頭部分
+FULL_CODE_LENGTH = 5
+_CODE_PATTERN = re.compile(r'\d{2}(?:[A-Z]\d{0,2})?')
+_CODE_SEPARATOR = re.compile(r'[\s,]+')
+
+# TM-SONAR で指定できる類似群コードの最大数（ベンチマークの上限）
+MAX_CODES = 42
+BENCHMARK_CODE_COUNTS = (1, 5, MAX_CODES)
+
+CHUNK_SIZE = 500
+
+
+class InvalidCodeError(ValueError):
+    """類似群コードの形式が不正な場合のエラー"""
+
+
+def _chunks(items: List[str], size: int = CHUNK_SIZE) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def normalize_code(term: str) -> str:
+    """全角・小文字を正規化（'０９ｇ０１' → '09G01'）"""
+    return unicodedata.normalize('NFKC', term).strip().upper()
+
+
+def parse_codes(text) -> List[str]:
+    """
+    空白・カンマ区切りの類似群コードを正規化して重複を除く
+
+    Raises:
+        InvalidCodeError: コードまたは前方一致の先頭部分として不正な語がある場合
+    """
+    terms = _CODE_SEPARATOR.split(text) if isinstance(text, str) else list(text)
+    codes = []
+    for term in terms:
+        code = normalize_code(term)
+        if not code:
+            continue
+        if not _CODE_PATTERN.fullmatch(code):
+            raise InvalidCodeError(f"Invalid similar-group code: {term!r} (e.g. 09G01, or 09G for a prefix)")
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def is_full_code(code: str) -> bool:
+    return len(code) == FULL_CODE_LENGTH
+
+
+def table_exists(query_one: Callable) -> bool:
+    """索引テーブルが存在するか（query_one: (sql, params) -> 1行 or None）"""
+    row = query_one("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (CODE_TABLE,))
+    return row is not None
+
+
+def similar_group_condition(codes, op: str = 'and', indexed: bool = True) -> Tuple[List[str], List[str]]:
+    """
+    類似群コードの WHERE条件とパラメータを生成（jiken_c_t j に対する条件）
+
+    Args:
+        codes: 類似群コード（空白区切りの文字列またはリスト、5桁未満は前方一致）
+        op: 'and'（全コードを持つ） / 'or'（いずれかを持つ）
+        indexed: t_knd_info_code が利用可能か（False の場合は元の列を LIKE で評価）
+
+    Returns:
+        (where_parts, params)
+    """
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator: {op} (expected one of {OPERATORS})")
+    codes = parse_codes(codes)
+    if not codes:
+        raise InvalidCodeError("No similar-group code given")
+
+    if not indexed:
+        # 元の列（空白区切り）の語として完全一致・前方一致を判定
+        where = []
+        params = []
+        for code in codes:
+            where.append("EXISTS (SELECT 1 FROM t_knd_info_art_table k "
+                         "WHERE k.normalized_app_num = j.normalized_app_num "
+                         "AND ' ' || k.smlr_dsgn_group_cd || ' ' LIKE ?)")
+            params.append(f"% {code}{' ' if is_full_code(code) else ''}%")
+        if op == 'or':
+            return [f"({' OR '.join(where)})"], params
+        return where, params
+
+    exact = [code for code in codes if is_full_code(code)]
+    prefixes = [code for code in codes if not is_full_code(code)]
+    exact_sql = f"SELECT normalized_app_num FROM {CODE_TABLE} WHERE code IN ({','.join(['?' for _ in exact])})"
+    prefix_sql = f"SELECT normalized_app_num FROM {CODE_TABLE} WHERE code >= ? AND code < ?"
+
+    if op == 'or':
+        subqueries = []
+        params = []
+        if exact:
+            subqueries.append(exact_sql)
+            params.extend(exact)
+        for prefix in prefixes:
+            subqueries.append(prefix_sql)
+            params.extend([prefix, prefix + PREFIX_UPPER_BOUND])
+        return [f"j.normalized_app_num IN ({' UNION ALL '.join(subqueries)})"], params
+
+    where = []
+    params = []
+    if len(exact) == 1:
+        where.append(f"j.normalized_app_num IN ({exact_sql})")
+        params.extend(exact)
+    elif exact:
+        # 主キー（コード, 出願番号）のため、一致した行数 = 一致したコードの数
+        where.append(f"j.normalized_app_num IN ({exact_sql} GROUP BY normalized_app_num HAVING COUNT(*) = ?)")
+        params.extend(exact + [len(exact)])
+    for prefix in prefixes:
+        where.append(f"j.normalized_app_num IN ({prefix_sql})")
+        params.extend([prefix, prefix + PREFIX_UPPER_BOUND])
+    return where, params
+
+
+def create_table(conn: sqlite3.Connection):
+    """索引テーブルを作成"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CODE_TABLE} (
+            code TEXT NOT NULL,
+            normalized_app_num TEXT NOT NULL,
+            PRIMARY KEY (code, normalized_app_num)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CODE_TABLE}_app_num ON {CODE_TABLE}(normalized_app_num)")
+
+
+def _code_rows(rows: Iterable[Tuple[str, str]]) -> Iterable[Tuple[str, str]]:
+    """(出願番号, 空白区切りのコード) → (コード, 出願番号)"""
+    for app_num, value in rows:
+        if not app_num or not value:
+            continue
+        for token in _CODE_SEPARATOR.split(value):
+            code = normalize_code(token)
+            if code:
+                yield code, app_num
+
+
+def rebuild_table(conn: sqlite3.Connection) -> int:
+    """
+    索引テーブルを全件再構築（インポート後に実行）
+
+    Returns:
+        (コード, 出願番号) の行数
+    """
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {CODE_TABLE}")
+        create_table(conn)
+        rows = conn.execute("SELECT normalized_app_num, smlr_dsgn_group_cd FROM t_knd_info_art_table")
+        conn.executemany(f"INSERT OR IGNORE INTO {CODE_TABLE} (code, normalized_app_num) VALUES (?, ?)",
+                         _code_rows(rows))
+    count = conn.execute(f"SELECT COUNT(*) FROM {CODE_TABLE}").fetchone()[0]
+    logger.info(f"{CODE_TABLE} を再構築しました: {count}行")
+    return count
+
+
+def refresh_table(conn: sqlite3.Connection, app_nums: Iterable[str]) -> int:
+    """
+    指定した出願番号の行のみ作り直す（週次更新後に実行）
+    テーブルが未作成の場合は何もしない
+
+    Returns:
+        対象とした出願番号の件数
+    """
+    app_nums = sorted({num for num in app_nums if num})
+    if not app_nums or not table_exists(lambda sql, params: conn.execute(sql, params).fetchone()):
+        return 0
+
+    with transaction(conn):
+        for chunk in _chunks(app_nums):
+            placeholders = ','.join(['?' for _ in chunk])
+            conn.execute(f"DELETE FROM {CODE_TABLE} WHERE normalized_app_num IN ({placeholders})", chunk)
+            rows = conn.execute(f"SELECT normalized_app_num, smlr_dsgn_group_cd FROM t_knd_info_art_table "
+                                f"WHERE normalized_app_num IN ({placeholders})", chunk).fetchall()
+            conn.executemany(f"INSERT OR IGNORE INTO {CODE_TABLE} (code, normalized_app_num) VALUES (?, ?)",
+                             _code_rows(rows))
+    logger.info(f"{CODE_TABLE} を更新しました: {len(app_nums)}件")
+    return len(app_nums)
+
+
+def _legacy_condition(codes: Sequence[str], op: str) -> Tuple[str, List[str], List[str]]:
+    """従来の条件（1行のJOIN + LIKE '%コード%'、ベンチマーク用）"""
+    like = ["tknd.smlr_dsgn_group_cd LIKE ?" for _ in codes]
+    where = f"({' OR '.join(like)})" if op == 'or' else " AND ".join(like)
+    return ("LEFT JOIN t_knd_info_art_table AS tknd ON j.normalized_app_num = tknd.normalized_app_num",
+            [where], [f"%{code}%" for code in codes])
+
+
+def benchmark(conn: sqlite3.Connection, code_counts: Sequence[int] = BENCHMARK_CODE_COUNTS,
+              repeats: int = 3) -> Dict[int, Dict[str, float]]:
+    """
+    従来の LIKE 条件との比較（件数取得の秒数と件数）
+    使用頻度の高いコードから順に使用し、足りない分は存在しないコードで補う
+    """
+    rows = conn.execute(f"SELECT code FROM {CODE_TABLE} GROUP BY code ORDER BY COUNT(*) DESC, code "
+                        f"LIMIT ?", (max(code_counts),)).fetchall()
+    frequent = [row[0] for row in rows]
+    frequent += [f"99Z{i:02d}" for i in range(max(code_counts) - len(frequent))]
+
+    def measure(from_part: str, where: List[str], params: List[str]) -> Tuple[float, int]:
+        sql = f"SELECT COUNT(DISTINCT j.normalized_app_num) FROM jiken_c_t j {from_part} WHERE {' AND '.join(where)}"
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            total = conn.execute(sql, params).fetchone()[0]
+            best = min(best, time.perf_counter() - start)
+        return best, total
+
+    results = {}
+    for n in code_counts:
+        codes = frequent[:n]
+        timings = {}
+        for op in OPERATORS:
+            timings[f'legacy_{op}'], timings[f'legacy_{op}_count'] = measure(*_legacy_condition(codes, op))
+            where, params = similar_group_condition(codes, op)
+            timings[op], timings[f'{op}_count'] = measure("", where, params)
+        results[n] = timings
+    return results
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="類似群コード索引テーブルの作成・ベンチマーク")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    parser.add_argument("--rebuild", action="store_true", help=f"{CODE_TABLE} を再構築")
+    parser.add_argument("--benchmark", action="store_true",
+                        help=f"従来の LIKE 条件と比較（コード数 {', '.join(map(str, BENCHMARK_CODE_COUNTS))}）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not args.rebuild and not args.benchmark:
+        parser.error("--rebuild または --benchmark を指定してください")
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.rebuild:
+            print(f"{CODE_TABLE}: {rebuild_table(conn)}行")
+        if args.benchmark:
+            if not table_exists(lambda sql, params: conn.execute(sql, params).fetchone()):
+                print(f"エラー: {CODE_TABLE} がありません（--rebuild で作成してください）", file=sys.stderr)
+                sys.exit(1)
+            for n, timings in benchmark(conn).items():
+                parts = [f"{op.upper()} {timings[f'legacy_{op}'] * 1000:.1f}ms → {timings[op] * 1000:.1f}ms "
+                         f"({timings[f'legacy_{op}_count']}件 → {timings[f'{op}_count']}件)" for op in OPERATORS]
+                print(f"{n:>3}コード: {' / '.join(parts)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
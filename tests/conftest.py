@@ -0,0 +1,136 @@
+"""
+Shared fixtures for TMCloud tests.
+
+`search_db` builds a small database from create_schema.sql plus the columns and
+tables that the production output.db gains through the migration scripts
+(rui, normalized applicant numbers, *_enhanced tables), so the CLI search
+queries can run against it.
+"""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+PRODUCTION_EXTRAS = """
+ALTER TABLE jiken_c_t_shohin_joho ADD COLUMN rui TEXT;
+ALTER TABLE jiken_c_t_shutugannindairinin ADD COLUMN normalized_app_num TEXT;
+ALTER TABLE applicant_mapping ADD COLUMN created_at TEXT;
+ALTER TABLE t_sample ADD COLUMN has_image_file TEXT DEFAULT 'NO';
+
+CREATE TABLE jiken_c_t_enhanced (
+    normalized_app_num TEXT PRIMARY KEY,
+    shutugan_bi TEXT,
+    toroku_bi TEXT,
+    raz_toroku_no TEXT,
+    raz_kohohakko_bi TEXT,
+    pcz_kokaikohohakko_bi TEXT
+);
+CREATE TABLE t_basic_item_enhanced (
+    normalized_app_num TEXT,
+    reg_num TEXT,
+    prior_app_right_occr_dt TEXT,
+    conti_prd_expire_dt TEXT,
+    rjct_finl_dcsn_dsptch_dt TEXT,
+    rec_latest_updt_dt TEXT,
+    set_reg_dt TEXT
+);
+CREATE TABLE mgt_info_enhanced (
+    normalized_app_num TEXT,
+    trial_dcsn_year_month_day TEXT,
+    processing_type TEXT
+);
+CREATE TABLE add_info_enhanced (
+    normalized_app_num TEXT,
+    right_request TEXT
+);
+"""
+
+MARKS = [
+    "ソニー", "ソニック", "SONY", "パナソニック", "トヨタ", "テスト商標", "ブルーオーシャン",
+    "コーヒーハウス", "ヴェール", "ティファニー", "サンプル", "さくら", "サクラ珈琲", "ABC",
+]
+CLASSES = ["09", "30", "35", "42", "43"]
+CODES = ["09G01", "09G02", "11C01", "29A01", "30A01", "35K01", "42P02", "43A01"]
+
+
+def seed_search_db(conn):
+    """Insert deterministic sample trademarks."""
+    cur = conn.cursor()
+    for i in range(60):
+        app_num = f"2024{i:06d}"
+        reg_num = f"6{i:06d}" if i % 3 == 0 else None
+        mark = MARKS[i % len(MARKS)]
+        cur.execute("INSERT INTO jiken_c_t VALUES (?, ?, ?)",
+                    (app_num, f"2024{(i % 12) + 1:02d}01", f"2025{(i % 12) + 1:02d}15" if reg_num else None))
+        if i % 4 != 3:
+            cur.execute("INSERT INTO standard_char_t_art (normalized_app_num, standard_char_t) VALUES (?, ?)",
+                        (app_num, mark))
+        if i % 5 == 0:
+            cur.execute("INSERT INTO indct_use_t_art (normalized_app_num, indct_use_t) VALUES (?, ?)",
+                        (app_num, mark + "ロゴ"))
+        cur.execute("INSERT INTO search_use_t_art_table (normalized_app_num, search_use_t_seq, search_use_t) "
+                    "VALUES (?, 1, ?)", (app_num, mark))
+        if i % 7 == 0:
+            cur.execute("INSERT INTO search_use_t_art_table (normalized_app_num, search_use_t_seq, search_use_t) "
+                        "VALUES (?, 2, ?)", (app_num, "ソニ"))
+        cls_a = CLASSES[i % len(CLASSES)]
+        cls_b = CLASSES[(i * 3 + 1) % len(CLASSES)]
+        for cls in sorted({cls_a, cls_b}):
+            cur.execute("INSERT INTO goods_class_art (normalized_app_num, reg_num, goods_classes) VALUES (?, ?, ?)",
+                        (app_num, reg_num, cls))
+            cur.execute("INSERT INTO jiken_c_t_shohin_joho (normalized_app_num, rui, designated_goods) "
+                        "VALUES (?, ?, ?)",
+                        (app_num, cls, f"第{cls}類 電子計算機，コーヒー，菓子，広告業 {mark}"))
+        codes = [CODES[i % len(CODES)], CODES[(i * 5 + 2) % len(CODES)]]
+        cur.execute("INSERT INTO t_knd_info_art_table (normalized_app_num, smlr_dsgn_group_cd) VALUES (?, ?)",
+                    (app_num, " ".join(codes)))
+        cur.execute("INSERT INTO t_dsgnt_art (normalized_app_num, dsgnt) VALUES (?, ?)",
+                    (app_num, mark))
+        if reg_num:
+            cur.execute("INSERT INTO reg_mapping (app_num, reg_num) VALUES (?, ?)", (app_num, reg_num))
+            cur.execute("INSERT INTO right_person_art_t (reg_num, normalized_app_num, right_person_name, "
+                        "right_person_addr) VALUES (?, ?, ?, ?)",
+                        (reg_num, app_num, f"権利者{i}株式会社", "東京都"))
+        appl_cd = f"{100000000 + (i % 9)}"
+        cur.execute("INSERT INTO jiken_c_t_shutugannindairinin (shutugan_no, normalized_app_num, "
+                    "shutugannindairinin_code, shutugannindairinin_sikbt) VALUES (?, ?, ?, '1')",
+                    (app_num, app_num, appl_cd))
+        if i % 9 < 5:
+            cur.execute("INSERT OR IGNORE INTO applicant_master VALUES (?, ?, ?)",
+                        (appl_cd, f"出願人{i % 9}", "大阪府"))
+        if i % 2 == 0:
+            cur.execute("INSERT INTO t_sample (normalized_app_num, image_data, rec_seq_num, has_image_file) "
+                        "VALUES (?, ?, 1, ?)", (app_num, "/9j/" + "A" * 40, "YES" if i % 4 == 0 else "NO"))
+        cur.execute("INSERT INTO jiken_c_t_enhanced (normalized_app_num, shutugan_bi) VALUES (?, ?)",
+                    (app_num, f"2024{(i % 12) + 1:02d}01"))
+    for code in range(100000005, 100000009):
+        cur.execute("INSERT INTO applicant_mapping (applicant_code, applicant_name, applicant_addr, "
+                    "trademark_count, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (str(code), f"推定出願人{code}", "京都府", 3, "2024-01-01"))
+    conn.commit()
+
+
+def build_search_db(db_path):
+    """Create a production-like schema with sample data at db_path."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript((REPO_ROOT / "create_schema.sql").read_text(encoding="utf-8"))
+    conn.executescript(PRODUCTION_EXTRAS)
+    seed_search_db(conn)
+    conn.close()
+    return db_path
+
+
+@pytest.fixture(scope="module")
+def search_db(tmp_path_factory):
+    """Path to a production-like search database shared by a test module."""
+    return build_search_db(tmp_path_factory.mktemp("search") / "search.db")
+
+
+@pytest.fixture
+def fresh_search_db(tmp_path):
+    """Path to a private search database that a test may modify."""
+    return build_search_db(tmp_path / "search.db")
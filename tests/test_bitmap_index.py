@@ -0,0 +1,153 @@
+"""
+Tests for the inverted bitmap index over goods classes and similar-group codes.
+"""
+
+import random
+import sqlite3
+from array import array
+from pathlib import Path
+
+import pytest
+
+import bitmap_index
+from bitmap_index import BitmapIndex, class_condition, intersect, page_ids, union
+from cli_trademark_search import TrademarkSearchCLI
+from search_cache import bump_data_version
+
+
+@pytest.fixture(scope="module")
+def index(search_db):
+    conn = sqlite3.connect(search_db)
+    try:
+        return BitmapIndex.build(conn)
+    finally:
+        conn.close()
+
+
+def as_posting(ids, size, dense):
+    return bitmap_index._to_bitmap(sorted(ids), size) if dense else array('I', sorted(ids))
+
+
+@pytest.mark.parametrize("dense", [(False, False), (True, False), (True, True)])
+def test_posting_operations_match_sets(dense):
+    rng = random.Random(7)
+    size = 1000
+    a = set(rng.sample(range(size), 300))
+    b = set(rng.sample(range(size), 500))
+    pa, pb = as_posting(a, size, dense[0]), as_posting(b, size, dense[1])
+
+    both = sorted(a & b)
+    assert page_ids(intersect([pa, pb], size), size) == both
+    assert page_ids(union([pa, pb], size), size) == sorted(a | b)
+    assert page_ids(intersect([pa, pb], size), 5, offset=10) == both[10:15]
+    assert page_ids(intersect([pa, pb], size), 5, after=both[20]) == both[21:26]
+    assert page_ids(pa, 5, offset=len(a)) == []
+
+
+def test_select_matches_sql(search_db, index):
+    conn = sqlite3.connect(search_db)
+
+    def sql(where, params):
+        return [row[0] for row in conn.execute(
+            f"SELECT DISTINCT j.normalized_app_num FROM jiken_c_t j "
+            f"LEFT JOIN goods_class_art gca ON j.normalized_app_num = gca.normalized_app_num "
+            f"LEFT JOIN t_knd_info_art_table tknd ON j.normalized_app_num = tknd.normalized_app_num "
+            f"WHERE {where} ORDER BY j.normalized_app_num", params)]
+
+    classes = index.select('goods_classes', ["09", "35"], match='exact', op='or')
+    assert index.app_nums_of(classes) == sql("gca.goods_classes IN ('09', '35')", ())
+    code = index.select('similar_group_codes', ["09g"], match='partial')
+    assert index.app_nums_of(code) == sql("tknd.smlr_dsgn_group_cd LIKE ?", ("%09g%",))
+    assert index.count(index.select('goods_classes', ["99"])) == 0
+    conn.close()
+
+
+def test_build_skips_fields_without_source_column(fresh_search_db):
+    conn = sqlite3.connect(fresh_search_db)
+    conn.execute("ALTER TABLE t_knd_info_art_table RENAME COLUMN smlr_dsgn_group_cd TO old_cd")
+    index = BitmapIndex.build(conn)
+    conn.close()
+
+    assert index.has_fields(['goods_classes']) and not index.has_fields(['goods_classes', 'similar_group_codes'])
+    assert index.count(index.select('goods_classes', ["09"])) > 0
+
+
+def test_build_on_schema_database():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript((Path(__file__).parent.parent / "create_schema.sql").read_text(encoding="utf-8"))
+    index = BitmapIndex.build(conn)
+    conn.close()
+    assert index.size == 0 and index.has_fields(['goods_classes', 'similar_group_codes'])
+
+
+@pytest.mark.parametrize("terms, match, op", [
+    (["09", "30"], 'partial', 'and'),
+    (["09", "35"], 'exact', 'or'),
+    (["09", "30"], 'exact', 'and'),
+    (["3"], 'partial', 'or'),
+])
+def test_class_condition_matches_select(search_db, index, terms, match, op):
+    """The SQL fallback decides per application like the index (classes may be on different rows)."""
+    where, params = class_condition(terms, match, op)
+    conn = sqlite3.connect(search_db)
+    result = [row[0] for row in conn.execute(
+        f"SELECT j.normalized_app_num FROM jiken_c_t j WHERE {' AND '.join(where)} "
+        f"ORDER BY j.normalized_app_num", params)]
+    conn.close()
+    assert result == index.app_nums_of(index.select('goods_classes', terms, match=match, op=op))
+    if op == 'and' and len(terms) > 1:
+        assert result
+
+
+def test_save_load_and_rebuild_on_new_data_version(fresh_search_db, tmp_path):
+    path = tmp_path / "bitmap_index.bin"
+    conn = sqlite3.connect(fresh_search_db)
+    built = BitmapIndex.load_or_build(conn, path)
+    loaded = BitmapIndex.load(path)
+    assert loaded.app_nums == built.app_nums and loaded.postings == built.postings
+    assert BitmapIndex.load_or_build(conn, path).data_version == built.data_version
+
+    conn.execute("INSERT INTO jiken_c_t (normalized_app_num) VALUES ('2024999999')")
+    conn.execute("INSERT INTO goods_class_art (normalized_app_num, goods_classes) VALUES ('2024999999', '45')")
+    bump_data_version(conn)
+    # 検索時の読み込みは古い索引を使わず、作り直しもしない
+    assert BitmapIndex.load_current(conn, path) is None
+    assert BitmapIndex.load(path).data_version == built.data_version
+    rebuilt = BitmapIndex.load_or_build(conn, path)
+    conn.close()
+    assert rebuilt.data_version != built.data_version
+    assert rebuilt.app_nums_of(rebuilt.select('goods_classes', ["45"])) == ["2024999999"]
+
+
+@pytest.mark.parametrize("criteria", [
+    {'goods_classes': '09 35'},
+    {'similar_group_codes': '09G 11C01'},
+    {'goods_classes': '30', 'similar_group_codes': '30'},
+    {'mark_text': 'ソニ', 'goods_classes': '09'},
+    {'designated_goods': 'コーヒー', 'similar_group_codes': '30A01'},
+    {'mark_text': 'ソニ', 'goods_classes': '09 30'},
+    {'designated_goods': 'コーヒー', 'goods_classes': '09 30'},
+])
+def test_cli_results_match_sql_path(search_db, index, criteria, monkeypatch):
+    def walk(bitmap):
+        searcher = TrademarkSearchCLI(str(search_db), bitmap_index=bitmap)
+        pages = []
+        try:
+            results, total = searcher.search_trademarks(limit=4, offset=2, **criteria)
+            pages.append(([r['app_num'] for r in results], total))
+            cursor = searcher.last_next_cursor
+            while cursor:
+                results, total = searcher.search_trademarks(limit=4, after=cursor, **criteria)
+                pages.append(([r['app_num'] for r in results], total))
+                cursor = searcher.last_next_cursor
+        finally:
+            searcher.close()
+        return pages
+
+    expected = walk(None)
+    assert expected[0][1] > 0
+    assert walk(index) == expected
+
+    # 候補が上限を超える場合はSQL条件で検索しても同じ結果
+    monkeypatch.setattr(bitmap_index, "CANDIDATE_LIMIT", 0)
+    assert walk(index) == expected
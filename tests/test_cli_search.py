@@ -0,0 +1,83 @@
+"""
+Search-path tests for TrademarkSearchCLI against the production-like fixture DB.
+"""
+
+import pytest
+
+from cli_trademark_search import TrademarkSearchCLI
+from search_paging import InvalidCursorError
+
+SEARCHES = [
+    {'mark_text': 'ソニ'},
+    {'mark_text': 'ー'},
+    {'goods_classes': '09 35'},
+    {'designated_goods': 'コーヒー'},
+    {'mark_text': 'サクラ', 'goods_classes': '30'},
+    {'mark_text': '該当なし'},
+]
+
+
+def run_search(db_path, count_mode, limit, offset, **criteria):
+    searcher = TrademarkSearchCLI(str(db_path), count_mode=count_mode, count_cap=15)
+    try:
+        results, total = searcher.search_trademarks(limit=limit, offset=offset, **criteria)
+        return [r['app_num'] for r in results], total, searcher.last_total_is_estimate
+    finally:
+        searcher.close()
+
+
+@pytest.mark.parametrize("criteria", SEARCHES)
+@pytest.mark.parametrize("limit,offset", [(10, 0), (7, 14), (5, 500)])
+def test_single_pass_matches_two_query_path(search_db, criteria, limit, offset):
+    """The window-function path must return the same page and total as COUNT(DISTINCT)."""
+    expected = run_search(search_db, 'exact', limit, offset, **criteria)
+    assert run_search(search_db, 'single', limit, offset, **criteria) == expected
+
+
+@pytest.mark.parametrize("criteria", SEARCHES)
+def test_estimate_mode_caps_total(search_db, criteria):
+    """Estimated counts stop at the cap but keep the page identical."""
+    app_nums, total, is_estimate = run_search(search_db, 'exact', 5, 5, **criteria)
+    est_nums, est_total, est_flag = run_search(search_db, 'estimate', 5, 5, **criteria)
+
+    assert est_nums == app_nums
+    assert est_flag == (total > 15)
+    assert est_total == min(total, 15)
+
+
+@pytest.mark.parametrize("criteria", SEARCHES)
+@pytest.mark.parametrize("count_mode", ['exact', 'single', 'estimate'])
+def test_cursor_walk_matches_offset_pages(search_db, criteria, count_mode):
+    """Following --after tokens must visit the same pages as LIMIT/OFFSET."""
+    expected, total, _ = run_search(search_db, 'exact', 10**6, 0, **criteria)
+
+    searcher = TrademarkSearchCLI(str(search_db), count_mode=count_mode, count_cap=15)
+    try:
+        walked, cursor = [], None
+        while True:
+            results, page_total = searcher.search_trademarks(limit=4, after=cursor, **criteria)
+            walked.extend(r['app_num'] for r in results)
+            assert page_total == (min(total, 15) if count_mode == 'estimate' else total)
+            cursor = searcher.last_next_cursor
+            if cursor is None:
+                break
+    finally:
+        searcher.close()
+
+    assert walked == expected
+
+
+def test_cursor_from_other_search_is_rejected(search_db):
+    """A token is bound to the search conditions it was issued for."""
+    searcher = TrademarkSearchCLI(str(search_db))
+    try:
+        searcher.search_trademarks(mark_text='ソニ', limit=2)
+        cursor = searcher.last_next_cursor
+        assert cursor
+
+        with pytest.raises(InvalidCursorError):
+            searcher.search_trademarks(mark_text='サクラ', limit=2, after=cursor)
+        with pytest.raises(InvalidCursorError):
+            searcher.search_trademarks(mark_text='ソニ', limit=2, after='not-a-token')
+    finally:
+        searcher.close()
@@ -0,0 +1,145 @@
+"""
+Tests for the batched detail loader of CorrectTrademarkSearch.
+"""
+
+import sqlite3
+
+import correct_trademark_search
+from correct_trademark_search import CorrectTrademarkSearch
+
+
+def load(db_path, app_nums):
+    conn = sqlite3.connect(db_path)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        details = CorrectTrademarkSearch(str(db_path))._get_trademark_info_batch(conn.cursor(), app_nums)
+    finally:
+        conn.close()
+    return details, statements
+
+
+def baseline_lookup(cursor, app_num):
+    """バッチ化前の1件ずつの取得処理（比較の基準）"""
+    result = {
+        'normalized_app_num': app_num, 'app_num': None, 'mark_text': None, 'search_use_t': None,
+        'standard_char_t': None, 'indct_use_t': None, 'goods_classes': None, 'designated_goods': None,
+        'similar_group_codes': None, 'shutugan_bi': None, 'reg_num': None, 'applicant_name': None,
+        'rights_holder': None, 'has_image': 'NO'
+    }
+    basic_info = cursor.execute("SELECT shutugan_bi FROM jiken_c_t WHERE normalized_app_num = ?",
+                                (app_num,)).fetchone()
+    if basic_info:
+        result['shutugan_bi'] = basic_info[0]
+        result['app_num'] = f"{app_num[:4]}-{app_num[4:]}"
+    reg_info = cursor.execute("SELECT reg_num FROM reg_mapping WHERE app_num = ?", (app_num,)).fetchone()
+    if reg_info:
+        result['reg_num'] = reg_info[0]
+    image_info = cursor.execute("SELECT has_image_file FROM t_sample WHERE normalized_app_num = ? LIMIT 1",
+                                (app_num,)).fetchone()
+    if image_info and image_info[0] == 'YES':
+        result['has_image'] = 'YES'
+        result['mark_text'] = '[画像商標]'
+    standard = cursor.execute("SELECT standard_char_t FROM standard_char_t_art WHERE normalized_app_num = ?",
+                              (app_num,)).fetchone()
+    if standard:
+        result['standard_char_t'] = standard[0]
+        if not result['mark_text']:
+            result['mark_text'] = standard[0]
+    search = cursor.execute("SELECT search_use_t FROM search_use_t_art_table WHERE normalized_app_num = ? LIMIT 1",
+                            (app_num,)).fetchone()
+    if search:
+        result['search_use_t'] = search[0]
+        if not result['mark_text']:
+            result['mark_text'] = search[0]
+    # GROUP_CONCAT(DISTINCT rui ORDER BY rui) はSQLite 3.44以降のため、並べ替え済みの副問い合わせで同じ値を得る
+    goods_info = cursor.execute("""
+        SELECT (SELECT GROUP_CONCAT(rui) FROM (SELECT DISTINCT rui FROM jiken_c_t_shohin_joho
+                                               WHERE normalized_app_num = ?1 ORDER BY rui)),
+               MAX(designated_goods)
+        FROM jiken_c_t_shohin_joho WHERE normalized_app_num = ?1
+    """, (app_num,)).fetchone()
+    if goods_info:
+        result['goods_classes'] = goods_info[0]
+        result['designated_goods'] = goods_info[1]
+    similar = cursor.execute("SELECT GROUP_CONCAT(DISTINCT smlr_dsgn_group_cd) FROM t_knd_info_art_table "
+                             "WHERE normalized_app_num = ?", (app_num,)).fetchone()
+    if similar and similar[0]:
+        result['similar_group_codes'] = ' '.join(
+            code.strip() for code in similar[0].split(',') if len(code.strip()) >= 5)
+    applicant = cursor.execute("""
+        SELECT am.appl_name
+        FROM jiken_c_t_shutugannindairinin ap
+        LEFT JOIN applicant_master am ON ap.shutugannindairinin_code = am.appl_cd
+        WHERE ap.normalized_app_num = ? AND ap.shutugannindairinin_sikbt = '1'
+        LIMIT 1
+    """, (app_num,)).fetchone()
+    if applicant and applicant[0]:
+        result['applicant_name'] = applicant[0]
+    else:
+        code_result = cursor.execute("""
+            SELECT DISTINCT shutugannindairinin_code FROM jiken_c_t_shutugannindairinin
+            WHERE normalized_app_num = ? AND shutugannindairinin_sikbt = '1' LIMIT 1
+        """, (app_num,)).fetchone()
+        if code_result:
+            result['applicant_name'] = f'申請人コード: {code_result[0]}'
+    rights = cursor.execute("""
+        SELECT rp.right_person_name
+        FROM reg_mapping rm
+        LEFT JOIN right_person_art_t rp ON rm.reg_num = rp.reg_num
+        WHERE rm.app_num = ?
+        LIMIT 1
+    """, (app_num,)).fetchone()
+    if rights:
+        result['rights_holder'] = rights[0]
+    if not result['mark_text']:
+        result['mark_text'] = ""
+    return result
+
+
+def test_batch_fields(search_db):
+    details, _ = load(search_db, ["2024000000", "2024000003", "2024000007", "2099999999"])
+
+    first = details["2024000000"]
+    assert first['app_num'] == "2024-000000" and first['shutugan_bi'] == "20240101"
+    assert first['has_image'] == 'YES' and first['mark_text'] == '[画像商標]'
+    assert first['standard_char_t'] == "ソニー" and first['search_use_t'] == "ソニー"
+    assert first['goods_classes'] == "09,30"
+    assert first['designated_goods'].startswith("第30類")
+    assert first['similar_group_codes'] == "09G01 11C01"
+    assert first['reg_num'] == "6000000" and first['rights_holder'] == "権利者0株式会社"
+    assert first['applicant_name'] == "出願人0"
+
+    # 標準文字・画像が無い場合は検索用商標を表示
+    assert details["2024000003"]['standard_char_t'] is None
+    assert details["2024000003"]['mark_text'] == "パナソニック"
+    # 申請人マスターに無い申請人はコードを表示
+    assert details["2024000007"]['applicant_name'] == "申請人コード: 100000007"
+    assert details["2024000007"]['reg_num'] is None and details["2024000007"]['rights_holder'] is None
+
+    missing = details["2099999999"]
+    assert missing['app_num'] is None and missing['mark_text'] == "" and missing['goods_classes'] is None
+
+
+def test_batch_matches_baseline_lookups_with_few_queries(fresh_search_db, monkeypatch):
+    conn = sqlite3.connect(fresh_search_db)
+    # 同じ出願番号の2行目以降は1件ずつの LIMIT 1 と同様に無視される
+    conn.execute("INSERT INTO standard_char_t_art (normalized_app_num, standard_char_t) VALUES ('2024000001', '後')")
+    conn.execute("INSERT INTO t_knd_info_art_table (normalized_app_num, smlr_dsgn_group_cd) "
+                 "VALUES ('2024000001', '09G01'), ('2024000001', '11C'), ('2024000001', '09G01')")
+    conn.commit()
+    conn.close()
+
+    app_nums = [f"2024{i:06d}" for i in range(59, -1, -1)]
+    monkeypatch.setattr(correct_trademark_search, "CHUNK_SIZE", 7)
+    batch, statements = load(fresh_search_db, app_nums)
+    assert len(statements) <= 10 * (len(app_nums) // 7 + 1)
+
+    conn = sqlite3.connect(fresh_search_db)
+    try:
+        for app_num in app_nums:
+            assert batch[app_num] == baseline_lookup(conn.cursor(), app_num)
+    finally:
+        conn.close()
+    assert batch["2024000001"]['standard_char_t'] != "後"
+    assert batch["2024000001"]['similar_group_codes'].endswith(" 09G01")
@@ -0,0 +1,85 @@
+"""Tests for the online / incremental database backup."""
+
+import json
+import sqlite3
+
+import db_backup
+
+
+def dump(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return list(conn.iterdump())
+    finally:
+        conn.close()
+
+
+def test_online_backup_reports_progress(fresh_search_db, tmp_path):
+    calls = []
+    dest = db_backup.online_backup(fresh_search_db, tmp_path / "copy.db", pages=2,
+                                   progress=lambda remaining, total: calls.append((remaining, total)))
+    assert dump(dest) == dump(fresh_search_db)
+    assert len(calls) > 1 and calls[-1][0] == 0
+
+
+def test_compressed_full_backup_restores(fresh_search_db, tmp_path):
+    backup_dir = tmp_path / "backups"
+    manifest_path = db_backup.create_backup(fresh_search_db, backup_dir, compress=True, progress=None)
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    assert manifest["kind"] == "full" and manifest["data"].endswith(".db.gz")
+
+    restored = db_backup.restore_backup(manifest_path, tmp_path / "restored.db")
+    assert dump(restored) == dump(fresh_search_db)
+
+
+def test_incremental_backup_stores_changed_pages(fresh_search_db, tmp_path):
+    backup_dir = tmp_path / "backups"
+    first = db_backup.create_backup(fresh_search_db, backup_dir, progress=None)
+    expected_first = dump(fresh_search_db)
+
+    conn = sqlite3.connect(fresh_search_db)
+    conn.execute("UPDATE jiken_c_t SET reg_reg_ymd = '20991231' WHERE normalized_app_num = '2024000001'")
+    conn.execute("INSERT INTO t_dsgnt_art (normalized_app_num, dsgnt) VALUES ('2099000001', ?)", ("x" * 5000,))
+    conn.commit()
+    conn.close()
+    second = db_backup.create_backup(fresh_search_db, backup_dir, incremental=True, progress=None)
+
+    conn = sqlite3.connect(fresh_search_db)
+    conn.execute("DELETE FROM t_dsgnt_art WHERE normalized_app_num = '2099000001'")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    third = db_backup.create_backup(fresh_search_db, backup_dir, incremental=True, progress=None)
+
+    manifest = json.loads(second.read_text(encoding="utf-8"))
+    assert manifest["kind"] == "delta" and manifest["parent"] == first.name
+    assert 0 < manifest["changed_pages"] < manifest["page_count"]
+    assert db_backup.backup_chain(third) == [first, second, third]
+
+    assert dump(db_backup.restore_backup(first, tmp_path / "r1.db")) == expected_first
+    assert dump(db_backup.restore_backup(third, tmp_path / "r3.db")) == dump(fresh_search_db)
+
+
+def test_prune_keeps_latest_full_chains(fresh_search_db, tmp_path):
+    backup_dir = tmp_path / "backups"
+    old_full = db_backup.create_backup(fresh_search_db, backup_dir, progress=None)
+    old_delta = db_backup.create_backup(fresh_search_db, backup_dir, incremental=True, progress=None)
+    new_full = db_backup.create_backup(fresh_search_db, backup_dir, keep=1, progress=None)
+
+    assert db_backup.list_manifests(backup_dir) == [new_full]
+    assert not old_full.exists() and not old_delta.exists()
+    assert sorted(p.name for p in backup_dir.iterdir()) == sorted([new_full.name, new_full.stem + ".db"])
+
+
+def test_incremental_backups_start_new_chains_and_prune(fresh_search_db, tmp_path):
+    """Incremental mode takes a full backup after max_deltas deltas, so old chains can be pruned."""
+    backup_dir = tmp_path / "backups"
+    manifests = [db_backup.create_backup(fresh_search_db, backup_dir, incremental=True, keep=2,
+                                         max_deltas=2, progress=None) for _ in range(7)]
+
+    kinds = [json.loads(path.read_text(encoding="utf-8"))["kind"] for path in db_backup.list_manifests(backup_dir)]
+    assert kinds == ["full", "delta", "delta", "full"]
+    assert db_backup.list_manifests(backup_dir) == manifests[3:]
+    assert not manifests[0].exists()
+    assert len(db_backup.backup_chain(manifests[-1])) == 1
+    assert dump(db_backup.restore_backup(manifests[5], tmp_path / "r.db")) == dump(fresh_search_db)
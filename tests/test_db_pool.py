@@ -0,0 +1,94 @@
+"""
+Tests for the read-only SQLite connection pool.
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from db_pool import PoolTimeoutError, SQLiteConnectionPool
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Create a small database to pool connections against."""
+    path = tmp_path / "pool.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jiken_c_t (normalized_app_num TEXT PRIMARY KEY)")
+    conn.executemany("INSERT INTO jiken_c_t VALUES (?)", [("2024000001",), ("2024000002",)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_connections_are_reused(db_path):
+    """A released connection should be handed out again instead of reconnecting."""
+    pool = SQLiteConnectionPool(db_path, max_size=2)
+    with pool.connection() as con:
+        first = con
+        assert con.execute("SELECT COUNT(*) FROM jiken_c_t").fetchone()[0] == 2
+    with pool.connection() as con:
+        assert con is first
+
+    stats = pool.get_stats()
+    assert stats['checkouts'] == 2
+    assert stats['connections_created'] == 1
+    assert stats['max_in_use'] == 1
+    pool.close_all()
+
+
+def test_connections_are_read_only_and_tuned(db_path):
+    """Pooled connections must reject writes and use WAL."""
+    pool = SQLiteConnectionPool(db_path, max_size=1)
+    with pool.connection() as con:
+        assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert con.execute("PRAGMA query_only").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            con.execute("INSERT INTO jiken_c_t VALUES ('2024000003')")
+    pool.close_all()
+
+
+def test_pool_is_bounded_and_counts_waits(db_path):
+    """Checkouts beyond max_size wait for a release and time out if none comes."""
+    pool = SQLiteConnectionPool(db_path, max_size=1)
+    con = pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+
+    acquired = []
+
+    def worker():
+        with pool.connection(timeout=5) as other:
+            acquired.append(other)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    threading.Event().wait(0.05)
+    pool.release(con)
+    thread.join(timeout=5)
+
+    assert acquired == [con]
+    stats = pool.get_stats()
+    assert stats['waits'] >= 1
+    assert stats['max_in_use'] == 1
+    assert stats['size'] == 1
+    pool.close_all()
+
+
+def test_unhealthy_connection_is_replaced(db_path):
+    """A connection that fails the health check is discarded and recreated."""
+    pool = SQLiteConnectionPool(db_path, max_size=1)
+    with pool.connection() as con:
+        broken = con
+    broken.close()
+
+    with pool.connection() as con:
+        assert con is not broken
+        assert con.execute("SELECT 1").fetchone()[0] == 1
+
+    stats = pool.get_stats()
+    assert stats['health_check_failures'] == 1
+    assert stats['connections_created'] == 2
+    pool.close_all()
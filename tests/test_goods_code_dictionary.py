@@ -0,0 +1,88 @@
+"""
+Tests for the goods-term to similar-group code dictionary.
+"""
+
+import random
+import sqlite3
+
+import pytest
+
+import goods_code_dictionary
+from cli_trademark_search import TrademarkSearchCLI
+from goods_code_dictionary import GoodsCodeDictionary, split_terms
+from search_cache import bump_data_version
+
+
+@pytest.fixture
+def mapping():
+    rng = random.Random(3)
+    chars = "コーヒ豆菓子電計算機茶アイス"
+    codes = [f"{i:02d}A{j:02d}" for i in range(1, 46) for j in range(1, 4)]
+    terms = {"".join(rng.choice(chars) for _ in range(rng.randint(1, 8))) for _ in range(2000)}
+    return {term: rng.sample(codes, rng.randint(1, 4)) for term in terms}
+
+
+def test_split_terms():
+    assert split_terms("第09類 電子計算機，コーヒー、ｺｰﾋｰ;菓子") == ["電子計算機", "コーヒー", "菓子"]
+    assert split_terms(None) == []
+
+
+def test_lookup_and_prefix_match_mapping(mapping, tmp_path, monkeypatch):
+    monkeypatch.setattr(goods_code_dictionary, "BLOCK_SIZE", 4)
+    dictionary = GoodsCodeDictionary.from_mapping(mapping)
+    path = tmp_path / "goods_dictionary.bin"
+    dictionary.save(path)
+    loaded = GoodsCodeDictionary.load(path)
+
+    for term, codes in mapping.items():
+        assert loaded.lookup(term) == codes
+    assert loaded.lookup("存在しない") == []
+
+    terms = sorted(mapping, key=lambda t: t.encode('utf-8'))
+    for prefix in ("コ", "コー", "豆菓", "ス"):
+        expected = [t for t in terms if t.startswith(prefix)][:5]
+        assert [t for t, _ in loaded.prefix(prefix, limit=5)] == expected
+
+
+def test_build_uses_cooccurrence(fresh_search_db):
+    conn = sqlite3.connect(fresh_search_db)
+    # 1件の出願にしか現れない語は min_count 未満のため採用しない
+    conn.execute("UPDATE jiken_c_t_shohin_joho SET designated_goods = designated_goods || '，腕時計' "
+                 "WHERE normalized_app_num = '2024000000'")
+    dictionary = GoodsCodeDictionary.build(conn, min_count=2, min_ratio=0.5)
+
+    apps = [row[0].split() for row in conn.execute(
+        "SELECT smlr_dsgn_group_cd FROM t_knd_info_art_table t WHERE EXISTS (SELECT 1 FROM jiken_c_t_shohin_joho s "
+        "WHERE s.normalized_app_num = t.normalized_app_num AND s.designated_goods LIKE '%ソニー%')")]
+    counts = {code: sum(code in codes for codes in apps) for codes in apps for code in codes}
+    expected = sorted((code for code, n in counts.items() if n >= max(2, len(apps) / 2)),
+                      key=lambda code: (-counts[code], code))
+    assert expected and dictionary.lookup("ソニー") == expected
+    assert dictionary.lookup("腕時計") == []
+    assert dictionary.expand("ｿﾆｰ") == expected
+    conn.close()
+
+
+def test_load_or_build_rebuilds_on_new_data_version(fresh_search_db, tmp_path):
+    path = tmp_path / "goods_dictionary.bin"
+    conn = sqlite3.connect(fresh_search_db)
+    built = GoodsCodeDictionary.load_or_build(conn, path)
+    assert GoodsCodeDictionary.load_or_build(conn, path).blocks == built.blocks
+    bump_data_version(conn)
+    assert GoodsCodeDictionary.load_or_build(conn, path).data_version != built.data_version
+    conn.close()
+
+
+def test_cli_goods_term_matches_code_search(fresh_search_db):
+    searcher = TrademarkSearchCLI(str(fresh_search_db))
+    try:
+        results, total = searcher.search_trademarks(goods_term="ソニー", limit=100)
+        codes = searcher.last_expanded_codes
+        assert codes and total > 0
+        expected, expected_total = searcher.search_trademarks(
+            similar_group_codes=" ".join(codes), similar_group_op='or', limit=100)
+        assert [r['app_num'] for r in results] == [r['app_num'] for r in expected]
+        assert total == expected_total
+        assert searcher.search_trademarks(goods_term="存在しない語") == ([], 0)
+    finally:
+        searcher.close()
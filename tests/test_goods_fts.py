@@ -0,0 +1,124 @@
+"""
+Tests for the FTS5 trigram designated-goods index.
+"""
+
+import sqlite3
+
+import pytest
+
+from cli_trademark_search import TrademarkSearchCLI
+from goods_fts import goods_condition, parse_query, rebuild_index, refresh_index
+from search_cache import SearchCache
+
+QUERIES = ['コーヒー', 'コーヒー 菓子', '菓子', 'コーヒー OR ソニー', '"電子計算機，コーヒー"', '"コーヒー 菓子"',
+           '第09類 ソニー', '第30類 OR 第35類 広告業', 'ヒー', 'コ%ヒー', '該当なし']
+
+
+@pytest.fixture
+def goods_db(fresh_search_db):
+    """A fixture database with the designated-goods index built."""
+    conn = sqlite3.connect(fresh_search_db)
+    rebuild_index(conn)
+    conn.close()
+    return fresh_search_db
+
+
+def search_app_nums(db_path, limit=1000, **criteria):
+    searcher = TrademarkSearchCLI(str(db_path))
+    try:
+        results, total = searcher.search_trademarks(limit=limit, **criteria)
+        return [r['app_num'] for r in results], total
+    finally:
+        searcher.close()
+
+
+def test_parse_query():
+    assert parse_query('コーヒー 菓子 OR "広告 業"') == [['コーヒー'], ['菓子', '広告 業']]
+    assert parse_query('OR 時計 OR') == [['時計']]
+    assert parse_query('"眼鏡') == [['眼鏡']]
+    assert parse_query('  ""  ') == []
+
+    _, where_parts, params = goods_condition('コーヒー 菓子', use_fts=True)
+    assert len(where_parts) == 1 and params[0] == '("コーヒー")'
+    from_parts, _, _ = goods_condition('菓子', use_fts=True)
+    assert from_parts
+
+
+@pytest.mark.parametrize("designated_goods", ['OR', '"', '""', 'OR OR'])
+def test_query_without_terms_matches_nothing(search_db, goods_db, designated_goods):
+    assert goods_condition(designated_goods, use_fts=True) == ([], ["0 = 1"], [])
+    assert search_app_nums(search_db, designated_goods=designated_goods) == ([], 0)
+    assert search_app_nums(goods_db, designated_goods=designated_goods, goods_order='relevance') == ([], 0)
+
+
+@pytest.mark.parametrize("designated_goods", QUERIES)
+def test_index_results_match_like(search_db, goods_db, designated_goods):
+    """The indexed search must return exactly the LIKE-only results."""
+    expected = search_app_nums(search_db, designated_goods=designated_goods)
+    assert search_app_nums(goods_db, designated_goods=designated_goods) == expected
+
+    # 関連度順は同じ集合を並べ替えたもの
+    ranked = search_app_nums(goods_db, designated_goods=designated_goods, goods_order='relevance')
+    assert sorted(ranked[0]) == expected[0] and ranked[1] == expected[1]
+
+
+def test_relevance_runs_match_once(goods_db):
+    """The rank subquery alone restricts the rows; the IN (...) condition is not added again."""
+    searcher = TrademarkSearchCLI(str(goods_db))
+    statements = []
+    try:
+        searcher.get_db_connection().set_trace_callback(statements.append)
+        results, total = searcher.search_trademarks(designated_goods='コーヒー 菓子', goods_order='relevance')
+    finally:
+        searcher.close()
+
+    assert results and total
+    page_sql = next(sql for sql in statements if 'bm25' in sql)
+    assert page_sql.count(' MATCH ') == 1
+
+
+def test_relevance_order_and_paging(goods_db):
+    conn = sqlite3.connect(goods_db)
+    conn.execute("UPDATE jiken_c_t_shohin_joho SET designated_goods = 'コーヒー，コーヒー豆，コーヒー飲料' "
+                 "WHERE normalized_app_num = '2024000041'")
+    refresh_index(conn, ['2024000041'])
+    conn.close()
+
+    ranked, total = search_app_nums(goods_db, designated_goods='コーヒー', goods_order='relevance')
+    assert ranked[0] == '2024000041'
+
+    searcher = TrademarkSearchCLI(str(goods_db), cache=SearchCache(goods_db))
+    try:
+        pages = []
+        cursor = None
+        while True:
+            results, page_total = searcher.search_trademarks(designated_goods='コーヒー', goods_order='relevance',
+                                                             limit=7, after=cursor)
+            assert page_total == total
+            pages.extend(r['app_num'] for r in results)
+            cursor = searcher.last_next_cursor
+            if not cursor:
+                break
+        assert searcher.search_trademarks(designated_goods='コーヒー', goods_order='relevance',
+                                          limit=7, offset=7)[0] == searcher.search_trademarks(
+            designated_goods='コーヒー', goods_order='relevance', limit=7, offset=7)[0]
+    finally:
+        searcher.close()
+    assert pages == ranked
+
+
+def test_refresh_keeps_index_in_sync(goods_db):
+    """Changed app numbers are re-indexed so new goods are found and old goods are not."""
+    conn = sqlite3.connect(goods_db)
+    conn.execute("DELETE FROM jiken_c_t_shohin_joho WHERE normalized_app_num = '2024000000'")
+    conn.execute("INSERT INTO jiken_c_t_shohin_joho (normalized_app_num, rui, designated_goods) "
+                 "VALUES ('2024000000', '14', '腕時計，置き時計')")
+    conn.commit()
+
+    assert search_app_nums(goods_db, designated_goods='置き時計') == ([], 0)
+
+    refresh_index(conn, ['2024000000'])
+    conn.close()
+
+    assert search_app_nums(goods_db, designated_goods='置き時計') == (['2024000000'], 1)
+    assert '2024000000' not in search_app_nums(goods_db, designated_goods='コーヒー')[0]
@@ -0,0 +1,110 @@
+"""Tests for the streaming image extraction in tsv_to_image_converter."""
+
+import base64
+import sqlite3
+
+from tsv_to_image_converter import TSVImageConverter
+
+
+def jpeg_base64(seed):
+    return base64.b64encode(b"\xff\xd8\xff\xe0" + bytes([seed]) * 300 + b"\xff\xd9").decode("ascii")
+
+
+def sample_row(app_num, rec_seq, final, image_data):
+    cols = [""] * 18
+    cols[3] = app_num
+    cols[5] = f"{rec_seq:02d}"
+    cols[9] = f"{final:02d}"
+    cols[17] = image_data
+    return "\t".join(cols)
+
+
+def fragments(data, count):
+    size = -(-len(data) // count)
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def write_samples(path):
+    images = {"2024000001": jpeg_base64(1), "2024000002": jpeg_base64(2), "2024000003": jpeg_base64(3)}
+    lines = ["\t".join(f"col{i}" for i in range(18))]
+    lines.append(sample_row("2024000001", 1, 1, images["2024000001"]))
+    parts = fragments(images["2024000002"], 3)
+    # 同じ出願番号の中で順序が入れ替わっていても rec_seq_num の順に結合する
+    for rec_seq in (1, 3, 2):
+        lines.append(sample_row("2024000002", rec_seq, 3, parts[rec_seq - 1]))
+    # 最終レコード順序番号が欠けていても出願番号が変わった時点で結合する
+    for rec_seq, part in enumerate(fragments(images["2024000003"], 2), 1):
+        lines.append(sample_row("2024000003", rec_seq, 0, part))
+    # 2頁目は採用しない
+    lines.append(sample_row("2024000001", 1, 1, jpeg_base64(9)))
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return images
+
+
+def make_converter(tmp_path):
+    tsv = tmp_path / "upd_t_sample.tsv"
+    images = write_samples(tsv)
+    converter = TSVImageConverter(tsv_file=str(tsv), output_dir=str(tmp_path / "images"),
+                                  db_path=str(tmp_path / "images.db"))
+    return converter, images
+
+
+def test_iter_records_groups_fragments_in_order(tmp_path):
+    converter, images = make_converter(tmp_path)
+    records = list(converter.iter_records())
+
+    assert [(r["app_num"], r["is_multiline"]) for r in records] == [
+        ("2024-000001", False), ("2024-000002", True), ("2024-000003", True)]
+    assert {converter.normalize_app_num(r["app_num"]): r["image_data"] for r in records} == images
+    assert converter.stats["total_records"] == 3
+    assert converter.stats["multiline_records"] == 2
+
+
+def test_iter_records_yields_when_last_fragment_arrives(tmp_path):
+    converter, _ = make_converter(tmp_path)
+    records = converter.iter_records()
+    first = next(records)
+    assert first["app_num"] == "2024-000001"
+    # 次の出願番号の行を読む前に返している
+    assert converter.stats["total_records"] == 1
+    records.close()
+
+
+def test_convert_images_streams_to_files_and_database(tmp_path):
+    converter, images = make_converter(tmp_path)
+    stats = converter.convert_images()
+
+    assert stats["successful_conversions"] == 3
+    assert stats["database_updates"] == 3
+    for app_num, data in images.items():
+        # 出願番号の年・番号で分割したディレクトリに保存する
+        image_path = tmp_path / "images" / app_num[:4] / app_num[4:7] / f"{app_num}.jpg"
+        assert image_path.read_bytes() == base64.b64decode(data)
+
+    conn = sqlite3.connect(tmp_path / "images.db")
+    rows = conn.execute("SELECT normalized_app_num, image_data, has_image_file FROM t_sample "
+                        "ORDER BY normalized_app_num").fetchall()
+    conn.close()
+    assert rows == [(app_num, images[app_num], "YES") for app_num in sorted(images)]
+
+
+def test_parallel_conversion_matches_serial(tmp_path):
+    results = {}
+    for workers in (1, 2):
+        base = tmp_path / f"w{workers}"
+        base.mkdir()
+        converter, images = make_converter(base)
+        with open(converter.tsv_file, "a", encoding="utf-8") as f:
+            f.write(sample_row("2024000004", 1, 1, base64.b64encode(b"not an image" * 20).decode("ascii")) + "\n")
+        stats = converter.convert_images(workers=workers, chunk_size=2, max_pending=1)
+        files = {p.name: p.read_bytes() for p in (base / "images").rglob("*.jpg")}
+        conn = sqlite3.connect(base / "images.db")
+        rows = conn.execute("SELECT normalized_app_num, has_image_file FROM t_sample "
+                            "ORDER BY normalized_app_num").fetchall()
+        conn.close()
+        results[workers] = (stats["successful_conversions"], stats["failed_conversions"], files, rows)
+
+    assert results[1] == results[2]
+    assert results[2][:2] == (3, 1)
+    assert results[2][3][-1] == ("2024000004", "NO")
+    assert stats["images_per_second"] > 0
@@ -0,0 +1,75 @@
+"""Tests for the in-memory image manifest."""
+
+import os
+
+from image_manifest import ImageManifest
+
+
+def touch(path):
+    path.write_bytes(b"\xff\xd8\xff")
+
+
+def bump_mtime(directory):
+    # 同じ時刻の刻みの中で変更した場合でも変化を検出できるようにする
+    stat = directory.stat()
+    os.utime(directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_lookup_prefers_extension_order(tmp_path):
+    touch(tmp_path / "2024000001.png")
+    touch(tmp_path / "2024000001.jpg")
+    touch(tmp_path / "2024000002.webp")
+    touch(tmp_path / "notes.txt")
+    manifest = ImageManifest(tmp_path, ttl=3600)
+
+    assert manifest.lookup("2024-000001") == "2024000001.jpg"
+    assert manifest.lookup("2024000002") == "2024000002.webp"
+    assert manifest.lookup("2024000003") is None
+    assert manifest.lookup("") is None
+    assert manifest.filenames() == ["2024000001.jpg", "2024000002.webp"]
+    assert manifest.stats["scans"] == 1
+
+
+def test_lookups_within_ttl_do_not_touch_filesystem(tmp_path):
+    manifest = ImageManifest(tmp_path, ttl=3600)
+    assert len(manifest) == 0
+    touch(tmp_path / "2024000001.jpg")
+    assert manifest.lookup("2024000001") is None
+    assert manifest.stats["scans"] == 1
+
+
+def test_refresh_applies_added_and_removed_files(tmp_path):
+    touch(tmp_path / "2024000001.jpg")
+    touch(tmp_path / "2024000001.png")
+    manifest = ImageManifest(tmp_path, ttl=0)
+    assert manifest.lookup("2024000001") == "2024000001.jpg"
+
+    (tmp_path / "2024000001.jpg").unlink()
+    touch(tmp_path / "2024000002.gif")
+    bump_mtime(tmp_path)
+    assert manifest.lookup("2024000001") == "2024000001.png"
+    assert manifest.lookup("2024000002") == "2024000002.gif"
+    assert manifest.stats["added"] == 3 and manifest.stats["removed"] == 1
+
+    # ディレクトリが変化していなければ一覧を取り直さない
+    scans = manifest.stats["scans"]
+    assert manifest.refresh() is False
+    assert manifest.stats["scans"] == scans
+
+
+def test_missing_directory(tmp_path):
+    manifest = ImageManifest(tmp_path / "missing", ttl=0)
+    assert manifest.lookup("2024000001") is None
+    (tmp_path / "missing").mkdir()
+    touch(tmp_path / "missing" / "2024000001.jpeg")
+    assert manifest.lookup("2024000001") == "2024000001.jpeg"
+
+
+def test_version_follows_file_mtime(tmp_path):
+    touch(tmp_path / "2024000001.jpg")
+    os.utime(tmp_path / "2024000001.jpg", ns=(0, 0x1234 * 1_000_000_000))
+    manifest = ImageManifest(tmp_path, ttl=3600)
+
+    filename = manifest.lookup("2024000001")
+    assert manifest.version(filename) == format(0x1234 * 1_000_000_000, "x")
+    assert manifest.version("2024000002.jpg") is None
@@ -0,0 +1,79 @@
+"""Tests for the sharded image store."""
+
+import os
+
+import pytest
+
+import image_store
+from image_manifest import ImageManifest
+from image_store import ImageStore, iter_images, relative_image_path, relative_thumbnail_path
+
+
+def test_shard_layout():
+    assert relative_image_path("2024000001") == "2024/000/2024000001.jpg"
+    assert relative_image_path("2024123456", "png") == "2024/123/2024123456.png"
+    assert relative_thumbnail_path("2024000001") == "thumbs/2024/000/2024000001.jpg"
+    other = relative_image_path("T2024-1")
+    assert other.startswith("_hash/") and other.endswith("/T2024-1.jpg")
+
+
+def test_iter_images_skips_thumbnails_and_hidden_dirs(tmp_path):
+    store = ImageStore(tmp_path, thumbnails=False)
+    store.write("2024000001", b"a")
+    (tmp_path / "2023000001.png").write_bytes(b"b")
+    (tmp_path / "thumbs" / "2024" / "000").mkdir(parents=True)
+    (tmp_path / "thumbs" / "2024" / "000" / "2024000001.jpg").write_bytes(b"t")
+    (tmp_path / ".cache").mkdir()
+    (tmp_path / ".cache" / "2022000001.jpg").write_bytes(b"c")
+
+    assert sorted(iter_images(tmp_path)) == [
+        ("2023000001", "png", "2023000001.png"),
+        ("2024000001", "jpg", "2024/000/2024000001.jpg"),
+    ]
+    assert store.existing_app_nums("jpg") == {"2024000001"}
+
+
+def test_migrate_flat_moves_into_shards(tmp_path):
+    (tmp_path / "2024000001.jpg").write_bytes(b"one")
+    (tmp_path / "2024000002.jpg").write_bytes(b"two")
+    (tmp_path / "readme.txt").write_text("x")
+    store = ImageStore(tmp_path, thumbnails=False)
+    store.write("2024000002", b"already")
+
+    assert store.migrate_flat(dry_run=True)["moved"] == 1
+    assert (tmp_path / "2024000001.jpg").exists()
+
+    stats = store.migrate_flat()
+    assert stats["moved"] == 1 and stats["skipped"] == 1
+    assert store.path("2024000001").read_bytes() == b"one"
+    assert store.path("2024000002").read_bytes() == b"already"
+    assert (tmp_path / "readme.txt").exists()
+
+
+def test_manifest_sees_sharded_writes_through_marker(tmp_path):
+    store = ImageStore(tmp_path, thumbnails=False)
+    store.write("2024000001", b"a")
+    manifest = ImageManifest(tmp_path, ttl=0)
+    assert manifest.lookup("2024000001") == "2024/000/2024000001.jpg"
+
+    # 既存の分割ディレクトリへの追加はルートの更新時刻を変えない
+    store.write("2024000002", b"b")
+    store.mark_updated()
+    marker = tmp_path / image_store.MARKER_FILE
+    stat = marker.stat()
+    os.utime(marker, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert manifest.lookup("2024000002") == "2024/000/2024000002.jpg"
+
+
+@pytest.mark.skipif(not image_store.thumbnails_available(), reason="Pillow is not installed")
+def test_write_creates_thumbnail(tmp_path):
+    from io import BytesIO
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (800, 400), "red").save(buffer, "JPEG")
+    store = ImageStore(tmp_path)
+    store.write("2024000001", buffer.getvalue())
+
+    with Image.open(store.thumbnail_path("2024000001")) as thumbnail:
+        assert max(thumbnail.size) <= max(image_store.THUMBNAIL_SIZE)
@@ -0,0 +1,62 @@
+"""
+Tests for the bounded kana edit-distance kernels against the naive DP.
+"""
+
+import itertools
+import random
+
+import pytest
+
+from kana_distance import (
+    EPSILON, QueryScorer, batch_distances, benchmark, bounded_levenshtein, levenshtein_naive, myers_distance,
+    synthetic_morae, weighted_distance, weighted_distance_naive,
+)
+
+ALPHABET = list('カガキサザハパン-ッアイ')
+
+
+def random_pairs(count, seed=0, max_length=9):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ([rng.choice(ALPHABET) for _ in range(rng.randint(0, max_length))],
+               [rng.choice(ALPHABET) for _ in range(rng.randint(0, max_length))])
+
+
+def test_unit_kernels_match_naive():
+    for a, b in random_pairs(3000):
+        expected = levenshtein_naive(a, b)
+        assert myers_distance(a, b) == expected
+        for k in range(5):
+            bounded = expected if expected <= k else None
+            assert bounded_levenshtein(a, b, k) == bounded
+            assert myers_distance(a, b, k) == bounded
+
+
+def test_myers_handles_long_patterns():
+    a, b = synthetic_morae(2, seed=3, min_length=80, max_length=120)
+    assert myers_distance(a, b) == levenshtein_naive(a, b)
+
+
+@pytest.mark.parametrize("max_distance", [0.3, 0.5, 1.0, 1.5, 2.5])
+def test_weighted_kernels_match_naive(max_distance):
+    for a, b in random_pairs(2000, seed=1):
+        naive = weighted_distance_naive(a, b)
+        expected = naive if naive <= max_distance + EPSILON else None
+        for actual in (weighted_distance(a, b, max_distance), QueryScorer(a, max_distance).distance(b)):
+            if expected is None:
+                assert actual is None
+            else:
+                assert actual == pytest.approx(expected)
+
+
+def test_batch_preserves_candidate_order():
+    query = list('サクラ')
+    candidates = [list(''.join(p)) for p in itertools.product('サザクラ', repeat=3)]
+    assert batch_distances(query, candidates, 1.0) == [weighted_distance(query, c, 1.0) for c in candidates]
+    assert batch_distances(query, candidates, 1, weighted=False) == [myers_distance(query, c, 1) for c in candidates]
+
+
+def test_benchmark_reports_speedups():
+    results = benchmark(synthetic_morae(2, seed=1), synthetic_morae(300, seed=2))
+    assert set(results) == {'unit', 'weighted'}
+    assert results['weighted']['batch_speedup'] > 1.0
@@ -0,0 +1,66 @@
+"""
+Tests for the FTS5 trigram mark-text index.
+"""
+
+import sqlite3
+
+import pytest
+
+from cli_trademark_search import TrademarkSearchCLI
+from mark_text_fts import can_use_fts, mark_text_condition, rebuild_index, refresh_index
+
+QUERIES = ['ソニ', 'ソニー', 'ソニック', 'sony', 'Sony', 'ーヒーハ', 'ロゴ', 'サクラ珈琲', 'ティファ',
+           '該当なし', 'ヴェ', 'ソ%ー', 'SO_Y', 'ABC"']
+
+
+@pytest.fixture
+def fts_db(fresh_search_db):
+    """A fixture database with the mark-text index built."""
+    conn = sqlite3.connect(fresh_search_db)
+    rebuild_index(conn)
+    conn.close()
+    return fresh_search_db
+
+
+def search_app_nums(db_path, **criteria):
+    searcher = TrademarkSearchCLI(str(db_path))
+    try:
+        results, total = searcher.search_trademarks(limit=1000, **criteria)
+        return [r['app_num'] for r in results], total
+    finally:
+        searcher.close()
+
+
+def test_short_and_wildcard_queries_fall_back_to_like():
+    assert not can_use_fts('ソニ')
+    assert not can_use_fts('ソ%ー')
+    assert not can_use_fts('SO_Y')
+    assert can_use_fts('ソニー')
+
+    _, where_parts, params = mark_text_condition('ソニー', use_fts=True)
+    assert len(where_parts) == 2 and params[0] == '"ソニー"'
+    _, where_parts, _ = mark_text_condition('ソニ', use_fts=True)
+    assert len(where_parts) == 1
+
+
+@pytest.mark.parametrize("mark_text", QUERIES)
+def test_index_results_match_like(search_db, fts_db, mark_text):
+    """The indexed search must return exactly the LIKE-only results."""
+    assert search_app_nums(fts_db, mark_text=mark_text) == search_app_nums(search_db, mark_text=mark_text)
+
+
+def test_refresh_keeps_index_in_sync(fts_db):
+    """Changed app numbers are re-indexed so new text is found and old text is not."""
+    conn = sqlite3.connect(fts_db)
+    conn.execute("UPDATE standard_char_t_art SET standard_char_t = 'ミライテック' WHERE normalized_app_num = '2024000000'")
+    conn.execute("DELETE FROM search_use_t_art_table WHERE normalized_app_num = '2024000000'")
+    conn.execute("DELETE FROM indct_use_t_art WHERE normalized_app_num = '2024000000'")
+    conn.commit()
+
+    assert search_app_nums(fts_db, mark_text='ミライテック') == ([], 0)
+
+    refresh_index(conn, ['2024000000'])
+    conn.close()
+
+    assert search_app_nums(fts_db, mark_text='ミライテック') == (['2024000000'], 1)
+    assert '2024000000' not in search_app_nums(fts_db, mark_text='ソニー')[0]
@@ -0,0 +1,79 @@
+"""
+Differential tests: the compiled normalizer must match text_normalizer exactly.
+"""
+
+import itertools
+import sqlite3
+
+import pytest
+
+from normalization_engine import (
+    NORMALIZATION_MODES, CompiledNormalizer, get_compiled_normalizer, iter_corpus, normalize_many,
+    verify_against_reference,
+)
+from text_normalizer import TextNormalizer
+
+KANA_ALPHABET = list('ヴツテトデドフウシジチエオコイアァィゥェォュャョヂヲぁぃゔてでつ ,、ー-ａ')
+
+TRICKY = [
+    '', ' ', '　', ', ', 'A, B', 'a,b', 'ß', 'ﬀ', 'İ', 'Σίσυφος', 'Ⅲⅻⅰ', '①②', 'ｶﾞｷﾞ', 'ﾊﾟﾋﾟ',
+    'ソニー株式会社', '有限会社 さくら', 'ヴェール・ティファニー', 'ツィェ ティェ ディェ トゥェ',
+    'エイコウ オウ', 'ショコラティエ', 'Café\tBar\n', '　ＡＢＣ マート', '𠮷野家',
+]
+
+
+def assert_matches(texts, modes=NORMALIZATION_MODES):
+    checked, mismatches = verify_against_reference(texts, modes)
+    assert checked == len(texts)
+    assert mismatches == []
+
+
+def test_every_bmp_character_matches_reference():
+    assert_matches([chr(c) for c in range(0x10000) if not 0xD800 <= c < 0xE000])
+
+
+def test_kana_combinations_match_reference():
+    texts = [''.join(p) for k in (1, 2, 3) for p in itertools.product(KANA_ALPHABET, repeat=k)]
+    assert_matches(texts)
+
+
+def test_tricky_strings_match_reference():
+    assert_matches(TRICKY)
+
+
+def test_fixture_corpus_matches_reference(search_db):
+    conn = sqlite3.connect(search_db)
+    try:
+        texts = list(iter_corpus(conn))
+    finally:
+        conn.close()
+    assert texts
+    assert_matches(texts)
+
+
+def test_public_api_matches_text_normalizer():
+    engine = get_compiled_normalizer()
+    reference = TextNormalizer()
+    assert engine is get_compiled_normalizer()
+    assert isinstance(engine, CompiledNormalizer)
+    for text in TRICKY:
+        assert engine.normalize_applicant_name(text) == reference.normalize_applicant_name(text)
+        for mode in NORMALIZATION_MODES:
+            expected = getattr(reference, f"normalize_{mode}")(text)
+            assert engine.normalize(text, mode) == expected
+            assert engine.get_function(mode)(text) == expected
+    with pytest.raises(ValueError):
+        engine.get_function('unknown')
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_normalize_many_preserves_order(workers):
+    reference = TextNormalizer()
+    texts = TRICKY * 7 + [None, 'ソニー']
+    results = list(normalize_many(iter(texts), 'pronunciation', workers=workers, chunk_size=5, max_pending=2))
+    assert results == [None if t is None else reference.normalize_pronunciation(t) for t in texts]
+
+
+def test_normalize_many_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        normalize_many(['a'], 'unknown')
@@ -0,0 +1,109 @@
+"""
+Tests for the stored normalized mark-text columns and exact/prefix matching.
+"""
+
+import sqlite3
+
+import pytest
+
+from cli_trademark_search import TrademarkSearchCLI
+from normalized_marks import (
+    NORMALIZED_SOURCES, normalized_mark_condition, rebuild_normalized_columns, refresh_normalized_columns,
+)
+from text_normalizer import TextNormalizer
+
+QUERIES = [('exact', 'ソニー'), ('exact', 'sony'), ('exact', 'そにー'), ('prefix', 'ソニ'), ('prefix', 'さ'),
+           ('prefix', 'ブルー・'), ('exact', '該当なし')]
+
+
+@pytest.fixture
+def normalized_db(fresh_search_db):
+    """A fixture database with the normalized columns built."""
+    conn = sqlite3.connect(fresh_search_db)
+    rebuild_normalized_columns(conn)
+    conn.close()
+    return fresh_search_db
+
+
+def expected_app_nums(db_path, match, mark_text, mode):
+    """Brute-force reference: normalize every stored value in Python."""
+    normalizer = TextNormalizer()
+    func = getattr(normalizer, f"normalize_{mode}")
+    key = func(mark_text)
+    found = set()
+    conn = sqlite3.connect(db_path)
+    for table, column in NORMALIZED_SOURCES:
+        for app_num, text in conn.execute(f"SELECT normalized_app_num, {column} FROM {table}"):
+            if text is None:
+                continue
+            value = func(text)
+            if value == key or (match == 'prefix' and value.startswith(key)):
+                found.add(app_num)
+    conn.close()
+    return sorted(found)
+
+
+def search_app_nums(db_path, **criteria):
+    searcher = TrademarkSearchCLI(str(db_path))
+    try:
+        results, total = searcher.search_trademarks(limit=1000, **criteria)
+        assert total == len(results)
+        return [r['app_num'] for r in results], searcher.has_normalized_columns()
+    finally:
+        searcher.close()
+
+
+def test_columns_match_text_normalizer(normalized_db):
+    normalizer = TextNormalizer()
+    conn = sqlite3.connect(normalized_db)
+    for table, column in NORMALIZED_SOURCES:
+        rows = conn.execute(f"SELECT {column}, normalized_trademark, normalized_pronunciation FROM {table}").fetchall()
+        assert rows
+        for text, trademark, pronunciation in rows:
+            assert trademark == normalizer.normalize_trademark(text)
+            assert pronunciation == normalizer.normalize_pronunciation(text)
+    conn.close()
+
+
+@pytest.mark.parametrize("mode", ['trademark', 'pronunciation'])
+@pytest.mark.parametrize("match,mark_text", QUERIES)
+def test_indexed_and_fallback_searches_match_reference(search_db, normalized_db, match, mark_text, mode):
+    expected = expected_app_nums(search_db, match, mark_text, mode)
+    criteria = dict(mark_text=mark_text, mark_match=match, mark_normalization=mode)
+    indexed, used_index = search_app_nums(normalized_db, **criteria)
+    fallback, fallback_used_index = search_app_nums(search_db, **criteria)
+
+    assert used_index and not fallback_used_index
+    assert indexed == expected
+    assert fallback == expected
+
+
+@pytest.mark.parametrize("match", ['exact', 'prefix'])
+@pytest.mark.parametrize("mark_text", [' ', '\u3000'])
+def test_query_normalized_to_empty_matches_nothing(normalized_db, match, mark_text):
+    assert normalized_mark_condition(mark_text, match) == (["0 = 1"], [])
+    assert search_app_nums(normalized_db, mark_text=mark_text, mark_match=match) == ([], True)
+
+
+@pytest.mark.parametrize("match", ['exact', 'prefix'])
+def test_condition_uses_index_seeks(normalized_db, match):
+    where_parts, params = normalized_mark_condition('ソニ', match)
+    conn = sqlite3.connect(normalized_db)
+    plan = conn.execute(f"EXPLAIN QUERY PLAN SELECT j.normalized_app_num FROM jiken_c_t j "
+                        f"WHERE {where_parts[0]}", params).fetchall()
+    conn.close()
+    details = [row[-1] for row in plan]
+    for table, _ in NORMALIZED_SOURCES:
+        assert any(f"SEARCH {table} USING INDEX idx_{table}_normalized_trademark" in d for d in details), details
+
+
+def test_refresh_recomputes_changed_rows(normalized_db):
+    conn = sqlite3.connect(normalized_db)
+    conn.execute("UPDATE standard_char_t_art SET standard_char_t = 'ヴァイオリン' WHERE normalized_app_num = '2024000000'")
+    conn.commit()
+    # one standard_char_t_art row, two search_use_t_art_table rows, one t_dsgnt_art row
+    assert refresh_normalized_columns(conn, ['2024000000']) == 4
+    row = conn.execute("SELECT normalized_trademark, normalized_pronunciation FROM standard_char_t_art "
+                       "WHERE normalized_app_num = '2024000000'").fetchone()
+    conn.close()
+    assert row == ('ヴァイオリン', 'バイオリン')
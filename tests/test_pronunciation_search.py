@@ -0,0 +1,79 @@
+"""
+Tests for the pronunciation (称呼) similarity search.
+"""
+
+import sqlite3
+
+import pytest
+
+from kana_distance import COST_VOICING, COST_WEAK, substitution_cost, weighted_distance
+from pronunciation_search import mora_bigrams, rebuild_index, refresh_index, search, split_morae
+from text_normalizer import TextNormalizer
+
+QUERIES = ['ソニー', 'そにっく', 'トヨダ', 'サクラ', 'ティファニー', 'パナソニク', 'ABC', 'テスト']
+
+
+@pytest.fixture(scope="module")
+def pronunciation_db(search_db):
+    """The module's shared fixture database with the pronunciation index built."""
+    conn = sqlite3.connect(search_db)
+    rebuild_index(conn)
+    yield conn
+    conn.close()
+
+
+def brute_force(conn, query, max_distance):
+    """Reference: distance against every stored pronunciation that shares a mora bigram."""
+    normalizer = TextNormalizer()
+    morae = split_morae(normalizer.normalize_pronunciation(query))
+    grams = set(mora_bigrams(morae))
+    found = {}
+    for app_num, dsgnt in conn.execute("SELECT normalized_app_num, dsgnt FROM t_dsgnt_art"):
+        candidate = normalizer.normalize_pronunciation(dsgnt)
+        candidate_morae = split_morae(candidate)
+        if not grams & set(mora_bigrams(candidate_morae)):
+            continue
+        distance = weighted_distance(morae, candidate_morae)
+        if distance <= max_distance:
+            found.setdefault(candidate, []).append(app_num)
+    return {k: sorted(v) for k, v in found.items()}
+
+
+def test_kana_aware_costs():
+    assert substitution_cost('カ', 'ガ') == COST_VOICING
+    assert substitution_cost('ハ', 'パ') == COST_VOICING
+    assert substitution_cost('カ', 'サ') < substitution_cost('カ', 'ミ')
+    assert weighted_distance(split_morae('ソニ-'), split_morae('ソニ')) == COST_WEAK
+    assert weighted_distance(split_morae('トヨタ'), split_morae('トヨダ')) == COST_VOICING
+    assert weighted_distance(split_morae('サクラ'), split_morae('ミカン'), max_distance=1.0) is None
+    assert split_morae('キャット') == ['キャ', 'ッ', 'ト']
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("max_distance", [0.5, 1.0, 2.0])
+def test_search_matches_brute_force(pronunciation_db, query, max_distance):
+    matches = search(pronunciation_db, query, max_distance=max_distance, limit=1000)
+    expected = brute_force(pronunciation_db, query, max_distance)
+
+    assert {m.pronunciation: m.app_nums for m in matches} == expected
+    ranking = [(m.distance, -m.score) for m in matches]
+    assert ranking == sorted(ranking)
+    assert all(0.0 <= m.score <= 1.0 for m in matches)
+
+
+def test_exact_pronunciation_ranks_first(pronunciation_db):
+    matches = search(pronunciation_db, 'そにー')
+    assert matches[0].pronunciation == 'ソニ-'
+    assert matches[0].distance == 0.0 and matches[0].score == 1.0
+
+
+def test_refresh_follows_changed_rows(fresh_search_db):
+    conn = sqlite3.connect(fresh_search_db)
+    rebuild_index(conn)
+    conn.execute("UPDATE t_dsgnt_art SET dsgnt = 'サクラガオカ' WHERE normalized_app_num = '2024000000'")
+    conn.commit()
+    refresh_index(conn, ['2024000000'])
+
+    assert search(conn, 'サクラガオカ')[0].app_nums == ['2024000000']
+    assert '2024000000' not in {app for m in search(conn, 'ソニー') for app in m.app_nums}
+    conn.close()
@@ -0,0 +1,111 @@
+"""
+Tests for the two-level search result cache and its data-version invalidation.
+"""
+
+import sqlite3
+
+import pytest
+
+from cli_trademark_search import TrademarkSearchCLI
+from search_cache import SearchCache, bump_data_version, get_data_version
+from search_paging import fetch_keyset_page
+
+FROM = "FROM jiken_c_t j LEFT JOIN standard_char_t_art s ON j.normalized_app_num = s.normalized_app_num"
+WHERE = "s.standard_char_t LIKE ?"
+PARAMS = ["%ソニ%"]
+
+
+class CountingQuery:
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.calls = 0
+
+    def __call__(self, sql, args=()):
+        self.calls += 1
+        return [dict(row) for row in self.conn.execute(sql, args)]
+
+
+def test_memory_and_persistent_hits(fresh_search_db):
+    cache = SearchCache(fresh_search_db, version_ttl=0)
+    assert cache.get('page', ['a']) is None
+    cache.put('page', ['a'], ["2024000001"])
+    assert cache.get('page', ['a']) == ["2024000001"]
+    cache.close()
+
+    # 別プロセス相当（新しいインスタンス）は2段目から取得する
+    other = SearchCache(fresh_search_db, version_ttl=0)
+    assert other.get('page', ['a']) == ["2024000001"]
+    stats = other.get_stats()
+    assert stats['persistent_hits'] == 1 and stats['memory_hits'] == 0
+    assert other.get('page', ['a']) == ["2024000001"]
+    assert other.get_stats()['memory_hits'] == 1
+    other.close()
+
+
+def test_lru_eviction(fresh_search_db):
+    cache = SearchCache(fresh_search_db, max_entries=2, persistent=False)
+    for i in range(3):
+        cache.put('count', [i], [i, False])
+    assert cache.get('count', [0]) is None
+    assert cache.get('count', [2]) == [2, False]
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1 and stats['entries'] == 2
+    with pytest.raises(ValueError):
+        cache.put('rows', [0], [])
+
+
+def test_bump_data_version_invalidates(fresh_search_db):
+    cache = SearchCache(fresh_search_db, version_ttl=0)
+    cache.put('count', ['q'], [3, False])
+    version = cache.current_version()
+
+    conn = sqlite3.connect(fresh_search_db)
+    assert bump_data_version(conn) == version + 1
+    assert get_data_version(conn) == version + 1
+    assert conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] == 0
+    conn.close()
+
+    assert cache.get('count', ['q']) is None
+    assert cache.get_stats()['invalidations'] == 1
+    cache.close()
+
+
+@pytest.mark.parametrize("count_mode", ['exact', 'single', 'estimate'])
+def test_cached_pages_match_uncached(fresh_search_db, count_mode):
+    query = CountingQuery(fresh_search_db)
+    cache = SearchCache(fresh_search_db)
+    kwargs = dict(count_mode=count_mode, count_cap=3)
+    for offset in (0, 2, 4):
+        expected = fetch_keyset_page(query, FROM, WHERE, PARAMS, 2, offset, **kwargs)
+        calls = query.calls
+        first = fetch_keyset_page(query, FROM, WHERE, PARAMS, 2, offset, cache=cache, **kwargs)
+        assert first == expected
+        # 2ページ目以降は総件数をキャッシュから取るため1クエリで済む
+        assert query.calls - calls <= (1 if offset else 2)
+
+        calls = query.calls
+        assert fetch_keyset_page(query, FROM, WHERE, PARAMS, 2, offset, cache=cache, **kwargs) == expected
+        assert query.calls == calls
+
+    following = fetch_keyset_page(query, FROM, WHERE, PARAMS, 2, cursor=expected.next_cursor, **kwargs)
+    calls = query.calls
+    assert fetch_keyset_page(query, FROM, WHERE, PARAMS, 2, cursor=expected.next_cursor,
+                             cache=cache, **kwargs) == following
+    assert fetch_keyset_page(query, FROM, WHERE, PARAMS, 2, cursor=expected.next_cursor,
+                             cache=cache, **kwargs) == following
+    assert query.calls == calls + 1
+    cache.close()
+
+
+def test_cli_with_cache_returns_same_results(fresh_search_db):
+    def run(cache):
+        searcher = TrademarkSearchCLI(str(fresh_search_db), cache=cache)
+        results, total = searcher.search_trademarks(mark_text='ソニ', limit=5, offset=5)
+        return [r['app_num'] for r in results], total
+
+    expected = run(None)
+    assert run(SearchCache(fresh_search_db)) == expected
+    cache = SearchCache(fresh_search_db)
+    assert run(cache) == expected
+    assert cache.get_stats()['persistent_hits'] == 2
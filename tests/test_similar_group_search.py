@@ -0,0 +1,101 @@
+"""
+Tests for similar-group code matching over the t_knd_info_code table.
+"""
+
+import sqlite3
+
+import pytest
+
+from cli_trademark_search import TrademarkSearchCLI
+from similar_group_search import (CODE_TABLE, InvalidCodeError, benchmark, parse_codes, rebuild_table,
+                                  refresh_table, similar_group_condition)
+
+
+@pytest.fixture
+def code_db(fresh_search_db):
+    conn = sqlite3.connect(fresh_search_db)
+    rebuild_table(conn)
+    yield conn
+    conn.close()
+
+
+def app_nums(conn, codes, op, indexed=True):
+    where, params = similar_group_condition(codes, op, indexed)
+    return [row[0] for row in conn.execute(
+        f"SELECT j.normalized_app_num FROM jiken_c_t j WHERE {' AND '.join(where)} "
+        f"ORDER BY j.normalized_app_num", params)]
+
+
+def expected(conn, predicate):
+    return [app_num for app_num, value in conn.execute(
+        "SELECT normalized_app_num, smlr_dsgn_group_cd FROM t_knd_info_art_table ORDER BY normalized_app_num")
+        if predicate(value.split())]
+
+
+def test_parse_codes():
+    assert parse_codes("０９ｇ０１, 11c 09G01") == ["09G01", "11C"]
+    assert parse_codes("  ") == []
+    for invalid in ("A01", "09G011", "9G01", "09%"):
+        with pytest.raises(InvalidCodeError):
+            parse_codes(invalid)
+
+
+@pytest.mark.parametrize("codes, op, predicate", [
+    ("09G01", 'and', lambda tokens: "09G01" in tokens),
+    ("09G", 'and', lambda tokens: any(t.startswith("09G") for t in tokens)),
+    ("09G01 30A01", 'and', lambda tokens: {"09G01", "30A01"} <= set(tokens)),
+    ("09G01 11C01 43A", 'or', lambda tokens: bool({"09G01", "11C01"} & set(tokens))
+     or any(t.startswith("43A") for t in tokens)),
+    ("09 11", 'or', lambda tokens: any(t[:2] in ("09", "11") for t in tokens)),
+    ("09G02 30", 'and', lambda tokens: "09G02" in tokens and any(t.startswith("30") for t in tokens)),
+])
+def test_condition_matches_tokens(code_db, codes, op, predicate):
+    result = app_nums(code_db, codes, op)
+    assert result == expected(code_db, predicate)
+    assert result == app_nums(code_db, codes, op, indexed=False)
+
+
+def test_code_is_not_matched_inside_another(code_db):
+    code_db.execute("INSERT INTO jiken_c_t (normalized_app_num) VALUES ('2024999999')")
+    code_db.execute("INSERT INTO t_knd_info_art_table (normalized_app_num, smlr_dsgn_group_cd) "
+                    "VALUES ('2024999999', '109G012')")
+    refresh_table(code_db, ['2024999999'])
+    for indexed in (True, False):
+        assert '2024999999' not in app_nums(code_db, "09G01", 'and', indexed)
+
+
+def test_refresh_table(code_db):
+    code_db.execute("UPDATE t_knd_info_art_table SET smlr_dsgn_group_cd = '45Z01' "
+                    "WHERE normalized_app_num = '2024000001'")
+    assert app_nums(code_db, "45Z01", 'and') == []
+    assert refresh_table(code_db, ['2024000001']) == 1
+    assert app_nums(code_db, "45Z01", 'and') == ['2024000001']
+    assert code_db.execute(f"SELECT COUNT(*) FROM {CODE_TABLE} WHERE normalized_app_num = '2024000001'"
+                           ).fetchone()[0] == 1
+
+
+def test_benchmark_reports_each_code_count(code_db):
+    results = benchmark(code_db, repeats=1)
+    assert sorted(results) == [1, 5, 42]
+    assert results[1]['and_count'] == results[1]['legacy_and_count'] > 0
+    assert results[42]['and_count'] == 0
+    assert results[42]['or_count'] == 60
+
+
+@pytest.mark.parametrize("op", ['and', 'or'])
+def test_cli_with_and_without_table(fresh_search_db, op):
+    def run():
+        searcher = TrademarkSearchCLI(str(fresh_search_db))
+        try:
+            results, total = searcher.search_trademarks(similar_group_codes="09g01 11C", similar_group_op=op,
+                                                        limit=100)
+        finally:
+            searcher.close()
+        return [r['app_num'] for r in results], total
+
+    without_table = run()
+    conn = sqlite3.connect(fresh_search_db)
+    rebuild_table(conn)
+    conn.close()
+    assert run() == without_table
+    assert without_table[1] > 0
@@ -0,0 +1,119 @@
+"""
+Tests for the denormalized trademark_summary table.
+"""
+
+import sqlite3
+
+import pytest
+
+from cli_trademark_search import TrademarkSearchCLI
+from trademark_summary import (SUMMARY_TABLE, WEB_SUMMARY_COLUMNS, check_consistency, rebuild_summary,
+                               refresh_summary, summary_lookup_sql, web_detail_sql)
+
+
+@pytest.fixture
+def summary_db(fresh_search_db):
+    """A fixture database with the summary table built."""
+    conn = sqlite3.connect(fresh_search_db)
+    rebuild_summary(conn)
+    conn.close()
+    return fresh_search_db
+
+
+def search_all(db_path, **criteria):
+    searcher = TrademarkSearchCLI(str(db_path))
+    try:
+        results, _ = searcher.search_trademarks(limit=1000, **criteria)
+        return results, searcher.has_summary_table()
+    finally:
+        searcher.close()
+
+
+def test_summary_matches_live_join(summary_db):
+    """Every row of the rebuilt table equals the live 17-table join."""
+    conn = sqlite3.connect(summary_db)
+    report = check_consistency(conn)
+    conn.close()
+
+    assert report['checked'] == 60
+    assert report['missing'] == report['extra'] == report['mismatched'] == []
+
+
+def test_summary_matches_web_join(summary_db):
+    """The web columns equal the Flask live join, which differs from the CLI join."""
+    conn = sqlite3.connect(summary_db)
+    # 推定出願人: CLIは登録日時の新しい方、Web画面は商標件数の多い方を使う
+    conn.execute("INSERT INTO applicant_mapping (applicant_code, applicant_name, applicant_addr, "
+                 "trademark_count, created_at) VALUES ('100000005', '旧推定出願人', '奈良県', 10, '2023-01-01')")
+    conn.execute("UPDATE jiken_c_t_enhanced SET shutugan_bi = '20230101' WHERE normalized_app_num = '2024000005'")
+    conn.commit()
+    rebuild_summary(conn)
+
+    assert check_consistency(conn)['mismatched'] == []
+    report = check_consistency(conn, view='web')
+    conn.row_factory = sqlite3.Row
+    web = dict(conn.execute(summary_lookup_sql(1, WEB_SUMMARY_COLUMNS), ('2024000005',)).fetchone())
+    live = dict(conn.execute(web_detail_sql(1), ('2024000005',)).fetchone())
+    cli = dict(conn.execute(f"SELECT * FROM {SUMMARY_TABLE} WHERE app_num = '2024000005'").fetchone())
+    conn.close()
+
+    assert report['checked'] == 60
+    assert report['missing'] == report['extra'] == report['mismatched'] == []
+    assert web['applicant_name'] == live['applicant_name'] == '旧推定出願人 (推定)'
+    assert cli['applicant_name'] == '推定出願人100000005 (推定)'
+    assert web['app_date'] == live['app_date'] != cli['app_date'] == '20230101'
+
+
+def test_check_consistency_rejects_unknown_view(summary_db):
+    conn = sqlite3.connect(summary_db)
+    with pytest.raises(ValueError):
+        check_consistency(conn, view='mobile')
+    conn.close()
+
+
+def test_cli_results_are_identical_with_summary(search_db, summary_db):
+    """The primary-key lookup must return exactly what the live join returned."""
+    live, live_used_summary = search_all(search_db, goods_classes='09 30 35 42 43')
+    summary, used_summary = search_all(summary_db, goods_classes='09 30 35 42 43')
+
+    assert not live_used_summary and used_summary
+    assert len(live) == 60
+    assert summary == live
+
+
+def test_refresh_repairs_changed_rows(summary_db):
+    """After source tables change, refreshing the touched app numbers restores consistency."""
+    conn = sqlite3.connect(summary_db)
+    conn.execute("UPDATE standard_char_t_art SET standard_char_t = '新商標' WHERE normalized_app_num = '2024000000'")
+    conn.execute("INSERT INTO jiken_c_t VALUES ('2024999999', '20240901', NULL)")
+    conn.execute("DELETE FROM jiken_c_t WHERE normalized_app_num = '2024000001'")
+    conn.commit()
+
+    stale = check_consistency(conn)
+    assert [m[:2] for m in stale['mismatched']] == [('2024000000', 'mark_text')]
+    assert stale['missing'] == ['2024999999']
+    assert stale['extra'] == ['2024000001']
+
+    refresh_summary(conn, ['2024000000', '2024999999', '2024000001'])
+    report = check_consistency(conn)
+    conn.close()
+
+    assert report['missing'] == report['extra'] == report['mismatched'] == []
+
+
+def test_display_mark_skips_empty_standard_character(summary_db):
+    """The web display falls back to the next mark text when the standard characters are empty."""
+    conn = sqlite3.connect(summary_db)
+    conn.execute("UPDATE standard_char_t_art SET standard_char_t = '' WHERE normalized_app_num = '2024000000'")
+    conn.execute(f"ALTER TABLE {SUMMARY_TABLE} DROP COLUMN display_mark_text")
+    refresh_summary(conn, ['2024000000', '2024000003'])
+
+    rows = conn.execute(summary_lookup_sql(2, {'app_num': 'app_num', 'mark_text': 'mark_text',
+                                               'display_mark_text': 'display_mark_text'}),
+                        ('2024000000', '2024000003')).fetchall()
+    # CLI向けの mark_text はライブJOINと同じく空文字のまま
+    assert check_consistency(conn)['mismatched'] == []
+    assert check_consistency(conn, app_nums=['2024000000', '2024000003'], view='web')['mismatched'] == []
+    conn.close()
+    assert rows == [('2024000000', '', 'ソニーロゴ'), ('2024000003', rows[1][1], rows[1][1])]
+    assert rows[1][1]
@@ -0,0 +1,117 @@
+"""
+Tests for the TSV importer: the bulk-load mode must produce the same tables as the row-wise mode.
+"""
+
+import csv
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from import_tsv_data_fixed import IMPORT_SPECS, bulk_import, import_table, parallel_import
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+TSV_ROWS = {
+    'jiken_c_t': (['shutugan_no', 'shutugan_bi', 'toroku_bi'],
+                  [[f"2024-{i:06d}", f"2024{(i % 12) + 1:02d}01", ''] for i in range(250)]
+                  + [["2024-000001", "20240301", "20250101"]]),
+    'standard_char_t_art': (['app_num', 'standard_char_t'],
+                            [[f"2024-{i:06d}", f"商標{i}"] for i in range(250)]),
+    'goods_class_art': (['processing_type', 'law_cd', 'reg_num', 'split_num', 'app_num',
+                         'goods_cls_art_upd_ymd', 'mu_num', 'desig_goods_or_desig_wrk_class'],
+                        [['1', '4', f"6{i:06d}", '0' * 31, '0000000000' if i % 50 == 0 else f"2024{i:06d}",
+                          '20240101', '', f"{i % 45 + 1:02d}"] for i in range(250)]),
+    't_sample': (['app_num', 'image_data', 'rec_seq_num'],
+                 [[f"2024-{i:06d}", "/9j/" + "A" * 20, '1'] for i in range(0, 250, 3)]),
+}
+
+
+@pytest.fixture
+def tsv_files(tmp_path):
+    files = {}
+    for table, (header, rows) in TSV_ROWS.items():
+        path = tmp_path / f"{table}.tsv"
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter='\t')
+            writer.writerow(header)
+            writer.writerows(rows)
+        files[table] = path
+    return files
+
+
+def new_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript((REPO_ROOT / "create_schema.sql").read_text(encoding="utf-8"))
+    return conn
+
+
+def dump(conn, table):
+    return sorted(conn.execute(f"SELECT * FROM {table}").fetchall(), key=repr)
+
+
+def indexes(conn):
+    return conn.execute("SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' ORDER BY name").fetchall()
+
+
+def test_bulk_mode_matches_row_mode(tmp_path, tsv_files):
+    row_conn = new_db(tmp_path / "row.db")
+    bulk_conn = new_db(tmp_path / "bulk.db")
+    expected_indexes = indexes(bulk_conn)
+    journal_mode = bulk_conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    for table, path in tsv_files.items():
+        import_table(row_conn, table, path)
+    stats = bulk_import(bulk_conn, tsv_files, batch_size=64)
+
+    assert set(stats) == set(tsv_files)
+    assert stats['jiken_c_t'][0] == 251
+    for table in tsv_files:
+        assert dump(bulk_conn, table) == dump(row_conn, table)
+    # 1 duplicate application number is replaced, not inserted twice
+    assert bulk_conn.execute("SELECT COUNT(*) FROM jiken_c_t").fetchone()[0] == 250
+    assert bulk_conn.execute("SELECT reg_reg_ymd FROM jiken_c_t WHERE normalized_app_num = '2024000001'"
+                             ).fetchone()[0] == '20250101'
+    assert bulk_conn.execute("SELECT COUNT(*) FROM goods_class_art WHERE normalized_app_num IS NULL"
+                             ).fetchone()[0] == 5
+
+    assert indexes(bulk_conn) == expected_indexes
+    assert bulk_conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    assert bulk_conn.execute("PRAGMA journal_mode").fetchone()[0] == journal_mode
+    row_conn.close()
+    bulk_conn.close()
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_parallel_import_matches_row_mode(tmp_path, tsv_files, bulk):
+    row_conn = new_db(tmp_path / "row.db")
+    parallel_conn = new_db(tmp_path / "parallel.db")
+    expected_indexes = indexes(parallel_conn)
+    # existing rows are replaced exactly as the row-wise loader would
+    for conn in (row_conn, parallel_conn):
+        conn.execute("INSERT INTO jiken_c_t VALUES ('2024000002', '20200101', NULL)")
+        conn.commit()
+
+    for table, path in tsv_files.items():
+        import_table(row_conn, table, path)
+    if bulk:
+        stats = bulk_import(parallel_conn, tsv_files, batch_size=64, workers=2)
+    else:
+        stats = parallel_import(parallel_conn, tsv_files, batch_size=64, workers=2)
+
+    assert {table: rows for table, (rows, _) in stats.items()} == {
+        table: len(rows) for table, (_, rows) in TSV_ROWS.items()}
+    for table in tsv_files:
+        assert dump(parallel_conn, table) == dump(row_conn, table)
+    assert indexes(parallel_conn) == expected_indexes
+    assert list((tmp_path).glob("import_staging_*")) == []
+    row_conn.close()
+    parallel_conn.close()
+
+
+def test_every_table_has_an_import_spec():
+    schema = (REPO_ROOT / "create_schema.sql").read_text(encoding="utf-8")
+    for table, (insert_sql, _) in IMPORT_SPECS.items():
+        assert f"CREATE TABLE IF NOT EXISTS {table}" in schema
+        assert insert_sql.count('?') == len(insert_sql.split('(')[1].split(','))
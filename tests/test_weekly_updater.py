@@ -0,0 +1,156 @@
+"""Tests for the set-based weekly delta merge in weekly_data_updater."""
+
+import importlib
+import sqlite3
+import sys
+
+import pytest
+
+from bitmap_index import BitmapIndex
+from goods_code_dictionary import GoodsCodeDictionary
+from search_cache import get_data_version
+
+
+@pytest.fixture
+def updater(fresh_search_db, tmp_path, monkeypatch):
+    # モジュールの読み込み時にカレントディレクトリへログファイルを作るため tmp_path で読み込む
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("weekly_data_updater")
+    return module.WeeklyDataUpdater(fresh_search_db)
+
+
+def write_tsv(path, header, rows):
+    lines = ["\t".join(header)] + ["\t".join(row) for row in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def test_update_jiken_c_t_upserts(updater, tmp_path):
+    tsv = tmp_path / "upd_jiken_c_t.tsv"
+    write_tsv(tsv, ["shutugan_no", "shutugan_bi", "toroku_bi"], [
+        ["2024-000001", "20240909", "20250909"],
+        ["2099-000001", "20990101", ""],
+        ["", "20990101", ""],
+    ])
+    assert updater.update_jiken_c_t(tsv) == (1, 1, 0)
+
+    conn = sqlite3.connect(updater.db_path)
+    rows = conn.execute("SELECT * FROM jiken_c_t WHERE normalized_app_num IN ('2024000001', '2099000001') "
+                        "ORDER BY normalized_app_num").fetchall()
+    conn.close()
+    assert rows == [("2024000001", "20240909", "20250909"), ("2099000001", "20990101", "")]
+    assert updater.changed_app_nums == {"2024000001", "2099000001"}
+
+
+def test_update_standard_char_t_art(updater, tmp_path):
+    tsv = tmp_path / "upd_standard_char_t_art.tsv"
+    write_tsv(tsv, ["app_num", "standard_char_t"], [
+        ["2024000000", "旧い値"],
+        ["2024000000", "新商標"],
+        ["2099000002", "追加商標"],
+    ])
+    assert updater.update_standard_char_t_art(tsv) == (1, 1, 0)
+
+    conn = sqlite3.connect(updater.db_path)
+    rows = dict(conn.execute("SELECT normalized_app_num, standard_char_t FROM standard_char_t_art "
+                             "WHERE normalized_app_num IN ('2024000000', '2099000002')").fetchall())
+    conn.close()
+    assert rows == {"2024000000": "新商標", "2099000002": "追加商標"}
+
+
+def test_generic_update_replaces_all_rows_of_an_app(updater, tmp_path):
+    conn = sqlite3.connect(updater.db_path)
+    before = conn.execute("SELECT COUNT(*) FROM goods_class_art WHERE normalized_app_num = '2024000001'").fetchone()[0]
+    conn.close()
+    assert before == 2
+
+    tsv = tmp_path / "upd_goods_class_art.tsv"
+    write_tsv(tsv, ["app_num", "goods_classes"], [
+        ["2024000001", "01"],
+        ["2024000001", "02"],
+        ["2024000001", "03"],
+        ["2099000003", "45"],
+    ])
+    assert updater.update_table_generic("goods_class_art", tsv, ["goods_classes"]) == (1, 3, 2)
+
+    conn = sqlite3.connect(updater.db_path)
+    classes = [row[0] for row in conn.execute(
+        "SELECT goods_classes FROM goods_class_art WHERE normalized_app_num = '2024000001' ORDER BY rowid")]
+    conn.close()
+    assert classes == ["01", "02", "03"]
+
+
+def test_update_from_directory_is_atomic(updater, tmp_path):
+    tsv_dir = tmp_path / "weekly"
+    tsv_dir.mkdir()
+    write_tsv(tsv_dir / "upd_jiken_c_t.tsv", ["shutugan_no", "shutugan_bi", "toroku_bi"],
+              [["2099-000004", "20990101", ""]])
+    # 存在しない列を含むため t_dsgnt_art の更新で失敗する
+    write_tsv(tsv_dir / "upd_t_dsgnt_art.tsv", ["app_num", "dsgnt"], [["2099000004", "x"]])
+    conn = sqlite3.connect(updater.db_path)
+    conn.execute("DROP TABLE t_dsgnt_art")
+    conn.execute("CREATE TABLE t_dsgnt_art (normalized_app_num TEXT)")
+    conn.commit()
+    conn.close()
+
+    assert updater.update_from_directory(tsv_dir) is False
+
+    conn = sqlite3.connect(updater.db_path)
+    count = conn.execute("SELECT COUNT(*) FROM jiken_c_t WHERE normalized_app_num = '2099000004'").fetchone()[0]
+    conn.close()
+    assert count == 0
+
+
+def test_failed_refresh_rolls_back_table_updates(updater, tmp_path, monkeypatch):
+    """Derived tables are refreshed in the same transaction as the merges."""
+    tsv_dir = tmp_path / "weekly"
+    tsv_dir.mkdir()
+    write_tsv(tsv_dir / "upd_jiken_c_t.tsv", ["shutugan_no", "shutugan_bi", "toroku_bi"],
+              [["2099-000006", "20990101", ""]])
+    write_tsv(tsv_dir / "upd_standard_char_t_art.tsv", ["app_num", "standard_char_t"],
+              [["2099000006", "週次商標"]])
+    conn = sqlite3.connect(updater.db_path)
+    version = get_data_version(conn)
+    conn.close()
+
+    def fail(conn, app_nums):
+        raise sqlite3.OperationalError("refresh failed")
+
+    monkeypatch.setattr(sys.modules[type(updater).__module__], "refresh_pronunciation_index", fail)
+    assert updater.update_from_directory(tsv_dir) is False
+    assert updater.changed_app_nums == set()
+
+    conn = sqlite3.connect(updater.db_path)
+    rows = [conn.execute(f"SELECT COUNT(*) FROM {table} WHERE normalized_app_num = '2099000006'").fetchone()[0]
+            for table in ("jiken_c_t", "standard_char_t_art")]
+    assert rows == [0, 0]
+    assert get_data_version(conn) == version
+    conn.close()
+
+
+def test_update_from_directory_commits_all_tables(updater, tmp_path):
+    tsv_dir = tmp_path / "weekly"
+    tsv_dir.mkdir()
+    write_tsv(tsv_dir / "upd_jiken_c_t.tsv", ["shutugan_no", "shutugan_bi", "toroku_bi"],
+              [["2099-000005", "20990101", ""]])
+    write_tsv(tsv_dir / "upd_standard_char_t_art.tsv", ["app_num", "standard_char_t"],
+              [["2099000005", "週次商標"]])
+    write_tsv(tsv_dir / "upd_t_knd_info_art_table.tsv", ["app_num", "smlr_dsgn_group_cd"],
+              [["2099000005", "09G01"]])
+
+    assert updater.update_from_directory(tsv_dir) is True
+
+    conn = sqlite3.connect(updater.db_path)
+    mark = conn.execute("SELECT standard_char_t FROM standard_char_t_art "
+                        "WHERE normalized_app_num = '2099000005'").fetchone()
+    codes = conn.execute("SELECT smlr_dsgn_group_cd FROM t_knd_info_art_table "
+                         "WHERE normalized_app_num = '2099000005'").fetchall()
+    conn.close()
+    assert mark == ("週次商標",)
+    assert codes == [("09G01",)]
+
+    # Webアプリが読み込むだけで済むよう、新しいデータバージョンの索引ファイルを作成する
+    conn = sqlite3.connect(updater.db_path)
+    index = BitmapIndex.load_current(conn, updater.bitmap_index_path)
+    conn.close()
+    assert index is not None and "2099000005" in index.app_nums_of(index.select('similar_group_codes', ["09G01"]))
+    assert GoodsCodeDictionary.load(updater.goods_dictionary_path).data_version == index.data_version
@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+商標サマリーテーブル（trademark_summary）
+検索結果表示用の項目を出願番号ごとに1行へ事前集約した非正規化テーブル。
+17テーブルのLEFT JOINとGROUP_CONCATをページ表示のたびに行う代わりに、
+主キー検索だけで表示データを取得できるようにする。
+
+インポート時は全件再構築、週次更新時は変更された出願番号のみ再集計する。
+集約内容はライブJOIN（live_detail_sql）と同一で、check_consistency で突き合わせできる。
+"""
+
+import argparse
+import logging
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from db_pool import transaction
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TABLE = "trademark_summary"
+
+# バインド変数の上限を超えないためのIN句あたりの件数
+CHUNK_SIZE = 500
+
+# 表示項目（CLIの get_optimized_results の出力列と同じ並び）
+SUMMARY_COLUMNS = [
+    'app_num', 'app_date', 'reg_date', 'registration_number',
+    'reg_gazette_date', 'publication_date', 'prior_right_date', 'expiry_date',
+    'rejection_dispatch_date', 'renewal_application_date', 'renewal_registration_date',
+    'trial_request_date', 'trial_type', 'additional_info',
+    'mark_text', 'right_person_name', 'right_person_addr',
+    'applicant_name', 'applicant_addr',
+    'goods_classes', 'similar_group_codes', 'designated_goods', 'call_name',
+    'has_image',
+]
+
+# Web画面用の列（Web画面のライブJOIN web_detail_sql と同じ値、既存のテーブルには create_summary_table で追加する）
+# CLIのライブJOINとは商標文字（空文字を飛ばす）・日付と登録番号（拡張データを使わない）・
+# 出願人（出願番号の結合列と推定出願人の選び方）が異なる
+_EXTRA_COLUMNS = {
+    'display_mark_text': 'TEXT',
+    'web_app_date': 'TEXT',
+    'web_reg_date': 'TEXT',
+    'web_reg_no': 'TEXT',
+    'web_applicant_name': 'TEXT',
+    'web_applicant_addr': 'TEXT',
+}
+
+# Web画面の表示項目: サマリーの列 → 出力名（web_detail_sql の出力列と同じ）
+WEB_SUMMARY_COLUMNS = {
+    'app_num': 'app_num',
+    'display_mark_text': 'mark_text',
+    'web_app_date': 'app_date',
+    'web_reg_date': 'reg_date',
+    'web_reg_no': 'reg_no',
+    'right_person_name': 'owner_name',
+    'right_person_addr': 'owner_addr',
+    'web_applicant_name': 'applicant_name',
+    'web_applicant_addr': 'applicant_addr',
+    'goods_classes': 'goods_classes',
+    'similar_group_codes': 'similar_group_codes',
+    'designated_goods': 'designated_goods',
+    'call_name': 'call_name',
+    'is_standard_char': 'is_standard_char',
+}
+
+# ライブJOINの出願人マッピング（出願人コードごとに最新の1件）
+APPLICANT_MAPPING_SUBQUERY = """(
+                SELECT applicant_code, applicant_name, applicant_addr,
+                       ROW_NUMBER() OVER (PARTITION BY applicant_code ORDER BY created_at DESC) as rn
+                FROM applicant_mapping
+            )"""
+
+# 表示データを集約するライブJOIN
+# {apm_source}: 出願人マッピング（サブクエリまたは事前計算した一時テーブル）
+# {where}: 対象出願番号の条件
+# 非集約列（mark_text等）はグループ内のどの行の値になるかが実行計画に依存するため、
+# サマリーの構築もライブJOINと同じ「出願番号のIN検索」の形で行う
+DETAIL_SQL_TEMPLATE = """
+            SELECT DISTINCT
+                j.normalized_app_num AS app_num,
+                COALESCE(je.shutugan_bi, j.shutugan_bi) AS app_date,
+                COALESCE(je.toroku_bi, j.reg_reg_ymd) AS reg_date,
+
+                -- 登録番号（拡張データから取得）
+                COALESCE(je.raz_toroku_no, tbi.reg_num, rm.reg_num, h.reg_num) AS registration_number,
+
+                -- 基本項目（新規対応）
+                je.raz_kohohakko_bi AS reg_gazette_date,
+                je.pcz_kokaikohohakko_bi AS publication_date,
+                tbi.prior_app_right_occr_dt AS prior_right_date,
+                tbi.conti_prd_expire_dt AS expiry_date,
+                tbi.rjct_finl_dcsn_dsptch_dt AS rejection_dispatch_date,
+                tbi.rec_latest_updt_dt AS renewal_application_date,
+                tbi.set_reg_dt AS renewal_registration_date,
+
+                -- 管理情報項目（新規対応）
+                mgi.trial_dcsn_year_month_day AS trial_request_date,
+                mgi.processing_type AS trial_type,
+
+                -- 付加情報項目（新規対応）
+                ai.right_request AS additional_info,
+
+                -- 商標文字（優先順位: 標準文字 → 表示用 → 検索用）
+                COALESCE(s.standard_char_t, iu.indct_use_t, su.search_use_t) AS mark_text,
+
+                -- 権利者情報
+                h.right_person_name AS right_person_name,
+                h.right_person_addr AS right_person_addr,
+
+                -- 申請人情報（マスターファイル優先、フォールバック付き）
+                CASE
+                    WHEN am.appl_name IS NOT NULL AND am.appl_name != '' AND am.appl_name NOT LIKE '%省略%'
+                    THEN am.appl_name
+                    WHEN apm.applicant_name IS NOT NULL
+                    THEN apm.applicant_name || ' (推定)'
+                    ELSE 'コード:' || ap.shutugannindairinin_code
+                END as applicant_name,
+                COALESCE(am.appl_addr, apm.applicant_addr) as applicant_addr,
+
+                -- 商品・役務区分（GROUP_CONCAT）
+                GROUP_CONCAT(DISTINCT gca.goods_classes) AS goods_classes,
+
+                -- 類似群コード（GROUP_CONCAT）
+                GROUP_CONCAT(DISTINCT tknd.smlr_dsgn_group_cd) AS similar_group_codes,
+
+                -- 指定商品・役務（GROUP_CONCAT）
+                GROUP_CONCAT(DISTINCT jcs.designated_goods) AS designated_goods,
+
+                -- 称呼（GROUP_CONCAT）
+                GROUP_CONCAT(DISTINCT td.dsgnt) AS call_name,
+
+                -- 画像データの有無
+                CASE WHEN ts.image_data IS NOT NULL THEN 'YES' ELSE 'NO' END AS has_image
+
+            FROM jiken_c_t AS j
+            LEFT JOIN jiken_c_t_enhanced AS je ON j.normalized_app_num = je.normalized_app_num
+            LEFT JOIN t_basic_item_enhanced AS tbi ON j.normalized_app_num = tbi.normalized_app_num
+            LEFT JOIN mgt_info_enhanced AS mgi ON j.normalized_app_num = mgi.normalized_app_num
+            LEFT JOIN add_info_enhanced AS ai ON j.normalized_app_num = ai.normalized_app_num
+            LEFT JOIN standard_char_t_art AS s ON j.normalized_app_num = s.normalized_app_num
+            LEFT JOIN indct_use_t_art AS iu ON j.normalized_app_num = iu.normalized_app_num
+            LEFT JOIN search_use_t_art_table AS su ON j.normalized_app_num = su.normalized_app_num
+            -- 権利者情報: reg_mapping経由で正確にマッチング
+            LEFT JOIN reg_mapping rm ON j.normalized_app_num = rm.app_num
+            LEFT JOIN right_person_art_t AS h ON rm.reg_num = h.reg_num
+            -- 申請人情報
+            LEFT JOIN jiken_c_t_shutugannindairinin ap ON j.normalized_app_num = ap.normalized_app_num
+                                                       AND ap.shutugannindairinin_sikbt = '1'
+            -- 申請人マスターファイル（優先）
+            LEFT JOIN applicant_master am ON ap.shutugannindairinin_code = am.appl_cd
+            -- 部分的申請人マッピング（フォールバック）
+            LEFT JOIN {apm_source} apm ON ap.shutugannindairinin_code = apm.applicant_code AND apm.rn = 1
+            -- 商品区分: 出願番号でマッチング、または登録番号経由でマッチング
+            LEFT JOIN goods_class_art AS gca ON (j.normalized_app_num = gca.normalized_app_num OR
+                                               (rm.reg_num IS NOT NULL AND gca.reg_num = rm.reg_num))
+            LEFT JOIN t_knd_info_art_table AS tknd ON j.normalized_app_num = tknd.normalized_app_num
+            LEFT JOIN jiken_c_t_shohin_joho AS jcs ON j.normalized_app_num = jcs.normalized_app_num
+            LEFT JOIN t_dsgnt_art AS td ON j.normalized_app_num = td.normalized_app_num
+            LEFT JOIN t_sample AS ts ON j.normalized_app_num = ts.normalized_app_num
+
+            WHERE {where}
+            GROUP BY j.normalized_app_num
+            ORDER BY j.normalized_app_num
+        """
+
+# Web画面のライブJOINの出願人マッピング（出願人コードごとに商標件数が最多の1件）
+WEB_APPLICANT_MAPPING_SUBQUERY = """(
+            SELECT applicant_code, applicant_name, applicant_addr,
+                   ROW_NUMBER() OVER (PARTITION BY applicant_code ORDER BY trademark_count DESC) as rn
+            FROM applicant_mapping
+        )"""
+
+# Web画面の表示データを集約するライブJOIN（商標表示優先順位対応 + 申請人実名表示）
+# 商品区分の結合は DETAIL_SQL_TEMPLATE と同じ（出願番号、または登録番号経由）
+WEB_DETAIL_SQL_TEMPLATE = """
+        SELECT
+            j.normalized_app_num AS app_num,
+            -- 商標表示の優先順位: 標準文字 > 表示用商標 > 検索用商標
+            COALESCE(
+                NULLIF(s.standard_char_t, ''),
+                NULLIF(iu.indct_use_t, ''),
+                NULLIF(su.search_use_t, '')
+            ) AS mark_text,
+            j.shutugan_bi AS app_date,
+            j.reg_reg_ymd AS reg_date,
+            h.reg_num AS reg_no,
+            h.right_person_name AS owner_name,
+            h.right_person_addr AS owner_addr,
+            
+            -- 申請人情報（マスターファイル優先、フォールバック付き）
+            CASE 
+                WHEN am.appl_name IS NOT NULL AND am.appl_name != '' AND am.appl_name NOT LIKE '%省略%'
+                THEN am.appl_name
+                WHEN apm.applicant_name IS NOT NULL
+                THEN apm.applicant_name || ' (推定)'
+                ELSE 'コード:' || ap.shutugannindairinin_code
+            END as applicant_name,
+            COALESCE(am.appl_addr, apm.applicant_addr) as applicant_addr,
+            
+            -- 商品・役務区分（GROUP_CONCAT）
+            GROUP_CONCAT(DISTINCT gca.goods_classes) AS goods_classes,
+            
+            -- 類似群コード（GROUP_CONCAT）
+            GROUP_CONCAT(DISTINCT tknd.smlr_dsgn_group_cd) AS similar_group_codes,
+            
+            -- 指定商品・役務（GROUP_CONCAT）
+            GROUP_CONCAT(DISTINCT jcs.designated_goods) AS designated_goods,
+            
+            -- 称呼（GROUP_CONCAT）
+            GROUP_CONCAT(DISTINCT td.dsgnt) AS call_name,
+            
+            -- 画像データ（最初のレコードのみ）
+            MIN(ts.image_data) AS image_data_sample
+            
+        FROM jiken_c_t AS j
+        LEFT JOIN standard_char_t_art AS s ON j.normalized_app_num = s.normalized_app_num
+        LEFT JOIN indct_use_t_art AS iu ON j.normalized_app_num = iu.normalized_app_num
+        LEFT JOIN search_use_t_art_table AS su ON j.normalized_app_num = su.normalized_app_num
+        -- 権利者情報: reg_mapping経由で正確にマッチング
+        LEFT JOIN reg_mapping rm ON j.normalized_app_num = rm.app_num
+        LEFT JOIN right_person_art_t AS h ON rm.reg_num = h.reg_num
+        -- 申請人情報
+        LEFT JOIN jiken_c_t_shutugannindairinin ap ON j.normalized_app_num = ap.shutugan_no 
+                                                   AND ap.shutugannindairinin_sikbt = '1'
+        -- 申請人マスターファイル（優先）
+        LEFT JOIN applicant_master am ON ap.shutugannindairinin_code = am.appl_cd
+        -- 部分的申請人マッピング（フォールバック）
+        LEFT JOIN {apm_source} apm ON ap.shutugannindairinin_code = apm.applicant_code AND apm.rn = 1
+        -- 商品区分: 出願番号でマッチング、または登録番号経由でマッチング
+        LEFT JOIN goods_class_art AS gca ON (j.normalized_app_num = gca.normalized_app_num OR
+                                           (rm.reg_num IS NOT NULL AND gca.reg_num = rm.reg_num))
+        LEFT JOIN t_knd_info_art_table AS tknd ON j.normalized_app_num = tknd.normalized_app_num
+        LEFT JOIN jiken_c_t_shohin_joho AS jcs ON j.normalized_app_num = jcs.normalized_app_num
+        LEFT JOIN t_dsgnt_art AS td ON j.normalized_app_num = td.normalized_app_num
+        LEFT JOIN t_sample AS ts ON j.normalized_app_num = ts.normalized_app_num
+        
+        WHERE {where}
+        GROUP BY j.normalized_app_num
+        ORDER BY j.normalized_app_num
+    """
+
+CREATE_SUMMARY_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        app_num TEXT PRIMARY KEY,
+        app_date TEXT,
+        reg_date TEXT,
+        registration_number TEXT,
+        reg_gazette_date TEXT,
+        publication_date TEXT,
+        prior_right_date TEXT,
+        expiry_date TEXT,
+        rejection_dispatch_date TEXT,
+        renewal_application_date TEXT,
+        renewal_registration_date TEXT,
+        trial_request_date TEXT,
+        trial_type TEXT,
+        additional_info TEXT,
+        mark_text TEXT,
+        right_person_name TEXT,
+        right_person_addr TEXT,
+        applicant_name TEXT,
+        applicant_addr TEXT,
+        goods_classes TEXT,
+        similar_group_codes TEXT,
+        designated_goods TEXT,
+        call_name TEXT,
+        has_image TEXT,
+        is_standard_char INTEGER,
+        display_mark_text TEXT,
+        web_app_date TEXT,
+        web_reg_date TEXT,
+        web_reg_no TEXT,
+        web_applicant_name TEXT,
+        web_applicant_addr TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def is_standard_character(image_data: str) -> bool:
+    """標準文字かどうかを判定"""
+    if not image_data:
+        return True
+
+    # 標準文字の特徴的なパターン
+    if (image_data.startswith("//") or
+        set(image_data.strip()) == {"/"} or
+        len(image_data.strip()) < 20 or
+        image_data.count("/") / len(image_data) > 0.8):
+        return True
+
+    return False
+
+
+def _chunks(items: Sequence[str], size: int = CHUNK_SIZE) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield list(items[i:i + size])
+
+
+def live_detail_sql(app_count: int) -> str:
+    """指定件数の出願番号を対象にしたライブJOINのSQL"""
+    placeholders = ','.join(['?' for _ in range(app_count)])
+    return DETAIL_SQL_TEMPLATE.format(
+        apm_source=APPLICANT_MAPPING_SUBQUERY,
+        where=f"j.normalized_app_num IN ({placeholders})",
+    )
+
+
+def web_detail_sql(app_count: int) -> str:
+    """指定件数の出願番号を対象にしたWeb画面のライブJOINのSQL"""
+    placeholders = ','.join(['?' for _ in range(app_count)])
+    return WEB_DETAIL_SQL_TEMPLATE.format(
+        apm_source=WEB_APPLICANT_MAPPING_SUBQUERY,
+        where=f"j.normalized_app_num IN ({placeholders})",
+    )
+
+
+def summary_lookup_sql(app_count: int, columns: Optional[Dict[str, str]] = None) -> str:
+    """
+    サマリーテーブルの主キー検索SQL
+
+    Args:
+        app_count: 出願番号の件数
+        columns: {サマリー列名: 出力名}（省略時は SUMMARY_COLUMNS をそのまま出力）
+    """
+    if columns is None:
+        select_list = ", ".join(SUMMARY_COLUMNS)
+    else:
+        select_list = ", ".join(col if col == alias else f"{col} AS {alias}"
+                                for col, alias in columns.items())
+    placeholders = ','.join(['?' for _ in range(app_count)])
+    return (f"SELECT {select_list} FROM {SUMMARY_TABLE} "
+            f"WHERE app_num IN ({placeholders}) ORDER BY app_num")
+
+
+def summary_exists(query_one: Callable) -> bool:
+    """サマリーテーブルが存在するか（query_one: (sql, params) -> 1行 or None）"""
+    row = query_one("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (SUMMARY_TABLE,))
+    return row is not None
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (table_name,)).fetchone()
+    return row is not None
+
+
+def create_summary_table(conn: sqlite3.Connection):
+    """サマリーテーブルを作成"""
+    conn.execute(CREATE_SUMMARY_SQL)
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({SUMMARY_TABLE})")}
+    for column, definition in _EXTRA_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {SUMMARY_TABLE} ADD COLUMN {column} {definition}")
+
+
+def _prepare_build(conn: sqlite3.Connection):
+    """集約用の関数と出願人マッピング一時テーブルを準備"""
+    conn.create_function("is_standard_character", 1,
+                         lambda data: 1 if is_standard_character(data) else 0,
+                         deterministic=True)
+    # ウィンドウ関数による出願人マッピングの絞り込みは再構築ごとに一度だけ行う
+    conn.execute("DROP TABLE IF EXISTS temp.summary_applicant_mapping")
+    conn.execute(f"CREATE TEMP TABLE summary_applicant_mapping AS SELECT * FROM {APPLICANT_MAPPING_SUBQUERY} "
+                 f"WHERE rn = 1")
+    conn.execute("CREATE INDEX temp.idx_summary_apm_code ON summary_applicant_mapping(applicant_code)")
+    conn.execute("DROP TABLE IF EXISTS temp.summary_web_applicant_mapping")
+    conn.execute(f"CREATE TEMP TABLE summary_web_applicant_mapping AS SELECT * FROM {WEB_APPLICANT_MAPPING_SUBQUERY} "
+                 f"WHERE rn = 1")
+    conn.execute("CREATE INDEX temp.idx_summary_web_apm_code ON summary_web_applicant_mapping(applicant_code)")
+
+
+def _drop_build_tables(conn: sqlite3.Connection):
+    conn.execute("DROP TABLE IF EXISTS temp.summary_applicant_mapping")
+    conn.execute("DROP TABLE IF EXISTS temp.summary_web_applicant_mapping")
+
+
+def _summarize_chunk(conn: sqlite3.Connection, chunk: List[str]):
+    """出願番号の一群をライブJOINと同じSQLで集約してサマリーへ挿入"""
+    placeholders = ','.join(['?' for _ in chunk])
+    select_sql = DETAIL_SQL_TEMPLATE.format(
+        apm_source="temp.summary_applicant_mapping",
+        where=f"j.normalized_app_num IN ({placeholders})",
+    )
+    columns = ", ".join(SUMMARY_COLUMNS)
+    conn.execute(f"INSERT INTO {SUMMARY_TABLE} ({columns}) {select_sql}", chunk)
+    # MIN()を集約SQLに加えるとGROUP BYの非集約列の値が変わるため、標準文字判定は別途更新する
+    conn.execute(f"""
+        UPDATE {SUMMARY_TABLE}
+        SET is_standard_char = is_standard_character(
+            (SELECT MIN(image_data) FROM t_sample WHERE t_sample.normalized_app_num = {SUMMARY_TABLE}.app_num)
+        )
+        WHERE app_num IN ({placeholders})
+    """, chunk)
+    # Web画面用の列はWeb画面のライブJOINと同じSQLで集約する
+    web_sql = WEB_DETAIL_SQL_TEMPLATE.format(
+        apm_source="temp.summary_web_applicant_mapping",
+        where=f"j.normalized_app_num IN ({placeholders})",
+    )
+    conn.execute(f"""
+        UPDATE {SUMMARY_TABLE}
+        SET display_mark_text = w.mark_text,
+            web_app_date = w.app_date,
+            web_reg_date = w.reg_date,
+            web_reg_no = w.reg_no,
+            web_applicant_name = w.applicant_name,
+            web_applicant_addr = w.applicant_addr
+        FROM ({web_sql}) AS w
+        WHERE {SUMMARY_TABLE}.app_num = w.app_num
+    """, chunk)
+
+
+def rebuild_summary(conn: sqlite3.Connection) -> int:
+    """
+    サマリーテーブルを全件再構築（インポート後に実行）
+
+    Returns:
+        構築した行数
+    """
+    create_summary_table(conn)
+    _prepare_build(conn)
+    try:
+        app_nums = [row[0] for row in conn.execute(
+            "SELECT normalized_app_num FROM jiken_c_t ORDER BY normalized_app_num")]
+        with conn:
+            conn.execute(f"DELETE FROM {SUMMARY_TABLE}")
+            for chunk in _chunks(app_nums):
+                _summarize_chunk(conn, chunk)
+        count = conn.execute(f"SELECT COUNT(*) FROM {SUMMARY_TABLE}").fetchone()[0]
+    finally:
+        _drop_build_tables(conn)
+    logger.info(f"{SUMMARY_TABLE} を再構築しました: {count}件")
+    return count
+
+
+def refresh_summary(conn: sqlite3.Connection, app_nums: Iterable[str]) -> int:
+    """
+    指定した出願番号のサマリー行のみ再集計（週次更新後に実行）
+    サマリーテーブルが未作成の場合は何もしない
+
+    Returns:
+        再集計した出願番号の件数
+    """
+    app_nums = sorted({num for num in app_nums if num})
+    if not app_nums or not _table_exists(conn, SUMMARY_TABLE):
+        return 0
+
+    create_summary_table(conn)
+    _prepare_build(conn)
+    try:
+        with transaction(conn):
+            for chunk in _chunks(app_nums):
+                placeholders = ','.join(['?' for _ in chunk])
+                conn.execute(f"DELETE FROM {SUMMARY_TABLE} WHERE app_num IN ({placeholders})", chunk)
+                _summarize_chunk(conn, chunk)
+    finally:
+        _drop_build_tables(conn)
+    logger.info(f"{SUMMARY_TABLE} を更新しました: {len(app_nums)}件")
+    return len(app_nums)
+
+
+def _cli_views(cur: sqlite3.Cursor, chunk: List[str]):
+    live = {row['app_num']: dict(row) for row in cur.execute(live_detail_sql(len(chunk)), chunk)}
+    summary = {row['app_num']: dict(row) for row in cur.execute(summary_lookup_sql(len(chunk)), chunk)}
+    return live, summary, SUMMARY_COLUMNS
+
+
+def _web_views(cur: sqlite3.Cursor, chunk: List[str]):
+    live = {}
+    for row in cur.execute(web_detail_sql(len(chunk)), chunk):
+        row = dict(row)
+        row['is_standard_char'] = 1 if is_standard_character(row.pop('image_data_sample')) else 0
+        live[row['app_num']] = row
+    summary = {row['app_num']: dict(row)
+               for row in cur.execute(summary_lookup_sql(len(chunk), WEB_SUMMARY_COLUMNS), chunk)}
+    return live, summary, list(WEB_SUMMARY_COLUMNS.values())
+
+
+# 突き合わせる表示: CLI（live_detail_sql） / Web画面（web_detail_sql）
+VIEWS = {'cli': _cli_views, 'web': _web_views}
+
+
+def check_consistency(conn: sqlite3.Connection, app_nums: Optional[Iterable[str]] = None,
+                      sample_size: Optional[int] = None, view: str = 'cli') -> Dict:
+    """
+    サマリーテーブルとライブJOINの結果を突き合わせる
+
+    Args:
+        app_nums: 検査対象の出願番号（省略時は全件、または sample_size 件の無作為抽出）
+        sample_size: 無作為抽出する件数
+        view: 'cli'（CLIのライブJOIN） / 'web'（Web画面のライブJOIN）
+
+    Returns:
+        {'checked', 'missing', 'extra', 'mismatched'} の辞書
+        mismatched は (出願番号, 列名, サマリーの値, ライブJOINの値) のリスト
+    """
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view: {view} (expected one of {tuple(VIEWS)})")
+    cur = conn.cursor()
+    cur.row_factory = sqlite3.Row
+    if app_nums is not None:
+        targets = sorted(set(app_nums))
+    elif sample_size:
+        targets = sorted(row[0] for row in conn.execute(
+            "SELECT normalized_app_num FROM jiken_c_t ORDER BY RANDOM() LIMIT ?", (sample_size,)))
+    else:
+        targets = [row[0] for row in conn.execute(
+            "SELECT normalized_app_num FROM jiken_c_t ORDER BY normalized_app_num")]
+
+    report = {'checked': len(targets), 'missing': [], 'extra': [], 'mismatched': []}
+
+    for chunk in _chunks(targets):
+        live, summary, columns = VIEWS[view](cur, chunk)
+        for app_num in chunk:
+            if app_num in live and app_num not in summary:
+                report['missing'].append(app_num)
+            elif app_num in summary and app_num not in live:
+                report['extra'].append(app_num)
+            elif app_num in live:
+                for col in columns:
+                    if summary[app_num][col] != live[app_num][col]:
+                        report['mismatched'].append((app_num, col, summary[app_num][col], live[app_num][col]))
+
+    # 事件が削除されたのにサマリーに残っている行（全件検査時のみ）
+    if app_nums is None and not sample_size:
+        report['extra'].extend(row[0] for row in conn.execute(
+            f"SELECT app_num FROM {SUMMARY_TABLE} WHERE app_num NOT IN (SELECT normalized_app_num FROM jiken_c_t)"))
+
+    return report
+
+
+def main():
+    """CLI エントリーポイント"""
+    parser = argparse.ArgumentParser(description="商標サマリーテーブルの構築・整合性チェック")
+    parser.add_argument("--db", default="output.db", help="データベースファイルパス")
+    parser.add_argument("--rebuild", action="store_true", help="サマリーテーブルを全件再構築")
+    parser.add_argument("--check", action="store_true", help="CLI・Web画面のライブJOINとの整合性チェック")
+    parser.add_argument("--sample", type=int, help="整合性チェックを無作為抽出した件数で行う")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not Path(args.db).exists():
+        print(f"エラー: データベースファイルが見つかりません: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.rebuild:
+            count = rebuild_summary(conn)
+            print(f"{SUMMARY_TABLE}: {count}件を構築しました")
+
+        if args.check:
+            if not _table_exists(conn, SUMMARY_TABLE):
+                print(f"{SUMMARY_TABLE} が存在しません。--rebuild で作成してください。", file=sys.stderr)
+                sys.exit(1)
+            failed = False
+            for view in VIEWS:
+                report = check_consistency(conn, sample_size=args.sample, view=view)
+                print(f"[{view}] 検査件数: {report['checked']}")
+                print(f"欠落: {len(report['missing'])}件 / 余剰: {len(report['extra'])}件 / "
+                      f"不一致: {len(report['mismatched'])}件")
+                for app_num, col, summary_value, live_value in report['mismatched'][:20]:
+                    print(f"  {app_num} {col}: summary={summary_value!r} live={live_value!r}")
+                failed = failed or bool(report['missing'] or report['extra'] or report['mismatched'])
+            if failed:
+                sys.exit(2)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
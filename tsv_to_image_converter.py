@@ -9,22 +9,84 @@ upd_t_sample.tsvファイルから画像データを抽出しJPGファイルに
 
 import os
 import base64
+import binascii
 import sqlite3
 import csv
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import re
 
+from image_store import ImageStore, iter_images
+
+# t_sample の列位置
+APP_NUM_COLUMN = 3           # 出願番号（1950025233形式）
+REC_SEQ_NUM_COLUMN = 5       # レコード順序番号（01～99）
+FINAL_REC_SEQ_NUM_COLUMN = 9  # 最終レコード順序番号（レコード分割数）
+IMAGE_DATA_COLUMN = 17       # イメージデータ（Base64）
+
+# 画像として扱う最小サイズ（バイト）
+MIN_IMAGE_BYTES = 100
+JPEG_MAGIC = b'\xff\xd8\xff'
+
+# ワーカープロセスへ1回で渡すレコード数
+DEFAULT_IMAGE_CHUNK_SIZE = 64
+
+# データベース更新のバッチ（行数・Base64の合計文字数のどちらかに達したら書き込む）
+DB_BATCH_ROWS = 1000
+DB_BATCH_CHARS = 8 * 1024 * 1024
+
+def decode_image(image_data: str) -> Optional[bytes]:
+    """Base64を1回だけデコードし、JPEGのマジックナンバーと最小サイズを満たす場合のみ返す"""
+    if not image_data:
+        return None
+    try:
+        decoded = base64.b64decode(image_data)
+    except (binascii.Error, ValueError):
+        return None
+    if len(decoded) < MIN_IMAGE_BYTES or not decoded.startswith(JPEG_MAGIC):
+        return None
+    return decoded
+
+
+def write_images(output_dir: str, items: List[Tuple[str, str]], thumbnails: bool = True) -> List[Tuple[str, str]]:
+    """
+    (normalized_app_num, image_data) のリストを画像ストア（分割ディレクトリ）へ書き出し、
+    サムネイルも作成する（ワーカープロセスで実行）
+
+    Returns:
+        [(normalized_app_num, 'ok' / 'invalid' / 'error'), ...]
+    """
+    store = ImageStore(output_dir, thumbnails=thumbnails)
+    results = []
+    for normalized_app_num, image_data in items:
+        decoded = decode_image(image_data)
+        if decoded is None:
+            results.append((normalized_app_num, 'invalid'))
+            continue
+        try:
+            store.write(normalized_app_num, decoded)
+            results.append((normalized_app_num, 'ok'))
+        except OSError:
+            results.append((normalized_app_num, 'error'))
+    return results
+
+
 class TSVImageConverter:
     """TSVファイルから画像データを抽出してJPGファイルに変換するクラス"""
     
     def __init__(self, tsv_file: str = "tsv_data/250611/upd_t_sample.tsv", 
                  output_dir: str = "images/final_complete",
-                 db_path: str = "output.db"):
+                 db_path: str = "output.db", thumbnails: bool = True):
         self.tsv_file = Path(tsv_file)
         self.output_dir = Path(output_dir)
         self.db_path = db_path
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # 画像は出願番号の年・番号で分割したディレクトリへ保存する
+        self.thumbnails = thumbnails
+        self.store = ImageStore(self.output_dir, thumbnails=thumbnails)
         
         # TSVファイルの列インデックス（upd_t_sample.tsv用）
         self.SHUTUGAN_NO_INDEX = 0  # 出願番号
@@ -36,92 +98,97 @@ class TSVImageConverter:
             'successful_conversions': 0,
             'failed_conversions': 0,
             'multiline_records': 0,
-            'database_updates': 0
+            'database_updates': 0,
+            'images_per_second': 0.0
         }
     
     def normalize_app_num(self, app_num: str) -> str:
         """出願番号を正規化（ハイフン除去）"""
         return app_num.replace('-', '')
     
-    def read_tsv_with_multiline_handling(self) -> List[Dict[str, str]]:
+    def _make_record(self, app_num: str, parts: List[Dict], line_start: int) -> Dict:
+        """出願番号ごとのデータ部分を rec_seq_num の順に結合したレコードを作成"""
+        return {
+            'app_num': app_num,
+            'image_data': self.combine_by_seq_num(parts),
+            'rec_seq_num': parts[0]['rec_seq_num'],
+            'line_start': line_start,
+            'is_multiline': len(parts) > 1
+        }
+    
+    def iter_records(self) -> Iterator[Dict[str, str]]:
         """
-        TSVファイルを読み込み、複数行にまたがる画像データを適切に処理
+        TSVファイルを1行ずつ読み込み、出願番号ごとのレコードを順に返す
+        同じ出願番号の行は連続して並ぶため、最終レコード順序番号の行が揃った時点
+        （または出願番号が変わった時点）で結合して返す。保持するのは1件分の画像データのみ。
+        既に返した出願番号が再び現れた場合（複数頁の2頁目以降など）は最初の画像を採用する。
         """
-        print(f"📖 TSVファイルを読み込み中: {self.tsv_file}")
-        
         if not self.tsv_file.exists():
             raise FileNotFoundError(f"TSVファイルが見つかりません: {self.tsv_file}")
         
-        records = {}  # 出願番号をキーとする辞書に変更
+        emitted = set()
         current_app_num = None
-        header_skipped = False
+        parts = []
+        line_start = 0
+        
+        def flush():
+            emitted.add(current_app_num)
+            record = self._make_record(current_app_num, parts, line_start)
+            self.stats['total_records'] += 1
+            if record['is_multiline']:
+                self.stats['multiline_records'] += 1
+            return record
         
         with open(self.tsv_file, 'r', encoding='utf-8') as f:
             for line_num, line in enumerate(f, 1):
                 line = line.rstrip('\n\r')
                 
-                # 空行をスキップ
-                if not line.strip():
+                # ヘッダー行・空行をスキップ
+                if line_num == 1 or not line.strip():
                     continue
                 
-                # ヘッダー行をスキップ
-                if not header_skipped and line_num == 1:
-                    header_skipped = True
+                # 進捗表示
+                if line_num % 10000 == 0:
+                    print(f"   処理済み行数: {line_num:,}")
+                
+                # タブ区切りで分割（出願番号が無い行は続きの行として扱わない）
+                cols = line.split('\t')
+                if len(cols) < 18 or not re.match(r'^\d{10}$', cols[APP_NUM_COLUMN]):
                     continue
                 
-                # タブ区切りで分割
-                parts = line.split('\t')
+                raw_app_num = cols[APP_NUM_COLUMN]
+                app_num = f"{raw_app_num[:4]}-{raw_app_num[4:]}"  # 1950-025233形式
+                if app_num != current_app_num:
+                    if parts:
+                        yield flush()
+                    current_app_num = app_num
+                    parts = []
+                    line_start = line_num
+                if app_num in emitted:
+                    continue
                 
-                # 新しいレコードまたは続きのレコードを判定
-                if len(parts) >= 18 and parts[3] and re.match(r'^\d{10}$', parts[3]):
-                    raw_app_num = parts[3]  # 1950025233形式
-                    formatted_app_num = f"{raw_app_num[:4]}-{raw_app_num[4:]}"  # 1950-025233形式
-                    current_app_num = formatted_app_num
-                    image_data = parts[17] if len(parts) > 17 else ''
-                    rec_seq_num = int(parts[5]) if parts[5].isdigit() else 0
-                    
-                    # 同じ出願番号のレコードがある場合
-                    if formatted_app_num in records:
-                        # データ部分をリストに追加
-                        if 'data_parts' not in records[formatted_app_num]:
-                            # 最初のデータもリストに変換
-                            first_rec_seq = records[formatted_app_num].get('rec_seq_num', 1)
-                            records[formatted_app_num]['data_parts'] = [{
-                                'rec_seq_num': first_rec_seq,
-                                'image_data': records[formatted_app_num]['image_data']
-                            }]
-                        
-                        # 新しいデータを追加
-                        records[formatted_app_num]['data_parts'].append({
-                            'rec_seq_num': rec_seq_num,
-                            'image_data': image_data
-                        })
-                        records[formatted_app_num]['is_multiline'] = True
-                    else:
-                        # 新しいレコードを作成
-                        records[formatted_app_num] = {
-                            'app_num': formatted_app_num,
-                            'image_data': image_data,
-                            'rec_seq_num': rec_seq_num,
-                            'line_start': line_num,
-                            'is_multiline': False
-                        }
+                rec_seq_num = int(cols[REC_SEQ_NUM_COLUMN]) if cols[REC_SEQ_NUM_COLUMN].isdigit() else 0
+                parts.append({'rec_seq_num': rec_seq_num, 'image_data': cols[IMAGE_DATA_COLUMN]})
                 
-                # 進捗表示
-                if line_num % 10000 == 0:
-                    print(f"   処理済み行数: {line_num:,}")
+                # 最終レコードまで揃ったら即座に返す
+                final = int(cols[FINAL_REC_SEQ_NUM_COLUMN]) if cols[FINAL_REC_SEQ_NUM_COLUMN].isdigit() else 0
+                if final > 0 and rec_seq_num >= final and len(parts) >= final:
+                    yield flush()
+                    parts = []
         
-        # 辞書からリストに変換し、複数パーツのデータを結合
-        records_list = []
-        for record in records.values():
-            if record.get('is_multiline') and 'data_parts' in record:
-                # 複数パーツの場合はrec_seq_numの順序で結合
-                record['image_data'] = self.combine_by_seq_num(record['data_parts'])
-            records_list.append(record)
+        if parts:
+            yield flush()
+    
+    def read_tsv_with_multiline_handling(self) -> List[Dict[str, str]]:
+        """
+        TSVファイルを読み込み、複数行にまたがる画像データを適切に処理
+        （全レコードを保持するため、大きなファイルには iter_records を使用する）
+        """
+        print(f"📖 TSVファイルを読み込み中: {self.tsv_file}")
         
-        # 統計情報更新
-        self.stats['total_records'] = len(records_list)
-        self.stats['multiline_records'] = sum(1 for r in records_list if r['is_multiline'])
+        self.stats['total_records'] = 0
+        self.stats['multiline_records'] = 0
+        records_list = list(self.iter_records())
         
         print(f"✅ TSV読み込み完了: {len(records_list):,} レコード")
         print(f"   複数行レコード: {self.stats['multiline_records']:,} 件")
@@ -141,126 +208,74 @@ class TSVImageConverter:
         
         return combined
     
-    def is_valid_base64(self, data: str) -> bool:
-        """Base64データの有効性を検証"""
-        try:
-            # データが空または無効な長さの場合は除外
-            if not data or len(data) % 4 != 0:
-                return False
-            
-            # 無効な画像データフォーマットを除外
-            # 多くのレコードが「////」で始まるが、これらは有効なJPEG Base64データではない
-            if data.startswith('////'):
-                return False
-            
-            # 有効なJPEG Base64データは通常「/9j/」で始まる
-            if not data.startswith('/9j/'):
-                return False
-            
-            decoded = base64.b64decode(data)
-            
-            # 最小サイズチェック
-            if len(decoded) < 100:
-                return False
-            
-            # JPEGファイルのマジックナンバーをチェック
-            if decoded[:2] == b'\xff\xd8':
-                return True
-            
-            # PNGファイルのマジックナンバーをチェック
-            if decoded[:8] == b'\x89PNG\r\n\x1a\n':
-                return True
-            
-            return False
+    def _prepare_t_sample_table(self, cursor):
+        """t_sampleテーブルと has_image_file カラムを用意"""
+        # 既存のt_sampleテーブル構造を確認
+        cursor.execute("""
+            SELECT sql FROM sqlite_master 
+            WHERE type='table' AND name='t_sample'
+        """)
+        
+        existing_table = cursor.fetchone()
+        
+        if not existing_table:
+            # テーブルが存在しない場合は作成
+            cursor.execute("""
+                CREATE TABLE t_sample (
+                    normalized_app_num TEXT PRIMARY KEY,
+                    image_data TEXT,
+                    rec_seq_num INTEGER,
+                    has_image_file TEXT DEFAULT 'NO',
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            print("✅ t_sampleテーブルを作成しました")
+        else:
+            # has_image_fileカラムが存在しない場合は追加
+            cursor.execute("PRAGMA table_info(t_sample)")
+            columns = [col[1] for col in cursor.fetchall()]
             
-        except Exception:
-            return False
+            if 'has_image_file' not in columns:
+                cursor.execute("ALTER TABLE t_sample ADD COLUMN has_image_file TEXT DEFAULT 'NO'")
+                print("✅ has_image_fileカラムを追加しました")
     
-    def convert_to_jpg(self, base64_data: str, output_path: Path) -> bool:
-        """Base64データをJPGファイルに変換"""
-        try:
-            # Base64データをデコード
-            image_data = base64.b64decode(base64_data)
-            
-            # JPEGファイルとして保存
-            with open(output_path, 'wb') as f:
-                f.write(image_data)
-            
-            # ファイルサイズをチェック
-            file_size = output_path.stat().st_size
-            if file_size < 100:  # 100バイト未満は無効とみなす
-                output_path.unlink()  # ファイルを削除
-                return False
-            
-            return True
-            
-        except Exception as e:
-            print(f"⚠️ 画像変換エラー: {e}")
-            return False
+    def _write_database_rows(self, cursor, rows: List[Tuple[str, str, str]]):
+        """(normalized_app_num, image_data, has_image_file) の行をまとめて挿入/更新"""
+        cursor.executemany("""
+            INSERT OR REPLACE INTO t_sample 
+            (normalized_app_num, image_data, has_image_file)
+            VALUES (?, ?, ?)
+        """, rows)
+        self.stats['database_updates'] += len(rows)
     
-    def update_database(self, records: List[Dict[str, str]]):
+    def _database_row(self, record: Dict[str, str]) -> Tuple[str, str, str]:
+        normalized_app_num = self.normalize_app_num(record['app_num'])
+        # 画像ファイルが存在するかチェック
+        image_file = self.store.path(normalized_app_num)
+        has_image_file = 'YES' if image_file.exists() else 'NO'
+        return normalized_app_num, record['image_data'], has_image_file
+    
+    def update_database(self, records: Iterable[Dict[str, str]]):
         """データベースのt_sampleテーブルを更新"""
         print("📊 データベースを更新中...")
         
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
-            
-            # 既存のt_sampleテーブル構造を確認
-            cursor.execute("""
-                SELECT sql FROM sqlite_master 
-                WHERE type='table' AND name='t_sample'
-            """)
-            
-            existing_table = cursor.fetchone()
-            
-            if not existing_table:
-                # テーブルが存在しない場合は作成
-                cursor.execute("""
-                    CREATE TABLE t_sample (
-                        normalized_app_num TEXT PRIMARY KEY,
-                        image_data TEXT,
-                        rec_seq_num INTEGER,
-                        has_image_file TEXT DEFAULT 'NO',
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                print("✅ t_sampleテーブルを作成しました")
-            else:
-                # has_image_fileカラムが存在しない場合は追加
-                cursor.execute("PRAGMA table_info(t_sample)")
-                columns = [col[1] for col in cursor.fetchall()]
-                
-                if 'has_image_file' not in columns:
-                    cursor.execute("ALTER TABLE t_sample ADD COLUMN has_image_file TEXT DEFAULT 'NO'")
-                    print("✅ has_image_fileカラムを追加しました")
+            self._prepare_t_sample_table(cursor)
             
             # データをバッチで挿入/更新
-            batch_size = 1000
-            for i in range(0, len(records), batch_size):
-                batch = records[i:i + batch_size]
-                
-                for record in batch:
-                    app_num = record['app_num']
-                    normalized_app_num = self.normalize_app_num(app_num)
-                    image_data = record['image_data']
-                    
-                    # 画像ファイルが存在するかチェック
-                    image_file = self.output_dir / f"{normalized_app_num}.jpg"
-                    has_image_file = 'YES' if image_file.exists() else 'NO'
-                    
-                    # データベースに挿入/更新
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO t_sample 
-                        (normalized_app_num, image_data, has_image_file)
-                        VALUES (?, ?, ?)
-                    """, (normalized_app_num, image_data, has_image_file))
-                
-                self.stats['database_updates'] += len(batch)
-                
-                # 進捗表示
-                if i % (batch_size * 10) == 0:
-                    print(f"   データベース更新: {i:,} / {len(records):,}")
+            batch = []
+            for record in records:
+                batch.append(self._database_row(record))
+                if len(batch) >= DB_BATCH_ROWS:
+                    self._write_database_rows(cursor, batch)
+                    batch = []
+                    # 進捗表示
+                    if self.stats['database_updates'] % (DB_BATCH_ROWS * 10) == 0:
+                        print(f"   データベース更新: {self.stats['database_updates']:,}")
+            if batch:
+                self._write_database_rows(cursor, batch)
             
             conn.commit()
             conn.close()
@@ -270,59 +285,114 @@ class TSVImageConverter:
         except Exception as e:
             print(f"❌ データベース更新エラー: {e}")
     
-    def convert_images(self) -> Dict[str, int]:
-        """画像変換のメイン処理"""
-        print("🖼️ TSV画像データ変換を開始...")
+    def _iter_conversion_chunks(self, existing_files, chunk_size: int):
+        """(レコードのリスト, 変換対象の (出願番号, 画像データ) リスト) をチャンク単位で返す"""
+        records = []
+        items = []
+        for record in self.iter_records():
+            normalized_app_num = self.normalize_app_num(record['app_num'])
+            # 画像ファイルが既に存在する場合はスキップ
+            if normalized_app_num not in existing_files:
+                items.append((normalized_app_num, record['image_data']))
+            records.append(record)
+            if len(records) >= chunk_size:
+                yield records, items
+                records, items = [], []
+        if records:
+            yield records, items
+    
+    def _iter_converted(self, existing_files, workers: int, chunk_size: int, max_pending: int):
+        """
+        画像を書き出し、(レコードのリスト, 変換結果) を入力順に返す
+        workers > 1 の場合は読み込みと並行してプロセスプールで変換する（先読みは max_pending チャンクまで）
+        """
+        chunks = self._iter_conversion_chunks(existing_files, chunk_size)
+        output_dir = str(self.output_dir)
+        if workers <= 1:
+            for records, items in chunks:
+                yield records, write_images(output_dir, items, self.thumbnails)
+            return
         
-        # TSVファイルを読み込み
-        records = self.read_tsv_with_multiline_handling()
+        pending = deque()
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            for records, items in chunks:
+                pending.append((records, executor.submit(write_images, output_dir, items, self.thumbnails)))
+                if len(pending) >= max_pending:
+                    records, future = pending.popleft()
+                    yield records, future.result()
+            while pending:
+                records, future = pending.popleft()
+                yield records, future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def convert_images(self, workers: int = 1, chunk_size: int = DEFAULT_IMAGE_CHUNK_SIZE,
+                       max_pending: Optional[int] = None) -> Dict[str, int]:
+        """
+        画像変換のメイン処理
+        レコードを読み込みながらチャンク単位でワーカーへ渡し、Base64のデコード・検証・書き出しを
+        並列に行う。結果は入力順に受け取り、データベースへの書き込みバッチに追加する。
+        
+        Args:
+            workers: ワーカープロセス数（1以下なら現在のプロセスで処理）
+            chunk_size: ワーカーへ1回で渡すレコード数
+            max_pending: 処理中とするチャンク数の上限（既定 workers×2）
+        """
+        print("🖼️ TSV画像データ変換を開始...")
+        print(f"📖 TSVファイルを読み込み中: {self.tsv_file}")
         
         # 既存の画像ファイルをチェック
         existing_files = set()
         if self.output_dir.exists():
-            existing_files = {f.stem for f in self.output_dir.glob('*.jpg')}
+            existing_files = self.store.existing_app_nums('jpg')
         
         print(f"📁 既存画像ファイル: {len(existing_files):,} 個")
         
-        # 画像変換処理
-        for i, record in enumerate(records, 1):
-            app_num = record['app_num']
-            normalized_app_num = self.normalize_app_num(app_num)
-            
-            # 画像データを取得（既に結合済み）
-            image_data = record['image_data']
-            
-            # 進捗表示
-            if i % 100 == 0:
-                print(f"   処理中: {i:,} / {len(records):,} ({i/len(records)*100:.1f}%)")
-            
-            # 画像ファイルが既に存在する場合はスキップ
-            if normalized_app_num in existing_files:
-                continue
-            
-            # 画像データの有効性チェック
-            if not image_data:
-                self.stats['failed_conversions'] += 1
-                continue
-            
-            # データの有効性をチェック（JPEGヘッダーまたは有効なBase64）
-            is_valid = (image_data.startswith('/9j/') and len(image_data) > 100)
-            
-            if not is_valid:
-                self.stats['failed_conversions'] += 1
-                continue
-            
-            # 画像ファイルパス
-            output_file = self.output_dir / f"{normalized_app_num}.jpg"
+        start = time.perf_counter()
+        max_pending = max(1, max_pending or workers * 2)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            self._prepare_t_sample_table(cursor)
             
-            # 画像変換
-            if self.convert_to_jpg(image_data, output_file):
-                self.stats['successful_conversions'] += 1
-            else:
-                self.stats['failed_conversions'] += 1
+            batch = []
+            batch_chars = 0
+            for records, results in self._iter_converted(existing_files, workers, chunk_size, max_pending):
+                converted = set()
+                for normalized_app_num, status in results:
+                    if status == 'ok':
+                        self.stats['successful_conversions'] += 1
+                        converted.add(normalized_app_num)
+                    else:
+                        self.stats['failed_conversions'] += 1
+                
+                for record in records:
+                    normalized_app_num = self.normalize_app_num(record['app_num'])
+                    has_image_file = 'YES' if (normalized_app_num in converted
+                                               or normalized_app_num in existing_files) else 'NO'
+                    batch.append((normalized_app_num, record['image_data'], has_image_file))
+                    batch_chars += len(record['image_data'] or '')
+                if len(batch) >= DB_BATCH_ROWS or batch_chars >= DB_BATCH_CHARS:
+                    self._write_database_rows(cursor, batch)
+                    batch = []
+                    batch_chars = 0
+                    print(f"   処理中: {self.stats['total_records']:,} レコード")
+            if batch:
+                self._write_database_rows(cursor, batch)
+            conn.commit()
+            # 画像目録（Webアプリ）に分割ディレクトリ内の追加を知らせる
+            self.store.mark_updated()
+        finally:
+            conn.close()
         
-        # データベースを更新
-        self.update_database(records)
+        elapsed = time.perf_counter() - start
+        self.stats['images_per_second'] = round(self.stats['successful_conversions'] / elapsed, 1) if elapsed else 0.0
+        
+        print(f"✅ TSV読み込み完了: {self.stats['total_records']:,} レコード")
+        print(f"   複数行レコード: {self.stats['multiline_records']:,} 件")
+        print(f"✅ データベース更新完了: {self.stats['database_updates']:,} レコード")
+        print(f"⏱️ 変換速度: {self.stats['images_per_second']:,} 画像/秒 ({elapsed:.1f}秒)")
         
         return self.stats
     
@@ -336,6 +406,7 @@ class TSVImageConverter:
         print(f"変換成功:         {self.stats['successful_conversions']:,}")
         print(f"変換失敗:         {self.stats['failed_conversions']:,}")
         print(f"データベース更新: {self.stats['database_updates']:,}")
+        print(f"変換速度:         {self.stats['images_per_second']:,} 画像/秒")
         print(f"成功率:           {self.stats['successful_conversions']/max(self.stats['total_records'], 1)*100:.1f}%")
         print("="*50)
     
@@ -354,7 +425,7 @@ class TSVImageConverter:
             print("❌ 画像ディレクトリが存在しません")
             return validation_stats
         
-        image_files = list(self.output_dir.glob('*.jpg'))
+        image_files = [self.output_dir / path for _, ext, path in iter_images(self.output_dir) if ext == 'jpg']
         validation_stats['total_files'] = len(image_files)
         
         for image_file in image_files:
@@ -396,6 +467,10 @@ def main():
                         help="データベースファイルパス")
     parser.add_argument("--validate-only", action="store_true", 
                         help="既存画像ファイルの検証のみ実行")
+    parser.add_argument("--no-thumbnails", action="store_true",
+                        help="一覧表示用サムネイルを作成しない")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="画像のデコード・書き出しを行うワーカープロセス数")
     
     args = parser.parse_args()
     
@@ -403,7 +478,8 @@ def main():
     converter = TSVImageConverter(
         tsv_file=args.tsv_file,
         output_dir=args.output_dir,
-        db_path=args.db_path
+        db_path=args.db_path,
+        thumbnails=not args.no_thumbnails
     )
     
     if args.validate_only:
@@ -420,7 +496,7 @@ def main():
                 print(f"  {file_path}")
     else:
         # 画像変換実行
-        stats = converter.convert_images()
+        stats = converter.convert_images(workers=args.workers)
         converter.print_summary()
         
         # 既存画像の検証も実行
@@ -10,12 +10,22 @@ import sqlite3
 import csv
 import os
 import sys
-import shutil
 import logging
 from pathlib import Path
-from datetime import datetime
 import argparse
 
+from bitmap_index import default_index_path, write_index as write_bitmap_index
+from db_backup import create_backup as create_database_backup
+from db_pool import transaction
+from goods_code_dictionary import default_dictionary_path, write_dictionary as write_goods_dictionary
+from goods_fts import refresh_index as refresh_goods_index
+from mark_text_fts import refresh_index as refresh_mark_text_index
+from normalized_marks import refresh_normalized_columns
+from pronunciation_search import refresh_index as refresh_pronunciation_index
+from search_cache import bump_data_version
+from similar_group_search import refresh_table as refresh_similar_group_table
+from trademark_summary import refresh_summary
+
 # ログ設定
 logging.basicConfig(
     level=logging.INFO,
@@ -31,22 +41,27 @@ class WeeklyDataUpdater:
         self.db_path = Path(db_path)
         self.backup_dir = Path("backups")
         self.backup_dir.mkdir(exist_ok=True)
-        
-    def create_backup(self):
-        """データベースのバックアップを作成"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = self.backup_dir / f"output_backup_{timestamp}.db"
-        
-        logging.info(f"データベースをバックアップ中: {backup_path}")
-        shutil.copy2(self.db_path, backup_path)
-        
-        # 古いバックアップを削除（最新5つを保持）
-        backups = sorted(self.backup_dir.glob("output_backup_*.db"), reverse=True)
-        for old_backup in backups[5:]:
-            old_backup.unlink()
-            logging.info(f"古いバックアップを削除: {old_backup}")
-        
-        return backup_path
+        # 区分・類似群コードのビットマップ索引（データバージョンを進めた後に作り直す）
+        self.bitmap_index_path = default_index_path(self.db_path)
+        # 商品・役務名 → 類似群コードの展開辞書
+        self.goods_dictionary_path = default_dictionary_path(self.db_path)
+        # 今回の更新で変更された出願番号（サマリーテーブル・検索索引の再集計対象）
+        self.changed_app_nums = set()
+        
+    def create_backup(self, compress=False, incremental=False):
+        """
+        データベースのバックアップを作成（オンラインバックアップAPIでページ単位に複製）
+        
+        Args:
+            compress: gzip 圧縮して保存
+            incremental: 前回のバックアップから変化したページのみ保存
+        
+        Returns:
+            バックアップのマニフェストのパス
+        """
+        # 最新5世代のフルバックアップ（とその差分）を保持
+        return create_database_backup(self.db_path, self.backup_dir, compress=compress,
+                                      incremental=incremental, keep=5)
     
     def get_database_stats(self):
         """データベースの統計情報を取得"""
@@ -67,156 +82,188 @@ class WeeklyDataUpdater:
         conn.close()
         return stats
     
-    def update_jiken_c_t(self, tsv_path):
-        """jiken_c_tテーブルを更新"""
+    def _stage_tsv(self, conn, table_name, tsv_path, app_num_field, column_mapping, unique):
+        """
+        TSVファイルを一時テーブル temp.stage_<table_name> へ一括投入
+        出願番号が空の行は除外し、投入した出願番号を changed_app_nums に記録する
+        
+        Args:
+            column_mapping: [(テーブルの列名, TSVの列名), ...]
+            unique: True なら出願番号ごとに1行（同じ出願番号は後の行で上書き）
+        
+        Returns:
+            一時テーブル名
+        """
+        stage = f"stage_{table_name}"
+        columns = [db_col for db_col, _ in column_mapping]
+        key = "normalized_app_num TEXT PRIMARY KEY" if unique else "normalized_app_num TEXT NOT NULL"
+        conn.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+        conn.execute(f"CREATE TEMP TABLE {stage} ({key}, {', '.join(columns)})")
+        
+        def rows():
+            with open(tsv_path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f, delimiter='\t'):
+                    app_num = row.get(app_num_field, '')
+                    normalized_app_num = app_num.replace('-', '') if app_num else None
+                    if not normalized_app_num:
+                        continue
+                    yield [normalized_app_num] + [row.get(tsv_col) for _, tsv_col in column_mapping]
+        
+        verb = "INSERT OR REPLACE" if unique else "INSERT"
+        placeholders = ",".join(["?"] * (len(columns) + 1))
+        conn.executemany(f"{verb} INTO temp.{stage} (normalized_app_num, {', '.join(columns)}) "
+                         f"VALUES ({placeholders})", rows())
+        if not unique:
+            conn.execute(f"CREATE INDEX temp.idx_{stage}_app_num ON {stage}(normalized_app_num)")
+        
+        self.changed_app_nums.update(
+            app_num for (app_num,) in conn.execute(f"SELECT DISTINCT normalized_app_num FROM temp.{stage}")
+        )
+        return stage
+    
+    def _run_in_transaction(self, conn, apply):
+        """conn が指定されていればそのトランザクション（transaction）内で、無ければ新しい接続で実行してコミット"""
+        if conn is not None:
+            return apply(conn)
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        updated = 0
-        inserted = 0
-        
-        with open(tsv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter='\t')
-            for row in reader:
-                app_num = row.get('shutugan_no', '')
-                normalized_app_num = app_num.replace('-', '') if app_num else None
-                
-                if not normalized_app_num:
-                    continue
-                
-                # 既存データをチェック
-                cursor.execute("SELECT COUNT(*) FROM jiken_c_t WHERE normalized_app_num = ?", (normalized_app_num,))
-                exists = cursor.fetchone()[0] > 0
-                
-                if exists:
-                    # 更新
-                    cursor.execute("""
-                        UPDATE jiken_c_t 
-                        SET shutugan_bi = ?, reg_reg_ymd = ?
-                        WHERE normalized_app_num = ?
-                    """, (
-                        row.get('shutugan_bi'),
-                        row.get('toroku_bi'),
-                        normalized_app_num
-                    ))
-                    updated += 1
-                else:
-                    # 新規挿入
-                    cursor.execute("""
-                        INSERT INTO jiken_c_t (normalized_app_num, shutugan_bi, reg_reg_ymd)
-                        VALUES (?, ?, ?)
-                    """, (
-                        normalized_app_num,
-                        row.get('shutugan_bi'),
-                        row.get('toroku_bi')
-                    ))
-                    inserted += 1
-                
-                if (updated + inserted) % 1000 == 0:
-                    logging.debug(f"  処理済み: {updated + inserted} レコード")
-        
-        conn.commit()
-        conn.close()
-        
+        try:
+            with transaction(conn):
+                return apply(conn)
+        finally:
+            conn.close()
+    
+    def update_jiken_c_t(self, tsv_path, conn=None):
+        """jiken_c_tテーブルを更新（出願番号の主キーで INSERT ... ON CONFLICT DO UPDATE）"""
+        def apply(conn):
+            stage = self._stage_tsv(conn, 'jiken_c_t', tsv_path, 'shutugan_no',
+                                    [('shutugan_bi', 'shutugan_bi'), ('reg_reg_ymd', 'toroku_bi')], unique=True)
+            staged = conn.execute(f"SELECT COUNT(*) FROM temp.{stage}").fetchone()[0]
+            updated = conn.execute(f"""
+                SELECT COUNT(*) FROM temp.{stage}
+                WHERE normalized_app_num IN (SELECT normalized_app_num FROM jiken_c_t)
+            """).fetchone()[0]
+            conn.execute(f"""
+                INSERT INTO jiken_c_t (normalized_app_num, shutugan_bi, reg_reg_ymd)
+                SELECT normalized_app_num, shutugan_bi, reg_reg_ymd FROM temp.{stage} WHERE true
+                ON CONFLICT(normalized_app_num) DO UPDATE SET
+                    shutugan_bi = excluded.shutugan_bi,
+                    reg_reg_ymd = excluded.reg_reg_ymd
+            """)
+            conn.execute(f"DROP TABLE temp.{stage}")
+            return staged - updated, updated, 0
+        
+        inserted, updated, deleted = self._run_in_transaction(conn, apply)
         logging.info(f"  jiken_c_t: 新規{inserted}件、更新{updated}件")
-        return inserted, updated
+        return inserted, updated, deleted
     
-    def update_standard_char_t_art(self, tsv_path):
-        """standard_char_t_artテーブルを更新"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        updated = 0
-        inserted = 0
-        
-        with open(tsv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter='\t')
-            for row in reader:
-                app_num = row.get('app_num', '')
-                normalized_app_num = app_num.replace('-', '') if app_num else None
-                
-                if not normalized_app_num:
-                    continue
-                
-                cursor.execute("SELECT COUNT(*) FROM standard_char_t_art WHERE normalized_app_num = ?", (normalized_app_num,))
-                exists = cursor.fetchone()[0] > 0
-                
-                if exists:
-                    cursor.execute("""
-                        UPDATE standard_char_t_art 
-                        SET standard_char_t = ?
-                        WHERE normalized_app_num = ?
-                    """, (
-                        row.get('standard_char_t'),
-                        normalized_app_num
-                    ))
-                    updated += 1
-                else:
-                    cursor.execute("""
-                        INSERT INTO standard_char_t_art (normalized_app_num, standard_char_t)
-                        VALUES (?, ?)
-                    """, (
-                        normalized_app_num,
-                        row.get('standard_char_t')
-                    ))
-                    inserted += 1
-                
-                if (updated + inserted) % 1000 == 0:
-                    logging.debug(f"  処理済み: {updated + inserted} レコード")
-        
-        conn.commit()
-        conn.close()
-        
+    def update_standard_char_t_art(self, tsv_path, conn=None):
+        """standard_char_t_artテーブルを更新（既存の出願番号は UPDATE、無ければ INSERT）"""
+        def apply(conn):
+            stage = self._stage_tsv(conn, 'standard_char_t_art', tsv_path, 'app_num',
+                                    [('standard_char_t', 'standard_char_t')], unique=True)
+            updated = conn.execute(f"""
+                UPDATE standard_char_t_art
+                SET standard_char_t = (
+                    SELECT s.standard_char_t FROM temp.{stage} s
+                    WHERE s.normalized_app_num = standard_char_t_art.normalized_app_num
+                )
+                WHERE normalized_app_num IN (SELECT normalized_app_num FROM temp.{stage})
+            """).rowcount
+            inserted = conn.execute(f"""
+                INSERT INTO standard_char_t_art (normalized_app_num, standard_char_t)
+                SELECT normalized_app_num, standard_char_t FROM temp.{stage}
+                WHERE normalized_app_num NOT IN (
+                    SELECT normalized_app_num FROM standard_char_t_art WHERE normalized_app_num IS NOT NULL
+                )
+                ORDER BY rowid
+            """).rowcount
+            conn.execute(f"DROP TABLE temp.{stage}")
+            return inserted, updated, 0
+        
+        inserted, updated, deleted = self._run_in_transaction(conn, apply)
         logging.info(f"  standard_char_t_art: 新規{inserted}件、更新{updated}件")
-        return inserted, updated
+        return inserted, updated, deleted
+    
+    def update_table_generic(self, table_name, tsv_path, column_mapping, conn=None):
+        """
+        汎用的なテーブル更新
+        TSVに含まれる出願番号の既存行をすべて削除し、TSVの行（複数行も可）で置き換える
+        
+        Returns:
+            (inserted, updated, deleted): 新規の出願番号の行数、既存の出願番号を置き換えた行数、削除した既存行数
+        """
+        def apply(conn):
+            stage = self._stage_tsv(conn, table_name, tsv_path, 'app_num',
+                                    [(col, col) for col in column_mapping], unique=False)
+            replaced = conn.execute(f"""
+                SELECT COUNT(*) FROM temp.{stage}
+                WHERE normalized_app_num IN (SELECT normalized_app_num FROM {table_name})
+            """).fetchone()[0]
+            deleted = conn.execute(f"""
+                DELETE FROM {table_name}
+                WHERE normalized_app_num IN (SELECT normalized_app_num FROM temp.{stage})
+            """).rowcount
+            # 列名を明示（正規化列など後から追加された列があるテーブルに対応）
+            columns = ", ".join(["normalized_app_num"] + list(column_mapping))
+            total = conn.execute(f"""
+                INSERT INTO {table_name} ({columns})
+                SELECT {columns} FROM temp.{stage} ORDER BY rowid
+            """).rowcount
+            conn.execute(f"DROP TABLE temp.{stage}")
+            return total - replaced, replaced, deleted
+        
+        inserted, updated, deleted = self._run_in_transaction(conn, apply)
+        logging.info(f"  {table_name}: 新規{inserted}件、更新{updated}件、削除{deleted}件")
+        return inserted, updated, deleted
+    
+    def refresh_derived_tables(self, conn=None):
+        """
+        変更された出願番号の正規化列・trademark_summary 行・商標文字索引・指定商品索引・称呼索引・類似群コード表を再集計し、
+        データバージョンを進めて検索結果キャッシュを無効化
+        conn が指定されていればテーブル更新と同じトランザクション内で実行し、確定後に呼び出し側が
+        write_search_files を呼ぶ（無ければ新しい接続で実行・コミットしてからファイルも作り直す）
+        """
+        if not self.changed_app_nums:
+            return 0
+        
+        def apply(conn):
+            return (refresh_normalized_columns(conn, self.changed_app_nums),
+                    refresh_summary(conn, self.changed_app_nums),
+                    refresh_mark_text_index(conn, self.changed_app_nums),
+                    refresh_goods_index(conn, self.changed_app_nums),
+                    refresh_pronunciation_index(conn, self.changed_app_nums),
+                    refresh_similar_group_table(conn, self.changed_app_nums),
+                    bump_data_version(conn))
+        
+        normalized, refreshed, reindexed, _, _, _, version = self._run_in_transaction(conn, apply)
+        if normalized:
+            logging.info(f"  正規化列: {normalized}行を再計算")
+        if refreshed:
+            logging.info(f"  trademark_summary: {refreshed}件を再集計")
+        if reindexed:
+            logging.info(f"  mark_text_fts: {reindexed}件を再索引")
+        logging.info(f"  データバージョン: {version}（検索キャッシュを無効化）")
+        if conn is None:
+            self.write_search_files()
+        return refreshed
     
-    def update_table_generic(self, table_name, tsv_path, column_mapping):
-        """汎用的なテーブル更新"""
+    def write_search_files(self):
+        """
+        確定したデータバージョンのビットマップ索引・商品・役務名辞書のファイルを作り直す
+        （失敗しても更新は取り消さない。Webアプリは索引が古い間はSQL条件、辞書は前回のものを使う）
+        """
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        updated = 0
-        inserted = 0
-        
-        with open(tsv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter='\t')
-            for row in reader:
-                app_num = row.get('app_num', '')
-                normalized_app_num = app_num.replace('-', '') if app_num else None
-                
-                if not normalized_app_num:
-                    continue
-                
-                # 既存データをチェック
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE normalized_app_num = ?", (normalized_app_num,))
-                exists = cursor.fetchone()[0] > 0
-                
-                values = [normalized_app_num]
-                for col in column_mapping:
-                    values.append(row.get(col))
-                
-                if exists:
-                    # 更新（重複レコードは削除してから挿入）
-                    cursor.execute(f"DELETE FROM {table_name} WHERE normalized_app_num = ?", (normalized_app_num,))
-                    placeholders = ",".join(["?" for _ in values])
-                    cursor.execute(f"INSERT INTO {table_name} VALUES ({placeholders})", values)
-                    updated += 1
-                else:
-                    # 新規挿入
-                    placeholders = ",".join(["?" for _ in values])
-                    cursor.execute(f"INSERT INTO {table_name} VALUES ({placeholders})", values)
-                    inserted += 1
-                
-                if (updated + inserted) % 1000 == 0:
-                    logging.debug(f"  処理済み: {updated + inserted} レコード")
-        
-        conn.commit()
-        conn.close()
-        
-        logging.info(f"  {table_name}: 新規{inserted}件、更新{updated}件")
-        return inserted, updated
+        try:
+            for name, write, path in (("ビットマップ索引", write_bitmap_index, self.bitmap_index_path),
+                                      ("商品・役務名辞書", write_goods_dictionary, self.goods_dictionary_path)):
+                try:
+                    write(conn, path)
+                except (OSError, sqlite3.Error) as e:
+                    logging.warning(f"  {name}を保存できませんでした: {e}")
+        finally:
+            conn.close()
     
-    def update_from_directory(self, tsv_dir):
+    def update_from_directory(self, tsv_dir, backup_compress=False, backup_incremental=False):
         """TSVディレクトリから一括更新"""
         tsv_path = Path(tsv_dir)
         if not tsv_path.exists():
@@ -227,7 +274,7 @@ class WeeklyDataUpdater:
         logging.info(f"TSVディレクトリ: {tsv_path}")
         
         # バックアップ作成
-        backup_path = self.create_backup()
+        backup_path = self.create_backup(compress=backup_compress, incremental=backup_incremental)
         
         # 更新前の統計
         stats_before = self.get_database_stats()
@@ -247,39 +294,60 @@ class WeeklyDataUpdater:
             't_sample': 'upd_t_sample.tsv'
         }
         
+        # 追加列があるテーブルの更新対象列
+        generic_columns = {
+            'goods_class_art': ['goods_classes'],
+            'jiken_c_t_shohin_joho': ['designated_goods'],
+            't_knd_info_art_table': ['smlr_dsgn_group_cd'],
+            't_dsgnt_art': ['dsgnt'],
+            't_sample': ['image_data', 'rec_seq_num'],
+        }
+        
         total_inserted = 0
         total_updated = 0
+        total_deleted = 0
         
-        print(f"\\n=== テーブル更新開始 ===")
+        print(f"\n=== テーブル更新開始 ===")
         
-        for table_name, file_name in update_files.items():
-            file_path = tsv_path / file_name
-            if file_path.exists():
-                print(f"\\n{table_name}を更新中...")
-                
-                if table_name == 'jiken_c_t':
-                    inserted, updated = self.update_jiken_c_t(file_path)
-                elif table_name == 'standard_char_t_art':
-                    inserted, updated = self.update_standard_char_t_art(file_path)
-                elif table_name == 'goods_class_art':
-                    inserted, updated = self.update_table_generic(table_name, file_path, ['goods_classes'])
-                elif table_name == 'jiken_c_t_shohin_joho':
-                    inserted, updated = self.update_table_generic(table_name, file_path, ['designated_goods'])
-                elif table_name == 't_knd_info_art_table':
-                    inserted, updated = self.update_table_generic(table_name, file_path, ['smlr_dsgn_group_cd'])
-                elif table_name == 't_dsgnt_art':
-                    inserted, updated = self.update_table_generic(table_name, file_path, ['dsgnt'])
-                elif table_name == 't_sample':
-                    inserted, updated = self.update_table_generic(table_name, file_path, ['image_data', 'rec_seq_num'])
-                elif table_name == 'right_person_art_t':
-                    # 権利者情報は特別処理（reg_numベース）
-                    inserted, updated = 0, 0
-                    print(f"  {table_name}: スキップ（特別処理が必要）")
+        # 全テーブルと派生テーブルを1トランザクションで更新（途中で失敗した場合はすべて取り消す）
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with transaction(conn):
+                for table_name, file_name in update_files.items():
+                    file_path = tsv_path / file_name
+                    if not file_path.exists():
+                        print(f"  {file_name}: ファイルが見つかりません")
+                        continue
+                    
+                    print(f"\n{table_name}を更新中...")
+                    if table_name == 'jiken_c_t':
+                        inserted, updated, deleted = self.update_jiken_c_t(file_path, conn)
+                    elif table_name == 'standard_char_t_art':
+                        inserted, updated, deleted = self.update_standard_char_t_art(file_path, conn)
+                    elif table_name == 'right_person_art_t':
+                        # 権利者情報は特別処理（reg_numベース）
+                        print(f"  {table_name}: スキップ（特別処理が必要）")
+                        continue
+                    else:
+                        inserted, updated, deleted = self.update_table_generic(
+                            table_name, file_path, generic_columns[table_name], conn)
+                    print(f"  新規: {inserted}件、更新: {updated}件、削除: {deleted}件")
+                    
+                    total_inserted += inserted
+                    total_updated += updated
+                    total_deleted += deleted
                 
-                total_inserted += inserted
-                total_updated += updated
-            else:
-                print(f"  {file_name}: ファイルが見つかりません")
+                # 変更された出願番号のサマリー行・検索索引の再集計とデータバージョンの更新も同じトランザクションで行う
+                self.refresh_derived_tables(conn)
+        except Exception as e:
+            # 取り消した変更は再集計の対象から外す
+            self.changed_app_nums.clear()
+            logging.error(f"更新に失敗したため変更を取り消しました: {e}")
+            return False
+        finally:
+            conn.close()
+        
+        self.write_search_files()
         
         # 更新後の統計
         stats_after = self.get_database_stats()
@@ -292,6 +360,7 @@ class WeeklyDataUpdater:
         print(f"\\n=== 更新完了 ===")
         print(f"総新規レコード: {total_inserted}")
         print(f"総更新レコード: {total_updated}")
+        print(f"総削除レコード: {total_deleted}")
         print(f"バックアップ: {backup_path}")
         
         return True
@@ -336,12 +405,16 @@ def main():
     parser.add_argument('tsv_dir', help='新しいTSVファイルのディレクトリ')
     parser.add_argument('--db', default='output.db', help='データベースファイル')
     parser.add_argument('--validate', action='store_true', help='更新後にデータ検証を実行')
+    parser.add_argument('--backup-compress', action='store_true', help='バックアップを gzip 圧縮で保存')
+    parser.add_argument('--backup-incremental', action='store_true',
+                        help='前回のバックアップから変化したページのみ保存')
     
     args = parser.parse_args()
     
     updater = WeeklyDataUpdater(args.db)
     
-    if updater.update_from_directory(args.tsv_dir):
+    if updater.update_from_directory(args.tsv_dir, backup_compress=args.backup_compress,
+                                     backup_incremental=args.backup_incremental):
         if args.validate:
             updater.validate_update()
         